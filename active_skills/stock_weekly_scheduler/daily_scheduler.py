@@ -29,7 +29,7 @@ from typing import List, Dict
 sys.path.insert(0, r'E:\pycharm\stock-analysis')
 
 from sync.index.sixty_index_analysis import SixtyIndexAnalysis
-from analysis.index_analyzer import IndexAnalyzer
+from analysis.multi_index_runner import analyze_many
 from util.date_util import TimeUtils
 from entity import constant
 
@@ -101,19 +101,23 @@ class DailyScheduler:
         
         results = []
         
-        for ts_code, name in self.index_list:
+        # 进程池并行分析，结果按 index_list 顺序返回
+        codes = [ts_code for ts_code, _ in self.index_list]
+        analysis_results = analyze_many(codes, start_date=START_DATE, lookback_years=LOOKBACK_YEARS)
+        
+        for (ts_code, name), analysis in zip(self.index_list, analysis_results):
             try:
-                logger.info('[OK] 分析 ' + name + ' (' + ts_code + ')...')
+                logger.info('[OK] 分析 ' + name + ' (' + ts_code + ')... 耗时 ' + f'{analysis.elapsed:.1f}s')
+                if analysis.error is not None:
+                    if analysis.traceback:
+                        logger.error(analysis.traceback)
+                    raise RuntimeError(analysis.error)
                 
-                analyzer = IndexAnalyzer(
-                    ts_code=ts_code,
-                    start_date=START_DATE,
-                    lookback_years=LOOKBACK_YEARS
-                )
-                df = analyzer.analyze()
+                analyzer = analysis.to_analyzer()
+                df = analyzer.data
                 
                 # 获取当前信号
-                current_signal = analyzer.get_current_signal()
+                current_signal = analysis.signal
                 
                 # 获取最新数据
                 latest = df.iloc[-1]
@@ -38,16 +38,19 @@ class CrossSignalDetector:
     
     def __init__(self,
                  ma_cross_pairs: Optional[List[Tuple[int, int]]] = None,
-                 output_col: str = 'cross_signals'):
+                 output_col: str = 'cross_signals',
+                 typed_columns: bool = False):
         """
         初始化交叉信号检测器
         
         Args:
             ma_cross_pairs: 均线交叉检测对，如 [(5, 10), (10, 20)]
             output_col: 输出列名
+            typed_columns: 同时输出类型化列 signal_ma_5_10 / signal_macd / signal_macd_hist_trend 等
         """
         self.ma_cross_pairs = ma_cross_pairs or self.DEFAULT_MA_CROSS_PAIRS
         self.output_col = output_col
+        self.typed_columns = typed_columns
     
     def detect(self, df: pd.DataFrame) -> pd.DataFrame:
         """
@@ -77,6 +80,12 @@ class CrossSignalDetector:
             axis=1
         )
         
+        if self.typed_columns:
+            for key, signals in ma_signals.items():
+                result_df[f'signal_{key}'] = signals
+            result_df['signal_macd'] = macd_cross
+            result_df['signal_macd_hist_trend'] = macd_trend
+        
         return result_df
     
     def _detect_ma_cross(self, df: pd.DataFrame, short_period: int, long_period: int) -> pd.Series:
@@ -8,6 +8,7 @@
 import json
 from typing import List, Optional
 
+import numpy as np
 import pandas as pd
 
 
@@ -34,7 +35,8 @@ class DeviationRateCalculator:
                  price_col: str = 'close',
                  output_as_json: bool = True,
                  output_col: str = 'deviation_rate',
-                 decimal_places: int = 4):
+                 decimal_places: int = 4,
+                 typed_columns: bool = False):
         """
         初始化偏离率计算器
         
@@ -44,12 +46,14 @@ class DeviationRateCalculator:
             output_as_json: True=输出 JSON 字符串，False=输出多列
             output_col: 输出列名（仅当 output_as_json=True 时使用）
             decimal_places: 小数位数，默认 4
+            typed_columns: JSON 模式下同时输出类型化列 deviation_ma_N（float，写入 ts_stock_data 类型化列）
         """
         self.ma_periods = ma_periods or self.DEFAULT_MA_PERIODS
         self.price_col = price_col
         self.output_as_json = output_as_json
         self.output_col = output_col
         self.decimal_places = decimal_places
+        self.typed_columns = typed_columns
     
     def calculate(self, df: pd.DataFrame) -> pd.DataFrame:
         """
@@ -68,6 +72,9 @@ class DeviationRateCalculator:
             result_df[self.output_col] = result_df.apply(
                 lambda row: self._compute_deviation_json(row), axis=1
             )
+            if self.typed_columns:
+                for dev_col, values in self._compute_deviation_columns(result_df).items():
+                    result_df[dev_col] = values
         else:
             for period in self.ma_periods:
                 ma_col = f'ma_{period}'
@@ -107,6 +114,33 @@ class DeviationRateCalculator:
         
         return json.dumps(deviation_dict)
     
+    def _compute_deviation_columns(self, df: pd.DataFrame) -> dict:
+        """
+        列式计算各均线偏离率（与 JSON 口径一致：收盘价缺失或为 0 时整行为空）
+        
+        Args:
+            df: DataFrame
+        
+        Returns:
+            dict: {'deviation_ma_5': np.ndarray, ...}
+        """
+        if self.price_col in df.columns:
+            close = pd.to_numeric(df[self.price_col], errors='coerce').to_numpy(dtype=np.float64)
+        else:
+            close = np.full(len(df), np.nan)
+        close = np.where(close == 0, np.nan, close)
+        
+        result = {}
+        for period in self.ma_periods:
+            ma_col = f'ma_{period}'
+            if ma_col in df.columns:
+                ma = pd.to_numeric(df[ma_col], errors='coerce').to_numpy(dtype=np.float64)
+            else:
+                ma = np.full(len(df), np.nan)
+            ma = np.where(ma == 0, np.nan, ma)
+            result[f'deviation_{ma_col}'] = np.round((close - ma) / ma, self.decimal_places)
+        return result
+    
     def _compute_single_deviation(self, row: pd.Series, ma_col: str) -> Optional[float]:
         """
         计算单个均线的偏离率
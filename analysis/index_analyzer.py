@@ -12,15 +12,16 @@ import warnings
 warnings.filterwarnings('ignore')
 
 from entity import constant
-from entity.stock_data import StockData
 from mysql_connect.sixty_index_mapper import SixtyIndexMapper
 from analysis.cross_signal_detector import CrossSignalDetector
+from analysis.index_data_store import IndexDataStore, load_index_frame_from_db
+from analysis.indicator_columns import expand_payloads
 from analysis.percentile_calculator import PercentileCalculator
 from analysis.multi_factor_scorer import MultiFactorScorer
 from analysis.signal_generator import SignalGenerator
 from analysis.backtester import Backtester
-from util.class_util import ClassUtil
 from util.date_util import TimeUtils
+from util.shared_cache import get_shared_cache
 
 
 class IndexAnalyzer:
@@ -45,12 +46,22 @@ class IndexAnalyzer:
         analyzer.generate_charts(save_path='output/')
     """
     
+    # V15: 跨指数特征缓存（共享缓存，所有实例及后续运行共享；
+    # 条目有效期一天，上证50列存水位线变化时重算）
+    CROSS_50_CACHE_NAME = 'index_anchor'
+    CROSS_50_CACHE_KEY = 'cross_50'
+    CROSS_50_CACHE_TTL_SECONDS = 24 * 3600
+    
+    # 是否通过本地列存读取行情（False 时每次直接查询 MySQL）
+    USE_DATA_STORE = True
+    
     def __init__(self, 
                  ts_code: str, 
                  start_date: Optional[str] = None,
                  end_date: Optional[str] = None,
                  lookback_years: int = 5,
-                 include_macro: bool = True):
+                 include_macro: bool = True,
+                 data: Optional[pd.DataFrame] = None):
         """
         初始化指数分析器
         
@@ -60,6 +71,7 @@ class IndexAnalyzer:
             end_date: 结束日期，默认为当前日期
             lookback_years: 百分位计算回溯年数
             include_macro: V13 是否包含宏观因子 (默认开启)
+            data: 已加载/已分析的数据，传入时不再查询数据库（并行分析结果回到主进程后使用）
         """
         self.ts_code = ts_code
         self.lookback_years = lookback_years
@@ -73,8 +85,10 @@ class IndexAnalyzer:
         self.end_date = end_date
         
         # 初始化计算器
-        self.cross_detector = CrossSignalDetector()
-        self.percentile_calculator = PercentileCalculator(lookback_years=lookback_years)
+        # 同时输出类型化列（signal_* / pctl_*），下游阶段按列读取，不再解析 JSON
+        self.cross_detector = CrossSignalDetector(typed_columns=True)
+        self.percentile_calculator = PercentileCalculator(lookback_years=lookback_years,
+                                                          typed_columns=True)
         self.multi_factor_scorer = MultiFactorScorer()
         self.signal_generator = SignalGenerator()
         self._ml_predictor = None  # 延迟加载，避免强制依赖 xgboost
@@ -88,12 +102,9 @@ class IndexAnalyzer:
         self._macro_scorer = None
         self._macro_data = None  # 缓存宏观数据
         
-        # V15: 跨指数特征缓存（类级，所有实例共享）
-        self._cross_50_cache_loaded = False
-        
         # 加载数据
         self.mapper = SixtyIndexMapper()
-        self.data = self._load_data()
+        self.data = self._decode_payloads(self._load_data() if data is None else data)
         self.name = constant.TS_CODE_NAME_DICT.get(ts_code, ts_code)
         
         # 图表生成器（延迟加载）
@@ -101,29 +112,29 @@ class IndexAnalyzer:
     
     def _load_data(self) -> pd.DataFrame:
         """
-        从数据库加载指数数据
+        加载指数数据（优先本地列存，缺失或过期时回退 MySQL）
         
         Returns:
             pd.DataFrame: 指数历史数据
         """
         end_date = self.end_date if self.end_date else TimeUtils.get_current_date_str()
-        index_data = self.mapper.select_by_code_and_trade_round(
-            self.ts_code, self.start_date, end_date
-        )
-        
-        data_frame_list = []
-        for row in index_data:
-            stock_data = ClassUtil.create_entities_from_data(StockData, row)
-            data_frame_list.append(stock_data.to_dict())
-        
-        df = pd.DataFrame(data_frame_list)
-        
-        # 确保trade_date是日期类型并排序
-        if 'trade_date' in df.columns and len(df) > 0:
-            df['trade_date'] = pd.to_datetime(df['trade_date'])
-            df = df.sort_values('trade_date').reset_index(drop=True)
+        if self.USE_DATA_STORE:
+            return IndexDataStore(mapper=self.mapper).load(self.ts_code, self.start_date, end_date)
+        return load_index_frame_from_db(self.mapper, self.ts_code, self.start_date, end_date)
+    
+    # 加载后一次性展开为类型化列的 JSON 载荷（deviation_ma_N / pctl_*）
+    DECODED_PAYLOADS = ['deviation_rate', 'percentile_ranks']
+    
+    def _decode_payloads(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        解码阶段：将 deviation_rate / percentile_ranks JSON 展开为 float 列（每行只解析一次）
         
-        return df
+        已有的类型化列（数据库类型化列、并行分析传回的数据）不重复解析。
+        analyze() 中重新计算的百分位由 PercentileCalculator 直接输出 pctl_* 列覆盖。
+        """
+        if len(df) == 0:
+            return df
+        return expand_payloads(df, self.DECODED_PAYLOADS)
     
     def analyze(self, include_ml: bool = True, auto_tune: bool = False) -> pd.DataFrame:
         """
@@ -290,36 +301,9 @@ class IndexAnalyzer:
             return  # 上证50自身不需要跨指数特征
         
         try:
-            # 类级缓存，避免每个指数都重复加载上证50数据
-            if not self._cross_50_cache_loaded:
-                mapper = SixtyIndexMapper()
-                end_date = self.end_date or TimeUtils.get_current_date_str()
-                index_data = mapper.select_by_code_and_trade_round(
-                    '000016.SH', '20050101', end_date
-                )
-                data_list = []
-                for row in index_data:
-                    sd = ClassUtil.create_entities_from_data(StockData, row)
-                    data_list.append(sd.to_dict())
-                df = pd.DataFrame(data_list)
-                if 'trade_date' in df.columns and len(df) > 0:
-                    df['trade_date'] = pd.to_datetime(df['trade_date'])
-                    df = df.sort_values('trade_date').reset_index(drop=True)
-                
-                # 计算上证50的技术指标
-                df['close'] = pd.to_numeric(df['close'], errors='coerce')
-                ma50 = df['close'].rolling(50, min_periods=20).mean()
-                df['feat_cross_50_ma50_pos'] = df['close'] / ma50
-                df['feat_cross_50_mom_20'] = df['close'].pct_change(20) * 100
-                df['feat_cross_50_vol_20'] = df['close'].pct_change().rolling(20).std() * 100
-                
-                type(self)._cross_50_cache = df[
-                    ['trade_date', 'feat_cross_50_ma50_pos', 'feat_cross_50_mom_20', 'feat_cross_50_vol_20']
-                ].copy()
-                self._cross_50_cache_loaded = True
+            cross_50 = self.load_cross_50_features(self.end_date).copy()
             
             # 合并到当前数据
-            cross_50 = type(self)._cross_50_cache.copy()
             self.data = pd.merge(self.data, cross_50, on='trade_date', how='left')
             
             # 向前填充（交易日不完全一致）
@@ -333,11 +317,65 @@ class IndexAnalyzer:
         except Exception as e:
             print(f"  [V16] 跨指数特征处理失败: {e}，跳过")
     
+    @classmethod
+    def load_cross_50_features(cls, end_date: Optional[str] = None) -> pd.DataFrame:
+        """
+        获取上证50市场锚特征（共享缓存，所有实例共享）
+        
+        缓存未过期、覆盖到 end_date 且上证50列存水位线未变化时直接复用，
+        避免每个指数、每次运行都重复加载上证50数据。
+        
+        Returns:
+            pd.DataFrame: trade_date + feat_cross_50_* 特征列
+        """
+        end_date = end_date or TimeUtils.get_current_date_str()
+        cache = cls._cross_50_shared_cache()
+        mapper = SixtyIndexMapper()
+        store = IndexDataStore(mapper=mapper) if cls.USE_DATA_STORE else None
+        watermark = store.watermark('000016.SH') if store is not None else None
+        cached = cache.get(cls.CROSS_50_CACHE_KEY, watermark)
+        if cached is not None and cached[1] >= end_date:
+            return cached[0]
+        
+        if store is not None:
+            df = store.load('000016.SH', '20050101', end_date)
+        else:
+            df = load_index_frame_from_db(mapper, '000016.SH', '20050101', end_date)
+        
+        # 计算上证50的技术指标
+        df['close'] = pd.to_numeric(df['close'], errors='coerce')
+        ma50 = df['close'].rolling(50, min_periods=20).mean()
+        df['feat_cross_50_ma50_pos'] = df['close'] / ma50
+        df['feat_cross_50_mom_20'] = df['close'].pct_change(20) * 100
+        df['feat_cross_50_vol_20'] = df['close'].pct_change().rolling(20).std() * 100
+        
+        cross_50 = df[
+            ['trade_date', 'feat_cross_50_ma50_pos', 'feat_cross_50_mom_20', 'feat_cross_50_vol_20']
+        ].copy()
+        # 读取后列存可能已补齐新数据，以读取后的水位线作为条目水位线
+        watermark = store.watermark('000016.SH') if store is not None else None
+        cache.put(cls.CROSS_50_CACHE_KEY, (cross_50, end_date), watermark)
+        return cross_50
+    
+    @classmethod
+    def _cross_50_shared_cache(cls):
+        return get_shared_cache(cls.CROSS_50_CACHE_NAME, ttl_seconds=cls.CROSS_50_CACHE_TTL_SECONDS)
+    
+    @classmethod
+    def export_cross_50_cache(cls) -> Optional[dict]:
+        """导出上证50市场锚特征缓存条目（传给并行分析的子进程）；无缓存时返回 None"""
+        return cls._cross_50_shared_cache().export_entry(cls.CROSS_50_CACHE_KEY)
+    
+    @classmethod
+    def install_cross_50_cache(cls, entry: dict):
+        """注入主进程已计算的上证50市场锚特征缓存条目"""
+        cls._cross_50_shared_cache().install_entry(cls.CROSS_50_CACHE_KEY, entry)
+    
     def _get_ml_predictor(self):
         """延迟加载 ML 预测器"""
         if self._ml_predictor is None:
             from analysis.ml_predictor import MLPredictor
-            self._ml_predictor = MLPredictor()
+            self._ml_predictor = MLPredictor(ts_code=self.ts_code)
         return self._ml_predictor
     
     def get_current_status(self) -> Dict:
@@ -658,22 +696,31 @@ class IndexAnalyzer:
 
 
 def analyze_all_indices(save_charts: bool = True, print_status: bool = True,
-                        include_ml: bool = True):
+                        include_ml: bool = True, workers: Optional[int] = None):
     """
-    分析所有指数
+    分析所有指数（进程池并行分析，主进程按顺序输出和生成图表）
     
     Args:
         save_charts: 是否保存图表
         print_status: 是否打印状态摘要
         include_ml: 是否包含 ML 预测
+        workers: 并行进程数，None 为 CPU 核数
     """
+    from analysis.multi_index_runner import analyze_many
+    
     ts_codes = list(constant.TS_CODE_NAME_DICT.keys())
+    results = analyze_many(ts_codes, workers=workers, include_ml=include_ml)
     
-    for ts_code in ts_codes:
+    for result in results:
+        if not result.ok:
+            print(f"分析 {result.ts_code} 时出错: {result.error}")
+            if result.traceback:
+                print(result.traceback)
+            continue
+        
         try:
-            print(f"\n开始分析 {constant.TS_CODE_NAME_DICT.get(ts_code, ts_code)}...")
-            analyzer = IndexAnalyzer(ts_code)
-            analyzer.analyze(include_ml=include_ml)
+            print(f"\n{result.name} 分析完成 ({result.elapsed:.1f}s)")
+            analyzer = result.to_analyzer()
             
             if print_status:
                 analyzer.print_current_signal()
@@ -682,13 +729,14 @@ def analyze_all_indices(save_charts: bool = True, print_status: bool = True,
                 analyzer.generate_charts()
                 
         except Exception as e:
-            print(f"分析 {ts_code} 时出错: {e}")
+            print(f"分析 {result.ts_code} 时出错: {e}")
             import traceback
             traceback.print_exc()
 
 
 def signal_all_indices(ts_code: Optional[str] = None, include_ml: bool = True,
-                       auto_tune: bool = False, include_macro: bool = True, **kwargs):
+                       auto_tune: bool = False, include_macro: bool = True,
+                       workers: Optional[int] = None, **kwargs):
     """
     生成指数交易信号
     
@@ -697,22 +745,25 @@ def signal_all_indices(ts_code: Optional[str] = None, include_ml: bool = True,
         include_ml: 是否包含 ML 预测
         auto_tune: 是否使用 Optuna 自动调优
         include_macro: V13 是否包含宏观因子
+        workers: 并行进程数，None 为 CPU 核数
         **kwargs: 兼容 main.py 传入的其他参数 (model_type 等)
     """
+    from analysis.multi_index_runner import analyze_many
+    
     if ts_code:
         codes = [ts_code]
     else:
         codes = list(constant.TS_CODE_NAME_DICT.keys())
     
-    for code in codes:
-        try:
-            analyzer = IndexAnalyzer(code, include_macro=include_macro)
-            analyzer.analyze(include_ml=include_ml, auto_tune=auto_tune)
-            analyzer.print_current_signal()
-        except Exception as e:
-            print(f"生成 {code} 信号时出错: {e}")
-            import traceback
-            traceback.print_exc()
+    results = analyze_many(codes, workers=workers, include_ml=include_ml,
+                           auto_tune=auto_tune, include_macro=include_macro)
+    for result in results:
+        if not result.ok:
+            print(f"生成 {result.ts_code} 信号时出错: {result.error}")
+            if result.traceback:
+                print(result.traceback)
+            continue
+        result.to_analyzer().print_current_signal()
 
 
 def portfolio_backtest(start_date: str = '20200101',
@@ -725,6 +776,7 @@ def portfolio_backtest(start_date: str = '20200101',
                        index_max_weight: Optional[Dict[str, float]] = None,
                        defense_etf_code: Optional[str] = '518880.SH',
                        optimize_defense: bool = False,
+                       workers: Optional[int] = None,
                        **kwargs) -> dict:
     """
     运行组合级回测
@@ -733,6 +785,7 @@ def portfolio_backtest(start_date: str = '20200101',
         ...
         defense_etf_code: 防御ETF代码, None 表示禁用跷跷板策略
         optimize_defense: 若True, 运行Optuna债券参数优化后做最终回测
+        workers: 加载指数信号时的并行进程数，None 为 CPU 核数
 
     Returns:
         dict: 完整回测结果 (optimize_defense时额外包含optimize_result)
@@ -748,6 +801,7 @@ def portfolio_backtest(start_date: str = '20200101',
         exclude_codes=exclude_codes,
         index_max_weight=index_max_weight,
         defense_etf_code=defense_etf_code,
+        analysis_workers=workers,
     )
 
     if optimize_defense:
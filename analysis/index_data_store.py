@@ -0,0 +1,266 @@
+"""
+指数行情本地列存
+
+每个指数一份 ts_stock_data 全量历史的本地列式文件，IndexAnalyzer 直接读取（毫秒级），
+不再每次从 MySQL 拉取 15-20 年历史并逐行转换实体。
+
+目录结构（默认 <cache>/index_store，随 config.yaml 的 cache.dir 配置）:
+    <ts_code>.parquet    安装 pyarrow 时使用 Parquet，否则为 <ts_code>.pkl（pandas pickle）
+    <ts_code>.json       水位线: {"ts_code", "last_trade_date", "rows", "format", "schema_version", "updated_at"}
+
+新鲜度：读取时比较水位线与数据库中该指数的最大交易日（一次索引 MAX 查询），
+数据库更新时只补拉水位线之后的行；文件缺失、损坏或格式版本变化时回退 MySQL 全量重建。
+同步程序写库后调用 refresh() 按起始日期覆盖追加（含事后回写的 PE/PB）。
+"""
+
+import inspect
+import json
+import os
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from analysis.indicator_columns import typed_columns
+from entity.stock_data import StockData
+from mysql_connect.sixty_index_mapper import SixtyIndexMapper
+from util.config_loader import get_cache_dir
+from util.date_util import TimeUtils
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+
+# 保持为字符串的列，其余列统一转为 float64，trade_date 转为 datetime64
+STRING_COLUMNS = {'ts_code', 'name', 'deviation_rate', 'cross_signals', 'percentile_ranks',
+                  'signal_ma_5_10', 'signal_ma_10_20', 'signal_macd', 'signal_macd_hist_trend'}
+
+# 从 ts_stock_data 读取的列：StockData 实体字段 + 类型化指标列（deviation_ma_N / signal_* / pctl_*），
+# 读取方直接使用类型化列，不再逐行解析 JSON
+INDEX_COLUMNS = ([name for name in inspect.signature(StockData.__init__).parameters if name != 'self']
+                 + typed_columns())
+
+
+def normalize_index_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    统一指数数据的列类型并按交易日排序（MySQL 读取和本地列存读取结果一致）
+
+    Args:
+        df: ts_stock_data 行数据
+
+    Returns:
+        pd.DataFrame: trade_date 为 datetime64，数值列为 float64
+    """
+    if len(df) == 0:
+        return df
+    result_df = df.copy()
+    for col in result_df.columns:
+        if col == 'trade_date':
+            result_df[col] = pd.to_datetime(result_df[col])
+        elif col not in STRING_COLUMNS:
+            result_df[col] = pd.to_numeric(result_df[col], errors='coerce').astype(np.float64)
+    if 'trade_date' in result_df.columns:
+        result_df = result_df.sort_values('trade_date', kind='stable').reset_index(drop=True)
+    return result_df
+
+
+def load_index_frame_from_db(mapper: SixtyIndexMapper, ts_code: str,
+                             start_date: str, end_date: str) -> pd.DataFrame:
+    """
+    从 MySQL 读取指数区间数据
+
+    Returns:
+        pd.DataFrame: normalize_index_frame 处理后的数据
+    """
+    columns = ', '.join(f'`{name}`' for name in INDEX_COLUMNS)
+    index_df = mapper.select_frame_by_code_and_trade_round(ts_code, start_date, end_date, columns=columns)
+    return normalize_index_frame(index_df)
+
+
+class IndexDataStore:
+    """
+    指数行情本地列存
+
+    使用示例:
+        store = IndexDataStore()
+        df = store.load('000300.SH', '20200101', '20241231')   # 缺失/过期时自动回退 MySQL
+        store.refresh('000300.SH', '20241201')                  # 同步写库后覆盖追加
+    """
+
+    # 首次建立列存时拉取的历史起点（覆盖全部历史）
+    HISTORY_START = '19900101'
+    # 文件格式版本：列类型规则变化时递增，旧文件自动重建
+    SCHEMA_VERSION = 2
+
+    def __init__(self, store_dir: Optional[str] = None,
+                 mapper: Optional[SixtyIndexMapper] = None):
+        """
+        Args:
+            store_dir: 列存目录，默认 <cache>/index_store
+            mapper: 指数数据 Mapper
+        """
+        self.store_dir = store_dir or get_cache_dir('index_store')
+        os.makedirs(self.store_dir, exist_ok=True)
+        self.mapper = mapper or SixtyIndexMapper()
+        self.format = 'parquet' if HAS_PYARROW else 'pickle'
+
+    def _data_path(self, ts_code: str) -> str:
+        ext = 'parquet' if self.format == 'parquet' else 'pkl'
+        return os.path.join(self.store_dir, f"{ts_code}.{ext}")
+
+    def _meta_path(self, ts_code: str) -> str:
+        return os.path.join(self.store_dir, f"{ts_code}.json")
+
+    # ==================== 文件读写 ====================
+
+    def watermark(self, ts_code: str) -> Optional[str]:
+        """列存覆盖到的最后交易日 YYYYMMDD，不存在或版本不符时返回 None"""
+        path = self._meta_path(ts_code)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        if meta.get('schema_version') != self.SCHEMA_VERSION or meta.get('format') != self.format:
+            return None
+        return meta.get('last_trade_date')
+
+    def read(self, ts_code: str) -> Optional[pd.DataFrame]:
+        """读取列存全量数据，不存在或损坏时返回 None"""
+        if self.watermark(ts_code) is None:
+            return None
+        path = self._data_path(ts_code)
+        try:
+            if self.format == 'parquet':
+                return pd.read_parquet(path)
+            return pd.read_pickle(path)
+        except Exception as e:
+            print(f"  [列存] 读取失败({e})，将重建: {path}")
+            return None
+
+    def write(self, ts_code: str, df: pd.DataFrame):
+        """整体写入（先写数据再写水位线，均为临时文件替换）"""
+        df = normalize_index_frame(df).reset_index(drop=True)
+        path = self._data_path(ts_code)
+        tmp_path = path + '.tmp'
+        if self.format == 'parquet':
+            df.to_parquet(tmp_path, index=False)
+        else:
+            df.to_pickle(tmp_path)
+        os.replace(tmp_path, path)
+
+        last_trade_date = TimeUtils.date_to_str(df['trade_date'].iloc[-1]) if len(df) else None
+        meta = {
+            'ts_code': ts_code,
+            'last_trade_date': last_trade_date,
+            'rows': len(df),
+            'format': self.format,
+            'schema_version': self.SCHEMA_VERSION,
+            'updated_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        meta_path = self._meta_path(ts_code)
+        with open(meta_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(meta_path + '.tmp', meta_path)
+
+    def append(self, ts_code: str, new_df: pd.DataFrame,
+               base: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """
+        按交易日覆盖追加：new_df 中出现的交易日替换原有行
+
+        Args:
+            ts_code: 指数代码
+            new_df: 新数据
+            base: 已读取的列存数据（避免重复读取），默认从文件读取
+
+        Returns:
+            pd.DataFrame: 合并后的全量数据
+        """
+        base = self.read(ts_code) if base is None else base
+        new_df = normalize_index_frame(new_df)
+        if base is None or len(base) == 0:
+            merged = new_df
+        elif len(new_df) == 0:
+            return base
+        else:
+            kept = base[~base['trade_date'].isin(new_df['trade_date'])]
+            merged = pd.concat([kept, new_df], ignore_index=True)
+        merged = normalize_index_frame(merged)
+        if len(merged):
+            self.write(ts_code, merged)
+        return merged
+
+    def invalidate(self, ts_code: str):
+        """删除列存（历史数据被整体重算后调用，下次读取时从 MySQL 重建）"""
+        for path in (self._meta_path(ts_code), self._data_path(ts_code)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    # ==================== 与数据库同步 ====================
+
+    def _db_watermark(self, ts_code: str) -> Optional[str]:
+        max_trade_date = self.mapper.get_max_trade_time(ts_code)
+        return TimeUtils.date_to_str(max_trade_date) if max_trade_date is not None else None
+
+    def refresh(self, ts_code: str, start_date: str) -> Optional[pd.DataFrame]:
+        """
+        同步写库后调用：从 MySQL 重新读取 start_date 及之后的行并覆盖追加
+
+        列存尚未建立时不做处理（首次读取时全量建立）。
+
+        Returns:
+            pd.DataFrame: 合并后的全量数据，列存不存在时为 None
+        """
+        base = self.read(ts_code)
+        if base is None:
+            return None
+        new_df = load_index_frame_from_db(self.mapper, ts_code, start_date,
+                                          TimeUtils.get_current_date_str())
+        return self.append(ts_code, new_df, base=base)
+
+    def load(self, ts_code: str, start_date: str, end_date: Optional[str] = None) -> pd.DataFrame:
+        """
+        读取指数区间数据：优先列存，缺失时从 MySQL 全量建立，过期时补拉水位线之后的行
+
+        Args:
+            ts_code: 指数代码
+            start_date: 开始日期 YYYYMMDD
+            end_date: 结束日期 YYYYMMDD，默认当前日期
+
+        Returns:
+            pd.DataFrame: 按交易日升序、类型统一的数据
+        """
+        end_date = end_date or TimeUtils.get_current_date_str()
+        frame = self.read(ts_code)
+
+        try:
+            db_watermark = self._db_watermark(ts_code)
+        except Exception as e:
+            if frame is None:
+                raise
+            print(f"  [列存] 查询数据库水位失败({e})，使用本地列存 {ts_code}")
+            db_watermark = None
+
+        if frame is None:
+            frame = load_index_frame_from_db(self.mapper, ts_code, self.HISTORY_START,
+                                             TimeUtils.get_current_date_str())
+            if len(frame):
+                self.write(ts_code, frame)
+        else:
+            watermark = self.watermark(ts_code)
+            if db_watermark is not None and watermark is not None and db_watermark > watermark:
+                next_date = TimeUtils.get_n_days_before_or_after(watermark, 1, is_before=False)
+                new_df = load_index_frame_from_db(self.mapper, ts_code, next_date, db_watermark)
+                frame = self.append(ts_code, new_df, base=frame)
+
+        if len(frame) == 0:
+            return frame
+        mask = ((frame['trade_date'] >= pd.Timestamp(start_date))
+                & (frame['trade_date'] <= pd.Timestamp(end_date)))
+        return frame.loc[mask].reset_index(drop=True)
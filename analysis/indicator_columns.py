@@ -0,0 +1,182 @@
+"""
+指标 JSON 载荷与类型化列
+
+ts_stock_data 的 deviation_rate / cross_signals / percentile_ranks 以 JSON 文本存储，
+读取方需要逐行 json.loads。这里定义与之对应的类型化列（数值 / 枚举）及互相转换：
+
+    deviation_rate    {"ma_5": ..}       -> deviation_ma_5 / deviation_ma_10 / ...      (double)
+    cross_signals     {"ma_5_10": ..}    -> signal_ma_5_10 / signal_macd / ...          (varchar 枚举)
+    percentile_ranks  {"pe_ttm": ..}     -> pctl_pe_ttm / pctl_deviation_ma_5 / ...     (double)
+
+偏离率列名与 DeviationRateCalculator 多列模式、percentile_ranks 中的偏离率键名一致。
+数据库中对应的列及渲染 JSON 的兼容视图见 sql/ts_stock_data_typed.sql。
+
+使用示例:
+    df = expand_payloads(df)                 # JSON -> 类型化列（已有的类型化列不重复解析）
+    pe_pctl = read_payload(df, 'percentile_ranks', ['pe_ttm'])['pe_ttm']
+    df['deviation_rate'] = render_payload(df, 'deviation_rate')
+"""
+
+import json
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+DEVIATION_KEYS = ['ma_5', 'ma_10', 'ma_20', 'ma_50']
+SIGNAL_KEYS = ['ma_5_10', 'ma_10_20', 'macd', 'macd_hist_trend']
+PERCENTILE_KEYS = (['amount', 'vol', 'macd', 'macd_histogram', 'rsi', 'pe_ttm', 'pb']
+                   + [f'deviation_{key}' for key in DEVIATION_KEYS])
+
+# JSON 列 -> (类型化列前缀, 键集合, 是否数值)
+PAYLOADS = {
+    'deviation_rate': ('deviation_', DEVIATION_KEYS, True),
+    'cross_signals': ('signal_', SIGNAL_KEYS, False),
+    'percentile_ranks': ('pctl_', PERCENTILE_KEYS, True),
+}
+
+
+def typed_column(payload: str, key: str) -> str:
+    """JSON 列中某个键对应的类型化列名，如 ('percentile_ranks', 'pe_ttm') -> 'pctl_pe_ttm'"""
+    return PAYLOADS[payload][0] + key
+
+
+def typed_columns(payloads: Optional[Iterable[str]] = None) -> List[str]:
+    """
+    类型化列名列表（按 PAYLOADS 顺序）
+
+    Args:
+        payloads: JSON 列名，默认全部
+    """
+    columns = []
+    for payload in payloads or PAYLOADS:
+        prefix, keys, _ = PAYLOADS[payload]
+        columns.extend(prefix + key for key in keys)
+    return columns
+
+
+def _loads(value) -> dict:
+    if not value or not isinstance(value, str):
+        return {}
+    try:
+        parsed = json.loads(value)
+    except (json.JSONDecodeError, TypeError):
+        return {}
+    return parsed if isinstance(parsed, dict) else {}
+
+
+def decode_payload(df: pd.DataFrame, payload: str,
+                   keys: Optional[List[str]] = None) -> Dict[str, pd.Series]:
+    """
+    将 JSON 列一次性解析为各键的序列（每行只 json.loads 一次）
+
+    Args:
+        df: 包含 JSON 列的 DataFrame
+        payload: JSON 列名
+        keys: 要提取的键，默认该载荷的全部键
+
+    Returns:
+        dict: {类型化列名: Series}，数值载荷为 float64（缺失为 NaN），枚举载荷为 object（缺失为 None）
+    """
+    _, default_keys, numeric = PAYLOADS[payload]
+    keys = keys or default_keys
+    if payload in df.columns:
+        parsed = [_loads(value) for value in df[payload].tolist()]
+    else:
+        parsed = [{}] * len(df)
+
+    result = {}
+    for key in keys:
+        values = [item.get(key) for item in parsed]
+        if numeric:
+            series = pd.to_numeric(pd.Series(values, index=df.index, dtype=object), errors='coerce')
+            result[typed_column(payload, key)] = series.astype(np.float64)
+        else:
+            result[typed_column(payload, key)] = pd.Series(values, index=df.index, dtype=object)
+    return result
+
+
+def expand_payloads(df: pd.DataFrame, payloads: Optional[Iterable[str]] = None,
+                    overwrite: bool = False) -> pd.DataFrame:
+    """
+    为 DataFrame 补齐类型化列
+
+    已存在的类型化列（如计算器直接输出、或从数据库类型化列读取）默认保留，
+    只解析缺失列对应的 JSON。
+
+    Args:
+        df: 包含 JSON 列的 DataFrame
+        payloads: 要展开的 JSON 列名，默认全部
+        overwrite: True 时总是从 JSON 重新解析
+
+    Returns:
+        pd.DataFrame: 添加类型化列后的 DataFrame（新对象）
+    """
+    result_df = df.copy()
+    for payload in payloads or PAYLOADS:
+        prefix, keys, _ = PAYLOADS[payload]
+        missing = [key for key in keys if overwrite or prefix + key not in result_df.columns]
+        if not missing:
+            continue
+        for column, series in decode_payload(result_df, payload, missing).items():
+            result_df[column] = series
+    return result_df
+
+
+def read_payload(df: pd.DataFrame, payload: str, keys: List[str]) -> Dict[str, pd.Series]:
+    """
+    读取载荷中若干键的值：优先使用类型化列，缺少的键一次性从 JSON 解析
+
+    IndexAnalyzer 在加载数据后已展开类型化列，下游各阶段通过本函数读取时不再解析 JSON；
+    单独使用的 DataFrame（只有 JSON 列）仍可正常读取。
+
+    Args:
+        df: DataFrame
+        payload: JSON 列名
+        keys: 要读取的键
+
+    Returns:
+        dict: {键: Series}，数值载荷为 float64（缺失为 NaN），枚举载荷为 object
+    """
+    prefix, _, numeric = PAYLOADS[payload]
+    result = {}
+    missing = []
+    for key in keys:
+        column = prefix + key
+        if column in df.columns:
+            values = df[column]
+            result[key] = pd.to_numeric(values, errors='coerce').astype(np.float64) if numeric else values
+        else:
+            missing.append(key)
+    if missing:
+        for key, series in zip(missing, decode_payload(df, payload, missing).values()):
+            result[key] = series
+    return {key: result[key] for key in keys}
+
+
+def render_payload(df: pd.DataFrame, payload: str) -> pd.Series:
+    """
+    由类型化列渲染 JSON 字符串（兼容旧读取方），缺失的键输出 null
+
+    Args:
+        df: 包含类型化列的 DataFrame
+        payload: JSON 列名
+
+    Returns:
+        pd.Series: JSON 字符串序列
+    """
+    prefix, keys, numeric = PAYLOADS[payload]
+    columns = {}
+    for key in keys:
+        column = prefix + key
+        if column not in df.columns:
+            continue
+        values = df[column]
+        if numeric:
+            values = pd.to_numeric(values, errors='coerce').astype(np.float64)
+            columns[key] = [None if v != v else float(v) for v in values.tolist()]
+        else:
+            columns[key] = [None if v is None or v != v else v for v in values.tolist()]
+    rows = [dict(zip(columns.keys(), row)) for row in zip(*columns.values())] if columns \
+        else [{}] * len(df)
+    return pd.Series([json.dumps(row) for row in rows], index=df.index, dtype=object)
@@ -10,7 +10,7 @@ V13 宏观因子数据采集器
 4. 人民币汇率 (USDCNH) - 影响资金流向
 
 设计原则:
-1. 内存缓存: 同一进程内只获取一次，避免重复API调用
+1. 共享缓存: 进程内共享并持久化到磁盘，有效期一天，每日只调用一次API
 2. 容错降级: 任何数据源不可用时跳过，不影响其他源
 3. 前向填充: 非交易日/缺失数据用最近有效值填充
 4. 无未来泄露: 所有特征仅使用当天及之前数据
@@ -27,6 +27,8 @@ _project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if _project_root not in sys.path:
     sys.path.insert(0, _project_root)
 
+from util.shared_cache import get_shared_cache
+
 
 class MacroFactorCollector:
     """
@@ -38,10 +40,10 @@ class MacroFactorCollector:
         # macro_df 包含 trade_date + 各宏观指标列
     """
 
-    # 内存缓存 (类变量，进程级别共享)
-    _cache: Optional[pd.DataFrame] = None
-    _cache_start: Optional[str] = None
-    _cache_end: Optional[str] = None
+    # 共享缓存 (进程级别共享 + 磁盘持久化)，条目为 (df, start, end)
+    CACHE_NAME = 'macro_factors'
+    CACHE_KEY = 'macro'
+    CACHE_TTL_SECONDS = 24 * 3600
 
     # Shibor 期限
     SHIBOR_TERMS = ['on', '1w', '1m']  # 隔夜, 1周, 1月
@@ -119,9 +121,7 @@ class MacroFactorCollector:
         merged = self._compute_derived_features(merged)
 
         # 更新缓存
-        MacroFactorCollector._cache = merged
-        MacroFactorCollector._cache_start = start_date
-        MacroFactorCollector._cache_end = end_date
+        self._shared_cache().put(self.CACHE_KEY, (merged, start_date, end_date))
 
         n_sources = len(all_data)
         n_cols = len([c for c in merged.columns if c != 'trade_date'])
@@ -350,18 +350,22 @@ class MacroFactorCollector:
 
     # ==================== 缓存管理 ====================
 
+    @classmethod
+    def _shared_cache(cls):
+        return get_shared_cache(cls.CACHE_NAME, ttl_seconds=cls.CACHE_TTL_SECONDS)
+
     def _is_cached(self, start_date: str, end_date: str) -> bool:
-        """检查缓存是否覆盖请求的日期范围"""
-        if MacroFactorCollector._cache is None:
-            return False
-        if MacroFactorCollector._cache_start is None:
+        """检查缓存是否未过期且覆盖请求的日期范围"""
+        cached = self._shared_cache().get(self.CACHE_KEY)
+        if cached is None:
             return False
-        return (MacroFactorCollector._cache_start <= start_date and
-                MacroFactorCollector._cache_end >= end_date)
+        _, cache_start, cache_end = cached
+        return cache_start <= start_date and cache_end >= end_date
 
     def _filter_cache(self, start_date: str, end_date: str) -> pd.DataFrame:
         """从缓存中过滤指定日期范围"""
-        df = MacroFactorCollector._cache
+        cached = self._shared_cache().get(self.CACHE_KEY)
+        df = cached[0] if cached is not None else None
         if df is None or df.empty:
             return pd.DataFrame(columns=['trade_date'])
         start_dt = pd.to_datetime(start_date)
@@ -371,10 +375,18 @@ class MacroFactorCollector:
 
     @classmethod
     def clear_cache(cls):
-        """清除缓存 (测试用)"""
-        cls._cache = None
-        cls._cache_start = None
-        cls._cache_end = None
+        """清除缓存 (内存和磁盘)"""
+        cls._shared_cache().invalidate(cls.CACHE_KEY)
+
+    @classmethod
+    def export_cache(cls) -> Optional[dict]:
+        """导出缓存条目，用于传给并行分析的子进程；无缓存时返回 None"""
+        return cls._shared_cache().export_entry(cls.CACHE_KEY)
+
+    @classmethod
+    def install_cache(cls, entry: dict):
+        """注入主进程已采集的缓存条目"""
+        cls._shared_cache().install_entry(cls.CACHE_KEY, entry)
 
     # ==================== 数据对齐 ====================
 
@@ -26,12 +26,13 @@ V13 市场状态识别模块
 5. V13: 宏观恶化可加速进入BEAR_TREND, 宏观转好可辅助识别BEAR_LATE底部
 """
 
-import json
 from typing import Dict, Optional, Tuple
 
 import numpy as np
 import pandas as pd
 
+from analysis.indicator_columns import read_payload
+from util.rolling_util import RollingUtil
 
 # 市场状态常量
 BULL_TREND = 'BULL_TREND'
@@ -97,7 +98,8 @@ class MarketRegimeDetector:
                  smooth_window: int = 5,
                  min_persist_days: int = 3,
                  momentum_lookback: int = 10,
-                 momentum_bear_threshold: float = -25):
+                 momentum_bear_threshold: float = -25,
+                 engine: str = 'auto'):
         """
         Args:
             lookback_window: 滚动窗口天数 (用于百分位计算)
@@ -105,12 +107,15 @@ class MarketRegimeDetector:
             min_persist_days: 新状态最少持续天数才生效
             momentum_lookback: V12 趋势动量回看天数
             momentum_bear_threshold: V12 趋势动量偏置阈值 (负值, 越小越严格)
+            engine: 滚动排名引擎，'auto' / 'numba' / 'sorted'
         """
         self.lookback_window = lookback_window
         self.smooth_window = smooth_window
         self.min_persist_days = min_persist_days
         self.momentum_lookback = momentum_lookback
         self.momentum_bear_threshold = momentum_bear_threshold
+        RollingUtil.resolve_engine(engine)
+        self.engine = engine
 
     def detect(self, df: pd.DataFrame) -> pd.DataFrame:
         """
@@ -257,15 +262,11 @@ class MarketRegimeDetector:
 
         # 1) ATR相对值的百分位
         atr_ratio = atr / close
-        atr_pctl = atr_ratio.rolling(window, min_periods=20).apply(
-            lambda x: pd.Series(x).rank(pct=True).iloc[-1] * 100, raw=False
-        ).fillna(50)
+        atr_pctl = self._rolling_rank_pct(atr_ratio, window).fillna(50)
 
         # 2) BB宽度百分位
         bb_width = (bb_high - bb_low) / bb_mid.replace(0, np.nan)
-        bb_pctl = bb_width.rolling(window, min_periods=20).apply(
-            lambda x: pd.Series(x).rank(pct=True).iloc[-1] * 100, raw=False
-        ).fillna(50)
+        bb_pctl = self._rolling_rank_pct(bb_width, window).fillna(50)
 
         # 3) 实际波动率 / 均值
         realized_vol = pct_chg.rolling(20, min_periods=10).std()
@@ -297,12 +298,8 @@ class MarketRegimeDetector:
         vol = df.get('vol', pd.Series(dtype=float))
         vol_ma10 = df.get('vol_ma_10', pd.Series(dtype=float))
 
-        # 1) PE_TTM 百分位 (从 percentile_ranks JSON 提取)
-        pe_pctl = pd.Series(50.0, index=df.index)
-        if 'percentile_ranks' in df.columns:
-            pe_pctl = df['percentile_ranks'].apply(
-                lambda x: self._extract_json_field(x, 'pe_ttm', 50.0)
-            )
+        # 1) PE_TTM 百分位 (类型化列 pctl_pe_ttm，缺少时从 percentile_ranks JSON 解析)
+        pe_pctl = read_payload(df, 'percentile_ranks', ['pe_ttm'])['pe_ttm'].fillna(50.0)
 
         # 2) 成交量 / 均线
         vol_ratio = vol / vol_ma10.replace(0, np.nan)
@@ -422,39 +419,41 @@ class MarketRegimeDetector:
         """
         平滑防抖: 5日众数平滑 + 最小持续天数过滤
 
-        防止在状态边界频繁跳变
+        防止在状态边界频繁跳变。状态编码为整数后按列计算:
+        众数 = 滑动窗口内各状态计数的 argmax (并列时取字典序最小，同 Series.mode)；
+        持续天数过滤按游程 (run-length) 处理。
         """
         if len(raw_labels) <= self.smooth_window:
             return raw_labels
 
-        # 5日众数平滑
-        smoothed = raw_labels.copy()
-        for i in range(self.smooth_window, len(raw_labels)):
-            window = raw_labels.iloc[max(0, i - self.smooth_window + 1):i + 1]
-            mode_val = window.mode()
-            if len(mode_val) > 0:
-                smoothed.iloc[i] = mode_val.iloc[0]
-
-        # 最小持续天数过滤: 如果新状态持续不到min_persist_days, 恢复为前一状态
+        # 状态编码: 类别按字典序排列，argmax 并列时自然取字典序最小的状态
+        categorical = pd.Categorical(raw_labels)
+        categories = np.asarray(categorical.categories, dtype=object)
+        codes = categorical.codes.astype(np.int64)
+
+        # 5日众数平滑: 各状态在窗口 [i - w + 1, i] 内的计数 (前缀和相减)
+        w = self.smooth_window
+        one_hot = np.zeros((len(codes) + 1, len(categories)), dtype=np.int64)
+        one_hot[np.arange(1, len(codes) + 1), codes] = 1
+        cumulative = one_hot.cumsum(axis=0)
+        ends = np.arange(w, len(codes))
+        window_counts = cumulative[ends + 1] - cumulative[ends + 1 - w]
+        smoothed_codes = codes.copy()
+        smoothed_codes[w:] = window_counts.argmax(axis=1)
+
+        # 最小持续天数过滤: 不足 min_persist_days 的游程恢复为前一游程的 (过滤后) 状态
+        # 第一个游程和最后一个 (尚未结束的) 游程不过滤
         if self.min_persist_days > 1:
-            filtered = smoothed.copy()
-            current_regime = filtered.iloc[0]
-            regime_start = 0
-
-            for i in range(1, len(filtered)):
-                if filtered.iloc[i] != current_regime:
-                    # 状态切换, 检查前一段是否持续足够
-                    duration = i - regime_start
-                    if duration < self.min_persist_days and regime_start > 0:
-                        # 太短, 恢复为再前一个状态
-                        prev_regime = filtered.iloc[max(0, regime_start - 1)]
-                        filtered.iloc[regime_start:i] = prev_regime
-                    current_regime = filtered.iloc[i]
-                    regime_start = i
+            run_starts = np.flatnonzero(np.r_[True, smoothed_codes[1:] != smoothed_codes[:-1]])
+            run_lengths = np.diff(np.r_[run_starts, len(smoothed_codes)])
+            run_codes = smoothed_codes[run_starts]
+            short = run_lengths < self.min_persist_days
+            short[0] = False
+            short[-1] = False
+            source_run = np.maximum.accumulate(np.where(short, 0, np.arange(len(run_starts))))
+            smoothed_codes = np.repeat(run_codes[source_run], run_lengths)
 
-            smoothed = filtered
-
-        return smoothed
+        return pd.Series(categories[smoothed_codes], index=raw_labels.index, name=raw_labels.name)
 
     # ==================== 置信度 ====================
 
@@ -553,24 +552,11 @@ class MarketRegimeDetector:
 
     # ==================== 工具方法 ====================
 
-    @staticmethod
-    def _extract_json_field(json_str, field: str, default: float = 50.0) -> float:
-        """从 JSON 字符串中提取字段值"""
-        if pd.isna(json_str) or not json_str:
-            return default
-        try:
-            if isinstance(json_str, str):
-                data = json.loads(json_str)
-            elif isinstance(json_str, dict):
-                data = json_str
-            else:
-                return default
-            val = data.get(field, default)
-            if val is None or (isinstance(val, float) and np.isnan(val)):
-                return default
-            return float(val)
-        except (json.JSONDecodeError, TypeError, ValueError):
-            return default
+    def _rolling_rank_pct(self, values: pd.Series, window: int) -> pd.Series:
+        """当前值在滚动窗口中的排名百分位 (0-100)，窗口内有效值不足 20 个时为 NaN"""
+        pctl = RollingUtil.rolling_rank_pct(values.to_numpy(dtype=np.float64, na_value=np.nan),
+                                            window, min_periods=20, engine=self.engine)
+        return pd.Series(pctl, index=values.index)
 
     @staticmethod
     def get_consensus_thresholds(regime_label: str) -> Dict[str, int]:
@@ -0,0 +1,158 @@
+"""
+ML 模型磁盘缓存
+
+FoldModelCache: Walk-Forward 每个训练周期的集成模型缓存。
+键 = (ts_code, 特征/参数/训练数据哈希, 训练截止日)，训练数据完全相同时直接复用，
+结果与重新训练一致（XGBoost 在固定种子下是确定性的），每日运行只需训练新增的周期。
+
+ModelRegistry: 每个指数一份完整的训练结果（Walk-Forward 预测 + 最后一个周期模型 + 最终模型）。
+键 = (ts_code, 特征列集合, 参数哈希, 最后训练日)，每日运行加载后只补齐新增行。
+"""
+
+import hashlib
+import json
+import os
+import pickle
+from typing import Dict, List, Optional, Set
+
+import numpy as np
+
+from util.config_loader import get_cache_dir
+
+
+def training_hash(feature_columns: List[str], params: dict, seeds: List[int],
+                  X: np.ndarray, y: np.ndarray) -> str:
+    """
+    训练输入的哈希：特征列、参数、种子和训练数据任何一项变化都会得到不同的键
+
+    Returns:
+        str: sha1 十六进制摘要
+    """
+    h = hashlib.sha1()
+    h.update(json.dumps(feature_columns).encode('utf-8'))
+    h.update(json.dumps(params, sort_keys=True, default=str).encode('utf-8'))
+    h.update(json.dumps(list(seeds)).encode('utf-8'))
+    h.update(np.ascontiguousarray(X).tobytes())
+    h.update(np.ascontiguousarray(y, dtype=np.float64).tobytes())
+    return h.hexdigest()
+
+
+class FoldModelCache:
+    """
+    Walk-Forward 训练周期模型缓存
+
+    目录结构: <cache>/ml_folds/<ts_code>/<训练截止日>_<哈希前16位>.pkl
+    """
+
+    def __init__(self, ts_code: str, cache_dir: Optional[str] = None):
+        """
+        Args:
+            ts_code: 指数代码
+            cache_dir: 缓存根目录，默认 <cache>/ml_folds
+        """
+        self.ts_code = ts_code
+        self.cache_dir = os.path.join(cache_dir or get_cache_dir('ml_folds'), ts_code)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._used: Set[str] = set()
+
+    def _path(self, fold_end: str, digest: str) -> str:
+        return os.path.join(self.cache_dir, f"{fold_end}_{digest[:16]}.pkl")
+
+    def load(self, fold_end: str, digest: str) -> Optional[list]:
+        """读取该周期的集成模型，不存在或损坏时返回 None"""
+        path = self._path(fold_end, digest)
+        self._used.add(os.path.basename(path))
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as f:
+                data = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        if data.get('digest') != digest:
+            return None
+        return data['models']
+
+    def save(self, fold_end: str, digest: str, models: list):
+        """保存该周期的集成模型（先写临时文件再替换）"""
+        path = self._path(fold_end, digest)
+        self._used.add(os.path.basename(path))
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'digest': digest, 'models': models}, f)
+        os.replace(tmp_path, path)
+
+    def prune(self) -> int:
+        """删除本次运行未用到的缓存文件（历史数据或参数已变化的旧周期）"""
+        removed = 0
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.pkl') and name not in self._used:
+                os.remove(os.path.join(self.cache_dir, name))
+                removed += 1
+        return removed
+
+
+def short_hash(obj) -> str:
+    """可 JSON 序列化对象的短哈希（12 位），用于文件名/study 名"""
+    return hashlib.sha1(json.dumps(obj, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:12]
+
+
+class ModelRegistry:
+    """
+    指数 ML 模型注册表
+
+    目录结构: <cache>/ml_registry/<ts_code>/<特征哈希>_<参数哈希>_<最后训练日>.pkl
+    同一 (特征, 参数) 只保留最新一份。条目内容:
+        n_valid / last_train_date / digest: 已覆盖的有效行数、最后一行日期、这些行的训练输入哈希
+        preds: 有效行的 Walk-Forward 预测 (float32，前 INITIAL_TRAIN_SIZE 行为 NaN)
+        fold_start / fold_models: 最后一个周期的起始行和集成模型
+        models: 最终集成模型
+    """
+
+    def __init__(self, ts_code: str, registry_dir: Optional[str] = None):
+        """
+        Args:
+            ts_code: 指数代码
+            registry_dir: 注册表根目录，默认 <cache>/ml_registry
+        """
+        self.ts_code = ts_code
+        self.registry_dir = os.path.join(registry_dir or get_cache_dir('ml_registry'), ts_code)
+        os.makedirs(self.registry_dir, exist_ok=True)
+
+    @staticmethod
+    def entry_prefix(feature_columns: List[str], params: dict) -> str:
+        """(特征列集合, 参数) 对应的文件名前缀"""
+        return f"{short_hash(sorted(feature_columns))}_{short_hash(params)}_"
+
+    def _entries(self, prefix: str) -> List[str]:
+        return sorted(name for name in os.listdir(self.registry_dir)
+                      if name.startswith(prefix) and name.endswith('.pkl'))
+
+    def load(self, feature_columns: List[str], params: dict) -> Optional[Dict]:
+        """读取最新条目，不存在或损坏时返回 None"""
+        names = self._entries(self.entry_prefix(feature_columns, params))
+        if not names:
+            return None
+        try:
+            with open(os.path.join(self.registry_dir, names[-1]), 'rb') as f:
+                entry = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        if entry.get('feature_columns') != list(feature_columns):
+            return None
+        return entry
+
+    def save(self, feature_columns: List[str], params: dict, entry: Dict):
+        """保存条目并删除同一 (特征, 参数) 的旧条目"""
+        prefix = self.entry_prefix(feature_columns, params)
+        entry = dict(entry, ts_code=self.ts_code, feature_columns=list(feature_columns),
+                     model_params=params)
+        name = f"{prefix}{entry['last_train_date']}.pkl"
+        path = os.path.join(self.registry_dir, name)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(entry, f)
+        os.replace(tmp_path, path)
+        for old in self._entries(prefix):
+            if old != name:
+                os.remove(os.path.join(self.registry_dir, old))
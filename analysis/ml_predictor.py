@@ -11,9 +11,14 @@
 - v15: 多模型集成投票 (5个不同随机种子的XGBoost模型)
       + 每个训练周期训练5个模型，预测取平均值
       + 消除ML模型随机性导致的收益波动
+- 增量训练: Walk-Forward 周期模型按 (ts_code, 训练输入哈希, 训练截止日) 缓存到磁盘，
+      每日运行只训练新增周期；可选 warm_start 模式在上一周期模型上继续 boosting
+- 模型注册表: Walk-Forward 预测和模型按 (ts_code, 特征列, 参数, 最后训练日) 持久化，
+      每日运行加载后只预测新增行，新增行跨过周期边界时才训练
+- Optuna 调优: 每个指数一个 SQLite study（可续跑，从历史最优参数热启动），
+      按折上报中间评分配合 Median/ASHA 剪枝，多线程并行 trial 并限制 XGBoost 线程数
 """
 
-import json
 import os
 import pickle
 from typing import Optional, Dict, List
@@ -21,6 +26,10 @@ from typing import Optional, Dict, List
 import numpy as np
 import pandas as pd
 
+from analysis.indicator_columns import read_payload
+from analysis.ml_model_store import FoldModelCache, ModelRegistry, short_hash, training_hash
+from util.config_loader import get_cache_dir
+
 try:
     import xgboost as xgb
     HAS_XGBOOST = True
@@ -84,19 +93,41 @@ class MLPredictor:
     THRESHOLD_VOL_FACTOR = 0.12  # 自适应阈值 = 波动率 * 此因子
 
     # Optuna 配置
-    OPTUNA_N_TRIALS = 50       # 搜索次数
+    OPTUNA_N_TRIALS = 50       # 搜索次数 (首次调优)
+    OPTUNA_RESUME_TRIALS = 15  # 已有历史 study 时追加的搜索次数
     OPTUNA_WF_FOLDS = 3        # Walk-Forward 折数 (用于调优评估)
+    OPTUNA_N_JOBS = 4          # 并行 trial 数 (线程)，XGBoost n_jobs 按 CPU 核数均分
+    OPTUNA_PRUNER = 'median'   # 剪枝器: 'median' / 'asha'
 
     # 多模型集成配置 (V15)
     N_ENSEMBLE = 5             # 每个训练周期训练的模型数
     ENSEMBLE_SEEDS = [42, 100, 200, 300, 500]  # 不同随机种子，确保模型多样性
 
-    def __init__(self, model_params: Optional[dict] = None):
+    # 增量训练配置
+    # off: 每个周期从零训练; cache: 周期模型磁盘缓存 (结果与从零训练一致);
+    # warm_start: 在上一周期模型上用新增行继续 boosting (xgb_model=)
+    INCREMENTAL_MODES = ('off', 'cache', 'warm_start')
+    WARM_START_ROUNDS = 50     # warm_start 每个周期追加的树数量
+
+    def __init__(self, model_params: Optional[dict] = None,
+                 ts_code: Optional[str] = None, incremental: str = 'cache'):
+        """
+        Args:
+            model_params: XGBoost 参数，默认 DEFAULT_PARAMS
+            ts_code: 指数代码 (模型注册表/周期缓存的键，未指定时不持久化)
+            incremental: 增量训练模式 'off' / 'cache' / 'warm_start'
+        """
         if not HAS_XGBOOST:
             raise ImportError("xgboost 未安装，请运行: pip install xgboost")
         if not HAS_SKLEARN:
             raise ImportError("scikit-learn 未安装，请运行: pip install scikit-learn")
+        if incremental not in self.INCREMENTAL_MODES:
+            raise ValueError(f"未知的增量训练模式: {incremental}，可选 {self.INCREMENTAL_MODES}")
 
+        self.ts_code = ts_code
+        self.incremental = incremental
+        self._fold_cache = None
+        self._registry = None
         self.model_params = model_params or self.DEFAULT_PARAMS.copy()
         self.model = None
         self.models = []  # V15: 多模型集成 (5个不同种子)
@@ -212,16 +243,15 @@ class MLPredictor:
             result['feat_pb'] = pd.to_numeric(result['pb'], errors='coerce').fillna(0)
         else:
             result['feat_pb'] = 0.0
-        # 从 JSON 解析百分位
-        result['feat_pe_pctl'] = result['percentile_ranks'].apply(
-            lambda x: self._extract_json_field(x, 'pe_ttm'))
-        result['feat_pb_pctl'] = result['percentile_ranks'].apply(
-            lambda x: self._extract_json_field(x, 'pb'))
+        # 百分位（类型化列 pctl_*，缺少时从 percentile_ranks JSON 解析）
+        pctl = read_payload(result, 'percentile_ranks', ['pe_ttm', 'pb'])
+        result['feat_pe_pctl'] = pctl['pe_ttm']
+        result['feat_pb_pctl'] = pctl['pb']
 
         # --- 偏离率特征 ---
+        deviation = read_payload(result, 'deviation_rate', [f'ma_{period}' for period in [5, 10, 20, 50]])
         for period in [5, 10, 20, 50]:
-            result[f'feat_dev_ma{period}'] = result['deviation_rate'].apply(
-                lambda x: self._extract_json_field(x, f'ma_{period}'))
+            result[f'feat_dev_ma{period}'] = deviation[f'ma_{period}']
 
         # --- V8: 市场状态特征 ---
         if 'regime_trend_score' in result.columns:
@@ -265,14 +295,20 @@ class MLPredictor:
     # ==================== Optuna 超参数自动调优 ====================
 
     def optimize_hyperparams(self, X: np.ndarray, y: np.ndarray,
-                             n_trials: int = None) -> dict:
+                             n_trials: int = None, n_jobs: int = None) -> dict:
         """
         使用 Optuna 在 Walk-Forward 框架内搜索最优超参数
 
+        指定 ts_code 时 study 持久化到 <cache>/optuna/<ts_code>.db：再次调优会续跑已有 study，
+        先用当前数据重新评估历史最优参数，再追加 OPTUNA_RESUME_TRIALS 次搜索；
+        最优参数只在本次运行评分的 trial 中选取，不与旧数据上的历史评分比较。
+        每折结束上报累计评分，落后的 trial 被剪枝。
+
         Args:
             X: 特征矩阵
             y: 标签 (次日收益率)
-            n_trials: 搜索次数
+            n_trials: 搜索次数，默认首次 OPTUNA_N_TRIALS、续跑 OPTUNA_RESUME_TRIALS
+            n_jobs: 并行 trial 数，默认 OPTUNA_N_JOBS
 
         Returns:
             dict: 最优参数
@@ -281,7 +317,6 @@ class MLPredictor:
             print("  optuna 未安装，跳过超参数调优，使用默认参数")
             return self.model_params
 
-        n_trials = n_trials or self.OPTUNA_N_TRIALS
         n = len(X)
 
         # Walk-Forward 折数配置
@@ -291,6 +326,11 @@ class MLPredictor:
             print("  数据量不足以进行超参数调优，使用默认参数")
             return self.model_params
 
+        # 并行 trial 共享 CPU：每个 trial 的 XGBoost 线程数 = 核数 / 并行数
+        n_cpu = os.cpu_count() or 1
+        n_workers = max(1, min(n_jobs or self.OPTUNA_N_JOBS, n_cpu))
+        xgb_threads = max(1, n_cpu // n_workers)
+
         def objective(trial):
             params = {
                 'n_estimators': trial.suggest_int('n_estimators', 100, 500, step=50),
@@ -304,7 +344,7 @@ class MLPredictor:
                 'gamma': trial.suggest_float('gamma', 0.0, 5.0),
                 'objective': 'reg:squarederror',
                 'random_state': 42,
-                'n_jobs': -1,
+                'n_jobs': xgb_threads,
             }
 
             # Walk-Forward 评估
@@ -328,37 +368,49 @@ class MLPredictor:
                 all_preds.extend(preds.tolist())
                 all_true.extend(y_test.tolist())
 
+                # 上报截至当前折的累计评分，供剪枝器比较
+                if len(all_preds) >= 10:
+                    trial.report(self._tuning_score(all_preds, all_true), fold)
+                    if trial.should_prune():
+                        raise optuna.TrialPruned()
+
             if len(all_preds) < 10:
                 return -1.0
 
-            all_preds_arr = np.array(all_preds)
-            all_true_arr = np.array(all_true)
-
-            # 主要目标: IC (信息系数) — 预测值与真实值的相关性
-            ic = np.corrcoef(all_preds_arr, all_true_arr)[0, 1]
-            if np.isnan(ic):
-                ic = 0.0
-
-            # 辅助目标: 方向准确率
-            pred_dir = (all_preds_arr > 0).astype(int)
-            true_dir = (all_true_arr > 0).astype(int)
-            dir_acc = np.mean(pred_dir == true_dir)
-
-            # 综合评分: IC 为主 (70%) + 方向准确率为辅 (30%)
-            # IC 范围 [-1, 1]，归一化到 [0, 1]
-            score = 0.7 * (ic + 1) / 2.0 + 0.3 * dir_acc
-            return score
-
-        print(f"  Optuna 超参数调优中 ({n_trials} trials)...")
-        study = optuna.create_study(direction='maximize')
-        study.optimize(objective, n_trials=n_trials, show_progress_bar=False)
+            return self._tuning_score(all_preds, all_true)
+
+        study = self._create_study()
+        n_complete = len(study.get_trials(deepcopy=False,
+                                          states=(optuna.trial.TrialState.COMPLETE,)))
+        # 本次运行的 trial 编号从这里开始（含下面入队的历史最优参数重评估）
+        first_trial_number = len(study.get_trials(deepcopy=False))
+        if n_complete > 0:
+            # 热启动: 先用当前数据重新评估历史最优参数
+            study.enqueue_trial(study.best_params, skip_if_exists=False)
+        if n_trials is None:
+            n_trials = self.OPTUNA_RESUME_TRIALS if n_complete > 0 else self.OPTUNA_N_TRIALS
+
+        print(f"  Optuna 超参数调优中 ({n_trials} trials, {n_workers} 并行, "
+              f"已有 {n_complete} 个历史 trial)...")
+        study.optimize(objective, n_trials=n_trials, n_jobs=n_workers, show_progress_bar=False)
+
+        # 只在本次运行（当前数据）评分的 trial 中选最优：历史 trial 的评分基于旧数据，
+        # 其参数已通过入队重评估参与本次比较
+        current_trials = [t for t in study.get_trials(deepcopy=False,
+                                                      states=(optuna.trial.TrialState.COMPLETE,))
+                          if t.number >= first_trial_number]
+        if not current_trials:
+            print("  本次调优没有完成的 trial，使用默认参数")
+            return self.model_params
+        best_trial = max(current_trials, key=lambda t: t.value)
 
-        best_params = study.best_params
+        best_params = dict(best_trial.params)
         best_params['objective'] = 'reg:squarederror'
         best_params['random_state'] = 42
         best_params['n_jobs'] = -1
 
-        print(f"  最优综合评分: {study.best_value:.4f}")
+        n_pruned = len(study.get_trials(deepcopy=False, states=(optuna.trial.TrialState.PRUNED,)))
+        print(f"  最优综合评分: {best_trial.value:.4f} (累计剪枝 {n_pruned} 个 trial)")
         print(f"  最优参数: max_depth={best_params['max_depth']}, "
               f"lr={best_params['learning_rate']:.4f}, "
               f"n_est={best_params['n_estimators']}, "
@@ -369,6 +421,50 @@ class MLPredictor:
 
         return best_params
 
+    def _create_study(self):
+        """创建或加载 study：指定 ts_code 时使用 SQLite 持久化，否则为内存 study"""
+        if self.OPTUNA_PRUNER == 'asha':
+            pruner = optuna.pruners.SuccessiveHalvingPruner()
+        else:
+            pruner = optuna.pruners.MedianPruner(n_startup_trials=5)
+
+        if self.ts_code:
+            # study 名包含特征集合和折划分，特征变化后不混用历史 trial
+            study_name = (f"{self.ts_code}_{short_hash(sorted(self.feature_columns))}_"
+                          f"{self.INITIAL_TRAIN_SIZE}x{self.OPTUNA_WF_FOLDS}")
+            path = os.path.join(get_cache_dir('optuna'), f"{self.ts_code}.db")
+            try:
+                storage = optuna.storages.RDBStorage(
+                    f"sqlite:///{path}", engine_kwargs={'connect_args': {'timeout': 60}})
+                return optuna.create_study(study_name=study_name, storage=storage,
+                                           load_if_exists=True, direction='maximize',
+                                           pruner=pruner)
+            except Exception as e:
+                print(f"  Optuna 存储不可用({e})，使用内存 study")
+        return optuna.create_study(direction='maximize', pruner=pruner)
+
+    @staticmethod
+    def _tuning_score(preds, true) -> float:
+        """
+        调优评分: IC 为主 (70%) + 方向准确率为辅 (30%)
+
+        IC 范围 [-1, 1]，归一化到 [0, 1]
+        """
+        all_preds_arr = np.asarray(preds)
+        all_true_arr = np.asarray(true)
+
+        # 主要目标: IC (信息系数) — 预测值与真实值的相关性
+        ic = np.corrcoef(all_preds_arr, all_true_arr)[0, 1]
+        if np.isnan(ic):
+            ic = 0.0
+
+        # 辅助目标: 方向准确率
+        pred_dir = (all_preds_arr > 0).astype(int)
+        true_dir = (all_true_arr > 0).astype(int)
+        dir_acc = np.mean(pred_dir == true_dir)
+
+        return 0.7 * (ic + 1) / 2.0 + 0.3 * dir_acc
+
     # ==================== 训练与预测（避免数据泄露） ====================
 
     def train_and_predict(self, df: pd.DataFrame, auto_tune: bool = False) -> tuple:
@@ -420,69 +516,64 @@ class MLPredictor:
         print(f"  自适应阈值: BUY>{buy_thresh:.4f}%, SELL<{sell_thresh:.4f}% "
               f"(波动率={pct_chg_series.dropna().std():.3f}%)")
 
+        # 有效行的特征矩阵一次性清洗（inf -> NaN），各周期按行切片
+        X_valid = self._sanitize_features(featured_df.iloc[valid_indices][self.feature_columns].values)
+        y_valid = labels.iloc[valid_indices].values
+        n_valid = len(valid_indices)
+
         # Optuna 超参数调优
         if auto_tune:
-            X_all = featured_df.iloc[valid_indices][self.feature_columns].values
-            y_all = labels.iloc[valid_indices].values
-            X_all = np.where(np.isfinite(X_all), X_all, np.nan).astype(np.float32)
-            self.model_params = self.optimize_hyperparams(X_all, y_all)
+            self.model_params = self.optimize_hyperparams(X_valid, y_valid)
 
         # 滚动预测（多模型集成投票）
         print(f"  开始滚动预测（回归模式，{self.N_ENSEMBLE}模型集成投票），"
-              f"共 {len(valid_indices)} 条有效数据...")
-        all_preds = []
-        all_true = []
-        train_count = 0
-        ensemble_trained = False
-
-        for i, idx in enumerate(valid_indices):
-            # 需要足够的历史数据才能训练
-            if i < self.INITIAL_TRAIN_SIZE:
+              f"共 {n_valid} 条有效数据...")
+
+        # 注册表命中时复用已有预测，只处理新增行
+        entry = self._load_registry_entry(featured_df, valid_indices, X_valid, y_valid)
+        preds_valid = np.full(n_valid, np.nan, dtype=np.float32)
+        models = None
+        prev_train_size = 0
+        n_done = self.INITIAL_TRAIN_SIZE
+        if entry is not None:
+            n_done = entry['n_valid']
+            preds_valid[:n_done] = entry['preds']
+            models, prev_train_size = entry['fold_models'], entry['fold_start']
+        fold_start = prev_train_size
+        fold_stats = {'trained': 0, 'cached': 0}
+
+        # 每 TEST_SIZE 行一个周期：用区间之前的数据训练，整块预测区间内的行
+        for start in range(self.INITIAL_TRAIN_SIZE, n_valid, self.TEST_SIZE):
+            end = min(start + self.TEST_SIZE, n_valid)
+            if end <= n_done:
                 continue
 
-            # 获取训练数据：只用当前时间点之前的数据
-            train_indices = valid_indices[:i]
-
-            # 每隔一定步长重新训练集成模型（减少计算量）
-            if train_count == 0 or train_count >= self.TEST_SIZE:
-                X_train = featured_df.iloc[train_indices][self.feature_columns].values
-                y_train = labels.iloc[train_indices].values
-
-                X_train = np.where(np.isfinite(X_train), X_train, np.nan).astype(np.float32)
-
-                # 训练多个模型，不同随机种子
-                models = []
-                for seed in self.ENSEMBLE_SEEDS:
-                    params = self.model_params.copy()
-                    params['random_state'] = seed
-                    model = xgb.XGBRegressor(**params)
-                    model.fit(X_train, y_train, verbose=False)
-                    models.append(model)
-                
-                if not ensemble_trained:
+            if start >= n_done:
+                # 训练多个模型，不同随机种子（cache 模式命中时直接复用）
+                fold_end = self._fold_end_label(featured_df, valid_indices[start - 1])
+                models = self._fit_fold_ensemble(X_valid[:start], y_valid[:start], fold_end,
+                                                 models, prev_train_size, fold_stats)
+                prev_train_size = fold_start = start
+
+                if start == self.INITIAL_TRAIN_SIZE:
                     print(f"    第1个集成周期: 训练{self.N_ENSEMBLE}个模型 "
                           f"(种子={self.ENSEMBLE_SEEDS})")
-                    ensemble_trained = True
-                    
-                train_count = 0
-
-            train_count += 1
-
-            # 预测当前时间点（集成投票：取所有模型预测的平均值）
-            X_pred = featured_df.iloc[[idx]][self.feature_columns].values
-            X_pred = np.where(np.isfinite(X_pred), X_pred, np.nan).astype(np.float32)
 
-            ensemble_preds = [m.predict(X_pred)[0] for m in models]
-            pred = np.mean(ensemble_preds)
-            preds_all[idx] = pred
+            # 预测区间内尚未预测的行（集成投票：取所有模型预测的平均值）
+            block_start = max(start, n_done)
+            preds_valid[block_start:end] = self._ensemble_predict(models, X_valid[block_start:end])
 
-            # 记录用于验证指标计算
-            all_preds.append(pred)
-            all_true.append(labels.iloc[idx])
+        preds_all[valid_indices] = preds_valid
+        n_folds = fold_stats['trained'] + fold_stats['cached']
+        reused = f", 注册表复用 {n_done - self.INITIAL_TRAIN_SIZE} 行" if entry is not None else ""
+        print(f"    训练周期: {n_folds} 个 (新训练 {fold_stats['trained']}, "
+              f"复用缓存 {fold_stats['cached']}{reused}, 模式={self.incremental})")
+        if self._fold_cache is not None and entry is None:
+            self._fold_cache.prune()
 
         # 计算验证指标
-        all_preds_arr = np.array(all_preds)
-        all_true_arr = np.array(all_true)
+        all_preds_arr = preds_valid[self.INITIAL_TRAIN_SIZE:]
+        all_true_arr = y_valid[self.INITIAL_TRAIN_SIZE:]
 
         # 方向准确率
         pred_dir = (all_preds_arr > 0).astype(int)
@@ -523,18 +614,14 @@ class MLPredictor:
             'model_type': 'regression',
         }
 
-        # 保存最终集成模型（用于预测未来）
-        valid_X = featured_df.loc[valid_mask, self.feature_columns].values
-        valid_y = labels.loc[valid_mask].values
-        valid_X = np.where(np.isfinite(valid_X), valid_X, np.nan).astype(np.float32)
-        self.models = []
-        for seed in self.ENSEMBLE_SEEDS:
-            params = self.model_params.copy()
-            params['random_state'] = seed
-            m = xgb.XGBRegressor(**params)
-            m.fit(valid_X, valid_y, verbose=False)
-            self.models.append(m)
+        # 最终集成模型（用于预测未来）：注册表命中且没有新周期时直接复用
+        if entry is not None and n_folds == 0:
+            self.models = entry['models']
+        else:
+            self.models = self._train_ensemble(X_valid, y_valid)
         self.model = self.models[0]  # 兼容旧接口
+        self._save_registry_entry(featured_df, valid_indices, X_valid, y_valid,
+                                  preds_valid, fold_start, models)
 
         # 构建结果 DataFrame
         result = featured_df.copy()
@@ -615,6 +702,143 @@ class MLPredictor:
 
         return result, metrics
 
+    @staticmethod
+    def _sanitize_features(X: np.ndarray) -> np.ndarray:
+        """inf 替换为 NaN（XGBoost 按缺失值处理），转 float32"""
+        X = np.asarray(X, dtype=np.float64)
+        return np.where(np.isfinite(X), X, np.nan).astype(np.float32)
+
+    @staticmethod
+    def _ensemble_predict(models: list, X: np.ndarray) -> np.ndarray:
+        """每个模型整块预测一次，按行取集成平均"""
+        return np.vstack([m.predict(X) for m in models]).mean(axis=0)
+
+    def _train_ensemble(self, X: np.ndarray, y: np.ndarray) -> list:
+        """用不同随机种子训练 N_ENSEMBLE 个模型"""
+        models = []
+        for seed in self.ENSEMBLE_SEEDS:
+            params = self.model_params.copy()
+            params['random_state'] = seed
+            model = xgb.XGBRegressor(**params)
+            model.fit(X, y, verbose=False)
+            models.append(model)
+        return models
+
+    def _get_registry(self) -> Optional[ModelRegistry]:
+        """指定了 ts_code 且未关闭增量训练时返回模型注册表"""
+        if self.incremental == 'off' or not self.ts_code:
+            return None
+        if self._registry is None:
+            self._registry = ModelRegistry(self.ts_code)
+        return self._registry
+
+    def _registry_layout(self) -> dict:
+        """周期划分方式，变化后注册表中的预测不可复用"""
+        return {'initial_train_size': self.INITIAL_TRAIN_SIZE, 'test_size': self.TEST_SIZE,
+                'incremental': self.incremental}
+
+    def _load_registry_entry(self, featured_df: pd.DataFrame, valid_indices: np.ndarray,
+                             X_valid: np.ndarray, y_valid: np.ndarray) -> Optional[dict]:
+        """
+        读取注册表条目，并校验已覆盖的有效行与本次数据完全一致
+
+        历史行的特征、标签或日期有任何变化时返回 None（全量 Walk-Forward）。
+        """
+        registry = self._get_registry()
+        if registry is None:
+            return None
+        entry = registry.load(self.feature_columns, self.model_params)
+        if entry is None or entry.get('layout') != self._registry_layout():
+            return None
+        n_stored = entry['n_valid']
+        if not self.INITIAL_TRAIN_SIZE < n_stored <= len(valid_indices):
+            return None
+        if self._fold_end_label(featured_df, valid_indices[n_stored - 1]) != entry['last_train_date']:
+            return None
+        digest = training_hash(self.feature_columns, self.model_params, self.ENSEMBLE_SEEDS,
+                               X_valid[:n_stored], y_valid[:n_stored])
+        return entry if digest == entry['digest'] else None
+
+    def _save_registry_entry(self, featured_df: pd.DataFrame, valid_indices: np.ndarray,
+                             X_valid: np.ndarray, y_valid: np.ndarray, preds_valid: np.ndarray,
+                             fold_start: int, fold_models: list):
+        """保存本次的 Walk-Forward 预测、最后一个周期模型和最终模型"""
+        registry = self._get_registry()
+        if registry is None:
+            return
+        registry.save(self.feature_columns, self.model_params, {
+            'layout': self._registry_layout(),
+            'n_valid': len(valid_indices),
+            'last_train_date': self._fold_end_label(featured_df, valid_indices[-1]),
+            'digest': training_hash(self.feature_columns, self.model_params,
+                                    self.ENSEMBLE_SEEDS, X_valid, y_valid),
+            'preds': preds_valid,
+            'fold_start': fold_start,
+            'fold_models': fold_models,
+            'models': self.models,
+            'return_std': self._return_std,
+        })
+
+    def _get_fold_cache(self) -> Optional[FoldModelCache]:
+        """cache 模式且指定了 ts_code 时返回周期模型缓存"""
+        if self.incremental != 'cache' or not self.ts_code:
+            return None
+        if self._fold_cache is None:
+            self._fold_cache = FoldModelCache(self.ts_code)
+        return self._fold_cache
+
+    def _fit_fold_ensemble(self, X_train: np.ndarray, y_train: np.ndarray, fold_end: str,
+                           prev_models: Optional[list], prev_train_size: int,
+                           fold_stats: dict) -> list:
+        """
+        训练一个 Walk-Forward 周期的集成模型
+
+        - warm_start: 在上一周期模型上，只用上一周期之后新增的训练行继续 boosting
+        - cache: 训练输入（特征/参数/数据）哈希一致时直接读取磁盘缓存
+        - off: 从零训练
+
+        训练数据始终只包含预测区间之前的行，三种模式都不会引入未来数据。
+        """
+        if self.incremental == 'warm_start' and prev_models:
+            X_new, y_new = X_train[prev_train_size:], y_train[prev_train_size:]
+            models = []
+            for seed, prev in zip(self.ENSEMBLE_SEEDS, prev_models):
+                params = self.model_params.copy()
+                params['random_state'] = seed
+                params['n_estimators'] = self.WARM_START_ROUNDS
+                model = xgb.XGBRegressor(**params)
+                model.fit(X_new, y_new, xgb_model=prev.get_booster(), verbose=False)
+                models.append(model)
+            fold_stats['trained'] += 1
+            return models
+
+        fold_cache = self._get_fold_cache()
+        digest = None
+        if fold_cache is not None:
+            digest = training_hash(self.feature_columns, self.model_params,
+                                   self.ENSEMBLE_SEEDS, X_train, y_train)
+            cached = fold_cache.load(fold_end, digest)
+            if cached is not None:
+                fold_stats['cached'] += 1
+                return cached
+
+        models = self._train_ensemble(X_train, y_train)
+        fold_stats['trained'] += 1
+        if fold_cache is not None:
+            fold_cache.save(fold_end, digest, models)
+        return models
+
+    @staticmethod
+    def _fold_end_label(featured_df: pd.DataFrame, idx: int) -> str:
+        """训练截止行的日期 (YYYYMMDD)，无 trade_date 列时使用行号"""
+        if 'trade_date' in featured_df.columns:
+            value = featured_df['trade_date'].iloc[idx]
+            try:
+                return pd.Timestamp(value).strftime('%Y%m%d')
+            except (ValueError, TypeError):
+                pass
+        return f"row{idx}"
+
     def train(self, df: pd.DataFrame, auto_tune: bool = False) -> dict:
         """
         使用 Walk-Forward 验证训练模型（仅用于验证，不用于预测）
@@ -634,11 +858,10 @@ class MLPredictor:
         for col in self.feature_columns:
             valid_mask &= featured_df[col].notna()
 
-        X = featured_df.loc[valid_mask, self.feature_columns].values
+        X = self._sanitize_features(featured_df.loc[valid_mask, self.feature_columns].values)
         y = labels.loc[valid_mask].values
         n = len(X)
 
-        X = np.where(np.isfinite(X), X, np.nan).astype(np.float32)
         self._return_std = max(np.nanstd(y), 0.1)
 
         if n < self.INITIAL_TRAIN_SIZE + self.TEST_SIZE:
@@ -662,17 +885,8 @@ class MLPredictor:
             X_train, y_train = X[:train_end], y[:train_end]
             X_test, y_test = X[train_end:test_end], y[train_end:test_end]
 
-            # 多模型集成：不同随机种子
-            preds_ensemble = []
-            for seed in self.ENSEMBLE_SEEDS:
-                params = self.model_params.copy()
-                params['random_state'] = seed
-                m = xgb.XGBRegressor(**params)
-                m.fit(X_train, y_train, verbose=False)
-                preds_ensemble.append(m.predict(X_test))
-            
-            # 集成投票：取平均值
-            preds = np.mean(preds_ensemble, axis=0)
+            # 多模型集成：不同随机种子，集成投票取平均值
+            preds = self._ensemble_predict(self._train_ensemble(X_train, y_train), X_test)
 
             all_preds.extend(preds.tolist())
             all_true.extend(y_test.tolist())
@@ -680,13 +894,7 @@ class MLPredictor:
             train_end = test_end
 
         # 用全量数据训练最终集成模型
-        self.models = []
-        for seed in self.ENSEMBLE_SEEDS:
-            params = self.model_params.copy()
-            params['random_state'] = seed
-            m = xgb.XGBRegressor(**params)
-            m.fit(X, y, verbose=False)
-            self.models.append(m)
+        self.models = self._train_ensemble(X, y)
         self.model = self.models[0]  # 兼容旧接口
 
         # 汇总验证结果
@@ -731,13 +939,11 @@ class MLPredictor:
             result['ml_signal'] = 'HOLD'
             return result
 
-        X = result[self.feature_columns].values
-        X = np.where(np.isfinite(X), X, np.nan).astype(np.float32)
+        X = self._sanitize_features(result[self.feature_columns].values)
 
         # 集成预测: 使用所有模型预测的平均值
         if hasattr(self, 'models') and self.models:
-            all_model_preds = [m.predict(X) for m in self.models]
-            preds = np.mean(all_model_preds, axis=0)
+            preds = self._ensemble_predict(self.models, X)
         else:
             preds = self.model.predict(X)
 
@@ -884,15 +1090,3 @@ class MLPredictor:
         if isinstance(result, pd.Series):
             result = result.replace([np.inf, -np.inf], np.nan)
         return result
-
-    @staticmethod
-    def _extract_json_field(json_str, field: str) -> Optional[float]:
-        """从 JSON 字符串中提取指定字段"""
-        if not json_str or not isinstance(json_str, str):
-            return np.nan
-        try:
-            data = json.loads(json_str)
-            val = data.get(field)
-            return float(val) if val is not None else np.nan
-        except (json.JSONDecodeError, TypeError, ValueError):
-            return np.nan
@@ -0,0 +1,190 @@
+"""
+多指数并行分析
+
+各指数的 IndexAnalyzer.analyze() 相互独立且是 CPU 密集型，用进程池并行执行。
+只读的共享输入（宏观因子数据、上证50市场锚特征）在主进程准备一次，
+通过进程池 initializer 注入各子进程的类级缓存，避免每个进程重复拉取。
+
+使用示例:
+    results = analyze_many(['000001.SH', '000300.SH'], workers=4)
+    for r in results:
+        if r.ok:
+            print(r.ts_code, r.signal.get('final_signal'), f"{r.elapsed:.1f}s")
+"""
+
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from entity import constant
+
+
+@dataclass
+class IndexAnalysisResult:
+    """单个指数的分析结果（可跨进程传递）"""
+
+    ts_code: str
+    name: str
+    data: Optional[pd.DataFrame] = None
+    signal: Dict = field(default_factory=dict)
+    error: Optional[str] = None
+    traceback: Optional[str] = None
+    skipped: bool = False
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and not self.skipped
+
+    def to_analyzer(self):
+        """用分析后的数据重建 IndexAnalyzer（不访问数据库），用于打印信号、生成图表等"""
+        from analysis.index_analyzer import IndexAnalyzer
+        return IndexAnalyzer(self.ts_code, data=self.data)
+
+
+def _default_start_date(lookback_years: int) -> str:
+    """与 IndexAnalyzer 默认开始日期一致"""
+    return f"{datetime.now().year - lookback_years}0101"
+
+
+def _build_tasks(codes: List[str], start_dates: Optional[Dict[str, str]],
+                 analyzer_kwargs: dict) -> List[dict]:
+    tasks = []
+    for code in codes:
+        kwargs = dict(analyzer_kwargs)
+        if start_dates and code in start_dates:
+            kwargs['start_date'] = start_dates[code]
+        tasks.append(kwargs)
+    return tasks
+
+
+def _prepare_shared_inputs(tasks: List[dict], codes: List[str]) -> dict:
+    """
+    在主进程准备只读共享输入
+
+    Returns:
+        dict: {'macro': 宏观因子缓存条目或 None, 'cross_50': 上证50市场锚缓存条目或 None}
+    """
+    from analysis.index_analyzer import IndexAnalyzer
+
+    shared = {'macro': None, 'cross_50': None}
+    end_date = tasks[0].get('end_date') or datetime.now().strftime('%Y%m%d')
+
+    if any(task.get('include_macro', True) for task in tasks):
+        start_date = min(task.get('start_date') or _default_start_date(task.get('lookback_years', 5))
+                         for task in tasks)
+        try:
+            from analysis.macro_factor_collector import MacroFactorCollector
+            MacroFactorCollector().collect(start_date, end_date)
+            shared['macro'] = MacroFactorCollector.export_cache()
+        except Exception as e:
+            print(f"  [并行分析] 宏观数据预加载失败: {e}，子进程将各自加载")
+
+    if any(code != '000016.SH' for code in codes):
+        try:
+            IndexAnalyzer.load_cross_50_features(end_date)
+            shared['cross_50'] = IndexAnalyzer.export_cross_50_cache()
+        except Exception as e:
+            print(f"  [并行分析] 上证50市场锚预加载失败: {e}，子进程将各自加载")
+
+    return shared
+
+
+def _init_worker(shared: dict):
+    """子进程初始化：丢弃继承的数据库连接池，注入共享只读输入"""
+    from mysql_connect.db import dispose_engine_after_fork
+    dispose_engine_after_fork()
+
+    if shared.get('macro') is not None:
+        from analysis.macro_factor_collector import MacroFactorCollector
+        MacroFactorCollector.install_cache(shared['macro'])
+    if shared.get('cross_50') is not None:
+        from analysis.index_analyzer import IndexAnalyzer
+        IndexAnalyzer.install_cross_50_cache(shared['cross_50'])
+
+
+def _analyze_one(ts_code: str, analyzer_kwargs: dict, include_ml: bool,
+                 auto_tune: bool, min_rows: int) -> IndexAnalysisResult:
+    """分析单个指数，异常记录到结果中而不是向上抛出"""
+    from analysis.index_analyzer import IndexAnalyzer
+
+    name = constant.TS_CODE_NAME_DICT.get(ts_code, ts_code)
+    result = IndexAnalysisResult(ts_code=ts_code, name=name)
+    started = time.perf_counter()
+    try:
+        analyzer = IndexAnalyzer(ts_code, **analyzer_kwargs)
+        if len(analyzer.data) < min_rows:
+            result.skipped = True
+            result.data = analyzer.data
+        else:
+            analyzer.analyze(include_ml=include_ml, auto_tune=auto_tune)
+            result.data = analyzer.data
+            result.signal = analyzer.get_current_signal()
+    except Exception as e:
+        result.error = str(e)
+        result.traceback = traceback.format_exc()
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def resolve_workers(workers: Optional[int], n_tasks: int) -> int:
+    """worker 数：未指定时取 CPU 核数，且不超过任务数"""
+    if workers is None:
+        workers = os.cpu_count() or 1
+    return max(1, min(int(workers), n_tasks))
+
+
+def analyze_many(codes: List[str], workers: Optional[int] = None,
+                 include_ml: bool = True, auto_tune: bool = False,
+                 start_dates: Optional[Dict[str, str]] = None,
+                 min_rows: int = 0, **analyzer_kwargs) -> List[IndexAnalysisResult]:
+    """
+    并行分析多个指数
+
+    Args:
+        codes: 指数代码列表
+        workers: 进程数，None 为 CPU 核数；<= 1 时在当前进程内顺序执行
+        include_ml: 是否包含 ML 预测
+        auto_tune: 是否使用 Optuna 自动调优
+        start_dates: 按指数指定开始日期 {ts_code: YYYYMMDD}，覆盖 analyzer_kwargs 中的 start_date
+        min_rows: 加载数据少于该行数时跳过分析（skipped=True）
+        **analyzer_kwargs: 传给 IndexAnalyzer 的其他参数 (start_date/end_date/lookback_years/include_macro)
+
+    Returns:
+        List[IndexAnalysisResult]: 与 codes 顺序一致的结果（含耗时和错误信息）
+    """
+    codes = list(codes)
+    if not codes:
+        return []
+
+    tasks = _build_tasks(codes, start_dates, analyzer_kwargs)
+    n_workers = resolve_workers(workers, len(codes))
+
+    if n_workers <= 1:
+        return [_analyze_one(code, kwargs, include_ml, auto_tune, min_rows)
+                for code, kwargs in zip(codes, tasks)]
+
+    shared = _prepare_shared_inputs(tasks, codes)
+    print(f"  [并行分析] {len(codes)} 个指数, {n_workers} 个进程")
+
+    results = []
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                             initargs=(shared,)) as executor:
+        futures = [executor.submit(_analyze_one, code, kwargs, include_ml, auto_tune, min_rows)
+                   for code, kwargs in zip(codes, tasks)]
+        for code, future in zip(codes, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                # 子进程异常退出等无法在任务内捕获的错误
+                results.append(IndexAnalysisResult(
+                    ts_code=code, name=constant.TS_CODE_NAME_DICT.get(code, code),
+                    error=str(e), traceback=traceback.format_exc()
+                ))
+    return results
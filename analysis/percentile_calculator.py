@@ -6,11 +6,75 @@
 """
 
 import json
-from typing import List, Optional
+from bisect import bisect_left, bisect_right, insort
+from collections import deque
+from typing import Dict, List, Optional
 
 import pandas as pd
 import numpy as np
 
+from analysis.indicator_columns import PERCENTILE_KEYS
+from util.rolling_util import RollingUtil
+
+
+class RollingPercentileWindow:
+    """
+    单指标滚动百分位状态
+
+    环形缓冲保存窗口内按时间顺序的原始值（含 NaN），有序列表保存非 NaN 值，
+    每追加一个值的百分位计算为 O(log w)，结果与 PercentileCalculator 的滚动计算一致。
+
+    使用示例:
+        window = RollingPercentileWindow(1250, history_values)
+        pct = window.push(today_value)
+    """
+
+    def __init__(self, window: int, values: Optional[List[float]] = None):
+        """
+        Args:
+            window: 窗口大小（交易日数）
+            values: 初始历史值（按时间升序，None/NaN 表示缺失）
+        """
+        self.window = window
+        self.ring = deque(maxlen=window)
+        self.sorted_values = []
+        for value in values or []:
+            self.push(value)
+
+    def push(self, value) -> float:
+        """
+        追加一个新值，返回该值在窗口中的百分位（0-100，未取整）
+
+        Args:
+            value: 新值，None/NaN 表示缺失
+
+        Returns:
+            float: 百分位，当前值缺失或窗口长度不足2时为 NaN
+        """
+        value = np.nan if value is None else float(value)
+
+        # 环形缓冲已满时移出最旧的值
+        if len(self.ring) == self.window:
+            old = self.ring[0]
+            if old == old:
+                del self.sorted_values[bisect_left(self.sorted_values, old)]
+        self.ring.append(value)
+
+        if value != value:
+            return np.nan
+        insort(self.sorted_values, value)
+
+        length = len(self.ring)
+        if length < 2:
+            return np.nan
+        below = bisect_left(self.sorted_values, value)
+        equal = bisect_right(self.sorted_values, value) - below
+        return (below + equal / 2) / length * 100
+
+    def to_list(self) -> List[Optional[float]]:
+        """导出窗口内的原始值（NaN 转为 None，便于 JSON 持久化）"""
+        return [None if v != v else v for v in self.ring]
+
 
 class PercentileCalculator:
     """
@@ -40,7 +104,9 @@ class PercentileCalculator:
                  indicators: Optional[List[str]] = None,
                  include_deviation: bool = True,
                  output_col: str = 'percentile_ranks',
-                 decimal_places: int = 2):
+                 decimal_places: int = 2,
+                 engine: str = 'auto',
+                 typed_columns: bool = False):
         """
         初始化历史百分位计算器
         
@@ -50,6 +116,8 @@ class PercentileCalculator:
             include_deviation: 是否包含偏离率百分位
             output_col: 输出列名
             decimal_places: 小数位数
+            engine: 滚动百分位引擎，'auto' / 'numba' / 'sorted'
+            typed_columns: 同时输出类型化列 pctl_<指标>（float）
         """
         self.lookback_years = lookback_years
         self.lookback_days = lookback_years * 250  # 每年约250个交易日
@@ -57,6 +125,9 @@ class PercentileCalculator:
         self.include_deviation = include_deviation
         self.output_col = output_col
         self.decimal_places = decimal_places
+        RollingUtil.resolve_engine(engine)
+        self.engine = engine
+        self.typed_columns = typed_columns
     
     def calculate(self, df: pd.DataFrame) -> pd.DataFrame:
         """
@@ -81,7 +152,7 @@ class PercentileCalculator:
                 )
         
         # 偏离率指标（需要从JSON解析）
-        if self.include_deviation and 'deviation_rate' in result_df.columns:
+        if self.include_deviation and self._has_deviation(result_df):
             deviation_percentiles = self._calculate_deviation_percentiles(result_df)
             percentile_data.update(deviation_percentiles)
         
@@ -90,43 +161,29 @@ class PercentileCalculator:
             lambda row: self._build_percentile_json(row, percentile_data),
             axis=1
         )
+        self._attach_typed_columns(result_df, percentile_data)
         
         return result_df
     
     def _calculate_rolling_percentile(self, series: pd.Series) -> pd.Series:
         """
         计算滚动窗口百分位
-        
-        使用历史数据（最多lookback_days天）计算当前值的百分位排名
-        
+
+        使用历史数据（最多lookback_days天）计算当前值的百分位排名。
+        通过有序窗口维护，复杂度 O(n log w)，结果与逐窗口扫描一致。
+
         Args:
             series: 数据序列
-        
+
         Returns:
             pd.Series: 百分位排名序列（0-100）
         """
-        def calc_percentile(window):
-            if len(window) < 2:
-                return np.nan
-            current_value = window.iloc[-1]
-            if pd.isna(current_value):
-                return np.nan
-            # 计算当前值在窗口中的百分位排名
-            count_below = (window < current_value).sum()
-            count_equal = (window == current_value).sum()
-            # 使用平均排名法
-            percentile = (count_below + count_equal / 2) / len(window) * 100
-            return round(percentile, self.decimal_places)
-        
-        # 使用扩展窗口，最大为lookback_days
-        percentiles = []
-        for i in range(len(series)):
-            start_idx = max(0, i - self.lookback_days + 1)
-            window = series.iloc[start_idx:i+1]
-            percentiles.append(calc_percentile(window))
-        
-        return pd.Series(percentiles, index=series.index)
-    
+        values = pd.to_numeric(series, errors='coerce').to_numpy(dtype=np.float64)
+        percentiles = RollingUtil.rolling_mid_rank_percentile(
+            values, self.lookback_days, min_length=2, engine=self.engine
+        )
+        return pd.Series(np.round(percentiles, self.decimal_places), index=series.index)
+
     def _calculate_deviation_percentiles(self, df: pd.DataFrame) -> dict:
         """
         计算偏离率的百分位
@@ -140,8 +197,33 @@ class PercentileCalculator:
             dict: 各偏离率指标的百分位序列
         """
         result = {}
+        for key, series in self._parse_deviation_series(df).items():
+            result[key] = self._calculate_rolling_percentile(series)
+        return result
+    
+    def _has_deviation(self, df: pd.DataFrame) -> bool:
+        """是否包含偏离率数据（JSON 列或完整的类型化列）"""
+        if 'deviation_rate' in df.columns:
+            return True
+        return all(f'deviation_{indicator}' in df.columns for indicator in self.DEVIATION_INDICATORS)
+    
+    def _parse_deviation_series(self, df: pd.DataFrame) -> Dict[str, pd.Series]:
+        """
+        将 deviation_rate JSON 列解析为各均线偏离率的数值序列
+        
+        已有类型化列 deviation_ma_N（DeviationRateCalculator 输出或数据库类型化列）时直接读取，
+        不再逐行解析 JSON。
+        
+        Args:
+            df: DataFrame
+        
+        Returns:
+            dict: {'deviation_ma_5': Series, ...}
+        """
+        typed_cols = [f'deviation_{indicator}' for indicator in self.DEVIATION_INDICATORS]
+        if all(col in df.columns for col in typed_cols):
+            return {col: pd.to_numeric(df[col], errors='coerce') for col in typed_cols}
         
-        # 先将JSON解析为多列
         deviation_data = {}
         for indicator in self.DEVIATION_INDICATORS:
             deviation_data[indicator] = []
@@ -157,16 +239,104 @@ class PercentileCalculator:
                 value = deviation_dict.get(indicator)
                 deviation_data[indicator].append(value)
         
-        # 计算每个偏离率指标的百分位
+        result = {}
         for indicator in self.DEVIATION_INDICATORS:
             series = pd.Series(deviation_data[indicator], index=df.index)
             # 转换为float，处理None值
-            series = pd.to_numeric(series, errors='coerce')
-            key = f'deviation_{indicator}'
-            result[key] = self._calculate_rolling_percentile(series)
+            result[f'deviation_{indicator}'] = pd.to_numeric(series, errors='coerce')
         
         return result
     
+    def extract_indicator_series(self, df: pd.DataFrame) -> Dict[str, pd.Series]:
+        """
+        提取需要计算百分位的各指标数值序列（键名与 percentile_ranks JSON 一致）
+        
+        Args:
+            df: DataFrame
+        
+        Returns:
+            dict: {指标键名: 数值序列}
+        """
+        series_dict = {}
+        for indicator in self.indicators:
+            if indicator in df.columns:
+                series_dict[indicator] = pd.to_numeric(df[indicator], errors='coerce')
+        if self.include_deviation and self._has_deviation(df):
+            series_dict.update(self._parse_deviation_series(df))
+        return series_dict
+    
+    def build_states(self, history_df: pd.DataFrame) -> Dict[str, RollingPercentileWindow]:
+        """
+        用历史数据构建各指标的滚动窗口状态
+        
+        Args:
+            history_df: 按交易日升序的历史数据（取最后 lookback_days 行即可）
+        
+        Returns:
+            dict: {指标键名: RollingPercentileWindow}
+        """
+        states = {}
+        for key, series in self.extract_indicator_series(history_df).items():
+            values = series.iloc[-self.lookback_days:].tolist()
+            states[key] = RollingPercentileWindow(self.lookback_days, values)
+        return states
+    
+    def calculate_incremental(self, df: pd.DataFrame,
+                              states: Dict[str, RollingPercentileWindow]) -> pd.DataFrame:
+        """
+        基于持久化的滚动窗口状态，逐行追加新数据并计算百分位
+        
+        每行 O(log w)，结果等价于在完整历史上调用 calculate() 后取新增行。
+        states 会被原地更新（缺失的指标自动新建空窗口，df 中不存在的指标被移除），
+        调用方负责持久化。
+        
+        Args:
+            df: 新增数据（按交易日升序，且紧接在 states 对应的历史之后）
+            states: 各指标的滚动窗口状态
+        
+        Returns:
+            pd.DataFrame: 添加 percentile_ranks 列的 DataFrame
+        """
+        result_df = df.copy()
+        
+        series_dict = self.extract_indicator_series(result_df)
+        for key in list(states.keys()):
+            if key not in series_dict:
+                del states[key]
+        
+        percentile_data = {}
+        for key, series in series_dict.items():
+            window = states.get(key)
+            if window is None:
+                window = states[key] = RollingPercentileWindow(self.lookback_days)
+            values = [window.push(v) for v in series.tolist()]
+            percentile_data[key] = pd.Series(
+                np.round(np.asarray(values, dtype=np.float64), self.decimal_places),
+                index=result_df.index
+            )
+        
+        result_df[self.output_col] = result_df.apply(
+            lambda row: self._build_percentile_json(row, percentile_data),
+            axis=1
+        )
+        self._attach_typed_columns(result_df, percentile_data)
+        
+        return result_df
+    
+    def _attach_typed_columns(self, result_df: pd.DataFrame, percentile_data: dict):
+        """
+        typed_columns=True 时将各指标百分位写入 pctl_<指标> 列（原地修改）
+        
+        本次未计算的标准指标置为 NaN（对应 JSON 中缺失的键），避免残留加载时的旧值
+        """
+        if not self.typed_columns:
+            return
+        for key in PERCENTILE_KEYS:
+            if key not in percentile_data:
+                result_df[f'pctl_{key}'] = np.nan
+        for key, series in percentile_data.items():
+            result_df[f'pctl_{key}'] = pd.to_numeric(series, errors='coerce').astype(np.float64)
+    
     def _build_percentile_json(self, row: pd.Series, percentile_data: dict) -> str:
         """
         构建百分位JSON字符串
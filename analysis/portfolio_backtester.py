@@ -68,7 +68,8 @@ class PortfolioBacktester:
                  stop_loss_pct: float = 0.35,
                  stop_loss_reduction: float = 0.3,
                  take_profit_pct: float = 0.50,
-                 take_profit_reduction: float = 0.5):
+                 take_profit_reduction: float = 0.5,
+                 analysis_workers: Optional[int] = None):
         """
         Args:
             initial_capital: 初始资金
@@ -92,6 +93,7 @@ class PortfolioBacktester:
             stop_loss_reduction: V23 止损后保留比例 (默认0.3即保留30%)
             take_profit_pct: V23 止盈触发阈值，N日涨幅超过X%时减仓 (默认0.50即50%)
             take_profit_reduction: V23 止盈后保留比例 (默认0.5即保留50%)
+            analysis_workers: 加载指数信号时的并行进程数，None 为 CPU 核数
         """
         self.initial_capital = initial_capital
         self.commission_rate = commission_rate
@@ -120,6 +122,7 @@ class PortfolioBacktester:
         self.stop_loss_reduction = stop_loss_reduction
         self.take_profit_pct = take_profit_pct
         self.take_profit_reduction = take_profit_reduction
+        self.analysis_workers = analysis_workers
         self._sl_trigger_count = 0
         self._tp_trigger_count = 0
         self._defense_data = None  # type: Optional[pd.DataFrame]
@@ -448,29 +451,31 @@ class PortfolioBacktester:
         - 确保 ML 模型有充足训练数据，fused_score 归一化稳定
         - 回测区间仅控制交易仿真的起止时间 (在 _align_dates 中截取)
         """
-        from analysis.index_analyzer import IndexAnalyzer
+        from analysis.multi_index_runner import analyze_many
 
         index_data = {}
         codes = list(constant.TS_CODE_NAME_DICT.keys())
 
-        for i, code in enumerate(codes):
-            name = constant.TS_CODE_NAME_DICT.get(code, code)
-            print(f"  [{i+1}/{len(codes)}] {name} ({code})...", end=" ", flush=True)
-
-            try:
-                # 始终使用全量历史数据生成信号，不受回测 start_date 限制
-                full_start = constant.HISTORY_START_DATE_MAP.get(code, '20100101')
-                analyzer = IndexAnalyzer(code, start_date=full_start, end_date=self.end_date,
-                                         include_macro=self.include_macro)
+        # 始终使用全量历史数据生成信号，不受回测 start_date 限制
+        start_dates = {code: constant.HISTORY_START_DATE_MAP.get(code, '20100101') for code in codes}
+        results = analyze_many(codes, workers=self.analysis_workers, include_ml=True,
+                               start_dates=start_dates, min_rows=100,
+                               end_date=self.end_date, include_macro=self.include_macro)
 
-                if len(analyzer.data) < 100:
-                    print(f"数据不足 ({len(analyzer.data)} 行)，跳过")
-                    continue
+        for i, result in enumerate(results):
+            code = result.ts_code
+            print(f"  [{i+1}/{len(codes)}] {result.name} ({code})...", end=" ", flush=True)
 
-                analyzer.analyze(include_ml=True)
+            if result.error is not None:
+                print(f"失败: {result.error}")
+                continue
+            if result.skipped:
+                print(f"数据不足 ({len(result.data)} 行)，跳过")
+                continue
 
+            try:
                 # 尝试生成 fused_signal
-                df = self._add_fused_signal(analyzer.data)
+                df = self._add_fused_signal(result.data)
 
                 # 截取回测区间: 信号已在全量数据上生成，现在只保留回测范围
                 df['trade_date'] = pd.to_datetime(df['trade_date'])
@@ -489,9 +494,9 @@ class PortfolioBacktester:
                 if sig_col in df_backtest.columns:
                     n_buy = (df_backtest[sig_col] == 'BUY').sum()
                     n_sell = (df_backtest[sig_col] == 'SELL').sum()
-                    print(f"OK (全量{n_full}行, 回测{n_rows}行, BUY={n_buy}, SELL={n_sell})")
+                    print(f"OK (全量{n_full}行, 回测{n_rows}行, BUY={n_buy}, SELL={n_sell}, {result.elapsed:.1f}s)")
                 else:
-                    print(f"OK (全量{n_full}行, 回测{n_rows}行, 信号列缺失)")
+                    print(f"OK (全量{n_full}行, 回测{n_rows}行, 信号列缺失, {result.elapsed:.1f}s)")
 
             except Exception as e:
                 print(f"失败: {e}")
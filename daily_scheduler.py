@@ -34,7 +34,7 @@ from typing import List, Dict
 sys.path.insert(0, r'E:\pycharm\stock-analysis')
 
 from sync.index.sixty_index_analysis import SixtyIndexAnalysis
-from analysis.index_analyzer import IndexAnalyzer
+from analysis.multi_index_runner import analyze_many
 from util.date_util import TimeUtils
 from entity import constant
 
@@ -98,23 +98,31 @@ class DailyScheduler:
         
         results = []
         
-        for index_name, code in self.indices.items():
+        # 1. 同步最新数据（所有指数共用一次）
+        logger.info('[OK] 同步最新数据...')
+        try:
+            sync_analysis = SixtyIndexAnalysis()
+            start_date = (datetime.now() - timedelta(days=30)).strftime('%Y%m%d')
+            sync_analysis.additional_data(start_date)
+        except Exception as e:
+            logger.error('[ERROR] 数据同步失败: ' + str(e))
+        
+        # 2. 进程池并行完整分析，结果按 self.indices 顺序返回
+        logger.info('[OK] 执行完整技术分析...')
+        analysis_results = analyze_many(list(self.indices.values()), include_ml=True)
+        
+        for (index_name, code), analysis in zip(self.indices.items(), analysis_results):
             try:
-                logger.info('[OK] 分析 ' + index_name + ' (' + code + ')...')
-                
-                # 1. 同步最新数据
-                logger.info('[OK] 同步最新数据...')
-                sync_analysis = SixtyIndexAnalysis()
-                start_date = (datetime.now() - timedelta(days=30)).strftime('%Y%m%d')
-                sync_analysis.additional_data(start_date)
+                logger.info('[OK] 分析 ' + index_name + ' (' + code + ')... 耗时 ' + f'{analysis.elapsed:.1f}s')
+                if analysis.error is not None:
+                    if analysis.traceback:
+                        logger.error(analysis.traceback)
+                    raise RuntimeError(analysis.error)
                 
-                # 2. 使用IndexAnalyzer进行完整分析
-                logger.info('[OK] 执行完整技术分析...')
-                analyzer = IndexAnalyzer(ts_code=code)
-                analysis_df = analyzer.analyze(include_ml=True)
+                analysis_df = analysis.data
                 
                 # 3. 提取分析结果
-                latest_row = analysis_df.iloc[-1] if len(analysis_df) > 0 else None
+                latest_row = analysis_df.iloc[-1] if analysis_df is not None and len(analysis_df) > 0 else None
                 
                 result = {
                     'name': index_name,
@@ -130,8 +138,6 @@ class DailyScheduler:
                 logger.info('[OK] ' + index_name + ' 分析完成 - 信号: ' + str(result['final_signal']))
             except Exception as e:
                 logger.error('[ERROR] ' + index_name + ' 分析失败: ' + str(e))
-                import traceback
-                traceback.print_exc()
                 results.append({
                     'name': index_name,
                     'code': code,
@@ -130,11 +130,12 @@ def print_guide():
 """)
 
 
-def run_daily_workflow(to_emails=None):
+def run_daily_workflow(to_emails=None, workers=None):
     """
     运行每日全流程：数据同步 -> 信号分析 -> 报表生成 -> 邮件推送
 
     使用 report/ 包的统一模块完成报告生成和邮件发送。
+    信号分析阶段用进程池并行分析各指数（workers 为进程数，None 为 CPU 核数）。
     """
     import subprocess
     import sys
@@ -166,24 +167,20 @@ def run_daily_workflow(to_emails=None):
     print("-" * 40)
     signals_data = []
     try:
-        from analysis.index_analyzer import IndexAnalyzer
+        from analysis.multi_index_runner import analyze_many
         from entity import constant
 
         codes = list(constant.TS_CODE_NAME_DICT.keys())
-        for i, code in enumerate(codes):
-            name = constant.TS_CODE_NAME_DICT.get(code, code)
-            print(f"  [{i+1}/{len(codes)}] {name} ({code})...", end=" ", flush=True)
-            try:
-                analyzer = IndexAnalyzer(code)
-                analyzer.analyze(include_ml=True)
-                sig = analyzer.get_current_signal()
-                if sig:
-                    signals_data.append(sig)
-                    print(f"OK -> {sig.get('final_signal', 'N/A')}")
-                else:
-                    print("无信号数据")
-            except Exception as e:
-                print(f"失败: {e}")
+        results = analyze_many(codes, workers=workers, include_ml=True)
+        for i, result in enumerate(results):
+            print(f"  [{i+1}/{len(codes)}] {result.name} ({result.ts_code})...", end=" ", flush=True)
+            if result.error is not None:
+                print(f"失败: {result.error}")
+            elif result.signal:
+                signals_data.append(result.signal)
+                print(f"OK -> {result.signal.get('final_signal', 'N/A')} ({result.elapsed:.1f}s)")
+            else:
+                print("无信号数据")
 
         print(f"\n[OK] 信号分析完成，共 {len(signals_data)} 个指数")
     except Exception as e:
@@ -316,6 +313,8 @@ if __name__ == "__main__":
                         help='禁用防御ETF (backtest模式，默认启用黄金ETF 518880.SH)')
     parser.add_argument('--optimize-defense', action='store_true',
                         help='Optuna调优防御资产参数 (backtest模式，需时较长)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='多指数并行分析的进程数 (signal/backtest/daily_report模式, 默认: CPU核数, 1为顺序执行)')
     args = parser.parse_args()
     
     # 日期校验
@@ -350,11 +349,12 @@ if __name__ == "__main__":
             auto_tune=args.auto_tune,
             include_macro=not args.no_macro,
             model_type=args.model_type,
-            feature_selection=args.feature_selection
+            feature_selection=args.feature_selection,
+            workers=args.workers
         )
     
     elif args.mode == 'daily_report':
-        run_daily_workflow(args.to_emails)
+        run_daily_workflow(args.to_emails, workers=args.workers)
     
     elif args.mode == 'backtest':
         from analysis.index_analyzer import portfolio_backtest
@@ -373,6 +373,7 @@ if __name__ == "__main__":
             defense_etf_code=None if args.no_defense else '518880.SH',
             # Optuna防御资产参数调优
             optimize_defense=args.optimize_defense,
+            workers=args.workers,
         )
 
     elif args.mode == 'cb_signal':
@@ -4,10 +4,8 @@ import pandas as pd
 from pandas.core.interchange.dataframe_protocol import DataFrame
 from pydantic import Field
 
-from entity.stock_data import StockData
 from mysql_connect.sixty_index_mapper import SixtyIndexMapper
 from tu_share_factory.tu_share_factory import TuShareFactory
-from util.class_util import ClassUtil
 
 tools=[]
 
@@ -295,13 +293,7 @@ def list_index_daily_basic(ts_code: str = Field(description='指数tushare编码
                            end_date: str = Field(description='指数走势的结束时间，以yyyyMMdd格式输入'),
                            field_list: list = Field(description='需要返回的参数列表，需要从get_field_list获取')) -> str:
     """根据指数编码获取最近指数走势与技术指标"""
-    index_data = mapper.select_by_code_and_trade_round(ts_code=ts_code, start_date=start_date, end_date=end_date)
-    data_frame_list = []
-    for row in index_data:
-        stock_data = ClassUtil.create_entities_from_data(StockData, row)
-        data_frame_list.append(stock_data.to_dict())
-
-    all_field_pd = pd.DataFrame(data_frame_list)
+    all_field_pd = mapper.select_json_view_frame_by_code_and_trade_round(ts_code=ts_code, start_date=start_date, end_date=end_date)
     #all_field_pd['trade_date'] = all_field_pd['trade_date'].dt.strftime('%Y%m%d')
 
     # 将'date_column'列转换为日期时间类型
@@ -3,10 +3,16 @@
 
 提供基础的 CRUD 操作，使用 SQLAlchemy 会话管理
 """
+from datetime import date
+from decimal import Decimal
+from typing import Dict, Iterator, List, Optional, Union
+
 import numpy as np
+import pandas as pd
+import pymysql
 from sqlalchemy import text
 
-from mysql_connect.db import get_session
+from mysql_connect.db import BULK_CHUNK_SIZE, execute_many, execute_many_tuples, get_engine, get_session
 
 
 def nan_to_null(value):
@@ -21,6 +27,75 @@ def nan_to_null(value):
         return value
 
 
+def frame_to_column_lists(df: pd.DataFrame) -> List[list]:
+    """
+    按列将 DataFrame 转换为 Python 原生值列表（NaN/NaT -> None）
+
+    逐列整体转换，避免 iterrows + 逐字段 nan_to_null 的开销；
+    .tolist() 同时把 numpy 标量转为 Python 原生类型，pymysql 可直接转义。
+    """
+    column_lists = []
+    for col in df.columns:
+        series = df[col]
+        null_mask = series.isna().to_numpy()
+        values = series.to_numpy(dtype=object) if series.dtype.kind in 'Mm' else series.to_numpy()
+        values = values.tolist()
+        if null_mask.any():
+            for i in np.flatnonzero(null_mask).tolist():
+                values[i] = None
+        column_lists.append(values)
+    return column_lists
+
+
+def _column_array(values: tuple):
+    """
+    按首个非空值的类型整列转换 DBAPI 返回值
+
+    Decimal / float / 含 NULL 的整数 -> float64（NULL 为 NaN），无 NULL 的整数 -> int64，
+    date / datetime -> datetime64（NULL 为 NaT），其余（字符串等）保持 object。
+    """
+    sample = next((v for v in values if v is not None), None)
+    try:
+        if isinstance(sample, bool):
+            return np.array(values, dtype=object)
+        if isinstance(sample, int):
+            if all(isinstance(v, int) for v in values):
+                return np.array(values, dtype=np.int64)
+            return np.array(values, dtype=np.float64)
+        if isinstance(sample, (Decimal, float)):
+            return np.array(values, dtype=np.float64)
+        if isinstance(sample, date):
+            return pd.to_datetime(pd.Series(values, dtype=object)).to_numpy()
+    except (TypeError, ValueError, OverflowError):
+        pass
+    return np.array(values, dtype=object)
+
+
+def rows_to_frame(column_names: List[str], rows: list,
+                  dtypes: Optional[Dict[str, object]] = None) -> pd.DataFrame:
+    """
+    将 DBAPI 游标返回的行元组按列转换为 DataFrame（不经过实体对象）
+
+    Args:
+        column_names: 列名（cursor.description 顺序）
+        rows: 行元组列表
+        dtypes: {列名: dtype} 指定列类型，在自动转换之前作用于原始值
+
+    Returns:
+        pd.DataFrame: 数值列为 float64/int64，日期列为 datetime64
+    """
+    dtypes = dtypes or {}
+    if not rows:
+        return pd.DataFrame({name: pd.Series(dtype=dtypes.get(name, object)) for name in column_names})
+    data = {}
+    for name, values in zip(column_names, zip(*rows)):
+        if name in dtypes:
+            data[name] = pd.Series(values, dtype=object).astype(dtypes[name])
+        else:
+            data[name] = _column_array(values)
+    return pd.DataFrame(data, columns=column_names)
+
+
 class CommonMapper:
     """通用 Mapper 基类"""
     
@@ -41,59 +116,189 @@ class CommonMapper:
             session.execute(text(sql), clean_data)
     
     def batch_insert_base_entity(self, base_entity_list):
-        """批量插入实体"""
+        """批量插入实体（executemany，每批一次往返）"""
         if not base_entity_list:
             return
         
-        sample = base_entity_list[0].to_dict_with_backticks(contains_id=False)
-        clean_keys = [k.strip('`') for k in sample.keys()]
-        
-        columns = ', '.join([f'`{k}`' for k in clean_keys])
-        placeholders = ', '.join([f':{k}' for k in clean_keys])
-        sql = f"INSERT INTO `{self.table_name}` ({columns}) VALUES ({placeholders})"
-        
         batch_data = []
         for entity in base_entity_list:
             entity_dict = entity.to_dict_with_backticks(contains_id=False)
             clean_data = {k.strip('`'): nan_to_null(v) for k, v in entity_dict.items()}
             batch_data.append(clean_data)
         
-        with get_session() as session:
-            for data in batch_data:
-                session.execute(text(sql), data)
+        self.bulk_insert(list(batch_data[0].keys()), batch_data)
     
     def upsert_base_entities_batch(self, base_entity_list):
-        """批量插入或更新实体（UPSERT）"""
+        """批量插入或更新实体（UPSERT，executemany，每批一次往返）"""
         if not base_entity_list:
             return 0
         
-        sample = base_entity_list[0].to_dict_with_backticks(contains_id=True)
-        clean_keys = [k.strip('`') for k in sample.keys()]
-        
-        columns = ', '.join([f'`{k}`' for k in clean_keys])
-        placeholders = ', '.join([f':{k}' for k in clean_keys])
-        update_clause = ', '.join([f'`{k}` = VALUES(`{k}`)' for k in clean_keys if k != 'id'])
-        
-        sql = f"""
-            INSERT INTO `{self.table_name}` ({columns})
-            VALUES ({placeholders})
-            ON DUPLICATE KEY UPDATE {update_clause}
-        """
-        
         batch_data = []
         for entity in base_entity_list:
             entity_dict = entity.to_dict_with_backticks(contains_id=True)
             clean_data = {k.strip('`'): nan_to_null(v) for k, v in entity_dict.items()}
             batch_data.append(clean_data)
         
-        affected_rows = 0
+        chunk_rowcounts = self.bulk_upsert(list(batch_data[0].keys()), batch_data)
+        return sum(chunk_rowcounts)
+    
+    def bulk_insert(self, columns: List[str], rows: list,
+                    chunk_size: int = BULK_CHUNK_SIZE) -> List[int]:
+        """
+        批量插入（executemany，pymysql 改写为多行 VALUES）
+        
+        Args:
+            columns: 列名列表
+            rows: 参数字典列表，键与 columns 一致，值已完成 NaN -> None 转换
+            chunk_size: 每批行数
+        
+        Returns:
+            List[int]: 每批影响的行数
+        """
+        if not rows:
+            return []
+        
+        column_sql = ', '.join([f'`{k}`' for k in columns])
+        placeholders = ', '.join([f':{k}' for k in columns])
+        sql = f"INSERT INTO `{self.table_name}` ({column_sql}) VALUES ({placeholders})"
+        
         with get_session() as session:
-            for data in batch_data:
-                result = session.execute(text(sql), data)
-                affected_rows += result.rowcount
+            return execute_many(session, sql, rows, chunk_size)
+    
+    def bulk_upsert(self, columns: List[str], rows: list,
+                    update_columns: Optional[List[str]] = None,
+                    chunk_size: int = BULK_CHUNK_SIZE) -> List[int]:
+        """
+        批量 UPSERT（INSERT ... ON DUPLICATE KEY UPDATE，executemany）
+        
+        所有批次在同一事务中提交。MySQL 的影响行数: 新插入计1，更新计2，未变化计0。
+        
+        Args:
+            columns: 列名列表
+            rows: 参数字典列表，键与 columns 一致，值已完成 NaN -> None 转换
+            update_columns: 冲突时更新的列，默认为除 id 外的全部列
+            chunk_size: 每批行数
+        
+        Returns:
+            List[int]: 每批影响的行数
+        """
+        if not rows:
+            return []
         
-        return affected_rows
+        if update_columns is None:
+            update_columns = [k for k in columns if k != 'id']
+        
+        column_sql = ', '.join([f'`{k}`' for k in columns])
+        placeholders = ', '.join([f':{k}' for k in columns])
+        update_clause = ', '.join([f'`{k}` = VALUES(`{k}`)' for k in update_columns])
+        
+        sql = f"""
+            INSERT INTO `{self.table_name}` ({column_sql})
+            VALUES ({placeholders})
+            ON DUPLICATE KEY UPDATE {update_clause}
+        """
+        
+        with get_session() as session:
+            return execute_many(session, sql, rows, chunk_size)
     
+    def upsert_dataframe(self, df: pd.DataFrame,
+                         column_map: Optional[Dict[str, str]] = None,
+                         update_columns: Optional[List[str]] = None,
+                         chunk_size: int = BULK_CHUNK_SIZE) -> List[int]:
+        """
+        直接将 DataFrame 批量 UPSERT 到表中（不经过实体对象）
+        
+        列式完成 NaN -> None 转换，再由各列数组拼出参数元组按批发送。
+        
+        Args:
+            df: 待写入数据
+            column_map: {df列名: 表列名}，仅写入映射中的列；为 None 时写入 df 全部列（同名）
+            update_columns: 冲突时更新的表列，默认为除 id 外的全部写入列
+            chunk_size: 每批行数
+        
+        Returns:
+            List[int]: 每批影响的行数
+        
+        使用示例:
+            mapper.upsert_dataframe(df, {'ts_code': 'ts_code', 'trade_date': 'trade_date', 'close': 'close'})
+        """
+        if df is None or df.empty:
+            return []
+        
+        if column_map is None:
+            column_map = {col: col for col in df.columns}
+        frame = df[list(column_map.keys())]
+        columns = list(column_map.values())
+        
+        if update_columns is None:
+            update_columns = [k for k in columns if k != 'id']
+        
+        column_sql = ', '.join([f'`{k}`' for k in columns])
+        placeholders = ', '.join(['%s'] * len(columns))
+        update_clause = ', '.join([f'`{k}` = VALUES(`{k}`)' for k in update_columns])
+        sql = (f"INSERT INTO `{self.table_name}` ({column_sql}) VALUES ({placeholders}) "
+               f"ON DUPLICATE KEY UPDATE {update_clause}")
+        
+        rows = zip(*frame_to_column_lists(frame))
+        with get_session() as session:
+            return execute_many_tuples(session, sql, rows, chunk_size)
+
+    def update_dataframe(self, df: pd.DataFrame, key_columns: List[str],
+                         update_columns: List[str],
+                         chunk_size: int = BULK_CHUNK_SIZE) -> int:
+        """
+        按键列批量更新已有行的指定列（不会插入新行）
+
+        先将 DataFrame 分批写入与目标表同列类型的临时表，再用一条
+        UPDATE ... JOIN 完成更新，替代逐行 UPDATE。
+        键在目标表中不存在的行被忽略，与逐行 UPDATE 的语义一致。
+
+        Args:
+            df: 待更新数据，需包含 key_columns 和 update_columns
+            key_columns: 匹配键列（如 ['ts_code', 'trade_date']）
+            update_columns: 要更新的列
+            chunk_size: 写入临时表的每批行数
+
+        Returns:
+            int: UPDATE 影响的行数
+        """
+        if df is None or df.empty:
+            return 0
+
+        columns = list(key_columns) + [c for c in update_columns if c not in key_columns]
+        frame = df[columns].drop_duplicates(subset=list(key_columns), keep='last')
+
+        tmp_table = f"tmp_update_{self.table_name}"
+        column_sql = ', '.join([f'`{k}`' for k in columns])
+        key_sql = ', '.join([f'`{k}`' for k in key_columns])
+        placeholders = ', '.join(['%s'] * len(columns))
+        set_clause = ', '.join([f't.`{k}` = s.`{k}`' for k in update_columns])
+        join_clause = ' AND '.join([f't.`{k}` = s.`{k}`' for k in key_columns])
+
+        rows = zip(*frame_to_column_lists(frame))
+        with get_session() as session:
+            connection = session.connection()
+            # 临时表只对当前连接可见，会话内的语句共用同一连接
+            # 键索引在 CREATE TEMPORARY TABLE 中声明：ALTER TABLE 会隐式提交当前事务
+            connection.exec_driver_sql(f"DROP TEMPORARY TABLE IF EXISTS `{tmp_table}`")
+            connection.exec_driver_sql(
+                f"CREATE TEMPORARY TABLE `{tmp_table}` (INDEX idx_keys ({key_sql})) "
+                f"SELECT {column_sql} FROM `{self.table_name}` LIMIT 0"
+            )
+            try:
+                execute_many_tuples(
+                    session,
+                    f"INSERT INTO `{tmp_table}` ({column_sql}) VALUES ({placeholders})",
+                    rows, chunk_size
+                )
+                result = connection.exec_driver_sql(
+                    f"UPDATE `{self.table_name}` t JOIN `{tmp_table}` s ON {join_clause} "
+                    f"SET {set_clause}"
+                )
+                return result.rowcount
+            finally:
+                connection.exec_driver_sql(f"DROP TEMPORARY TABLE IF EXISTS `{tmp_table}`")
+
     def select_base_entity(self, columns, condition):
         """查询实体"""
         sql = f"SELECT {columns} FROM `{self.table_name}`"
@@ -104,6 +309,67 @@ class CommonMapper:
             result = session.execute(text(sql))
             return result.fetchall()
     
+    def select_frame(self, columns='*', condition=None, params=None,
+                     dtypes: Optional[Dict[str, object]] = None,
+                     chunksize: Optional[int] = None) -> Union[pd.DataFrame, Iterator[pd.DataFrame]]:
+        """
+        查询结果直接读为 DataFrame
+
+        经 DBAPI 游标取回行元组后按列整体转换（见 rows_to_frame），
+        替代 select_base_entity -> 逐行创建实体 -> to_dict -> DataFrame。
+
+        Args:
+            columns: 查询列
+            condition: WHERE 条件，可使用 pymysql 占位符 %s / %(name)s（此时字面量 % 需写成 %%）
+            params: 占位符参数（元组/列表或字典），列表/元组值会展开为 IN (...) 列表
+            dtypes: {列名: dtype} 指定列类型
+            chunksize: 指定时使用服务端游标（SSCursor）按块读取，返回 DataFrame 迭代器，
+                       适用于 stock_daily_basic 等大表，避免一次性载入全部行
+
+        Returns:
+            pd.DataFrame，或 chunksize 指定时为 DataFrame 迭代器
+
+        使用示例:
+            df = mapper.select_frame('ts_code, trade_date, close', 'ts_code = %s', ('000300.SH',))
+            for chunk in mapper.select_frame(condition='trade_date >= %s', params=('20240101',), chunksize=50000):
+                ...
+        """
+        sql = f"SELECT {columns} FROM `{self.table_name}`"
+        if condition:
+            sql += f" WHERE {condition}"
+        if chunksize:
+            return self._iter_frames(sql, params, dtypes, chunksize)
+
+        connection = get_engine().raw_connection()
+        try:
+            cursor = connection.cursor()
+            cursor.execute(sql, params)
+            column_names = [d[0] for d in cursor.description]
+            rows = cursor.fetchall()
+            cursor.close()
+        finally:
+            connection.close()
+        return rows_to_frame(column_names, rows, dtypes)
+
+    @staticmethod
+    def _iter_frames(sql, params, dtypes, chunksize) -> Iterator[pd.DataFrame]:
+        """服务端游标逐块读取（迭代结束或中途关闭时归还连接）"""
+        connection = get_engine().raw_connection()
+        try:
+            cursor = connection.cursor(pymysql.cursors.SSCursor)
+            try:
+                cursor.execute(sql, params)
+                column_names = [d[0] for d in cursor.description]
+                while True:
+                    rows = cursor.fetchmany(chunksize)
+                    if not rows:
+                        break
+                    yield rows_to_frame(column_names, rows, dtypes)
+            finally:
+                cursor.close()
+        finally:
+            connection.close()
+    
     def delete_by_condition(self, condition):
         """根据条件删除"""
         sql = f"DELETE FROM `{self.table_name}` WHERE {condition}"
@@ -6,7 +6,7 @@
 import numpy as np
 from sqlalchemy import text
 
-from mysql_connect.db import get_session, get_engine, get_pool_status
+from mysql_connect.db import execute_many, get_session, get_engine, get_pool_status
 
 
 def nan_to_null(value):
@@ -97,7 +97,7 @@ class DatabaseManager:
                 return None
     
     def batch_insert(self, table, entities):
-        """批量插入"""
+        """批量插入（executemany，每批一次往返）"""
         if not entities:
             return
         
@@ -108,15 +108,17 @@ class DatabaseManager:
         placeholders = ', '.join([f':{k}' for k in clean_keys])
         sql = f"INSERT INTO `{table}` ({columns}) VALUES ({placeholders})"
         
+        batch_data = []
+        for entity in entities:
+            entity_dict = entity.to_dict_with_backticks()
+            batch_data.append({k.strip('`'): nan_to_null(v) for k, v in entity_dict.items()})
+        
         with get_session() as session:
-            for entity in entities:
-                entity_dict = entity.to_dict_with_backticks()
-                clean_data = {k.strip('`'): nan_to_null(v) for k, v in entity_dict.items()}
-                session.execute(text(sql), clean_data)
+            execute_many(session, sql, batch_data)
     
     def upsert_base_entities_batch(self, table, entities):
         """
-        批量 UPSERT 实现
+        批量 UPSERT 实现（executemany，每批一次往返）
         
         Args:
             table: 表名
@@ -141,15 +143,15 @@ class DatabaseManager:
             ON DUPLICATE KEY UPDATE {update_clause}
         """
         
-        affected_rows = 0
+        batch_data = []
+        for entity in entities:
+            entity_dict = entity.to_dict_with_backticks(contains_id=True)
+            batch_data.append({k.strip('`'): nan_to_null(v) for k, v in entity_dict.items()})
+        
         with get_session() as session:
-            for entity in entities:
-                entity_dict = entity.to_dict_with_backticks(contains_id=True)
-                clean_data = {k.strip('`'): nan_to_null(v) for k, v in entity_dict.items()}
-                result = session.execute(text(sql), clean_data)
-                affected_rows += result.rowcount
+            chunk_rowcounts = execute_many(session, sql, batch_data)
         
-        return affected_rows
+        return sum(chunk_rowcounts)
     
     def get_pool_status(self):
         """获取连接池状态"""
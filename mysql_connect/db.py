@@ -3,9 +3,10 @@
 
 提供 SQLAlchemy 连接池和会话管理
 """
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker, declarative_base
 from contextlib import contextmanager
+from typing import List
 import yaml
 from entity import constant
 
@@ -16,6 +17,11 @@ Base = declarative_base()
 _engine = None
 _SessionFactory = None
 
+# 批量写入每批行数
+# pymysql 会把 INSERT 的 executemany 改写为多行 VALUES (...),(...)，
+# 并按 max_stmt_length (~1MB) 自动拆分语句，保证低于 max_allowed_packet
+BULK_CHUNK_SIZE = 1000
+
 
 def get_engine():
     """获取数据库引擎（单例，带连接池）"""
@@ -70,6 +76,64 @@ def get_session():
         session.close()
 
 
+def dispose_engine_after_fork():
+    """
+    子进程（进程池 worker）中调用：丢弃从父进程继承的连接池
+
+    close=False 不关闭父进程仍在使用的连接，子进程后续按需建立自己的连接。
+    """
+    if _engine is not None:
+        _engine.dispose(close=False)
+
+
+def execute_many(session, sql, params_list: list, chunk_size: int = BULK_CHUNK_SIZE) -> List[int]:
+    """
+    分批执行 executemany（每批一次往返）
+
+    Args:
+        session: 数据库会话
+        sql: SQL 字符串或 text() 对象，使用 :name 命名参数
+        params_list: 参数字典列表（键必须一致）
+        chunk_size: 每批行数
+
+    Returns:
+        List[int]: 每批影响的行数
+    """
+    statement = text(sql) if isinstance(sql, str) else sql
+    chunk_rowcounts = []
+    for start in range(0, len(params_list), chunk_size):
+        chunk = params_list[start:start + chunk_size]
+        result = session.execute(statement, chunk)
+        chunk_rowcounts.append(result.rowcount)
+    return chunk_rowcounts
+
+
+def execute_many_tuples(session, sql: str, rows, chunk_size: int = BULK_CHUNK_SIZE) -> List[int]:
+    """
+    分批执行 DBAPI 层 executemany（位置参数元组，跳过 SQLAlchemy 参数处理）
+
+    Args:
+        session: 数据库会话
+        sql: 使用 %s 占位符的原生 SQL
+        rows: 参数元组的可迭代对象（可为生成器，按批次消费）
+        chunk_size: 每批行数
+
+    Returns:
+        List[int]: 每批影响的行数
+    """
+    connection = session.connection()
+    chunk_rowcounts = []
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            chunk_rowcounts.append(connection.exec_driver_sql(sql, chunk).rowcount)
+            chunk = []
+    if chunk:
+        chunk_rowcounts.append(connection.exec_driver_sql(sql, chunk).rowcount)
+    return chunk_rowcounts
+
+
 def get_pool_status():
     """获取连接池状态（用于监控）"""
     engine = get_engine()
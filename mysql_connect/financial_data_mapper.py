@@ -71,6 +71,10 @@ class FinancialDataMapper(CommonMapper):
         result = self.select_base_entity(columns='*', condition=condition)
         return result
 
+    def select_frame_by_ts_code(self, ts_code, columns='*'):
+        """根据股票代码查询全部报告期，直接返回 DataFrame"""
+        return self.select_frame(columns=columns, condition='ts_code = %s', params=(ts_code,))
+
     def select_by_ts_and_dates(self, ts_code, start_date, end_date):
         condition = (
             f"ts_code = '{ts_code}' AND "
@@ -80,6 +84,11 @@ class FinancialDataMapper(CommonMapper):
         results = self.select_base_entity(columns='*', condition=condition)
         return results
 
+    def select_max_end_date_by_code(self):
+        """各股票的最大报告期 {ts_code: end_date}（一次 GROUP BY 查询，用于初始化同步水位线）"""
+        rows = self.execute_sql(f"SELECT ts_code, MAX(end_date) FROM `{self.table_name}` GROUP BY ts_code")
+        return {ts_code: end_date for ts_code, end_date in rows or []}
+
     def get_max_end_date(self, ts_code):
         # 构建 SQL 查询以获取最大公告日期
         query = f"ts_code = '{ts_code}'"
@@ -26,6 +26,10 @@ class FundDataMapper(CommonMapper):
         market_data = self.select_base_entity(columns='*', condition=condition)
         return market_data
 
+    def select_frame_by_ts_code(self, ts_code):
+        """根据基金代码查询全部行情，直接返回 DataFrame"""
+        return self.select_frame(condition='ts_code = %s', params=(ts_code,))
+
     def select_by_code_and_trade_round(self, ts_code, start_date, end_date):
 
         condition = f'ts_code = \'{ts_code}\' and trade_date >= \'{start_date}\' and trade_date <= \'{end_date}\''
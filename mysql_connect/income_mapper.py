@@ -78,6 +78,11 @@ class IncomeMapper(CommonMapper):
         results = self.select_base_entity(columns='*', condition=condition)
         return results
 
+    def select_max_end_date_by_code(self):
+        """各股票的最大报告期 {ts_code: end_date}（一次 GROUP BY 查询，用于初始化同步水位线）"""
+        rows = self.execute_sql(f"SELECT ts_code, MAX(end_date) FROM `{self.table_name}` GROUP BY ts_code")
+        return {ts_code: end_date for ts_code, end_date in rows or []}
+
     def get_max_end_date(self, ts_code):
         # 构建 SQL 查询以获取最大公告日期
         query = f"ts_code = '{ts_code}'"
@@ -1,8 +1,13 @@
+import pandas as pd
+
 from entity import constant
 from mysql_connect.common_mapper import CommonMapper
 
 
 class SixtyIndexMapper(CommonMapper):
+    # 由类型化指标列渲染 deviation_rate/cross_signals/percentile_ranks JSON 的兼容视图（sql/ts_stock_data_typed.sql）
+    JSON_VIEW_NAME = 'v_ts_stock_data_json'
+
     def __init__(self):
         super().__init__('ts_stock_data')
         self.table_name = 'ts_stock_data'
@@ -30,12 +35,41 @@ class SixtyIndexMapper(CommonMapper):
         sixty_index = self.select_base_entity(columns='MAX(trade_date)', condition=query)
         return sixty_index[0][0]
 
+    def select_max_trade_date_by_code(self):
+        """各指数的最大交易日 {ts_code: trade_date}（一次 GROUP BY 查询，用于初始化同步水位线）"""
+        rows = self.execute_sql(f"SELECT ts_code, MAX(trade_date) FROM `{self.table_name}` GROUP BY ts_code")
+        return {ts_code: trade_date for ts_code, trade_date in rows or []}
+
+    def get_max_trade_time_before(self, ts_code, trade_date):
+        # 获取指定日期之前（不含）的最大交易时间
+        query = f" ts_code = \'{ts_code}\' and trade_date < \'{trade_date}\'"
+        sixty_index = self.select_base_entity(columns='MAX(trade_date)', condition=query)
+        return sixty_index[0][0]
+
     def select_by_code_and_trade_round(self, ts_code, start_date, end_date):
 
         condition = f'ts_code = \'{ts_code}\' and trade_date >= \'{start_date}\' and trade_date <= \'{end_date}\''
         sixty_index = self.select_base_entity(columns='*', condition=condition)
         return sixty_index
 
+    def select_frame_by_code_and_trade_round(self, ts_code, start_date, end_date, columns='*'):
+        """根据指数代码和交易日期范围查询，直接返回 DataFrame"""
+        condition = 'ts_code = %s and trade_date >= %s and trade_date <= %s ORDER BY trade_date'
+        return self.select_frame(columns=columns, condition=condition, params=(ts_code, start_date, end_date))
+
+    def select_json_view_frame_by_code_and_trade_round(self, ts_code, start_date, end_date):
+        """从兼容视图按区间查询，直接返回 DataFrame"""
+        condition = 'ts_code = %s and trade_date >= %s and trade_date <= %s ORDER BY trade_date'
+        return CommonMapper(self.JSON_VIEW_NAME).select_frame(condition=condition,
+                                                              params=(ts_code, start_date, end_date))
+
+    def select_json_view_by_code_and_trade_round(self, ts_code, start_date, end_date):
+        """
+        从兼容视图按区间查询（列与 ts_stock_data 一致，JSON 列由类型化列渲染）
+        """
+        condition = f'ts_code = \'{ts_code}\' and trade_date >= \'{start_date}\' and trade_date <= \'{end_date}\''
+        return self.execute_sql(f"SELECT * FROM `{self.JSON_VIEW_NAME}` WHERE {condition}")
+
     def update_by_ts_code_and_trade_date(self, base_entity, columns):
         self.update_base_entity(base_entity, columns, ['ts_code', 'trade_date'])
 
@@ -63,5 +97,20 @@ class SixtyIndexMapper(CommonMapper):
             stock_data_list: StockData 对象列表
             columns: 要更新的列名列表
         """
-        for stock_data in stock_data_list:
-            self.update_by_ts_code_and_trade_date(stock_data, columns)
\ No newline at end of file
+        if not stock_data_list:
+            return 0
+        df = pd.DataFrame([stock_data.to_dict() for stock_data in stock_data_list])
+        return self.update_frame_by_ts_code_and_trade_date(df, columns)
+
+    def update_frame_by_ts_code_and_trade_date(self, df: pd.DataFrame, columns: list) -> int:
+        """
+        按 (ts_code, trade_date) 批量更新指定列（临时表 + UPDATE JOIN，一次往返批次）
+
+        Args:
+            df: 包含 ts_code、trade_date 和待更新列的 DataFrame
+            columns: 要更新的列名列表
+
+        Returns:
+            int: 影响的行数
+        """
+        return self.update_dataframe(df, ['ts_code', 'trade_date'], columns)
\ No newline at end of file
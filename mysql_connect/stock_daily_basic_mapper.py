@@ -55,6 +55,34 @@ class StockDailyBasicMapper(CommonMapper):
         if duplicate_count > 0:
             print(f'内存去重跳过 {duplicate_count} 条重复数据')
 
+    def upsert_stock_daily_basic_frame(self, df, batch_size=1000):
+        """
+        直接将 daily_basic DataFrame 批量 UPSERT（不经过 StockDailyBasic 实体）
+
+        Args:
+            df: 列名与 stock_daily_basic 表字段一致的 DataFrame
+            batch_size: 每批行数
+
+        Returns:
+            int: 影响的行数
+        """
+        if df is None or df.empty:
+            return 0
+
+        # 内存去重
+        unique_df = df.drop_duplicates(subset=['ts_code', 'trade_date'], keep='first')
+        duplicate_count = len(df) - len(unique_df)
+
+        chunk_rowcounts = self.upsert_dataframe(unique_df, chunk_size=batch_size)
+        for idx, count in enumerate(chunk_rowcounts):
+            print(f'  第 {idx} 批 UPSERT 影响 {count} 行')
+        print(f'处理 {len(unique_df)} 条股票每日基本面数据，共影响 {sum(chunk_rowcounts)} 行')
+
+        if duplicate_count > 0:
+            print(f'内存去重跳过 {duplicate_count} 条重复数据')
+
+        return sum(chunk_rowcounts)
+
     def delete_all(self):
         """全量删除所有数据"""
         self.delete_by_condition('1=1')
@@ -85,12 +113,37 @@ class StockDailyBasicMapper(CommonMapper):
         stock_data = self.select_base_entity(columns='*', condition=condition)
         return stock_data
 
+    def select_by_trade_date_range_and_ts_code(self, start_date, end_date, ts_code_list, columns='*'):
+        """根据交易日期范围和股票代码列表查询（一次查询覆盖整个区间）"""
+        placeholders = ', '.join(f'\'{code}\'' for code in ts_code_list)
+        condition = (f'trade_date >= \'{start_date}\' and trade_date <= \'{end_date}\' '
+                     f'and ts_code IN ({placeholders}) ORDER BY trade_date, ts_code')
+        return self.select_base_entity(columns=columns, condition=condition)
+
+    def select_frame_by_trade_date_range_and_ts_code(self, start_date, end_date, ts_code_list,
+                                                     columns='*', dtypes=None):
+        """根据交易日期范围和股票代码列表查询，直接返回 DataFrame"""
+        condition = ('trade_date >= %s and trade_date <= %s and ts_code IN %s '
+                     'ORDER BY trade_date, ts_code')
+        return self.select_frame(columns=columns, condition=condition,
+                                 params=(start_date, end_date, tuple(ts_code_list)), dtypes=dtypes)
+
     def select_max_trade_date(self, ts_code):
         """根据股票代码和交易日期查询"""
         condition = f'ts_code = \'{ts_code}\''
         stock_data = self.select_base_entity(columns='MAX(trade_date)', condition=condition)
         return stock_data[0][0]
 
+    def select_max_trade_date_by_code(self):
+        """各股票的最大交易日 {ts_code: trade_date}（一次 GROUP BY 查询，用于初始化同步水位线）"""
+        rows = self.execute_sql(f"SELECT ts_code, MAX(trade_date) FROM `{self.table_name}` GROUP BY ts_code")
+        return {ts_code: trade_date for ts_code, trade_date in rows or []}
+
+    def select_global_max_trade_date(self):
+        """全表最大交易日（按交易日截面同步的全局水位线）"""
+        stock_data = self.select_base_entity(columns='MAX(trade_date)', condition=None)
+        return stock_data[0][0] if stock_data else None
+
     def select_by_ts_code(self, ts_code=''):
         """根据股票代码查询"""
         condition = f'ts_code = \'{ts_code}\''
@@ -69,6 +69,11 @@ class StockWeightMapper(CommonMapper):
         sixty_index = self.select_base_entity(columns='*', condition=condition)
         return sixty_index
 
+    def select_max_trade_date_by_code(self):
+        """各指数的权重最大交易日 {index_code: trade_date}（一次 GROUP BY 查询，用于初始化同步水位线）"""
+        rows = self.execute_sql(f"SELECT index_code, MAX(trade_date) FROM `{self.table_name}` GROUP BY index_code")
+        return {index_code: trade_date for index_code, trade_date in rows or []}
+
     def get_max_trade_time(self, index_code):
         # 构建 SQL 查询以获取最大交易时间
         query = f" index_code = \'{index_code}\';"
@@ -76,6 +81,26 @@ class StockWeightMapper(CommonMapper):
         sixty_index = self.select_base_entity(columns='MAX(trade_date)', condition=query)
         return sixty_index[0][0]
 
+    def select_weights_asof_range(self, index_code, start_date, end_date):
+        """
+        查询区间内生效的全部权重：start_date 当天生效的一期（最近一次调仓）到 end_date 之间的各期
+
+        Returns:
+            list: (con_code, trade_date, weight) 行
+        """
+        sql = f"""
+            SELECT con_code, trade_date, weight
+            FROM stock_weight
+            WHERE index_code = '{index_code}'
+              AND trade_date <= '{end_date}'
+              AND trade_date >= COALESCE(
+                (SELECT MAX(trade_date) FROM stock_weight
+                 WHERE index_code = '{index_code}' AND trade_date <= '{start_date}'),
+                '{start_date}')
+            ORDER BY trade_date, con_code;
+            """
+        return self.execute_sql(sql)
+
     def get_exist_con_code(self, index_code, start_date, end_date):
         """
         根据最新的权重获取在这个区间内均存在的股票
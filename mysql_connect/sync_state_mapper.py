@@ -0,0 +1,155 @@
+"""
+同步水位线 Mapper
+
+按 (dataset, ts_code) 记录每个同步数据集已提交的最大日期、最近成功时间和最近失败信息，
+替代每次同步前逐个代码 MAX(trade_date) / MAX(end_date) 查询：
+- 同步开始时一次查询读取数据集全部代码的水位线
+- 每提交一批数据就推进对应代码的水位线，中断后下次从断点继续
+- 数据集首次使用时由数据表的 GROUP BY 最大日期（一次查询）初始化
+
+表结构见 sql/sync_state.sql，首次使用时自动创建。
+"""
+import threading
+from datetime import date
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import text
+
+from mysql_connect.common_mapper import CommonMapper
+from mysql_connect.db import execute_many_tuples, get_session
+
+# 全市场截面同步（按交易日）使用的代码
+ALL_CODES = '*'
+
+
+def to_watermark(value) -> Optional[str]:
+    """日期 / 日期字符串统一为 YYYYMMDD 水位线"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, date):
+        return value.strftime('%Y%m%d')
+    return str(value).replace('-', '')[:8]
+
+
+class SyncStateMapper(CommonMapper):
+    """同步水位线表 sync_state 的读写"""
+
+    TABLE_DDL = """
+        CREATE TABLE IF NOT EXISTS `sync_state` (
+          `id` bigint(20) NOT NULL AUTO_INCREMENT COMMENT '自增主键',
+          `dataset` varchar(50) NOT NULL COMMENT '数据集（如 financial_data）',
+          `ts_code` varchar(20) NOT NULL COMMENT '代码（全市场截面水位线为 *）',
+          `watermark` varchar(8) DEFAULT NULL COMMENT '已提交的最大日期 YYYYMMDD',
+          `last_success_at` datetime DEFAULT NULL COMMENT '最近一次成功推进水位线的时间',
+          `last_error` varchar(1000) DEFAULT NULL COMMENT '最近一次失败信息（成功后清空）',
+          `last_error_at` datetime DEFAULT NULL COMMENT '最近一次失败时间',
+          `updated_at` datetime DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+          PRIMARY KEY (`id`),
+          UNIQUE KEY `uk_dataset_ts_code` (`dataset`,`ts_code`)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='同步水位线表'
+    """
+
+    # 进程内只建表一次
+    _table_ready = False
+    _table_lock = threading.Lock()
+
+    def __init__(self):
+        super().__init__('sync_state')
+        self.table_name = 'sync_state'
+
+    def ensure_table(self):
+        """表不存在时创建"""
+        with SyncStateMapper._table_lock:
+            if SyncStateMapper._table_ready:
+                return
+            with get_session() as session:
+                session.execute(text(self.TABLE_DDL))
+            SyncStateMapper._table_ready = True
+
+    def select_watermarks(self, dataset: str) -> Dict[str, str]:
+        """一次查询读取数据集全部代码的水位线 {ts_code: YYYYMMDD}"""
+        self.ensure_table()
+        with get_session() as session:
+            rows = session.execute(
+                text("SELECT ts_code, watermark FROM `sync_state` WHERE dataset = :dataset"),
+                {'dataset': dataset}
+            ).fetchall()
+        return {ts_code: watermark for ts_code, watermark in rows if watermark}
+
+    def load_watermarks(self, dataset: str,
+                        seed: Optional[Callable[[], Dict[str, object]]] = None) -> Dict[str, str]:
+        """
+        读取数据集水位线；数据集尚无记录时用 seed 初始化并写入
+
+        Args:
+            dataset: 数据集名称
+            seed: 返回 {代码: 最大日期} 的函数（通常是数据表的一次 GROUP BY 查询）
+
+        Returns:
+            Dict[str, str]: {ts_code: YYYYMMDD}
+        """
+        watermarks = self.select_watermarks(dataset)
+        if watermarks or seed is None:
+            return watermarks
+
+        watermarks = {ts_code: to_watermark(value) for ts_code, value in seed().items()}
+        watermarks = {ts_code: value for ts_code, value in watermarks.items() if value}
+        if watermarks:
+            rows = [{'dataset': dataset, 'ts_code': ts_code, 'watermark': value}
+                    for ts_code, value in watermarks.items()]
+            self.bulk_upsert(['dataset', 'ts_code', 'watermark'], rows, update_columns=['watermark'])
+            print(f"同步水位线 {dataset} 由数据表初始化，共 {len(watermarks)} 个代码")
+        return watermarks
+
+    def load_watermark(self, dataset: str, ts_code: str = ALL_CODES,
+                       seed: Optional[Callable[[], object]] = None) -> Optional[str]:
+        """读取单个代码的水位线（如全市场截面水位线）；无记录时用 seed 的返回值初始化"""
+        watermarks = self.load_watermarks(
+            dataset, (lambda: {ts_code: seed()}) if seed is not None else None)
+        return watermarks.get(ts_code)
+
+    def advance(self, dataset: str, ts_code: str, watermark):
+        """
+        一批数据提交后推进水位线（只前进不后退），同时记录成功时间并清空失败信息
+
+        Args:
+            dataset: 数据集名称
+            ts_code: 代码
+            watermark: 本批已提交的最大日期
+        """
+        self.advance_many(dataset, {ts_code: watermark})
+
+    def advance_many(self, dataset: str, watermarks: Dict[str, object]):
+        """批量推进多个代码的水位线（如一个交易日截面涉及的全部股票），一次 executemany"""
+        rows = [(dataset, ts_code, to_watermark(value)) for ts_code, value in watermarks.items()]
+        rows = [row for row in rows if row[2] is not None]
+        if not rows:
+            return
+        self.ensure_table()
+        with get_session() as session:
+            execute_many_tuples(session, """
+                INSERT INTO `sync_state` (dataset, ts_code, watermark, last_success_at, last_error)
+                VALUES (%s, %s, %s, NOW(), NULL)
+                ON DUPLICATE KEY UPDATE
+                    watermark = GREATEST(COALESCE(watermark, ''), VALUES(watermark)),
+                    last_success_at = NOW(),
+                    last_error = NULL
+            """, rows)
+
+    def record_error(self, dataset: str, ts_code: str, error):
+        """记录失败信息（水位线不变）"""
+        self.ensure_table()
+        with get_session() as session:
+            session.execute(text("""
+                INSERT INTO `sync_state` (dataset, ts_code, last_error, last_error_at)
+                VALUES (:dataset, :ts_code, :error, NOW())
+                ON DUPLICATE KEY UPDATE last_error = VALUES(last_error), last_error_at = NOW()
+            """), {'dataset': dataset, 'ts_code': ts_code, 'error': str(error)[:1000]})
+
+    def reset(self, dataset: str, ts_code: Optional[str] = None):
+        """删除水位线（整个数据集删除后，下次同步重新由数据表初始化）"""
+        self.ensure_table()
+        condition = f"dataset = '{dataset}'"
+        if ts_code is not None:
+            condition += f" AND ts_code = '{ts_code}'"
+        self.delete_by_condition(condition)
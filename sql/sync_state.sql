@@ -0,0 +1,12 @@
+CREATE TABLE IF NOT EXISTS `sync_state` (
+  `id` bigint(20) NOT NULL AUTO_INCREMENT COMMENT '自增主键',
+  `dataset` varchar(50) NOT NULL COMMENT '数据集（如 financial_data）',
+  `ts_code` varchar(20) NOT NULL COMMENT '代码（全市场截面水位线为 *）',
+  `watermark` varchar(8) DEFAULT NULL COMMENT '已提交的最大日期 YYYYMMDD',
+  `last_success_at` datetime DEFAULT NULL COMMENT '最近一次成功推进水位线的时间',
+  `last_error` varchar(1000) DEFAULT NULL COMMENT '最近一次失败信息（成功后清空）',
+  `last_error_at` datetime DEFAULT NULL COMMENT '最近一次失败时间',
+  `updated_at` datetime DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `uk_dataset_ts_code` (`dataset`,`ts_code`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='同步水位线表';
@@ -51,6 +51,25 @@ CREATE TABLE `ts_stock_data` (
   `vol_ma_10` double(255,4) DEFAULT NULL COMMENT '10日成交量均线',
   `cross_signals` TEXT DEFAULT NULL COMMENT '交叉信号JSON（均线金叉死叉、MACD信号、MACD柱状图趋势）',
   `percentile_ranks` TEXT DEFAULT NULL COMMENT '历史百分位JSON（偏离率、成交量、MACD等指标的5年百分位）',
+  `deviation_ma_5` double DEFAULT NULL COMMENT '收盘价相对ma_5偏离率',
+  `deviation_ma_10` double DEFAULT NULL COMMENT '收盘价相对ma_10偏离率',
+  `deviation_ma_20` double DEFAULT NULL COMMENT '收盘价相对ma_20偏离率',
+  `deviation_ma_50` double DEFAULT NULL COMMENT '收盘价相对ma_50偏离率',
+  `signal_ma_5_10` varchar(16) DEFAULT NULL COMMENT 'MA5/MA10交叉(golden_cross/death_cross)',
+  `signal_ma_10_20` varchar(16) DEFAULT NULL COMMENT 'MA10/MA20交叉(golden_cross/death_cross)',
+  `signal_macd` varchar(16) DEFAULT NULL COMMENT 'MACD交叉(golden_cross/death_cross)',
+  `signal_macd_hist_trend` varchar(16) DEFAULT NULL COMMENT 'MACD柱状图趋势(red_longer/red_shorter/green_longer/green_shorter)',
+  `pctl_amount` double DEFAULT NULL COMMENT 'amount历史百分位',
+  `pctl_vol` double DEFAULT NULL COMMENT 'vol历史百分位',
+  `pctl_macd` double DEFAULT NULL COMMENT 'macd历史百分位',
+  `pctl_macd_histogram` double DEFAULT NULL COMMENT 'macd_histogram历史百分位',
+  `pctl_rsi` double DEFAULT NULL COMMENT 'rsi历史百分位',
+  `pctl_pe_ttm` double DEFAULT NULL COMMENT 'pe_ttm历史百分位',
+  `pctl_pb` double DEFAULT NULL COMMENT 'pb历史百分位',
+  `pctl_deviation_ma_5` double DEFAULT NULL COMMENT 'deviation_ma_5历史百分位',
+  `pctl_deviation_ma_10` double DEFAULT NULL COMMENT 'deviation_ma_10历史百分位',
+  `pctl_deviation_ma_20` double DEFAULT NULL COMMENT 'deviation_ma_20历史百分位',
+  `pctl_deviation_ma_50` double DEFAULT NULL COMMENT 'deviation_ma_50历史百分位',
   PRIMARY KEY (`id`),
   UNIQUE KEY `idx_ts_code_trade_date` (`ts_code`, `trade_date`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -66,4 +85,5 @@ CREATE TABLE `ts_stock_data` (
 -- ALTER TABLE ts_stock_data ADD COLUMN minus_di double(255,4) DEFAULT NULL COMMENT '-DI负向动向指标';
 -- ALTER TABLE ts_stock_data ADD COLUMN cci double(255,4) DEFAULT NULL COMMENT 'CCI(20)商品通道指数';
 -- ALTER TABLE ts_stock_data ADD COLUMN vol_ma_5 double(255,4) DEFAULT NULL COMMENT '5日成交量均线';
--- ALTER TABLE ts_stock_data ADD COLUMN vol_ma_10 double(255,4) DEFAULT NULL COMMENT '10日成交量均线';
\ No newline at end of file
+-- ALTER TABLE ts_stock_data ADD COLUMN vol_ma_10 double(255,4) DEFAULT NULL COMMENT '10日成交量均线';
+-- 类型化指标列（deviation_ma_N / signal_* / pctl_*）、JSON 回填及兼容视图 v_ts_stock_data_json 见 ts_stock_data_typed.sql
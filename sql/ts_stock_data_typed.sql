@@ -0,0 +1,109 @@
+-- ts_stock_data 类型化指标列迁移
+--
+-- deviation_rate / cross_signals / percentile_ranks 三个 JSON 文本列拆分为类型化列，
+-- 读取方按列读取，不再逐行解析 JSON（命名规则见 analysis/indicator_columns.py）：
+--   deviation_rate   -> deviation_ma_N       (double)
+--   cross_signals    -> signal_<键>          (varchar 枚举)
+--   percentile_ranks -> pctl_<指标>          (double)
+-- 同步程序同时写入 JSON 列和类型化列；v_ts_stock_data_json 视图由类型化列渲染 JSON，
+-- 供 MCP 工具和报告等仍按 JSON 读取的调用方使用。
+
+-- 1. 新增列
+ALTER TABLE ts_stock_data
+  ADD COLUMN `deviation_ma_5` double DEFAULT NULL COMMENT '收盘价相对ma_5偏离率',
+  ADD COLUMN `deviation_ma_10` double DEFAULT NULL COMMENT '收盘价相对ma_10偏离率',
+  ADD COLUMN `deviation_ma_20` double DEFAULT NULL COMMENT '收盘价相对ma_20偏离率',
+  ADD COLUMN `deviation_ma_50` double DEFAULT NULL COMMENT '收盘价相对ma_50偏离率',
+  ADD COLUMN `signal_ma_5_10` varchar(16) DEFAULT NULL COMMENT 'MA5/MA10交叉(golden_cross/death_cross)',
+  ADD COLUMN `signal_ma_10_20` varchar(16) DEFAULT NULL COMMENT 'MA10/MA20交叉(golden_cross/death_cross)',
+  ADD COLUMN `signal_macd` varchar(16) DEFAULT NULL COMMENT 'MACD交叉(golden_cross/death_cross)',
+  ADD COLUMN `signal_macd_hist_trend` varchar(16) DEFAULT NULL COMMENT 'MACD柱状图趋势(red_longer/red_shorter/green_longer/green_shorter)',
+  ADD COLUMN `pctl_amount` double DEFAULT NULL COMMENT 'amount历史百分位',
+  ADD COLUMN `pctl_vol` double DEFAULT NULL COMMENT 'vol历史百分位',
+  ADD COLUMN `pctl_macd` double DEFAULT NULL COMMENT 'macd历史百分位',
+  ADD COLUMN `pctl_macd_histogram` double DEFAULT NULL COMMENT 'macd_histogram历史百分位',
+  ADD COLUMN `pctl_rsi` double DEFAULT NULL COMMENT 'rsi历史百分位',
+  ADD COLUMN `pctl_pe_ttm` double DEFAULT NULL COMMENT 'pe_ttm历史百分位',
+  ADD COLUMN `pctl_pb` double DEFAULT NULL COMMENT 'pb历史百分位',
+  ADD COLUMN `pctl_deviation_ma_5` double DEFAULT NULL COMMENT 'deviation_ma_5历史百分位',
+  ADD COLUMN `pctl_deviation_ma_10` double DEFAULT NULL COMMENT 'deviation_ma_10历史百分位',
+  ADD COLUMN `pctl_deviation_ma_20` double DEFAULT NULL COMMENT 'deviation_ma_20历史百分位',
+  ADD COLUMN `pctl_deviation_ma_50` double DEFAULT NULL COMMENT 'deviation_ma_50历史百分位';
+
+-- 2. 由已有 JSON 回填（JSON null 转为 SQL NULL）
+UPDATE ts_stock_data SET
+  `deviation_ma_5` = NULLIF(JSON_UNQUOTE(JSON_EXTRACT(deviation_rate, '$.ma_5')), 'null'),
+  `deviation_ma_10` = NULLIF(JSON_UNQUOTE(JSON_EXTRACT(deviation_rate, '$.ma_10')), 'null'),
+  `deviation_ma_20` = NULLIF(JSON_UNQUOTE(JSON_EXTRACT(deviation_rate, '$.ma_20')), 'null'),
+  `deviation_ma_50` = NULLIF(JSON_UNQUOTE(JSON_EXTRACT(deviation_rate, '$.ma_50')), 'null'),
+  `signal_ma_5_10` = NULLIF(JSON_UNQUOTE(JSON_EXTRACT(cross_signals, '$.ma_5_10')), 'null'),
+  `signal_ma_10_20` = NULLIF(JSON_UNQUOTE(JSON_EXTRACT(cross_signals, '$.ma_10_20')), 'null'),
+  `signal_macd` = NULLIF(JSON_UNQUOTE(JSON_EXTRACT(cross_signals, '$.macd')), 'null'),
+  `signal_macd_hist_trend` = NULLIF(JSON_UNQUOTE(JSON_EXTRACT(cross_signals, '$.macd_hist_trend')), 'null'),
+  `pctl_amount` = NULLIF(JSON_UNQUOTE(JSON_EXTRACT(percentile_ranks, '$.amount')), 'null'),
+  `pctl_vol` = NULLIF(JSON_UNQUOTE(JSON_EXTRACT(percentile_ranks, '$.vol')), 'null'),
+  `pctl_macd` = NULLIF(JSON_UNQUOTE(JSON_EXTRACT(percentile_ranks, '$.macd')), 'null'),
+  `pctl_macd_histogram` = NULLIF(JSON_UNQUOTE(JSON_EXTRACT(percentile_ranks, '$.macd_histogram')), 'null'),
+  `pctl_rsi` = NULLIF(JSON_UNQUOTE(JSON_EXTRACT(percentile_ranks, '$.rsi')), 'null'),
+  `pctl_pe_ttm` = NULLIF(JSON_UNQUOTE(JSON_EXTRACT(percentile_ranks, '$.pe_ttm')), 'null'),
+  `pctl_pb` = NULLIF(JSON_UNQUOTE(JSON_EXTRACT(percentile_ranks, '$.pb')), 'null'),
+  `pctl_deviation_ma_5` = NULLIF(JSON_UNQUOTE(JSON_EXTRACT(percentile_ranks, '$.deviation_ma_5')), 'null'),
+  `pctl_deviation_ma_10` = NULLIF(JSON_UNQUOTE(JSON_EXTRACT(percentile_ranks, '$.deviation_ma_10')), 'null'),
+  `pctl_deviation_ma_20` = NULLIF(JSON_UNQUOTE(JSON_EXTRACT(percentile_ranks, '$.deviation_ma_20')), 'null'),
+  `pctl_deviation_ma_50` = NULLIF(JSON_UNQUOTE(JSON_EXTRACT(percentile_ranks, '$.deviation_ma_50')), 'null')
+WHERE deviation_rate IS NOT NULL OR cross_signals IS NOT NULL OR percentile_ranks IS NOT NULL;
+
+-- 3. 兼容视图：列与 ts_stock_data 一致，三个 JSON 列由类型化列渲染；
+--    某行类型化列全部为 NULL（未回填，或原 JSON 为 {} / NULL）时返回存储的 JSON 列
+CREATE OR REPLACE VIEW v_ts_stock_data_json AS
+SELECT
+  t.`id`, t.`ts_code`, t.`trade_date`, t.`close`, t.`open`, t.`high`,
+  t.`low`, t.`pre_close`, t.`change`, t.`pct_chg`, t.`vol`, t.`amount`,
+  t.`average_date`, t.`average_amount`, t.`name`, t.`pe_weight`, t.`pe_ttm_weight`, t.`pb_weight`,
+  t.`pe`, t.`pb`, t.`pe_ttm`, t.`pe_profit_dedt`, t.`pe_profit_dedt_ttm`, t.`ma_5`,
+  t.`ma_10`, t.`ma_20`, t.`ma_50`, t.`wma_5`, t.`wma_10`, t.`wma_20`,
+  t.`wma_50`, t.`macd`, t.`macd_signal_line`, t.`macd_histogram`, t.`rsi`, t.`kdj_k`,
+  t.`kdj_d`, t.`kdj_j`, t.`bb_high`, t.`bb_mid`, t.`bb_low`, t.`obv`,
+  t.`atr`, t.`adx`, t.`plus_di`, t.`minus_di`, t.`cci`, t.`vol_ma_5`,
+  t.`vol_ma_10`,
+  CASE
+    WHEN t.`deviation_ma_5` IS NULL AND t.`deviation_ma_10` IS NULL AND
+      t.`deviation_ma_20` IS NULL AND t.`deviation_ma_50` IS NULL THEN t.`deviation_rate`
+    ELSE JSON_OBJECT(
+      'ma_5', t.`deviation_ma_5`,
+      'ma_10', t.`deviation_ma_10`,
+      'ma_20', t.`deviation_ma_20`,
+      'ma_50', t.`deviation_ma_50`
+    )
+  END AS `deviation_rate`,
+  CASE
+    WHEN t.`signal_ma_5_10` IS NULL AND t.`signal_ma_10_20` IS NULL AND t.`signal_macd` IS NULL AND
+      t.`signal_macd_hist_trend` IS NULL THEN t.`cross_signals`
+    ELSE JSON_OBJECT(
+      'ma_5_10', t.`signal_ma_5_10`,
+      'ma_10_20', t.`signal_ma_10_20`,
+      'macd', t.`signal_macd`,
+      'macd_hist_trend', t.`signal_macd_hist_trend`
+    )
+  END AS `cross_signals`,
+  CASE
+    WHEN t.`pctl_amount` IS NULL AND t.`pctl_vol` IS NULL AND t.`pctl_macd` IS NULL AND
+      t.`pctl_macd_histogram` IS NULL AND t.`pctl_rsi` IS NULL AND t.`pctl_pe_ttm` IS NULL AND
+      t.`pctl_pb` IS NULL AND t.`pctl_deviation_ma_5` IS NULL AND
+      t.`pctl_deviation_ma_10` IS NULL AND t.`pctl_deviation_ma_20` IS NULL AND
+      t.`pctl_deviation_ma_50` IS NULL THEN t.`percentile_ranks`
+    ELSE JSON_OBJECT(
+      'amount', t.`pctl_amount`,
+      'vol', t.`pctl_vol`,
+      'macd', t.`pctl_macd`,
+      'macd_histogram', t.`pctl_macd_histogram`,
+      'rsi', t.`pctl_rsi`,
+      'pe_ttm', t.`pctl_pe_ttm`,
+      'pb', t.`pctl_pb`,
+      'deviation_ma_5', t.`pctl_deviation_ma_5`,
+      'deviation_ma_10', t.`pctl_deviation_ma_10`,
+      'deviation_ma_20', t.`pctl_deviation_ma_20`,
+      'deviation_ma_50', t.`pctl_deviation_ma_50`
+    )
+  END AS `percentile_ranks`
+FROM ts_stock_data t;
@@ -7,7 +7,6 @@ from entity.fund_data import FundData
 from mysql_connect.fund_data_mapper import FundDataMapper
 from mysql_connect.fund_mapper import FundMapper
 from tu_share_factory.tu_share_factory import TuShareFactory
-from util.class_util import ClassUtil
 from util.date_util import TimeUtils
 
 FUND_DATA_FIELDS = [
@@ -53,13 +52,7 @@ def cal_average(ts_code):
     Args:
         ts_code: 基金代码
     """
-    data = fund_data_mapper.select_by_ts_code(ts_code)
-    data_frame_list = []
-    for row in data:
-        stock_data = ClassUtil.create_entities_from_data(FundData, row)
-        data_frame_list.append(stock_data.to_dict())
-
-    ds = pd.DataFrame(data_frame_list)
+    ds = fund_data_mapper.select_frame_by_ts_code(ts_code)
     if ds.empty:
         return
     
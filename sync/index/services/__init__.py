@@ -4,9 +4,13 @@
 包含：
 - IndexDataFetcher: 指数数据获取服务
 - ValuationCalculator: PE/PB 估值计算服务
+- PercentileStateStore: 历史百分位增量状态服务
+- WeightAsOfIndex: 成分股权重 as-of 索引
 """
 
 from sync.index.services.index_data_fetcher import IndexDataFetcher
 from sync.index.services.valuation_calculator import ValuationCalculator
+from sync.index.services.percentile_state_store import PercentileStateStore
+from sync.index.services.weight_asof_index import WeightAsOfIndex
 
-__all__ = ['IndexDataFetcher', 'ValuationCalculator']
+__all__ = ['IndexDataFetcher', 'ValuationCalculator', 'PercentileStateStore', 'WeightAsOfIndex']
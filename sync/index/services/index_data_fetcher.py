@@ -4,7 +4,6 @@
 从 Tushare API 批量获取指数行情数据
 """
 
-import time
 from typing import List, Optional
 
 import pandas as pd
@@ -20,7 +19,7 @@ class IndexDataFetcher:
     职责：
     - 从 Tushare API 批量获取指数行情数据
     - 获取交易日历过滤非交易日
-    - 处理 API 限流
+    - API 限流与重试由共享的 TushareClient 处理
     """
     
     INDEX_FIELDS = [
@@ -32,21 +31,19 @@ class IndexDataFetcher:
         "exchange", "cal_date", "is_open", "pretrade_date"
     ]
     
-    def __init__(self, api_sleep: float = 0.3, lookback_days: int = 100):
+    def __init__(self, lookback_days: int = 100):
         """
         初始化数据获取服务
         
         Args:
-            api_sleep: API 调用间隔时间（秒），用于限流
             lookback_days: 获取历史数据的回溯天数（用于计算技术指标）
         """
-        self.api_sleep = api_sleep
         self.lookback_days = lookback_days
         self._pro = None
     
     @property
     def pro(self):
-        """懒加载 Tushare API 客户端"""
+        """懒加载 Tushare API 客户端（进程内共享，限流）"""
         if self._pro is None:
             self._pro = TuShareFactory.build_api_client()
         return self._pro
@@ -73,8 +70,6 @@ class IndexDataFetcher:
         else:
             fetch_start_date = start_date
         
-        time.sleep(self.api_sleep)
-        
         try:
             daily_df = self.pro.index_daily(
                 ts_code=ts_code,
@@ -107,8 +102,6 @@ class IndexDataFetcher:
         Returns:
             List[str]: 交易日列表
         """
-        time.sleep(self.api_sleep)
-        
         try:
             trade_cal = self.pro.trade_cal(
                 exchange=exchange,
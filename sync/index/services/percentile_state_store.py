@@ -0,0 +1,146 @@
+"""
+历史百分位增量状态服务
+
+按 (ts_code, 指标) 持久化 5 年滚动窗口状态，每日同步只需追加新行即可得到
+与全量历史计算一致的百分位，避免只在 ~100 天回溯窗口内计算百分位。
+"""
+
+import json
+import os
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+from analysis.indicator_columns import typed_columns
+from analysis.percentile_calculator import PercentileCalculator, RollingPercentileWindow
+from mysql_connect.sixty_index_mapper import SixtyIndexMapper
+from util.config_loader import get_cache_dir
+from util.date_util import TimeUtils
+
+
+class PercentileStateStore:
+    """
+    百分位滚动窗口状态存储
+
+    每个指数一个 JSON 文件:
+        {"ts_code": ..., "last_trade_date": "YYYYMMDD", "window": 1250,
+         "indicators": {"amount": [...], "deviation_ma_5": [...], ...}}
+
+    职责：
+    - 读取/保存持久化状态
+    - 状态缺失或与数据库不衔接时，从 ts_stock_data 历史重建
+    """
+
+    # 从数据库重建状态时的额外回溯天数（覆盖节假日）
+    REBUILD_MARGIN_DAYS = 120
+
+    # 同步时新行尚无估值数据（PE/PB 由 ValuationCalculator 事后回写），状态只覆盖行情类指标；
+    # 偏离率直接读取类型化列 deviation_ma_N，不解析 deviation_rate JSON
+    HISTORY_COLUMNS = ', '.join(['trade_date', 'amount', 'vol', 'macd', 'macd_histogram', 'rsi']
+                                + typed_columns(['deviation_rate']))
+
+    def __init__(self, calculator: PercentileCalculator,
+                 state_dir: Optional[str] = None,
+                 mapper: Optional[SixtyIndexMapper] = None):
+        """
+        Args:
+            calculator: 百分位计算器（决定窗口大小和指标集合）
+            state_dir: 状态文件目录，默认 <cache>/percentile_state
+            mapper: 指数数据 Mapper
+        """
+        self.calculator = calculator
+        self.state_dir = state_dir or get_cache_dir('percentile_state')
+        self.mapper = mapper or SixtyIndexMapper()
+
+    def _state_path(self, ts_code: str) -> str:
+        return os.path.join(self.state_dir, f"{ts_code}.json")
+
+    def load(self, ts_code: str) -> Tuple[Optional[str], Dict[str, RollingPercentileWindow]]:
+        """
+        读取持久化状态
+
+        Returns:
+            tuple: (状态最后交易日 YYYYMMDD, {指标: RollingPercentileWindow})，不存在时为 (None, {})
+        """
+        path = self._state_path(ts_code)
+        if not os.path.exists(path):
+            return None, {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"  百分位状态文件损坏({e})，将重建: {path}")
+            return None, {}
+
+        window = self.calculator.lookback_days
+        if data.get('window') != window:
+            return None, {}
+
+        states = {key: RollingPercentileWindow(window, values)
+                  for key, values in data.get('indicators', {}).items()}
+        return data.get('last_trade_date'), states
+
+    def save(self, ts_code: str, last_trade_date: str,
+             states: Dict[str, RollingPercentileWindow]):
+        """保存状态（先写临时文件再替换，避免中断产生半个文件）"""
+        data = {
+            'ts_code': ts_code,
+            'last_trade_date': last_trade_date,
+            'window': self.calculator.lookback_days,
+            'indicators': {key: window.to_list() for key, window in states.items()},
+        }
+        path = self._state_path(ts_code)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def invalidate(self, ts_code: str):
+        """删除状态文件（历史数据被重算后调用，下次同步时重建）"""
+        path = self._state_path(ts_code)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def load_for_sync(self, ts_code: str, start_date: str) -> Dict[str, RollingPercentileWindow]:
+        """
+        获取可直接追加 start_date 及之后数据的状态
+
+        持久化状态的最后交易日必须等于数据库中 start_date 之前的最后交易日，
+        否则（首次运行、重跑历史区间、状态丢失）从数据库历史重建。
+
+        Args:
+            ts_code: 指数代码
+            start_date: 本次同步的起始日期 YYYYMMDD
+
+        Returns:
+            dict: {指标: RollingPercentileWindow}
+        """
+        prev_date = self.mapper.get_max_trade_time_before(ts_code, start_date)
+        prev_date_str = TimeUtils.date_to_str(prev_date) if prev_date is not None else None
+
+        last_trade_date, states = self.load(ts_code)
+        if states and last_trade_date == prev_date_str:
+            return states
+
+        if prev_date_str is None:
+            return {}
+
+        print(f"  重建百分位状态 (状态日期={last_trade_date}, 数据库={prev_date_str})")
+        return self.rebuild(ts_code, prev_date_str)
+
+    def rebuild(self, ts_code: str, end_date: str) -> Dict[str, RollingPercentileWindow]:
+        """
+        从 ts_stock_data 历史重建状态（取 end_date 及之前的 lookback_days 行）
+        """
+        lookback_days = self.calculator.lookback_days
+        calendar_days = int(lookback_days * 365 / 250) + self.REBUILD_MARGIN_DAYS
+        start_date = TimeUtils.get_n_days_before_or_after(end_date, calendar_days, is_before=True)
+
+        condition = (f"ts_code = '{ts_code}' and trade_date >= '{start_date}' "
+                     f"and trade_date <= '{end_date}' ORDER BY trade_date")
+        rows = self.mapper.select_base_entity(columns=self.HISTORY_COLUMNS, condition=condition)
+        if not rows:
+            return {}
+
+        history_df = pd.DataFrame([dict(row._mapping) for row in rows])
+        return self.calculator.build_states(history_df.tail(lookback_days))
@@ -7,15 +7,13 @@
 from datetime import datetime, timedelta
 from typing import List, Optional
 
+import numpy as np
 import pandas as pd
 
-from entity.stock_daily_basic import StockDailyBasic
-from entity.stock_weight import StockWeight
 from mysql_connect.stock_basic_mapper import StockBasicMapper
 from mysql_connect.stock_daily_basic_mapper import StockDailyBasicMapper
 from mysql_connect.stock_weight_mapper import StockWeightMapper
-from util.class_util import ClassUtil
-from util.date_util import TimeUtils
+from sync.index.services.weight_asof_index import WeightAsOfIndex
 
 
 class ValuationCalculator:
@@ -25,9 +23,12 @@ class ValuationCalculator:
     职责：
     - 计算加权 PE/PB（基于指数权重）
     - 计算等权 PE/PB（基于市值权重）
-    - 获取成分股权重数据
+    - 按交易日关联当期生效的成分股权重（point-in-time）
     """
     
+    # 估值计算用到的 stock_daily_basic 数值列
+    METRIC_COLUMNS = ['pe', 'pe_ttm', 'pb', 'total_mv', 'circ_mv', 'pe_profit_dedt', 'pe_ttm_profit_dedt']
+    
     def __init__(self,
                  stock_weight_mapper: Optional[StockWeightMapper] = None,
                  stock_basic_mapper: Optional[StockBasicMapper] = None,
@@ -62,69 +63,38 @@ class ValuationCalculator:
         
         print(f"开始计算指数 {index_code} 从 {start_dt.strftime('%Y-%m-%d')} 到 {end_dt.strftime('%Y-%m-%d')} 的 PE/PB")
         
-        # 1. 获取所有成分股代码
-        con_code_list = self._get_all_con_codes(index_code, start_dt, end_dt)
-        
-        if not con_code_list:
-            print("未找到成分股数据")
-            return pd.DataFrame()
-        
-        # 2. 获取最新的成分股权重
-        monthly_stock_info = self._get_monthly_stock_weights(index_code, con_code_list, start_dt, end_dt)
+        # 1. 构建成分股权重 as-of 索引（区间内各期调仓权重）
+        weight_index = self._build_weight_index(index_code, start_date, end_date)
         
-        if monthly_stock_info is None or monthly_stock_info.empty:
+        if weight_index.empty:
             print("未找到任何成分股权重数据")
             return pd.DataFrame()
         
-        print(f"找到 {len(con_code_list)} 只成分股")
+        print(f"找到 {len(weight_index.rebalance_dates)} 期成分股权重")
         
-        # 3. 计算每日加权 PE/PB 和等权 PE/PB
-        result_data = self._calculate_both_weighted_metrics(
-            monthly_stock_info, con_code_list, start_dt, end_dt
-        )
+        # 2. 逐月计算每日加权 PE/PB 和等权 PE/PB（每日只关联当日生效的成分股）
+        result_data = self._calculate_both_weighted_metrics(weight_index, start_dt, end_dt)
         
         print(f"计算完成，共生成 {len(result_data)} 条记录")
         return pd.DataFrame(result_data)
     
-    def _get_all_con_codes(self, index_code: str, start_date: datetime, end_date: datetime) -> List[str]:
-        """获取指定时间段内的所有成分股代码"""
-        start_date_str = TimeUtils.date_to_str(start_date)
-        end_date_str = TimeUtils.date_to_str(end_date)
-        return self.stock_weight_mapper.get_exist_con_code(
-            index_code=index_code, start_date=start_date_str, end_date=end_date_str
-        )
-    
-    def _get_monthly_stock_weights(self, index_code: str, con_code_list: List[str],
-                                   start_date: datetime, end_date: datetime) -> Optional[pd.DataFrame]:
-        """获取最新的成分股权重数据"""
-        start_date_str = TimeUtils.date_to_str(start_date)
-        end_date_str = TimeUtils.date_to_str(end_date)
-        
-        if not con_code_list:
-            return None
-        
-        data = self.stock_weight_mapper.get_newest_weight_by_con_code_list(
-            index_code=index_code, con_code_list=con_code_list,
-            start_date=start_date_str, end_date=end_date_str
-        )
-        
-        if not data:
-            return None
-        
-        weight_list = []
-        for row in data:
-            weight = ClassUtil.create_entities_from_data(StockWeight, row)
-            weight_list.append(weight.to_dict())
-        
-        return pd.DataFrame(weight_list)
+    def _build_weight_index(self, index_code: str, start_date: str, end_date: str) -> WeightAsOfIndex:
+        """读取区间内生效的各期成分股权重，构建 as-of 索引"""
+        rows = self.stock_weight_mapper.select_weights_asof_range(index_code, start_date, end_date)
+        weight_df = pd.DataFrame(rows or [], columns=['con_code', 'trade_date', 'weight'])
+        return WeightAsOfIndex(weight_df)
     
-    def _calculate_both_weighted_metrics(self, monthly_stock_info: pd.DataFrame,
-                                        consistent_stocks: List[str],
+    def _calculate_both_weighted_metrics(self, weight_index: WeightAsOfIndex,
                                         start_date: datetime, end_date: datetime) -> List[dict]:
-        """计算加权 PE/PB 和等权 PE/PB 指标"""
+        """
+        计算加权 PE/PB 和等权 PE/PB 指标
+
+        按月一次区间查询得到长表（只查询当月生效过的成分股），每行按交易日关联当期权重，
+        只遍历有数据的交易日，按 trade_date 分组向量化聚合。
+        """
         result_data = []
         
-        if monthly_stock_info is None or monthly_stock_info.empty:
+        if weight_index is None or weight_index.empty:
             return result_data
         
         current_month_start = start_date
@@ -137,247 +107,120 @@ class ValuationCalculator:
             if current_month_end > end_date:
                 current_month_end = end_date
             
-            # 计算当前月份每天的加权指标
-            current_date = current_month_start
-            while current_date <= current_month_end:
-                date_str = current_date.strftime('%Y%m%d')
-                financial_data = self.stock_daily_basic_mapper.select_by_trade_date_and_ts_code(
-                    date_str, consistent_stocks
-                )
-                
-                financial_data_info = []
-                for row in financial_data:
-                    stock_data = ClassUtil.create_entities_from_data(StockDailyBasic, row)
-                    financial_data_info.append(stock_data.to_dict())
-                
-                if financial_data:
-                    daily_result = self._calculate_daily_both_metrics(
-                        financial_data_info, monthly_stock_info, date_str
-                    )
-                    if daily_result:
-                        result_data.append(daily_result)
-                
-                current_date += timedelta(days=1)
+            month_start_str = current_month_start.strftime('%Y%m%d')
+            month_end_str = current_month_end.strftime('%Y%m%d')
+            con_codes = weight_index.con_codes_between(month_start_str, month_end_str)
+            month_df = self._load_daily_basic_range(con_codes, month_start_str, month_end_str)
+            if not month_df.empty:
+                merged_df = weight_index.attach_weights(month_df)
+                result_data.extend(self._aggregate_daily_metrics(merged_df))
             
             current_month_start = next_month_start
         
         return result_data
     
-    def _calculate_daily_both_metrics(self, daily_financial_data: List[dict],
-                                     month_weights: pd.DataFrame, trade_date: str) -> Optional[dict]:
-        """计算单日的加权指标和等权指标"""
-        financial_df = pd.DataFrame(daily_financial_data)
+    def _load_daily_basic_range(self, ts_code_list: List[str], start_date: str, end_date: str) -> pd.DataFrame:
+        """一次查询区间内成分股的日线基础数据，返回按 trade_date 排序的长表"""
+        if not ts_code_list:
+            return pd.DataFrame()
         
-        # 合并财务数据和权重
-        merged_df = pd.merge(
-            financial_df,
-            month_weights[['con_code', 'weight']],
-            left_on='ts_code',
-            right_on='con_code',
-            how='inner'
+        columns = ', '.join(['ts_code', 'trade_date'] + self.METRIC_COLUMNS)
+        df = self.stock_daily_basic_mapper.select_frame_by_trade_date_range_and_ts_code(
+            start_date, end_date, ts_code_list, columns=columns, dtypes={'trade_date': str}
         )
+        if df.empty:
+            return pd.DataFrame()
         
-        if merged_df.empty:
-            return None
-        
-        # 计算加权指标（基于指数权重）
-        weighted_metrics = self._calculate_index_weighted_metrics(merged_df)
-        
-        # 计算等权指标（基于市值权重）
-        equal_weight_metrics = self._calculate_market_cap_weighted_metrics(merged_df)
-        
-        # 合并结果
-        result = {
-            'trade_date': trade_date,
-            # 指数权重加权指标
-            'weighted_pe': weighted_metrics['pe'],
-            'weighted_pe_ttm': weighted_metrics['pe_ttm'],
-            'weighted_pb': weighted_metrics['pb'],
-            # 市值权重等权指标
-            'equal_weight_pe': equal_weight_metrics['pe'],
-            'equal_weight_pe_ttm': equal_weight_metrics['pe_ttm'],
-            'equal_weight_pb': equal_weight_metrics['pb'],
-            # 统计信息
-            'valid_stocks_pe': weighted_metrics['valid_pe_count'],
-            'valid_stocks_pe_ttm': weighted_metrics['valid_pe_ttm_count'],
-            'valid_stocks_pb': weighted_metrics['valid_pb_count'],
-            'total_stocks': len(merged_df),
-            'weighted_pe_dedt': weighted_metrics['pe_dedt'],
-            'weighted_pe_ttm_dedt': weighted_metrics['pe_ttm_dedt']
-        }
-        
-        return result
-    
-    def _calculate_index_weighted_metrics(self, merged_df: pd.DataFrame) -> dict:
-        """计算基于指数权重的加权指标"""
-        # 初始化累计值
-        weighted_total_net_profit = 0
-        weighted_total_net_profit_ttm = 0
-        weighted_total_net_profit_dedt = 0
-        weighted_total_net_profit_ttm_dedt = 0
-        weighted_total_net_assets = 0
-        weighted_total_circ_mv_pe = 0
-        weighted_total_circ_mv_pe_ttm = 0
-        weighted_total_circ_mv_pb = 0
-        weighted_total_circ_mv_pe_dedt = 0
-        weighted_total_circ_mv_pe_ttm_dedt = 0
-        
-        valid_pe_count = 0
-        valid_pe_ttm_count = 0
-        valid_pb_count = 0
-        
-        for _, row in merged_df.iterrows():
-            weight = row['weight'] / 100.0  # 假设权重是百分比
-            total_mv = row['total_mv']
-            circ_mv = row['circ_mv']
-            
-            # 计算 PE 相关指标
-            if pd.notna(row['pe']) and row['pe'] > 0:
-                net_profit = total_mv / row['pe']
-                weighted_total_net_profit += net_profit * weight
-                weighted_total_circ_mv_pe += circ_mv * weight
-                valid_pe_count += 1
-            else:
-                weighted_total_circ_mv_pe += circ_mv * weight
-                valid_pe_count += 1
-            
-            # 计算 PE_TTM 相关指标
-            if pd.notna(row['pe_ttm']) and row['pe_ttm'] > 0:
-                net_profit_ttm = total_mv / row['pe_ttm']
-                weighted_total_net_profit_ttm += net_profit_ttm * weight
-                weighted_total_circ_mv_pe_ttm += circ_mv * weight
-                valid_pe_ttm_count += 1
-            else:
-                weighted_total_circ_mv_pe_ttm += circ_mv * weight
-                valid_pe_ttm_count += 1
-            
-            # 计算 PB 相关指标
-            if pd.notna(row['pb']) and row['pb'] > 0:
-                net_assets = total_mv / row['pb']
-                weighted_total_net_assets += net_assets * weight
-                weighted_total_circ_mv_pb += circ_mv * weight
-                valid_pb_count += 1
-            else:
-                weighted_total_circ_mv_pb += circ_mv * weight
-                valid_pb_count += 1
-            
-            # 计算扣非 PE 相关指标
-            if 'pe_profit_dedt' in row and pd.notna(row['pe_profit_dedt']) and row['pe_profit_dedt'] > 0:
-                weighted_total_circ_mv_pe_dedt += circ_mv * weight
-                weighted_total_net_profit_dedt += circ_mv / row['pe_profit_dedt'] * weight
-            else:
-                weighted_total_circ_mv_pe_dedt += circ_mv * weight
-            
-            # 计算扣非 PE_TTM 相关指标
-            if 'pe_ttm_profit_dedt' in row and pd.notna(row['pe_ttm_profit_dedt']) and row['pe_ttm_profit_dedt'] > 0:
-                weighted_total_circ_mv_pe_ttm_dedt += circ_mv * weight
-                weighted_total_net_profit_ttm_dedt += circ_mv / row['pe_ttm_profit_dedt'] * weight
-            else:
-                weighted_total_circ_mv_pe_ttm_dedt += circ_mv * weight
-        
-        # 计算最终的加权指标
-        weighted_pe = (weighted_total_circ_mv_pe / weighted_total_net_profit
-                      if weighted_total_net_profit > 0 else None)
-        weighted_pe_ttm = (weighted_total_circ_mv_pe_ttm / weighted_total_net_profit_ttm
-                          if weighted_total_net_profit_ttm > 0 else None)
-        weighted_pb = (weighted_total_circ_mv_pb / weighted_total_net_assets
-                      if weighted_total_net_assets > 0 else None)
-        weighted_pe_dedt = (weighted_total_circ_mv_pe_dedt / weighted_total_net_profit_dedt
-                           if weighted_total_net_profit_dedt > 0 else None)
-        weighted_pe_ttm_dedt = (weighted_total_circ_mv_pe_ttm_dedt / weighted_total_net_profit_ttm_dedt
-                               if weighted_total_net_profit_ttm_dedt > 0 else None)
-        
-        return {
-            'pe': weighted_pe,
-            'pe_ttm': weighted_pe_ttm,
-            'pb': weighted_pb,
-            'pe_dedt': weighted_pe_dedt,
-            'pe_ttm_dedt': weighted_pe_ttm_dedt,
-            'valid_pe_count': valid_pe_count,
-            'valid_pe_ttm_count': valid_pe_ttm_count,
-            'valid_pb_count': valid_pb_count
-        }
+        for col in self.METRIC_COLUMNS:
+            df[col] = pd.to_numeric(df[col], errors='coerce') if col in df.columns else np.nan
+        return df.sort_values('trade_date', kind='stable').reset_index(drop=True)
     
-    def _calculate_market_cap_weighted_metrics(self, merged_df: pd.DataFrame) -> dict:
-        """计算基于市值权重的等权指标"""
-        # 过滤有效数据
-        valid_data = merged_df.dropna(subset=['total_mv'])
-        
-        if valid_data.empty:
-            return {'pe': None, 'pe_ttm': None, 'pb': None}
-        
-        # 计算总市值
-        total_market_cap = valid_data['total_mv'].sum()
-        
-        if total_market_cap <= 0:
-            return {'pe': None, 'pe_ttm': None, 'pb': None}
-        
-        # 计算总流通市值
-        circ_market_cap = valid_data['circ_mv'].sum()
-        
-        # 初始化累计值
-        mv_weighted_net_profit = 0
-        mv_weighted_net_profit_ttm = 0
-        mv_weighted_net_assets = 0
-        mv_weighted_total_mv_pe = 0
-        mv_weighted_total_mv_pe_ttm = 0
-        mv_weighted_total_mv_pb = 0
-        
-        weighted_total_net_profit_dedt = 0
-        weighted_total_net_profit_ttm_dedt = 0
-        weighted_total_circ_mv_pe_dedt = 0
-        weighted_total_circ_mv_pe_ttm_dedt = 0
-        
-        for _, row in valid_data.iterrows():
-            total_mv = row['total_mv']
-            mv_weight = total_mv / total_market_cap  # 市值权重
-            circ_mv = row['circ_mv']
-            circ_mv_weight = circ_mv / circ_market_cap if circ_market_cap > 0 else 0
-            
-            # 计算 PE 相关指标
-            if pd.notna(row['pe']) and row['pe'] > 0:
-                net_profit = total_mv / row['pe']
-                mv_weighted_net_profit += net_profit * mv_weight
-                mv_weighted_total_mv_pe += total_mv * mv_weight
-            
-            # 计算 PE_TTM 相关指标
-            if pd.notna(row['pe_ttm']) and row['pe_ttm'] > 0:
-                net_profit_ttm = total_mv / row['pe_ttm']
-                mv_weighted_net_profit_ttm += net_profit_ttm * mv_weight
-                mv_weighted_total_mv_pe_ttm += total_mv * mv_weight
-            
-            # 计算 PB 相关指标
-            if pd.notna(row['pb']) and row['pb'] > 0:
-                net_assets = total_mv / row['pb']
-                mv_weighted_net_assets += net_assets * mv_weight
-                mv_weighted_total_mv_pb += total_mv * mv_weight
-            
-            # 计算扣非 PE 相关指标
-            if 'pe_profit_dedt' in row and pd.notna(row['pe_profit_dedt']) and row['pe_profit_dedt'] > 0:
-                weighted_total_circ_mv_pe_dedt += circ_mv * circ_mv_weight
-                weighted_total_net_profit_dedt += circ_mv / row['pe_profit_dedt'] * circ_mv_weight
+    @staticmethod
+    def _aggregate_daily_metrics(merged_df: pd.DataFrame) -> List[dict]:
+        """
+        按交易日向量化计算加权指标和等权指标
+
+        口径与逐日逐行累加一致：条件累加用掩码置零后分组求和（np.add.reduceat），
+        NaN 仍按原逻辑向结果传播。
+
+        Args:
+            merged_df: 日线基础数据与权重 inner merge 后的长表，需按 trade_date 排序
+
+        Returns:
+            List[dict]: 每个交易日一条结果，字段: trade_date, weighted_pe/pe_ttm/pb,
+                equal_weight_pe/pe_ttm/pb, weighted_pe_dedt/pe_ttm_dedt, valid_stocks_pe/pe_ttm/pb, total_stocks
+        """
+        if merged_df.empty:
+            return []
+        
+        merged_df = merged_df.sort_values('trade_date', kind='stable')
+        trade_dates = merged_df['trade_date'].to_numpy()
+        starts = np.flatnonzero(np.r_[True, trade_dates[1:] != trade_dates[:-1]])
+        counts = np.diff(np.r_[starts, len(trade_dates)])
+        
+        def column(name):
+            if name not in merged_df.columns:
+                return np.full(len(merged_df), np.nan)
+            return merged_df[name].to_numpy(dtype=np.float64)
+        
+        def group_sum(values):
+            return np.add.reduceat(values, starts)
+        
+        def masked_sum(mask, values):
+            return group_sum(np.where(mask, values, 0.0))
+        
+        total_mv = column('total_mv')
+        circ_mv = column('circ_mv')
+        weight = column('weight') / 100.0  # 假设权重是百分比
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # ---- 指数权重加权：无论估值是否有效，流通市值都计入分子 ----
+            circ_weighted = group_sum(circ_mv * weight)
+            index_profit = {}
+            for key, name, numerator in (('pe', 'pe', total_mv), ('pe_ttm', 'pe_ttm', total_mv),
+                                         ('pb', 'pb', total_mv),
+                                         ('pe_dedt', 'pe_profit_dedt', circ_mv),
+                                         ('pe_ttm_dedt', 'pe_ttm_profit_dedt', circ_mv)):
+                ratio = column(name)
+                index_profit[key] = masked_sum(ratio > 0, numerator / ratio * weight)
             
-            # 计算扣非 PE_TTM 相关指标
-            if 'pe_ttm_profit_dedt' in row and pd.notna(row['pe_ttm_profit_dedt']) and row['pe_ttm_profit_dedt'] > 0:
-                weighted_total_circ_mv_pe_ttm_dedt += circ_mv * circ_mv_weight
-                weighted_total_net_profit_ttm_dedt += circ_mv / row['pe_ttm_profit_dedt'] * circ_mv_weight
-        
-        # 计算最终的市值加权指标
-        equal_weight_pe = (mv_weighted_total_mv_pe / mv_weighted_net_profit
-                          if mv_weighted_net_profit > 0 else None)
-        equal_weight_pe_ttm = (mv_weighted_total_mv_pe_ttm / mv_weighted_net_profit_ttm
-                              if mv_weighted_net_profit_ttm > 0 else None)
-        equal_weight_pb = (mv_weighted_total_mv_pb / mv_weighted_net_assets
-                          if mv_weighted_net_assets > 0 else None)
-        weighted_pe_dedt = (weighted_total_circ_mv_pe_dedt / weighted_total_net_profit_dedt
-                           if weighted_total_net_profit_dedt > 0 else None)
-        weighted_pe_ttm_dedt = (weighted_total_circ_mv_pe_ttm_dedt / weighted_total_net_profit_ttm_dedt
-                               if weighted_total_net_profit_ttm_dedt > 0 else None)
-        
-        return {
-            'pe': equal_weight_pe,
-            'pe_ttm': equal_weight_pe_ttm,
-            'pb': equal_weight_pb,
-            'weighted_pe_dedt': weighted_pe_dedt,
-            'weighted_pe_ttm_dedt': weighted_pe_ttm_dedt
-        }
+            # ---- 市值权重等权：只统计 total_mv 非空的股票 ----
+            valid_mv = ~np.isnan(total_mv)
+            valid_count = group_sum(valid_mv.astype(np.int64))
+            total_market_cap = masked_sum(valid_mv, total_mv)
+            row_market_cap = np.repeat(total_market_cap, counts)
+            mv_weight = total_mv / row_market_cap
+            market_cap = {}
+            for key in ('pe', 'pe_ttm', 'pb'):
+                ratio = column(key)
+                mask = valid_mv & (ratio > 0)
+                profit = masked_sum(mask, total_mv / ratio * mv_weight)
+                weighted_mv = masked_sum(mask, total_mv * mv_weight)
+                market_cap[key] = (weighted_mv, profit)
+        
+        def ratio_or_none(numerator, denominator, enabled=True):
+            return float(numerator / denominator) if enabled and denominator > 0 else None
+        
+        result = []
+        for g, start in enumerate(starts.tolist()):
+            cap_ok = bool(valid_count[g] > 0 and total_market_cap[g] > 0)
+            total = int(counts[g])
+            result.append({
+                'trade_date': trade_dates[start],
+                # 指数权重加权指标
+                'weighted_pe': ratio_or_none(circ_weighted[g], index_profit['pe'][g]),
+                'weighted_pe_ttm': ratio_or_none(circ_weighted[g], index_profit['pe_ttm'][g]),
+                'weighted_pb': ratio_or_none(circ_weighted[g], index_profit['pb'][g]),
+                # 市值权重等权指标
+                'equal_weight_pe': ratio_or_none(market_cap['pe'][0][g], market_cap['pe'][1][g], cap_ok),
+                'equal_weight_pe_ttm': ratio_or_none(market_cap['pe_ttm'][0][g], market_cap['pe_ttm'][1][g], cap_ok),
+                'equal_weight_pb': ratio_or_none(market_cap['pb'][0][g], market_cap['pb'][1][g], cap_ok),
+                # 统计信息
+                'valid_stocks_pe': total,
+                'valid_stocks_pe_ttm': total,
+                'valid_stocks_pb': total,
+                'total_stocks': total,
+                'weighted_pe_dedt': ratio_or_none(circ_weighted[g], index_profit['pe_dedt'][g]),
+                'weighted_pe_ttm_dedt': ratio_or_none(circ_weighted[g], index_profit['pe_ttm_dedt'][g]),
+            })
+        return result
@@ -0,0 +1,94 @@
+"""
+成分股权重 as-of 索引
+
+按指数把 stock_weight 整理为有序的调仓日期数组 + 每期权重向量，
+任意交易日通过 searchsorted 定位当日生效的成分股及权重（point-in-time）。
+"""
+
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+
+class WeightAsOfIndex:
+    """
+    单个指数的成分股权重 as-of 索引
+
+    生效规则：交易日 d 使用 trade_date <= d 的最近一期权重；
+    早于第一期调仓日的交易日使用第一期权重（历史权重覆盖不足时的兜底）。
+    """
+
+    def __init__(self, weight_df: pd.DataFrame):
+        """
+        Args:
+            weight_df: 包含 con_code、trade_date(YYYYMMDD)、weight 列的权重数据
+        """
+        if weight_df is None or weight_df.empty:
+            frame = pd.DataFrame({'con_code': pd.Series(dtype=object),
+                                  'trade_date': pd.Series(dtype=object),
+                                  'weight': pd.Series(dtype=np.float64)})
+        else:
+            frame = weight_df[['con_code', 'trade_date', 'weight']].copy()
+            frame['trade_date'] = frame['trade_date'].astype(str)
+            frame['weight'] = pd.to_numeric(frame['weight'], errors='coerce')
+            frame = frame.sort_values(['trade_date', 'con_code'], kind='stable')
+
+        # 调仓日期（升序）及其在长表中的区间 [offsets[i], offsets[i + 1])
+        trade_dates = frame['trade_date'].to_numpy(dtype=object)
+        if len(frame):
+            starts = np.flatnonzero(np.r_[True, trade_dates[1:] != trade_dates[:-1]])
+        else:
+            starts = np.array([], dtype=np.int64)
+        self.rebalance_dates = trade_dates[starts].astype(str)
+        self.offsets = np.r_[starts, len(frame)].astype(np.int64)
+        self.con_codes = frame['con_code'].to_numpy(dtype=object)
+        self.weights = frame['weight'].to_numpy(dtype=np.float64)
+
+    @property
+    def empty(self) -> bool:
+        return len(self.rebalance_dates) == 0
+
+    def locate(self, trade_dates) -> np.ndarray:
+        """
+        定位每个交易日生效的调仓期序号
+
+        Args:
+            trade_dates: YYYYMMDD 字符串序列
+
+        Returns:
+            np.ndarray: 调仓期序号（int64）
+        """
+        dates = np.asarray(trade_dates, dtype=str)
+        positions = np.searchsorted(self.rebalance_dates, dates, side='right') - 1
+        return np.maximum(positions, 0)
+
+    def con_codes_between(self, start_date: str, end_date: str) -> List[str]:
+        """区间内任一交易日生效过的成分股（用于限定区间查询的股票范围）"""
+        if self.empty:
+            return []
+        first, last = self.locate([start_date, end_date])
+        codes = self.con_codes[self.offsets[first]:self.offsets[last + 1]]
+        return sorted(set(codes.tolist()))
+
+    def attach_weights(self, daily_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        为长表的每一行关联当日生效的权重（inner join，非当期成分股被剔除）
+
+        Args:
+            daily_df: 包含 ts_code、trade_date 的日线数据
+
+        Returns:
+            pd.DataFrame: daily_df 加上 con_code、weight 列
+        """
+        if self.empty or daily_df.empty:
+            return daily_df.iloc[0:0].assign(con_code=pd.Series(dtype=object), weight=pd.Series(dtype=np.float64))
+
+        positions = np.arange(len(self.rebalance_dates))
+        period = np.repeat(positions, np.diff(self.offsets))
+        weight_long = pd.DataFrame({'_period': period, 'con_code': self.con_codes, 'weight': self.weights})
+
+        left = daily_df.assign(_period=self.locate(daily_df['trade_date'].to_numpy()))
+        merged = pd.merge(left, weight_long, left_on=['_period', 'ts_code'],
+                          right_on=['_period', 'con_code'], how='inner')
+        return merged.drop(columns='_period')
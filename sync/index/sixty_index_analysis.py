@@ -7,18 +7,22 @@
 - 管理数据流程
 """
 
-from typing import List, Optional
+from typing import Dict, Optional
 
 import pandas as pd
 
 from analysis.deviation_rate_calculator import DeviationRateCalculator
+from analysis.index_data_store import IndexDataStore
 from analysis.technical_indicator_calculator import TechnicalIndicatorCalculator
 from analysis.cross_signal_detector import CrossSignalDetector
+from analysis.indicator_columns import typed_columns
 from analysis.percentile_calculator import PercentileCalculator
 from entity import constant
 from entity.stock_data import StockData
 from mysql_connect.sixty_index_mapper import SixtyIndexMapper
+from mysql_connect.sync_state_mapper import SyncStateMapper
 from sync.index.services.index_data_fetcher import IndexDataFetcher
+from sync.index.services.percentile_state_store import PercentileStateStore
 from sync.index.services.valuation_calculator import ValuationCalculator
 from util.date_util import TimeUtils
 
@@ -45,6 +49,37 @@ class SixtyIndexAnalysis:
     BATCH_SIZE = 100
     PERCENTILE_LOOKBACK_YEARS = 5
     
+    # 写入 ts_stock_data 的行情/技术指标列（估值列由 _update_pe_pb_data 单独回写）
+    INDEX_DATA_COLUMNS = [
+        'close', 'open', 'high', 'low', 'pre_close', 'change', 'pct_chg', 'vol', 'amount',
+        'ma_5', 'ma_10', 'ma_20', 'ma_50',
+        'wma_5', 'wma_10', 'wma_20', 'wma_50',
+        'macd', 'macd_signal_line', 'macd_histogram',
+        'rsi', 'kdj_k', 'kdj_d', 'kdj_j',
+        'bb_high', 'bb_mid', 'bb_low', 'obv',
+        'atr', 'adx', 'plus_di', 'minus_di',
+        'cci', 'vol_ma_5', 'vol_ma_10',
+    ]
+    INDEX_JSON_COLUMNS = ['deviation_rate', 'cross_signals', 'percentile_ranks']
+    # JSON 列对应的类型化列（deviation_ma_N / signal_* / pctl_*），与 JSON 同时写入
+    INDEX_TYPED_COLUMNS = typed_columns()
+    PRICE_COLUMNS = ['close', 'open', 'high', 'low', 'pre_close', 'change', 'pct_chg', 'vol', 'amount']
+    
+    # ValuationCalculator 输出列 -> ts_stock_data 估值列
+    PE_PB_COLUMN_MAP = {
+        'weighted_pb': 'pb_weight',
+        'weighted_pe': 'pe_weight',
+        'weighted_pe_ttm': 'pe_ttm_weight',
+        'equal_weight_pb': 'pb',
+        'equal_weight_pe': 'pe',
+        'equal_weight_pe_ttm': 'pe_ttm',
+        'weighted_pe_dedt': 'pe_profit_dedt',
+        'weighted_pe_ttm_dedt': 'pe_profit_dedt_ttm',
+    }
+    
+    # sync_state 中的数据集名称
+    DATASET = 'ts_stock_data'
+    
     def __init__(self):
         """初始化服务组件"""
         self.data_fetcher = IndexDataFetcher()
@@ -53,13 +88,18 @@ class SixtyIndexAnalysis:
             wma_periods=self.WMA_PERIODS
         )
         self.deviation_calculator = DeviationRateCalculator(
-            ma_periods=self.MA_PERIODS
+            ma_periods=self.MA_PERIODS,
+            typed_columns=True
         )
-        self.cross_detector = CrossSignalDetector()
+        self.cross_detector = CrossSignalDetector(typed_columns=True)
         self.percentile_calculator = PercentileCalculator(
-            lookback_years=self.PERCENTILE_LOOKBACK_YEARS
+            lookback_years=self.PERCENTILE_LOOKBACK_YEARS,
+            typed_columns=True
         )
         self.valuation_calculator = ValuationCalculator()
+        self.percentile_state_store = PercentileStateStore(self.percentile_calculator)
+        self.index_store = IndexDataStore(mapper=mapper)
+        self.sync_state_mapper = SyncStateMapper()
     
     def additional_data(self, pe_cal_start_date: str):
         """
@@ -71,28 +111,38 @@ class SixtyIndexAnalysis:
         3. 计算技术指标
         4. 计算偏离率 JSON
         5. 计算交叉信号（均线金叉死叉、MACD金叉死叉）
-        6. 计算历史百分位（5年窗口）
-        7. 过滤增量数据
-        8. 批量插入数据库
+        6. 过滤增量数据
+        7. 计算历史百分位（持久化的5年滚动窗口状态，逐行追加）
+        8. 批量插入数据库并保存百分位状态
         9. 更新 PE/PB 数据
+        10. 将本次写入的行追加到本地列存
         
         Args:
             pe_cal_start_date: PE/PB 计算的起始日期
         """
+        # 全部指数的水位线一次读取（每批写入后推进，中断后从断点继续）
+        watermarks = self._load_watermarks()
         for ts_code in constant.TS_CODE_LIST:
             try:
-                self._sync_single_index(ts_code, pe_cal_start_date)
+                self._sync_single_index(ts_code, pe_cal_start_date, watermarks)
             except Exception as e:
                 print(f"同步指数 {ts_code} 失败: {e}")
+                self.sync_state_mapper.record_error(self.DATASET, ts_code, e)
                 continue
     
-    def _sync_single_index(self, ts_code: str, pe_cal_start_date: str):
+    def _load_watermarks(self) -> Dict[str, str]:
+        """各指数已写入的最大交易日 {ts_code: YYYYMMDD}"""
+        return self.sync_state_mapper.load_watermarks(self.DATASET, mapper.select_max_trade_date_by_code)
+    
+    def _sync_single_index(self, ts_code: str, pe_cal_start_date: str,
+                           watermarks: Optional[Dict[str, str]] = None):
         """
         同步单个指数的数据
         
         Args:
             ts_code: 指数代码
             pe_cal_start_date: PE/PB 计算起始日期
+            watermarks: 各指数水位线，默认从 sync_state 读取
         """
         index_name = constant.TS_CODE_NAME_DICT.get(ts_code, ts_code)
         print(f"\n开始同步指数 {index_name} ({ts_code})")
@@ -103,13 +153,13 @@ class SixtyIndexAnalysis:
             start_date = pe_cal_start_date
             print(f"  使用用户指定起始日期: {start_date}")
         else:
-            max_trade_date = mapper.get_max_trade_time(ts_code)
+            if watermarks is None:
+                watermarks = self._load_watermarks()
+            max_trade_date = watermarks.get(ts_code)
             if max_trade_date is None:
                 start_date = constant.HISTORY_START_DATE_MAP.get(ts_code, '20150101')
             else:
-                start_date = TimeUtils.get_n_days_before_or_after(
-                    TimeUtils.date_to_str(max_trade_date), 1, is_before=False
-                )
+                start_date = TimeUtils.get_n_days_before_or_after(max_trade_date, 1, is_before=False)
         end_date = TimeUtils.get_current_date_str()
         
         print(f"  同步日期范围: {start_date} - {end_date}")
@@ -133,11 +183,7 @@ class SixtyIndexAnalysis:
         market_df = self.cross_detector.detect(market_df)
         print(f"  交叉信号计算完成")
         
-        # 6. 计算历史百分位（需要全量历史数据）
-        market_df = self.percentile_calculator.calculate(market_df)
-        print(f"  历史百分位计算完成")
-        
-        # 7. 过滤只保留需要同步的日期范围内的数据
+        # 6. 过滤只保留需要同步的日期范围内的数据
         market_df = market_df[market_df['trade_date'] >= start_date].reset_index(drop=True)
         
         if market_df.empty:
@@ -146,99 +192,105 @@ class SixtyIndexAnalysis:
         
         print(f"  过滤后 {len(market_df)} 条数据需要同步")
         
-        # 8. 转换为 StockData 对象并批量插入
-        stock_data_list = self._convert_to_stock_data(market_df, ts_code)
-        self._batch_upsert(stock_data_list)
+        # 7. 计算历史百分位（基于5年滚动窗口状态，与 IndexAnalyzer 的全量计算一致）
+        # 数据库中 amount 按 /10 存储，百分位需在同一口径下与历史比较
+        percentile_states = self.percentile_state_store.load_for_sync(ts_code, start_date)
+        stored_scale_df = market_df.assign(amount=pd.to_numeric(market_df['amount'], errors='coerce') / 10)
+        percentile_df = self.percentile_calculator.calculate_incremental(stored_scale_df, percentile_states)
+        market_df['percentile_ranks'] = percentile_df['percentile_ranks'].values
+        for col in percentile_df.columns:
+            if col.startswith('pctl_'):
+                market_df[col] = percentile_df[col].values
+        print(f"  历史百分位计算完成")
+        
+        # 8. 列式批量写入
+        if self._batch_upsert(market_df, ts_code):
+            self.percentile_state_store.save(
+                ts_code, str(market_df['trade_date'].iloc[-1]), percentile_states
+            )
+        else:
+            # 部分写入失败时不推进状态，下次同步从数据库重建
+            self.percentile_state_store.invalidate(ts_code)
         
         print(f"  行情数据同步完成")
         
         # 9. 更新 PE/PB 数据
         self._update_pe_pb_data(ts_code, pe_cal_start_date, end_date)
+        
+        # 10. 本地列存覆盖追加（含 PE/PB 回写结果）
+        self._refresh_index_store(ts_code, min(start_date, pe_cal_start_date or start_date))
     
-    def _convert_to_stock_data(self, df: pd.DataFrame, ts_code: str) -> List[StockData]:
+    def _build_upsert_frame(self, df: pd.DataFrame, ts_code: str) -> pd.DataFrame:
         """
-        将 DataFrame 转换为 StockData 对象列表
+        将行情和技术指标 DataFrame 列式转换为 ts_stock_data 的写入格式
+        
+        amount 按 /10 存储，0 或空值写 NULL；JSON 列与类型化列同时写入，不创建实体对象。
         
         Args:
             df: 包含行情和技术指标的 DataFrame
             ts_code: 指数代码
         
         Returns:
-            List[StockData]: StockData 对象列表
+            pd.DataFrame: 列名与表字段一致的 DataFrame
         """
-        stock_data_list = []
-        index_name = constant.TS_CODE_NAME_DICT.get(ts_code, ts_code)
+        frame = pd.DataFrame({
+            'ts_code': ts_code,
+            'trade_date': df['trade_date'].astype(str),
+            'name': constant.TS_CODE_NAME_DICT.get(ts_code, ts_code),
+        }, index=df.index)
         
-        for _, row in df.iterrows():
-            stock_data = StockData(
-                ts_code=ts_code,
-                trade_date=str(row['trade_date']),
-                close=self._safe_float(row.get('close')),
-                open=self._safe_float(row.get('open')),
-                high=self._safe_float(row.get('high')),
-                low=self._safe_float(row.get('low')),
-                pre_close=self._safe_float(row.get('pre_close')),
-                change=self._safe_float(row.get('change')),
-                pct_chg=self._safe_float(row.get('pct_chg')),
-                vol=self._safe_float(row.get('vol')),
-                amount=self._safe_float(row.get('amount')) / 10 if row.get('amount') else None,
-                name=index_name,
-                deviation_rate=row.get('deviation_rate'),
-                # 技术指标
-                ma_5=self._safe_float(row.get('ma_5')),
-                ma_10=self._safe_float(row.get('ma_10')),
-                ma_20=self._safe_float(row.get('ma_20')),
-                ma_50=self._safe_float(row.get('ma_50')),
-                wma_5=self._safe_float(row.get('wma_5')),
-                wma_10=self._safe_float(row.get('wma_10')),
-                wma_20=self._safe_float(row.get('wma_20')),
-                wma_50=self._safe_float(row.get('wma_50')),
-                macd=self._safe_float(row.get('macd')),
-                macd_signal_line=self._safe_float(row.get('macd_signal_line')),
-                macd_histogram=self._safe_float(row.get('macd_histogram')),
-                rsi=self._safe_float(row.get('rsi')),
-                kdj_k=self._safe_float(row.get('kdj_k')),
-                kdj_d=self._safe_float(row.get('kdj_d')),
-                kdj_j=self._safe_float(row.get('kdj_j')),
-                bb_high=self._safe_float(row.get('bb_high')),
-                bb_mid=self._safe_float(row.get('bb_mid')),
-                bb_low=self._safe_float(row.get('bb_low')),
-                obv=self._safe_float(row.get('obv')),
-                atr=self._safe_float(row.get('atr')),
-                adx=self._safe_float(row.get('adx')),
-                plus_di=self._safe_float(row.get('plus_di')),
-                minus_di=self._safe_float(row.get('minus_di')),
-                cci=self._safe_float(row.get('cci')),
-                vol_ma_5=self._safe_float(row.get('vol_ma_5')),
-                vol_ma_10=self._safe_float(row.get('vol_ma_10')),
-                cross_signals=row.get('cross_signals'),
-                percentile_ranks=row.get('percentile_ranks')
-            )
-            stock_data_list.append(stock_data)
+        for col in self.INDEX_DATA_COLUMNS:
+            if col in df.columns:
+                frame[col] = pd.to_numeric(df[col], errors='coerce')
+            else:
+                frame[col] = None
+        amount = frame['amount']
+        frame['amount'] = amount.where(amount != 0) / 10
         
-        return stock_data_list
+        for col in self.INDEX_JSON_COLUMNS:
+            frame[col] = df[col] if col in df.columns else None
+        for col in self.INDEX_TYPED_COLUMNS:
+            frame[col] = df[col] if col in df.columns else None
+        
+        return frame
     
-    def _batch_upsert(self, stock_data_list: List[StockData]):
+    def _batch_upsert(self, df: pd.DataFrame, ts_code: str) -> bool:
         """
-        批量插入或更新数据
+        批量插入或更新数据（DataFrame 直接写入，失败批次回退为逐条写入）
+        
+        逐条回退写入与批量写入使用同一 DataFrame，JSON 列和类型化列同时写入。
+        每批完整写入后推进同步水位线；某批有行写入失败后不再推进，下次从该批重新同步。
         
         Args:
-            stock_data_list: StockData 对象列表
+            df: 包含行情和技术指标的 DataFrame
+            ts_code: 指数代码
+        
+        Returns:
+            bool: 是否全部写入成功
         """
-        total = len(stock_data_list)
+        all_success = True
+        frame = self._build_upsert_frame(df, ts_code)
+        total = len(frame)
         for i in range(0, total, self.BATCH_SIZE):
-            batch = stock_data_list[i:i + self.BATCH_SIZE]
+            batch = frame.iloc[i:i + self.BATCH_SIZE]
             try:
-                mapper.upsert_batch(batch)
+                mapper.upsert_dataframe(batch)
                 print(f"    已处理 {min(i + self.BATCH_SIZE, total)}/{total} 条数据")
             except Exception as e:
                 print(f"    批量插入失败: {e}")
-                # 尝试单条插入
-                for data in batch:
+                # 尝试单条写入
+                for j in range(len(batch)):
                     try:
-                        mapper.insert_index(data)
+                        mapper.upsert_dataframe(batch.iloc[j:j + 1])
                     except Exception as single_error:
+                        if all_success:
+                            self.sync_state_mapper.record_error(self.DATASET, ts_code, single_error)
+                        all_success = False
                         print(f"    单条插入失败: {single_error}")
+            if all_success:
+                self.sync_state_mapper.advance(self.DATASET, ts_code, batch['trade_date'].max())
+        
+        return all_success
     
     def _update_pe_pb_data(self, ts_code: str, start_date: str, end_date: str):
         """
@@ -257,45 +309,21 @@ class SixtyIndexAnalysis:
                 print(f"  无 PE/PB 数据")
                 return
             
-            # 转换为 StockData 并批量更新
-            update_fields = [
-                'pb_weight', 'pe_weight', 'pe_ttm_weight',
-                'pb', 'pe', 'pe_ttm',
-                'pe_profit_dedt', 'pe_profit_dedt_ttm'
-            ]
-            
-            for _, row in pe_pb_df.iterrows():
-                stock_data = StockData(
-                    ts_code=ts_code,
-                    trade_date=str(row['trade_date']),
-                    pb_weight=self._safe_float(row.get('weighted_pb')),
-                    pe_weight=self._safe_float(row.get('weighted_pe')),
-                    pe_ttm_weight=self._safe_float(row.get('weighted_pe_ttm')),
-                    pb=self._safe_float(row.get('equal_weight_pb')),
-                    pe=self._safe_float(row.get('equal_weight_pe')),
-                    pe_ttm=self._safe_float(row.get('equal_weight_pe_ttm')),
-                    pe_profit_dedt=self._safe_float(row.get('weighted_pe_dedt')),
-                    pe_profit_dedt_ttm=self._safe_float(row.get('weighted_pe_ttm_dedt'))
-                )
-                mapper.update_by_ts_code_and_trade_date(stock_data, update_fields)
+            # 按列映射后批量回写（临时表 + UPDATE JOIN，替代逐行 UPDATE）
+            frame = pd.DataFrame({'ts_code': ts_code,
+                                  'trade_date': pe_pb_df['trade_date'].astype(str)})
+            for source, target in self.PE_PB_COLUMN_MAP.items():
+                if source in pe_pb_df.columns:
+                    frame[target] = pd.to_numeric(pe_pb_df[source], errors='coerce')
+                else:
+                    frame[target] = None
+            mapper.update_frame_by_ts_code_and_trade_date(frame, list(self.PE_PB_COLUMN_MAP.values()))
             
             print(f"  PE/PB 数据更新完成，共 {len(pe_pb_df)} 条")
             
         except Exception as e:
             print(f"  更新 PE/PB 数据失败: {e}")
     
-    @staticmethod
-    def _safe_float(value) -> Optional[float]:
-        """安全转换为 float，处理 NaN 和 None"""
-        if value is None:
-            return None
-        if pd.isna(value):
-            return None
-        try:
-            return float(value)
-        except (ValueError, TypeError):
-            return None
-    
     # =========== 技术指标单独更新方法（保留兼容性）===========
     
     def additional_tech_data_and_update_mapper(self, index_code: str, start_date: str,
@@ -342,58 +370,19 @@ class SixtyIndexAnalysis:
             
             print(f"获取到 {len(df)} 条技术指标数据，开始批量更新...")
             
-            # 更新字段
-            update_fields = [
-                'ma_5', 'ma_10', 'ma_20', 'ma_50',
-                'wma_5', 'wma_10', 'wma_20', 'wma_50',
-                'macd', 'macd_signal_line', 'macd_histogram',
-                'rsi', 'kdj_k', 'kdj_d', 'kdj_j',
-                'bb_high', 'bb_mid', 'bb_low', 'obv',
-                'atr', 'adx', 'plus_di', 'minus_di',
-                'cci', 'vol_ma_5', 'vol_ma_10',
-                'deviation_rate', 'cross_signals', 'percentile_ranks'
-            ]
-            
-            total_updated = 0
-            for _, row in df.iterrows():
-                stock_data = StockData(
-                    ts_code=index_code,
-                    trade_date=str(row['trade_date']),
-                    ma_5=self._safe_float(row.get('ma_5')),
-                    ma_10=self._safe_float(row.get('ma_10')),
-                    ma_20=self._safe_float(row.get('ma_20')),
-                    ma_50=self._safe_float(row.get('ma_50')),
-                    wma_5=self._safe_float(row.get('wma_5')),
-                    wma_10=self._safe_float(row.get('wma_10')),
-                    wma_20=self._safe_float(row.get('wma_20')),
-                    wma_50=self._safe_float(row.get('wma_50')),
-                    macd=self._safe_float(row.get('macd')),
-                    macd_signal_line=self._safe_float(row.get('macd_signal_line')),
-                    macd_histogram=self._safe_float(row.get('macd_histogram')),
-                    rsi=self._safe_float(row.get('rsi')),
-                    kdj_k=self._safe_float(row.get('kdj_k')),
-                    kdj_d=self._safe_float(row.get('kdj_d')),
-                    kdj_j=self._safe_float(row.get('kdj_j')),
-                    bb_high=self._safe_float(row.get('bb_high')),
-                    bb_mid=self._safe_float(row.get('bb_mid')),
-                    bb_low=self._safe_float(row.get('bb_low')),
-                    obv=self._safe_float(row.get('obv')),
-                    atr=self._safe_float(row.get('atr')),
-                    adx=self._safe_float(row.get('adx')),
-                    plus_di=self._safe_float(row.get('plus_di')),
-                    minus_di=self._safe_float(row.get('minus_di')),
-                    cci=self._safe_float(row.get('cci')),
-                    vol_ma_5=self._safe_float(row.get('vol_ma_5')),
-                    vol_ma_10=self._safe_float(row.get('vol_ma_10')),
-                    deviation_rate=row.get('deviation_rate'),
-                    cross_signals=row.get('cross_signals'),
-                    percentile_ranks=row.get('percentile_ranks')
-                )
-                mapper.update_by_ts_code_and_trade_date(stock_data, update_fields)
-                total_updated += 1
+            # 只回写技术指标列，行情列保持不变
+            frame = self._build_upsert_frame(df, index_code)
+            update_fields = ([col for col in self.INDEX_DATA_COLUMNS if col not in self.PRICE_COLUMNS]
+                             + self.INDEX_JSON_COLUMNS + self.INDEX_TYPED_COLUMNS)
+            mapper.update_frame_by_ts_code_and_trade_date(frame, update_fields)
+            total_updated = len(frame)
             
             print(f"技术指标数据更新完成，共成功更新 {total_updated} 条数据")
             
+            # 历史百分位已重算，下次同步时从数据库重建增量状态
+            self.percentile_state_store.invalidate(index_code)
+            self.index_store.invalidate(index_code)
+            
         except Exception as e:
             print(f"更新技术指标数据时发生错误: {e}")
             raise e
@@ -410,3 +399,18 @@ class SixtyIndexAnalysis:
             batch_size: 批量大小
         """
         self._update_pe_pb_data(index_code, start_date, end_date)
+        self._refresh_index_store(index_code, start_date)
+    
+    def _refresh_index_store(self, ts_code: str, start_date: str):
+        """
+        从数据库重新读取 start_date 之后的行并覆盖追加到本地列存，失败时删除列存等待重建
+        
+        Args:
+            ts_code: 指数代码
+            start_date: 本次写入/回写的起始日期
+        """
+        try:
+            self.index_store.refresh(ts_code, start_date)
+        except Exception as e:
+            print(f"  本地列存更新失败({e})，下次读取时重建")
+            self.index_store.invalidate(ts_code)
@@ -1,10 +1,10 @@
 # 自动同步数据
-import time
 from datetime import datetime, timedelta
 
 from entity import constant
 from entity.stock_weight import StockWeight
 from mysql_connect.stock_weight_mapper import StockWeightMapper
+from mysql_connect.sync_state_mapper import SyncStateMapper
 from tu_share_factory.tu_share_factory import TuShareFactory
 from util.date_util import TimeUtils
 
@@ -13,21 +13,23 @@ class StockWeightSync:
     """指数成分股权重数据同步器"""
     
     BATCH_SIZE = 100
+    # sync_state 中的数据集名称
+    DATASET = 'stock_weight'
     
     def __init__(self):
         self.mapper = StockWeightMapper()
+        self.sync_state_mapper = SyncStateMapper()
     
     def additional_data(self):
-        """增量同步所有指数的权重数据"""
+        """增量同步所有指数的权重数据，返回写入条数"""
+        total = 0
+        # 全部指数的水位线一次读取（每月数据落库后推进，中断后从断点继续）
+        watermarks = self.sync_state_mapper.load_watermarks(self.DATASET, self.mapper.select_max_trade_date_by_code)
         for ts_code in constant.TS_CODE_LIST:
-            history_start_date = constant.HISTORY_START_DATE_MAP[ts_code]
-            max_trade_datetime = self.mapper.get_max_trade_time(ts_code)
-            if max_trade_datetime is None:
-                max_trade_date = history_start_date
-            else:
-                max_trade_date = max_trade_datetime
+            max_trade_date = watermarks.get(ts_code) or constant.HISTORY_START_DATE_MAP[ts_code]
             start_date = TimeUtils.get_n_days_before_or_after(max_trade_date, 1, True)
-            self._sync_data(ts_code, start_date, TimeUtils.get_current_date_str())
+            total += self._sync_data(ts_code, start_date, TimeUtils.get_current_date_str())
+        return total
     
     def _sync_data(self, index_code, start_date, end_date):
         """同步单个指数的权重数据"""
@@ -37,20 +39,29 @@ class StockWeightSync:
         start_date = datetime.strptime(start_date, '%Y%m%d')
         end_date = datetime.strptime(end_date, '%Y%m%d')
 
-        # 循环遍历每个月
+        # 按月切分请求区间
+        month_requests = []
         current_month_start = start_date
         while current_month_start <= end_date:
             # 计算当前月份的结束日期
             next_month_start = (current_month_start.replace(day=28) + timedelta(days=4)).replace(day=1)
             current_month_end = next_month_start - timedelta(days=1)
+            month_requests.append({
+                'index_code': index_code,
+                'start_date': current_month_start.strftime('%Y%m%d'),
+                'end_date': current_month_end.strftime('%Y%m%d'),
+            })
+            # 移动到下一个月
+            current_month_start = next_month_start
 
-            # 获取当前月份的指数成分股及其权重
-            time.sleep(0.3)
-            stock_info = pro.index_weight(
-                index_code=index_code, 
-                start_date=current_month_start.strftime('%Y%m%d'),
-                end_date=current_month_end.strftime('%Y%m%d')
-            )
+        synced_count = 0
+        # 各月并发请求（共享客户端限流），按月份顺序落库；
+        # 某月重试后仍失败时中止，已落库的月份不受影响，下次从水位线继续
+        for request, stock_info in pro.imap('index_weight', month_requests):
+            month = request['start_date'][:6]
+            if isinstance(stock_info, Exception):
+                self.sync_state_mapper.record_error(self.DATASET, index_code, stock_info)
+                raise stock_info
 
             # 去重并存储
             month_stock_info = stock_info.drop_duplicates(subset='con_code', keep='first')
@@ -72,7 +83,9 @@ class StockWeightSync:
                 self.mapper.insert_index_batch(batch_data)
                 print(f"最后批次插入 {len(batch_data)} 条数据")
 
-            print(f"月份 {current_month_start.strftime('%Y-%m')} 处理完成，共处理 {total_count} 条数据")
+            print(f"月份 {month} 处理完成，共处理 {total_count} 条数据")
+            synced_count += total_count
+            if not month_stock_info.empty:
+                self.sync_state_mapper.advance(self.DATASET, index_code, month_stock_info['trade_date'].max())
 
-            # 移动到下一个月
-            current_month_start = next_month_start
+        return synced_count
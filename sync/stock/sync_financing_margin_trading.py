@@ -1,5 +1,4 @@
 # 自动同步数据
-import time
 from datetime import datetime, timedelta
 import pandas as pd
 
@@ -26,13 +25,8 @@ class FinancingMarginTradingSync:
         """增量同步"""
         start_date = self.mapper.get_max_trade_date(exchange_id=None)
         start_date = start_date if start_date else '19000101'
-        time.sleep(0.3)
-        try:
-            self._sync_data(start_date, TimeUtils.get_current_date_str())
-        except Exception as e:
-            print(f'同步融资融券数据失败: {e}，30秒后重试')
-            time.sleep(30)
-            self._sync_data(start_date, TimeUtils.get_current_date_str())
+        # 限流与失败重试由共享的 TushareClient 处理
+        return self._sync_data(start_date, TimeUtils.get_current_date_str())
     
     def init(self):
         """全量初始化 2015年至今"""
@@ -43,12 +37,7 @@ class FinancingMarginTradingSync:
             year_start = datetime(start_year, 1, 1)
             year_end = datetime(start_year, 12, 31)
 
-            try:
-                self._sync_data(TimeUtils.date_to_str(year_start), TimeUtils.date_to_str(year_end))
-            except Exception as e:
-                print(f'同步 {start_year} 年融资融券数据失败: {e}，30秒后重试')
-                time.sleep(30)
-                self._sync_data(TimeUtils.date_to_str(year_start), TimeUtils.date_to_str(year_end))
+            self._sync_data(TimeUtils.date_to_str(year_start), TimeUtils.date_to_str(year_end))
             start_year += 1
     
     def _sync_data(self, start_date, end_date):
@@ -73,4 +62,6 @@ class FinancingMarginTradingSync:
             self.mapper.insert_financing_margin_trading_batch(batch_data)
             print(f"最后批次插入 {len(batch_data)} 条数据")
 
+        return total_count
+
 
@@ -1,5 +1,4 @@
 # 自动同步数据
-import time
 from datetime import datetime, timedelta
 import numpy as np
 import pandas as pd
@@ -8,6 +7,7 @@ from entity import constant
 from entity.income import Income
 from mysql_connect.income_mapper import IncomeMapper
 from mysql_connect.stock_basic_mapper import StockBasicMapper
+from mysql_connect.sync_state_mapper import SyncStateMapper
 from tu_share_factory.tu_share_factory import TuShareFactory
 from util.date_util import TimeUtils
 
@@ -34,33 +34,52 @@ class IncomeSync:
         "net_expo_hedging_benefits", "oth_impair_loss_assets", "total_opcost", "amodcost_fin_assets"
     ]
     BATCH_SIZE = 100
+    # sync_state 中的数据集名称
+    DATASET = 'income'
     
     def __init__(self):
         self.mapper = IncomeMapper()
         self.stock_basic_mapper = StockBasicMapper()
+        self.sync_state_mapper = SyncStateMapper()
     
     def additional_data(self):
-        """增量同步所有股票的收入数据"""
+        """增量同步所有股票的收入数据，返回写入条数"""
         ts_code_list = self.stock_basic_mapper.get_all_ts_codes()
 
+        end_date = TimeUtils.get_current_date_str()
+        # 全部股票的水位线一次读取（每只股票落库后推进，中断后从断点继续）
+        watermarks = self.sync_state_mapper.load_watermarks(self.DATASET, self.mapper.select_max_end_date_by_code)
+        requests = []
         for ts_code in ts_code_list:
-            start_date = self.mapper.get_max_end_date(ts_code=ts_code)
-            start_date = start_date if start_date else '19000101'
-            time.sleep(0.3)
-            try:
-                self._sync_data(ts_code, start_date, TimeUtils.get_current_date_str())
-            except Exception as e:
-                print(f'插入股票{ts_code} 收入数据失败: {e}，30秒后重试')
-                time.sleep(30)
-                self._sync_data(ts_code, start_date, TimeUtils.get_current_date_str())
+            start_date = watermarks.get(ts_code) or '19000101'
+            requests.append({'ts_code': ts_code, 'start_date': start_date, 'end_date': end_date,
+                             'fields': self.FIELDS})
+
+        # 各股票并发请求（共享客户端限流、重试），按顺序落库；重试后仍失败时中止
+        pro = TuShareFactory.build_api_client()
+        total = 0
+        for request, income_info in pro.imap('income', requests):
+            ts_code = request['ts_code']
+            if isinstance(income_info, Exception):
+                print(f'插入股票{ts_code} 收入数据失败: {income_info}')
+                self.sync_state_mapper.record_error(self.DATASET, ts_code, income_info)
+                raise income_info
+            total += self._save_data(ts_code, income_info)
+            if not income_info.empty:
+                self.sync_state_mapper.advance(self.DATASET, ts_code, income_info['end_date'].max())
+        return total
     
     def _sync_data(self, ts_code: str, start_date: str, end_date: str):
         """同步单个股票的收入数据"""
         pro = TuShareFactory.build_api_client()
 
         income_info = pro.income(ts_code=ts_code, start_date=start_date, end_date=end_date, fields=self.FIELDS)
+        self._save_data(ts_code, income_info)
+    
+    def _save_data(self, ts_code: str, income_info):
+        """写入单个股票的收入数据"""
         if income_info.empty:
-            return
+            return 0
 
         # 去重并存储
         month_income_info = income_info.drop_duplicates(subset='end_date', keep='first')
@@ -83,3 +102,4 @@ class IncomeSync:
             print(f"最后批次插入 {len(batch_data)} 条数据")
 
         print(f"股票 {ts_code} 处理完成，共处理 {total_count} 条数据")
+        return total_count
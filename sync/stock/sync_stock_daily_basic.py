@@ -1,138 +1,317 @@
-import time
-from datetime import datetime
-
+import numpy as np
 import pandas as pd
-from fontTools.misc.plistlib import end_date
 
-from entity.financial_data import FinancialData
-from entity.stock_daily_basic import StockDailyBasic
 from mysql_connect.financial_data_mapper import FinancialDataMapper
 from mysql_connect.stock_basic_mapper import StockBasicMapper
 from mysql_connect.stock_daily_basic_mapper import StockDailyBasicMapper
+from mysql_connect.sync_state_mapper import ALL_CODES, SyncStateMapper
 from tu_share_factory.tu_share_factory import TuShareFactory
-from util.class_util import ClassUtil
 from util.date_util import TimeUtils
 
 
 class StockDailyBasicSync:
-    """股票日线基础数据同步器"""
+    """
+    股票日线基础数据同步器
+
+    两种模式:
+    - 按交易日截面（默认）: 每个缺失交易日一次 daily_basic(trade_date=...) 返回全市场，
+      全市场水位线逐日推进，每日同步只需几次调用
+    - 逐只股票: 每只股票一次 daily_basic(ts_code=...)，回溯 93 天，用于指定股票的修复
+
+    水位线记录在 sync_state 中：全市场截面为 (DATASET_MARKET, *)，逐只股票为 (DATASET, ts_code)，
+    截面写入时同时推进当日涉及股票的逐只水位线。
+    """
     
     TRADE_CAL_FIELDS = ["exchange", "cal_date", "is_open", "pretrade_date"]
+    DAILY_BASIC_FIELDS = [
+        "ts_code", "trade_date", "close", "turnover_rate", "turnover_rate_f",
+        "volume_ratio", "pe", "pe_ttm", "pb", "ps", "ps_ttm", "dv_ratio",
+        "dv_ttm", "total_share", "float_share", "free_share", "total_mv", "circ_mv"
+    ]
     BATCH_SIZE = 100
+    # 截面模式每个交易日约 5000 行，按大批次写入
+    CROSS_SECTION_BATCH_SIZE = 1000
+    # 无数据时的同步起点
+    HISTORY_START = '20120101'
+    # 财报最多延迟一个季度披露：新公告的股票重算最近 93 天的扣非市盈率
+    PROFIT_DEDT_REFRESH_DAYS = 93
+    # sync_state 中的数据集名称
+    DATASET = 'stock_daily_basic'
+    DATASET_MARKET = 'stock_daily_basic_market'
     
     def __init__(self):
         self.stock_daily_basic_mapper = StockDailyBasicMapper()
         self.stock_basic_mapper = StockBasicMapper()
         self.financial_mapper = FinancialDataMapper()
+        self.sync_state_mapper = SyncStateMapper()
+    
+    def sync_all(self, by_trade_date: bool = True):
+        """
+        同步所有股票的日线基础数据
+
+        Args:
+            by_trade_date: True 按交易日截面同步，False 逐只股票同步
+        """
+        if by_trade_date:
+            return self.sync_by_trade_date()
+        return self.sync_by_stock()
+    
+    # ==================== 按交易日截面同步 ====================
+    
+    def sync_by_trade_date(self, end_date=None, refresh_days=PROFIT_DEDT_REFRESH_DAYS):
+        """
+        按交易日截面同步：全局水位线之后的每个交易日一次 daily_basic(trade_date=...)
+
+        每个交易日写入后推进水位线；某个交易日获取失败时停止，之后的交易日留到下次同步
+        （水位线不会越过缺失的交易日）。
+
+        Args:
+            end_date: 结束日期，默认今天
+            refresh_days: 重算扣非市盈率的回溯天数（仅最近有新财报公告的股票），0 表示不重算
+
+        Returns:
+            int: 写入影响的行数
+        """
+        end_date = end_date or TimeUtils.get_current_date_str()
+        watermark = self.sync_state_mapper.load_watermark(
+            self.DATASET_MARKET, ALL_CODES, self.stock_daily_basic_mapper.select_global_max_trade_date)
+        # 逐只水位线首次使用时先由数据表初始化，之后随截面一起推进
+        self._load_stock_watermarks()
+        start_date = TimeUtils.get_n_days_before_or_after(watermark, 1, is_before=False) \
+            if watermark else self.HISTORY_START
+        trade_dates = self._get_trade_dates(start_date, end_date) if start_date <= end_date else []
+        print(f"日线基础数据水位线 {watermark}，待同步交易日 {len(trade_dates)} 个")
+
+        financial_df = self.financial_mapper.select_frame(columns='ts_code, ann_date, end_date, profit_dedt')
+        profit_steps = self._build_profit_dedt_steps(financial_df)
+
+        pro = TuShareFactory.build_api_client()
+        requests = [{'trade_date': trade_date, 'fields': self.DAILY_BASIC_FIELDS} for trade_date in trade_dates]
+        total = 0
+        for request, daily_basic_df in pro.imap('daily_basic', requests):
+            trade_date = request['trade_date']
+            if isinstance(daily_basic_df, Exception):
+                print(f"        交易日 {trade_date} 截面获取失败: {daily_basic_df}，其后交易日下次同步")
+                self.sync_state_mapper.record_error(self.DATASET_MARKET, ALL_CODES, daily_basic_df)
+                break
+            if daily_basic_df is None or daily_basic_df.empty:
+                # 当日数据尚未发布，水位线停在前一交易日
+                print(f"        交易日 {trade_date} 截面暂无数据，其后交易日下次同步")
+                break
+            frame = self._with_profit_dedt(daily_basic_df, profit_steps)
+            total += self.stock_daily_basic_mapper.upsert_stock_daily_basic_frame(
+                frame, self.CROSS_SECTION_BATCH_SIZE)
+            self.sync_state_mapper.advance_many(self.DATASET, dict.fromkeys(frame['ts_code'], trade_date))
+            self.sync_state_mapper.advance(self.DATASET_MARKET, ALL_CODES, trade_date)
+            print(f"交易日 {trade_date} 处理完成，共 {len(frame)} 只股票")
+
+        if refresh_days and watermark:
+            refresh_start = TimeUtils.get_n_days_before_or_after(watermark, refresh_days, is_before=True)
+            total += self._refresh_profit_dedt(refresh_start, watermark, financial_df, profit_steps)
+        return total
+    
+    def _get_trade_dates(self, start_date, end_date):
+        """上交所交易日历中 [start_date, end_date] 内的开市日（升序）"""
+        pro = TuShareFactory.build_api_client()
+        trade_cal = pro.trade_cal(exchange='SSE', start_date=start_date, end_date=end_date,
+                                  fields=self.TRADE_CAL_FIELDS)
+        if trade_cal is None or trade_cal.empty:
+            return []
+        return sorted(trade_cal.loc[trade_cal['is_open'].astype(int) == 1, 'cal_date'].astype(str).tolist())
+    
+    def _with_profit_dedt(self, daily_basic_df, profit_steps):
+        """为截面（多只股票）按预计算的扣非净利润阶梯序列添加扣非市盈率列"""
+        pe_profit_dedt_list, pe_ttm_profit_dedt_list = self._apply_profit_dedt(daily_basic_df, profit_steps)
+        return daily_basic_df.assign(pe_profit_dedt=pe_profit_dedt_list,
+                                     pe_ttm_profit_dedt=pe_ttm_profit_dedt_list)
+    
+    def _refresh_profit_dedt(self, start_date, end_date, financial_df, profit_steps):
+        """
+        重算 [start_date, end_date] 内扣非市盈率（只处理公告日期在区间内的股票）
+
+        逐只模式每次回溯 93 天重新拉取来覆盖财报延迟披露；截面模式不再重复拉取行情，
+        直接读取库中 circ_mv 重算并按键批量更新。
+        """
+        if financial_df is None or financial_df.empty:
+            return 0
+        announced = financial_df['ann_date'].fillna('').astype(str) >= start_date
+        ts_codes = financial_df.loc[announced, 'ts_code'].unique().tolist()
+        if not ts_codes:
+            return 0
+        daily_df = self.stock_daily_basic_mapper.select_frame_by_trade_date_range_and_ts_code(
+            start_date, end_date, ts_codes, columns='ts_code, trade_date, circ_mv', dtypes={'trade_date': str})
+        if daily_df.empty:
+            return 0
+        frame = self._with_profit_dedt(daily_df, profit_steps)
+        updated = self.stock_daily_basic_mapper.update_dataframe(
+            frame, ['ts_code', 'trade_date'], ['pe_profit_dedt', 'pe_ttm_profit_dedt'])
+        print(f"重算 {len(ts_codes)} 只新公告股票 {start_date}~{end_date} 的扣非市盈率，更新 {updated} 行")
+        return updated
+    
+    # ==================== 逐只股票同步 ====================
     
-    def sync_all(self):
-        """同步所有股票的日线基础数据"""
+    def sync_by_stock(self, ts_codes=None):
+        """
+        逐只股票同步（每只股票从其最大交易日前推 93 天重新拉取）
+
+        Args:
+            ts_codes: 指定股票代码列表（修复个别股票），默认全部股票
+        """
         end_date = TimeUtils.get_current_date_str()
-        ts_codes = self.stock_basic_mapper.get_all_ts_codes()
+        ts_codes = ts_codes or self.stock_basic_mapper.get_all_ts_codes()
+        watermarks = self._load_stock_watermarks()
+        requests = []
         for ts_code in ts_codes:
-            start_date = self.stock_daily_basic_mapper.select_max_trade_date(ts_code)
+            start_date = watermarks.get(ts_code)
             # 往前推93天，因为季度原因，最多延迟一个季度同步
             start_date = TimeUtils.get_n_days_before_or_after(start_date, 93, True) \
-                if start_date is not None else '20120101'
-            self._fetch_data_batch(ts_code, start_date, end_date)
+                if start_date is not None else self.HISTORY_START
+            requests.append({'ts_code': ts_code, 'start_date': start_date, 'end_date': end_date,
+                             'fields': self.DAILY_BASIC_FIELDS})
+
+        # 各股票并发请求（共享客户端限流、重试），按顺序逐只计算落库
+        pro = TuShareFactory.build_api_client()
+        for request, daily_basic_df in pro.imap('daily_basic', requests):
+            ts_code = request['ts_code']
+            if isinstance(daily_basic_df, Exception):
+                print(f"        批次数据获取失败: {daily_basic_df}, {ts_code}")
+                self.sync_state_mapper.record_error(self.DATASET, ts_code, daily_basic_df)
+                continue
+            if self._save_data_batch(ts_code, daily_basic_df) and not daily_basic_df.empty:
+                self.sync_state_mapper.advance(self.DATASET, ts_code, daily_basic_df['trade_date'].max())
+    
+    def _load_stock_watermarks(self):
+        """全部股票的逐只水位线 {ts_code: YYYYMMDD}（一次查询）"""
+        return self.sync_state_mapper.load_watermarks(
+            self.DATASET, self.stock_daily_basic_mapper.select_max_trade_date_by_code)
     
     def _fetch_data_batch(self, ts_code, start_date, end_date):
         """获取单个时间批次的数据"""
         pro = TuShareFactory.build_api_client()
-        exchange = "SZSE" if ts_code.endswith("SZ") else "SSE"
-        time.sleep(0.2)
-
         try:
-            batch_idx = 0
-
             daily_basic_df = pro.daily_basic(
                 ts_code=ts_code,
                 start_date=start_date,
                 end_date=end_date,
-                fields=[
-                    "ts_code", "trade_date", "close", "turnover_rate", "turnover_rate_f", 
-                    "volume_ratio", "pe", "pe_ttm", "pb", "ps", "ps_ttm", "dv_ratio", 
-                    "dv_ttm", "total_share", "float_share", "free_share", "total_mv", "circ_mv"
-                ]
+                fields=self.DAILY_BASIC_FIELDS
             )
-            
-            batch_data = []
-            batch_count = 0
-            total_processed = 0
-
-            data = self.financial_mapper.select_financial_data_by_ts_code(ts_code=ts_code)
-            data_frame_list = []
-            for row in data:
-                financial_data = ClassUtil.create_entities_from_data(FinancialData, row)
-                data_frame_list.append(financial_data.to_dict())
-            financial_data_pd = pd.DataFrame(data_frame_list)
-
-            for _, row in daily_basic_df.iterrows():
-                pe_profit_dedt = None
-                pe_ttm_profit_dedt = None
-
-                # 获取上一年年终扣非净利润
-                if financial_data_pd is not None and not financial_data_pd.empty:
-                    last_day_of_previous_year = TimeUtils.get_last_day_of_previous_year(row['trade_date'])
-                    filtered_data = financial_data_pd[financial_data_pd['end_date'] == TimeUtils.date_to_str(last_day_of_previous_year)]
-                    if len(filtered_data) > 0 and 'profit_dedt' in filtered_data.columns and filtered_data['profit_dedt'] is not None:
-                        pe_profit_dedt = row['circ_mv'] * 10000 / filtered_data['profit_dedt'].iloc[0]
-
-                    profit_dedt_ttm = self._get_profit_dedt_ttm(financial_data_pd, row['trade_date'])
-                    if profit_dedt_ttm is not None:
-                        pe_ttm_profit_dedt = row['circ_mv'] * 10000 / profit_dedt_ttm
-
-                daily_data = StockDailyBasic.from_df_row(row)
-                daily_data.pe_profit_dedt = pe_profit_dedt if pe_profit_dedt is not None and pe_profit_dedt >= 0 else None
-                daily_data.pe_ttm_profit_dedt = pe_ttm_profit_dedt if pe_ttm_profit_dedt is not None and pe_ttm_profit_dedt >= 0 else None
-
-                batch_data.append(daily_data)
-                batch_count += 1
-
-                if len(batch_data) >= self.BATCH_SIZE:
-                    self.stock_daily_basic_mapper.batch_insert_stock_daily_basic(batch_data)
-                    print(f"  第 {batch_idx} 批已处理 {batch_count} 条数据，当前批次插入 {len(batch_data)} 条")
-                    total_processed += len(batch_data)
-                    batch_data = []
-                    batch_idx += 1
-
-            if batch_data:
-                self.stock_daily_basic_mapper.batch_insert_stock_daily_basic(batch_data)
-                print(f"  第 {batch_idx} 批最后批次插入 {len(batch_data)} 条数据")
-                total_processed += len(batch_data)
-
-            print(f"第 {batch_idx} 批处理完成，共处理 {batch_count} 条数据")
         except Exception as e:
-            print(f"        批次数据获取失败: {e}, {ts_code}，50秒后重试")
-            time.sleep(50)
-            self._fetch_data_batch(ts_code, start_date, end_date)
-    
-    def _get_profit_dedt_ttm(self, data_pd, date):
-        """计算TTM扣非净利润"""
-        records = data_pd[data_pd['end_date'] <= date]
-        records = records.sort_values(by='end_date', ascending=False)
-        if len(records) < 5:
-            return None
-        records = records.head(5)
-
-        last_quarter_date = records.iloc[0]['end_date']
-        last_quarter_date_time = TimeUtils.str_to_date(last_quarter_date)
-        if last_quarter_date_time.month == 12:
-            return records.iloc[0]['profit_dedt']
-        else:
-            last_year_this_quarter = datetime(
-                last_quarter_date_time.year - 1, 
-                last_quarter_date_time.month,
-                last_quarter_date_time.day
+            print(f"        批次数据获取失败: {e}, {ts_code}")
+            return
+        self._save_data_batch(ts_code, daily_basic_df)
+    
+    def _save_data_batch(self, ts_code, daily_basic_df):
+        """计算扣非市盈率并写入单只股票的日线基础数据，返回是否写入成功"""
+        try:
+            financial_data_pd = self.financial_mapper.select_frame_by_ts_code(
+                ts_code, columns='ts_code, end_date, profit_dedt')
+            pe_profit_dedt_list, pe_ttm_profit_dedt_list = self._compute_profit_dedt(
+                daily_basic_df, financial_data_pd)
+
+            # DataFrame 直接列式写入，不再逐行构造 StockDailyBasic
+            daily_basic_df = daily_basic_df.assign(
+                pe_profit_dedt=pe_profit_dedt_list,
+                pe_ttm_profit_dedt=pe_ttm_profit_dedt_list
             )
-            last_year_this_quarter_str = TimeUtils.date_to_str(last_year_this_quarter)
-            last_year_last_date = datetime(last_quarter_date_time.year - 1, 12, 31)
-            last_year_last_date_str = TimeUtils.date_to_str(last_year_last_date)
-            last_year_data = records[records['end_date'] == last_year_last_date_str]
-            last_year_this_quarter_data = records[records['end_date'] == last_year_this_quarter_str]
-
-            if (last_year_data is not None and last_year_this_quarter_data is not None
-                    and not last_year_data.empty and not last_year_this_quarter_data.empty):
-                return records['profit_dedt'].iloc[0] + last_year_data['profit_dedt'].iloc[0] - last_year_this_quarter_data['profit_dedt'].iloc[0]
-            else:
-                return None
+            self.stock_daily_basic_mapper.upsert_stock_daily_basic_frame(daily_basic_df, self.BATCH_SIZE)
+
+            print(f"{ts_code} 处理完成，共处理 {len(daily_basic_df)} 条数据")
+            return True
+        except Exception as e:
+            print(f"        批次数据处理失败: {e}, {ts_code}")
+            self.sync_state_mapper.record_error(self.DATASET, ts_code, e)
+            return False
+    
+    # ==================== 扣非市盈率 ====================
+    
+    def _compute_profit_dedt(self, daily_basic_df, financial_data_pd):
+        """
+        计算单只（或多只）股票各交易日的扣非市盈率（静态 / TTM），负值置为 None
+
+        Returns:
+            tuple: (pe_profit_dedt 列表, pe_ttm_profit_dedt 列表)，与 daily_basic_df 行顺序一致
+        """
+        return self._apply_profit_dedt(daily_basic_df, self._build_profit_dedt_steps(financial_data_pd))
+    
+    def _build_profit_dedt_steps(self, financial_data_pd):
+        """
+        预计算每只股票按报告期的扣非净利润阶梯序列
+
+        每个 (ts_code, end_date) 一行：profit_dedt 为该期扣非净利润（静态市盈率按上一年年报取值），
+        profit_dedt_ttm 为交易日落在该报告期之后（到下一报告期之前）时的 TTM 扣非净利润，
+        不足 5 期为空；年报直接取值；
+        否则为 本期 + 上年年报 - 上年同期，且两者须在最近 5 期内。
+
+        Returns:
+            DataFrame: ts_code, end_date, date_key(int), profit_dedt, profit_dedt_ttm，按 date_key 升序
+        """
+        columns = ['ts_code', 'end_date', 'date_key', 'profit_dedt', 'profit_dedt_ttm']
+        if financial_data_pd is None or financial_data_pd.empty:
+            return pd.DataFrame(columns=columns)
+
+        fin = financial_data_pd.loc[financial_data_pd['end_date'].notna(), ['ts_code', 'end_date', 'profit_dedt']]
+        fin = fin.astype({'end_date': str, 'profit_dedt': float})
+        # (ts_code, end_date) 唯一；稳定排序保证重复时与原逻辑一样取首条
+        fin = fin.sort_values(['ts_code', 'end_date'], kind='mergesort') \
+            .drop_duplicates(['ts_code', 'end_date'], keep='first').reset_index(drop=True)
+        fin['rank'] = fin.groupby('ts_code', sort=False).cumcount()
+
+        # 上年年报 / 上年同期按 (ts_code, end_date) 查找，并取回其期序号判断是否在最近 5 期内
+        lookup = fin[['ts_code', 'end_date', 'profit_dedt', 'rank']]
+        previous_year = (fin['end_date'].str[:4].astype(int) - 1).astype(str)
+        year_end = fin[['ts_code']].assign(end_date=previous_year + '1231') \
+            .merge(lookup, how='left', on=['ts_code', 'end_date'])
+        same_quarter = fin[['ts_code']].assign(end_date=previous_year + fin['end_date'].str[4:]) \
+            .merge(lookup, how='left', on=['ts_code', 'end_date'])
+
+        rank = fin['rank'].to_numpy()
+        profit = fin['profit_dedt'].to_numpy()
+        in_window = (year_end['rank'].to_numpy() >= rank - 4) & (same_quarter['rank'].to_numpy() >= rank - 4)
+        ttm = np.where(in_window,
+                       profit + year_end['profit_dedt'].to_numpy() - same_quarter['profit_dedt'].to_numpy(),
+                       np.nan)
+        ttm = np.where(fin['end_date'].str[4:6].to_numpy() == '12', profit, ttm)
+        fin['profit_dedt_ttm'] = np.where(rank >= 4, ttm, np.nan)
+        fin['date_key'] = fin['end_date'].astype(np.int64)
+        return fin.sort_values('date_key', kind='mergesort')[columns].reset_index(drop=True)
+    
+    def _apply_profit_dedt(self, daily_basic_df, profit_steps):
+        """
+        将扣非净利润阶梯序列连接到日线行上并按列计算扣非市盈率
+
+        静态：按交易日所在年份的上一年年报精确连接；
+        TTM：merge_asof 取报告期不晚于交易日的最近一期。
+
+        Returns:
+            tuple: (pe_profit_dedt 列表, pe_ttm_profit_dedt 列表)，与 daily_basic_df 行顺序一致
+        """
+        if daily_basic_df is None or daily_basic_df.empty:
+            return [], []
+        if profit_steps is None or profit_steps.empty:
+            return [None] * len(daily_basic_df), [None] * len(daily_basic_df)
+
+        rows = pd.DataFrame({
+            'row': np.arange(len(daily_basic_df)),
+            'ts_code': daily_basic_df['ts_code'].to_numpy(),
+            'trade_date': daily_basic_df['trade_date'].astype(str).to_numpy(),
+            'circ_mv': pd.to_numeric(daily_basic_df['circ_mv'], errors='coerce').to_numpy(dtype=float),
+        })
+        rows['date_key'] = rows['trade_date'].astype(np.int64)
+        rows['end_date'] = (rows['trade_date'].str[:4].astype(int) - 1).astype(str) + '1231'
+
+        annual = rows[['ts_code', 'end_date']].merge(
+            profit_steps[['ts_code', 'end_date', 'profit_dedt']], how='left', on=['ts_code', 'end_date'])
+        ttm = pd.merge_asof(rows[['row', 'ts_code', 'date_key']].sort_values('date_key', kind='mergesort'),
+                            profit_steps[['ts_code', 'date_key', 'profit_dedt_ttm']],
+                            on='date_key', by='ts_code', direction='backward').sort_values('row')
+
+        circ_mv = rows['circ_mv'].to_numpy() * 10000
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pe_profit_dedt = circ_mv / annual['profit_dedt'].to_numpy(dtype=float)
+            pe_ttm_profit_dedt = circ_mv / ttm['profit_dedt_ttm'].to_numpy(dtype=float)
+        return self._non_negative_or_none(pe_profit_dedt), self._non_negative_or_none(pe_ttm_profit_dedt)
+    
+    @staticmethod
+    def _non_negative_or_none(values):
+        """负值和空值置为 None"""
+        return [float(v) if v >= 0 else None for v in values]
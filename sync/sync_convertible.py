@@ -8,8 +8,8 @@
     from sync.sync_convertible import sync_all, sync_basic, sync_daily
 
     sync_all()              # 同步全部
-    sync_daily()            # 仅同步日线（增量）
-    sync_daily(ts_code='113044.SH')  # 仅同步指定转债
+    sync_daily()            # 仅同步日线（增量，按交易日截面）
+    sync_daily(ts_code='113044.SH')  # 仅同步指定转债（逐只模式，用于修复）
 
 CLI:
     python sync/sync_convertible.py basic      # 同步基本信息
@@ -18,12 +18,11 @@ CLI:
 """
 
 import pandas as pd
-import time
 from datetime import datetime, timedelta
 from sqlalchemy import text, Column, Integer, String, DECIMAL, DateTime, func, UniqueConstraint, Index
 from mysql_connect.db import get_session, get_engine, Base
 from mysql_connect.common_mapper import CommonMapper
-from entity.convertible_bond import ConvertibleBondBasic, ConvertibleBondDaily
+from entity.convertible_bond import ConvertibleBondBasic
 from tu_share_factory.tu_share_factory import TuShareFactory
 
 # ==================== ORM 模型（用于自动建表） ====================
@@ -95,6 +94,8 @@ CB_DAILY_FIELDS = [
     'pre_close', 'change', 'pct_chg', 'vol', 'amount',
 ]
 
+TRADE_CAL_FIELDS = 'exchange,cal_date,is_open'
+
 BATCH_SIZE = 500
 DAYS_PER_REQUEST = 60  # Tushare 单次请求最大天数限制
 
@@ -141,6 +142,21 @@ def get_active_basic_codes() -> list:
     return [r[0] for r in result]
 
 
+def get_basic_codes() -> set:
+    """cb_basic 中的全部转债代码（含已退市，截面同步时用于过滤）"""
+    with get_session() as session:
+        result = session.execute(text("SELECT ts_code FROM cb_basic")).fetchall()
+    return {r[0] for r in result}
+
+
+def get_trade_dates(pro, start: str, end: str) -> list:
+    """上交所交易日历中 [start, end] 内的开市日（升序）"""
+    df = pro.trade_cal(exchange='SSE', start_date=start, end_date=end, fields=TRADE_CAL_FIELDS)
+    if df is None or df.empty:
+        return []
+    return sorted(df.loc[df['is_open'].astype(int) == 1, 'cal_date'].astype(str).tolist())
+
+
 # ==================== 数据同步 ====================
 
 
@@ -181,78 +197,104 @@ def sync_basic() -> int:
     return total
 
 
-def _get_stock_close(pro, stk_code: str, trade_date: str) -> float:
-    """
-    获取指定股票在指定日期的收盘价
-
-    Args:
-        pro: Tushare API client
-        stk_code: 正股代码
-        trade_date: 交易日期
-
-    Returns:
-        float: 收盘价，获取失败返回 None
-    """
-    try:
-        df = pro.daily(ts_code=stk_code, trade_date=trade_date,
-                       fields='close', limit=1)
-        if df is not None and not df.empty:
-            return float(df.iloc[0]['close'])
-    except Exception:
-        pass
-    return None
+def _next_start_date() -> str:
+    """增量同步的开始日期：最新数据后一天；首次同步取近1年"""
+    latest = get_latest_trade_date()
+    if latest:
+        # 从最新日期的下一天开始
+        dt = datetime.strptime(latest, '%Y%m%d') + timedelta(days=1)
+    else:
+        # 首次同步：获取近1年数据
+        dt = datetime.now() - timedelta(days=365)
+    return dt.strftime('%Y%m%d')
 
 
-def sync_daily(start: str = None, end: str = None, ts_code: str = None) -> int:
+def sync_daily(start: str = None, end: str = None, ts_code: str = None,
+               by_trade_date: bool = True) -> int:
     """
     同步可转债日线行情 (cb_daily)
 
+    默认按交易日截面同步：每个缺失交易日一次 cb_daily(trade_date=...) 返回全部转债，
+    日常增量只需一两次请求；指定 ts_code 或 by_trade_date=False 时逐只请求。
+
     Args:
         start: 开始日期 YYYYMMDD，默认从最新数据后一天开始
         end: 结束日期 YYYYMMDD，默认为今天
-        ts_code: 指定转债代码，不传则同步全部（但分批请求，避免超限）
+        ts_code: 指定转债代码，不传则同步全部
+        by_trade_date: 是否按交易日截面同步（指定 ts_code 时忽略）
 
     Returns:
         int: 同步条数
     """
-    pro = TuShareFactory.build_api_client()
-    mapper = CommonMapper('cb_daily')
-
-    today = datetime.now().strftime('%Y%m%d')
-
-    # 确定开始日期
-    if start is None:
-        latest = get_latest_trade_date()
-        if latest:
-            # 从最新日期的下一天开始
-            dt = datetime.strptime(latest, '%Y%m%d') + timedelta(days=1)
-            start = dt.strftime('%Y%m%d')
-        else:
-            # 首次同步：获取近1年数据
-            dt = datetime.now() - timedelta(days=365)
-            start = dt.strftime('%Y%m%d')
+    start = start or _next_start_date()
+    end = end or datetime.now().strftime('%Y%m%d')
 
-    if end is None:
-        end = today
-
-    if start >= end:
+    if start > end:
         print(f"[CB] 日线数据已是最新 (latest={get_latest_trade_date()})")
         return 0
 
     print(f"[CB] 同步可转债日线: {start} ~ {end}")
 
-    total = 0
-    codes_to_sync = []
-
     if ts_code:
-        codes_to_sync = [ts_code]
-    else:
+        return _sync_daily_by_code([ts_code], start, end)
+    if by_trade_date:
+        return _sync_daily_by_trade_date(start, end)
+
+    codes_to_sync = get_active_basic_codes()
+    if not codes_to_sync:
+        # 如果基本信息还没同步，先同步基本信息
+        print("[WARN] cb_basic 为空，先同步基本信息...")
+        sync_basic()
         codes_to_sync = get_active_basic_codes()
-        if not codes_to_sync:
-            # 如果基本信息还没同步，先同步基本信息
-            print("[WARN] cb_basic 为空，先同步基本信息...")
-            sync_basic()
-            codes_to_sync = get_active_basic_codes()
+    return _sync_daily_by_code(codes_to_sync, start, end)
+
+
+def _sync_daily_by_trade_date(start: str, end: str) -> int:
+    """
+    按交易日截面同步：每个交易日一次请求，整批 UPSERT
+
+    截面只保留 cb_basic 中存在的转债；某个交易日获取失败或截面为空（尚未发布）时停止，
+    之后的交易日留到下次同步（最大交易日水位线不会越过缺失的交易日）。
+    """
+    pro = TuShareFactory.build_api_client()
+    mapper = CommonMapper('cb_daily')
+
+    basic_codes = get_basic_codes()
+    if not basic_codes:
+        # 如果基本信息还没同步，先同步基本信息
+        print("[WARN] cb_basic 为空，先同步基本信息...")
+        sync_basic()
+        basic_codes = get_basic_codes()
+
+    trade_dates = get_trade_dates(pro, start, end)
+    print(f"[CB] 待同步交易日数: {len(trade_dates)}")
+
+    total = 0
+    requests = [{'trade_date': trade_date, 'fields': ','.join(CB_DAILY_FIELDS)}
+                for trade_date in trade_dates]
+    for request, df in pro.imap('cb_daily', requests):
+        if isinstance(df, Exception):
+            print(f"[WARN] 同步 {request['trade_date']} 日线截面失败: {str(df)[:80]}，其后交易日下次同步")
+            break
+
+        if df is None or df.empty:
+            # 当日截面尚未发布，水位线停在前一交易日
+            print(f"[WARN] {request['trade_date']} 日线截面暂无数据，其后交易日下次同步")
+            break
+
+        df = df[df['ts_code'].isin(basic_codes)]
+        mapper.upsert_dataframe(df[CB_DAILY_FIELDS])
+        total += len(df)
+        print(f"[CB] {request['trade_date']} 已同步 {len(df)} 条日线")
+
+    print(f"[OK] 可转债日线同步完成，共 {total} 条")
+    return total
+
+
+def _sync_daily_by_code(codes_to_sync: list, start: str, end: str) -> int:
+    """逐只转债同步 [start, end] 的日线（用于指定转债的修复）"""
+    pro = TuShareFactory.build_api_client()
+    mapper = CommonMapper('cb_daily')
 
     if not codes_to_sync:
         print("[WARN] 没有需要同步日线的转债代码")
@@ -260,59 +302,37 @@ def sync_daily(start: str = None, end: str = None, ts_code: str = None) -> int:
 
     print(f"[CB] 待同步转债数: {len(codes_to_sync)}")
 
-    # 逐只同步，控制请求速度避免限流
-    entities = []
-    for idx, code in enumerate(codes_to_sync):
-        try:
-            # 每只转债之间延时 0.35s，控制 ~170次/分钟 < 200次/分钟限制
-            if idx > 0:
-                time.sleep(0.35)
-
-            df = pro.cb_daily(ts_code=code, start_date=start,
-                              end_date=end,
-                              fields=','.join(CB_DAILY_FIELDS))
-
-            if df is None or df.empty:
-                continue
-
-            for _, row in df.iterrows():
-                entity = ConvertibleBondDaily.from_df_row(row)
-                entities.append(entity)
-
-            if len(entities) >= BATCH_SIZE:
-                mapper.upsert_base_entities_batch(entities)
-                total += len(entities)
-                print(f"[CB] 已同步 {total} 条日线...")
-                entities = []
-
-        except Exception as e:
-            err_msg = str(e)
-            if '频率超限' in err_msg or 'rate limit' in err_msg.lower():
-                print(f"[WARN] 触发限流，等待60秒后重试 {code}...")
-                time.sleep(60)
-                try:
-                    df = pro.cb_daily(ts_code=code, start_date=start,
-                                      end_date=end,
-                                      fields=','.join(CB_DAILY_FIELDS))
-                    if df is not None and not df.empty:
-                        for _, row in df.iterrows():
-                            entity = ConvertibleBondDaily.from_df_row(row)
-                            entities.append(entity)
-                        if len(entities) >= BATCH_SIZE:
-                            mapper.upsert_base_entities_batch(entities)
-                            total += len(entities)
-                            entities = []
-                except Exception as e2:
-                    print(f"[WARN] 重试 {code} 仍失败: {e2}")
-            else:
-                print(f"[WARN] 同步 {code} 日线失败: {err_msg[:80]}")
+    # 逐只并发请求（共享客户端按接口配额限流、超限退避重试），按顺序落库
+    # 行情 DataFrame 直接列式写入，不再逐行构造 ConvertibleBondDaily
+    total = 0
+    pending = []
+
+    def flush():
+        nonlocal total, pending
+        if not pending:
+            return
+        batch_df = pd.concat(pending, ignore_index=True)
+        mapper.upsert_dataframe(batch_df[CB_DAILY_FIELDS])
+        total += len(batch_df)
+        print(f"[CB] 已同步 {total} 条日线...")
+        pending = []
+
+    requests = [{'ts_code': code, 'start_date': start, 'end_date': end,
+                 'fields': ','.join(CB_DAILY_FIELDS)} for code in codes_to_sync]
+    for request, df in pro.imap('cb_daily', requests):
+        if isinstance(df, Exception):
+            print(f"[WARN] 同步 {request['ts_code']} 日线失败: {str(df)[:80]}")
+            continue
+
+        if df is None or df.empty:
             continue
 
+        pending.append(df)
+        if sum(len(d) for d in pending) >= BATCH_SIZE:
+            flush()
+
     # 落库剩余
-        if entities:
-            mapper.upsert_base_entities_batch(entities)
-            total += len(entities)
-            print(f"[CB] 已同步 {total} 条日线...")
+    flush()
 
     print(f"[OK] 可转债日线同步完成，共 {total} 条")
     return total
@@ -0,0 +1,176 @@
+"""
+同步任务依赖图执行器
+
+各同步阶段声明依赖后，相互独立的阶段在线程池中并发执行，
+全部阶段共用进程内唯一的 TushareClient（TuShareFactory.build_api_client），
+因此并发只会把共享的接口配额跑满，不会超限；总耗时接近依赖图的关键路径。
+
+- 某阶段失败时，依赖它的阶段（直接或间接）标记为跳过，其他阶段照常执行
+- 记录每个阶段的耗时、写入行数（阶段函数返回 int 时）和失败信息
+- only / from_stage 选择部分阶段执行，未选中的依赖视为已满足
+
+使用示例:
+    stages = [
+        SyncStage('stock_basic', '股票基础数据', StockBasicSync().sync_all),
+        SyncStage('margin', '两融数据', FinancingMarginTradingSync().additional_data, ('stock_basic',)),
+        ...
+    ]
+    results = run_stages(stages, max_workers=4, from_stage='margin')
+    print(format_stage_results(results))
+"""
+
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+STATUS_OK = 'ok'
+STATUS_FAILED = 'failed'
+STATUS_SKIPPED = 'skipped'
+
+
+@dataclass
+class SyncStage:
+    """同步阶段：名称、说明、执行函数和依赖的阶段名"""
+
+    name: str
+    description: str
+    run: Callable[[], object]
+    depends_on: Tuple[str, ...] = ()
+
+
+@dataclass
+class StageResult:
+    """单个阶段的执行结果"""
+
+    name: str
+    description: str
+    status: str = STATUS_OK
+    elapsed: float = 0.0
+    rows: Optional[int] = None
+    error: Optional[str] = None
+    traceback: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status == STATUS_OK
+
+
+def select_stages(stages: List[SyncStage], only: Optional[Iterable[str]] = None,
+                  from_stage: Optional[str] = None) -> List[SyncStage]:
+    """
+    校验依赖图并选择要执行的阶段
+
+    Args:
+        stages: 全部阶段，须按拓扑顺序排列（依赖在前）
+        only: 只执行这些阶段
+        from_stage: 从该阶段开始执行其后（按 stages 顺序）的全部阶段，用于失败后续跑
+
+    Returns:
+        List[SyncStage]: 选中的阶段，保持原顺序
+
+    Raises:
+        ValueError: 阶段名重复/未知，或依赖未排在前面（含循环依赖）
+    """
+    seen = set()
+    for stage in stages:
+        if stage.name in seen:
+            raise ValueError(f"同步阶段重复: {stage.name}")
+        missing = [dep for dep in stage.depends_on if dep not in seen]
+        if missing:
+            raise ValueError(f"同步阶段 {stage.name} 的依赖 {missing} 不存在或未排在其前面")
+        seen.add(stage.name)
+
+    names = [stage.name for stage in stages]
+    only = list(only) if only else None
+    unknown = [name for name in (only or []) + ([from_stage] if from_stage else []) if name not in seen]
+    if unknown:
+        raise ValueError(f"未知的同步阶段: {unknown}，可选: {names}")
+
+    selected = stages
+    if from_stage:
+        selected = selected[names.index(from_stage):]
+    if only:
+        selected = [stage for stage in selected if stage.name in only]
+    return selected
+
+
+def _run_stage(stage: SyncStage) -> StageResult:
+    result = StageResult(stage.name, stage.description)
+    print(f"[同步] >>> {stage.description} ({stage.name}) 开始")
+    started = time.perf_counter()
+    try:
+        value = stage.run()
+        if isinstance(value, int) and not isinstance(value, bool):
+            result.rows = value
+    except Exception as e:
+        result.status = STATUS_FAILED
+        result.error = str(e)
+        result.traceback = traceback.format_exc()
+    result.elapsed = time.perf_counter() - started
+    if result.ok:
+        print(f"[同步] <<< {stage.description} ({stage.name}) 完成，耗时 {result.elapsed:.1f}s")
+    else:
+        print(f"[同步] !!! {stage.description} ({stage.name}) 失败，耗时 {result.elapsed:.1f}s: {result.error}")
+    return result
+
+
+def run_stages(stages: List[SyncStage], max_workers: int = 4,
+               only: Optional[Iterable[str]] = None,
+               from_stage: Optional[str] = None) -> List[StageResult]:
+    """
+    按依赖关系并发执行同步阶段
+
+    Args:
+        stages: 全部阶段，须按拓扑顺序排列
+        max_workers: 最多同时执行的阶段数，1 为按顺序执行
+        only: 只执行这些阶段
+        from_stage: 从该阶段开始执行
+
+    Returns:
+        List[StageResult]: 选中阶段的结果，按 stages 顺序
+    """
+    selected = select_stages(stages, only, from_stage)
+    selected_names = {stage.name for stage in selected}
+    results: Dict[str, StageResult] = {}
+    pending = list(selected)
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='sync') as pool:
+        while pending or running:
+            # 按拓扑顺序检查，前面阶段的跳过会在同一轮传递给后面的依赖者
+            for stage in list(pending):
+                deps = [dep for dep in stage.depends_on if dep in selected_names]
+                failed = [dep for dep in deps if dep in results and not results[dep].ok]
+                if failed:
+                    results[stage.name] = StageResult(stage.name, stage.description, status=STATUS_SKIPPED,
+                                                      error=f"依赖阶段未成功: {failed}")
+                    print(f"[同步] --- {stage.description} ({stage.name}) 跳过，依赖阶段未成功: {failed}")
+                    pending.remove(stage)
+                elif all(dep in results for dep in deps):
+                    running[pool.submit(_run_stage, stage)] = stage
+                    pending.remove(stage)
+
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                results[stage.name] = future.result()
+
+    return [results[stage.name] for stage in selected]
+
+
+def format_stage_results(results: List[StageResult], wall_time: Optional[float] = None) -> str:
+    """阶段结果的文本表格"""
+    status_text = {STATUS_OK: '成功', STATUS_FAILED: '失败', STATUS_SKIPPED: '跳过'}
+    lines = [f"{'阶段':<14}{'状态':>6}{'耗时':>10}{'行数':>10}  说明"]
+    for r in results:
+        rows = '' if r.rows is None else str(r.rows)
+        note = r.description if r.ok else f"{r.description}: {(r.error or '')[:80]}"
+        lines.append(f"{r.name:<14}{status_text[r.status]:>6}{r.elapsed:>9.1f}s{rows:>10}  {note}")
+    if wall_time is not None:
+        serial = sum(r.elapsed for r in results)
+        lines.append(f"总耗时 {wall_time:.1f}s（各阶段耗时合计 {serial:.1f}s）")
+    return '\n'.join(lines)
@@ -4,26 +4,24 @@
 
 
 
-同步顺序说明：
+同步阶段与依赖（相互独立的阶段并发执行，共用 Tushare 调用配额）：
 
-1. 股票基础数据 - 其他同步依赖此数据
+1. stock_basic 股票基础数据 - 其他同步依赖此数据
 
-2. 两融数据
+2. margin 两融数据、weight 权重数据、income 收入数据、financial 财务数据 - 相互独立，并发执行
 
-3. 权重数据
+3. daily_basic 股票日线数据 - 依赖财务数据（扣非市盈率）
 
-4. 收入数据
-
-5. 财务数据
-
-6. 股票日线数据
-
-7. 指数数据 - 放在最后，因为指数计算依赖上述数据
+4. index 指数数据 - 放在最后，依赖权重数据和股票日线数据
 
 """
 
 import argparse
 
+import sys
+
+import time
+
 from sync.stock.sync_stock_basic import StockBasicSync
 
 from sync.stock.sync_stock_daily_basic import StockDailyBasicSync
@@ -38,11 +36,15 @@ from sync.stock.sync_financial_data import FinancialDataSync
 
 from sync.index.sixty_index_analysis import SixtyIndexAnalysis
 
+from sync.sync_dag import SyncStage, format_stage_results, run_stages
 
-def sync_all(start_date='20200101'):
+from tu_share_factory.tu_share_factory import TuShareFactory
+
+
+def build_sync_stages(start_date='20200101'):
     """
 
-    执行所有同步任务
+    构建同步阶段依赖图（按拓扑顺序）
 
 
 
@@ -52,82 +54,86 @@ def sync_all(start_date='20200101'):
 
     """
 
-    # 1. 同步股票基础数据（其他依赖此数据）
+    return [
 
-    print('=' * 50)
+        SyncStage('stock_basic', '同步股票基础数据', lambda: StockBasicSync().sync_all()),
 
-    print('1. 同步股票基础数据')
+        SyncStage('margin', '同步两融数据', lambda: FinancingMarginTradingSync().additional_data(),
+                  ('stock_basic',)),
 
-    print('=' * 50)
+        SyncStage('weight', '同步权重数据', lambda: StockWeightSync().additional_data(),
+                  ('stock_basic',)),
 
-    StockBasicSync().sync_all()
+        SyncStage('income', '同步收入数据', lambda: IncomeSync().additional_data(),
+                  ('stock_basic',)),
 
-    # 2. 同步两融数据
+        SyncStage('financial', '同步财务数据', lambda: FinancialDataSync().additional_data(),
+                  ('stock_basic',)),
 
-    print('=' * 50)
+        SyncStage('daily_basic', '同步股票日线数据', lambda: StockDailyBasicSync().sync_all(),
+                  ('stock_basic', 'financial')),
 
-    print('2. 同步两融数据')
+        SyncStage('index', '同步指数数据', lambda: SixtyIndexAnalysis().additional_data(start_date),
+                  ('weight', 'daily_basic')),
 
-    print('=' * 50)
+    ]
 
-    FinancingMarginTradingSync().additional_data()
 
-    # 3. 同步权重数据
+def sync_all(start_date='20200101', only=None, from_stage=None, workers=4):
+    """
 
-    print('=' * 50)
+    执行所有同步任务（按依赖关系并发）
 
-    print('3. 同步权重数据')
 
-    print('=' * 50)
 
-    StockWeightSync().additional_data()
+    Args:
 
-    # 4. 同步收入数据
+        start_date: 指数数据同步的开始日期
 
-    print('=' * 50)
+        only: 只执行这些阶段（阶段名列表）
 
-    print('4. 同步收入数据')
+        from_stage: 从该阶段开始执行其后全部阶段（失败后续跑）
 
-    print('=' * 50)
+        workers: 最多同时执行的阶段数，1 为按顺序执行
 
-    IncomeSync().additional_data()
+    Returns:
 
-    # 5. 同步财务数据
+        List[StageResult]: 各阶段的执行结果
 
-    print('=' * 50)
+    """
 
-    print('5. 同步财务数据')
+    started = time.perf_counter()
 
-    print('=' * 50)
+    results = run_stages(build_sync_stages(start_date), max_workers=workers, only=only, from_stage=from_stage)
 
-    FinancialDataSync().additional_data()
-
-    # 6. 同步股票日线数据
+    wall_time = time.perf_counter() - started
 
     print('=' * 50)
 
-    print('6. 同步股票日线数据')
+    print(format_stage_results(results, wall_time))
 
-    print('=' * 50)
+    try:
 
-    StockDailyBasicSync().sync_all()
+        print(TuShareFactory.build_api_client().format_stats())
 
-    # 7. 同步指数数据（最后，依赖上述数据）
+    except Exception as e:
 
-    print('=' * 50)
-
-    print('7. 同步指数数据')
+        print(f'Tushare 调用统计不可用: {e}')
 
     print('=' * 50)
 
-    SixtyIndexAnalysis().additional_data(start_date)
+    if all(r.ok for r in results):
 
-    print('=' * 50)
+        print('所有数据同步完成！')
 
-    print('所有数据同步完成！')
+    else:
+
+        print('部分数据同步失败，可使用 --from <阶段名> 续跑')
 
     print('=' * 50)
 
+    return results
+
 
 def sync_index_only(start_date='20200101'):
     """仅同步指数数据"""
@@ -139,6 +145,8 @@ def sync_index_only(start_date='20200101'):
 
 if __name__ == "__main__":
 
+    stage_names = [stage.name for stage in build_sync_stages()]
+
     parser = argparse.ArgumentParser(description='股票分析系统 - 数据同步')
 
     parser.add_argument('--start-date', default='20150101', help='指数数据同步开始日期 (默认: 20200101)')
@@ -146,6 +154,14 @@ if __name__ == "__main__":
     parser.add_argument('--index-only', type=lambda v: v.lower() in ('true', '1', 'yes'), default=False,
                         help='仅同步指数数据 (true/false, 默认: false)')
 
+    parser.add_argument('--only', type=lambda v: [name.strip() for name in v.split(',') if name.strip()],
+                        default=None, help=f'只执行指定阶段，逗号分隔 (可选: {",".join(stage_names)})')
+
+    parser.add_argument('--from', dest='from_stage', choices=stage_names, default=None,
+                        help='从指定阶段开始执行其后全部阶段')
+
+    parser.add_argument('--workers', type=int, default=4, help='最多同时执行的阶段数 (默认: 4, 1为顺序执行)')
+
     args = parser.parse_args()
 
     if args.index_only:
@@ -154,4 +170,9 @@ if __name__ == "__main__":
 
     else:
 
-        sync_all(args.start_date)
\ No newline at end of file
+        results = sync_all(args.start_date, only=args.only, from_stage=args.from_stage, workers=args.workers)
+
+        # 有阶段失败或被跳过时以非零状态退出，供 cron / 调用方判断
+        if any(not r.ok for r in results):
+
+            sys.exit(1)
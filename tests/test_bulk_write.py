@@ -0,0 +1,145 @@
+"""
+批量写入 (executemany) 单元测试
+
+使用假会话验证分批逻辑，不依赖数据库
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mysql_connect.db import execute_many
+
+
+class FakeResult:
+    def __init__(self, rowcount):
+        self.rowcount = rowcount
+
+
+class FakeSession:
+    """记录每次 execute 的参数"""
+
+    def __init__(self):
+        self.calls = []
+
+    def execute(self, statement, params):
+        self.calls.append((str(statement), params))
+        return FakeResult(len(params))
+
+
+class TestExecuteMany:
+
+    def test_chunks_and_rowcounts(self):
+        session = FakeSession()
+        rows = [{'a': i} for i in range(25)]
+        counts = execute_many(session, "INSERT INTO t (a) VALUES (:a)", rows, chunk_size=10)
+        assert counts == [10, 10, 5]
+        # 每批一次 execute，参数为字典列表 (executemany)
+        assert len(session.calls) == 3
+        assert [len(p) for _, p in session.calls] == [10, 10, 5]
+        assert session.calls[2][1][-1] == {'a': 24}
+
+    def test_empty(self):
+        session = FakeSession()
+        assert execute_many(session, "INSERT INTO t (a) VALUES (:a)", []) == []
+        assert session.calls == []
+
+
+class FakeConnection:
+
+    def __init__(self):
+        self.calls = []
+
+    def exec_driver_sql(self, sql, rows=None):
+        rows = list(rows) if rows is not None else []
+        self.calls.append((sql, rows))
+        return FakeResult(len(rows))
+
+
+class FakeDriverSession:
+
+    def __init__(self):
+        self.conn = FakeConnection()
+
+    def connection(self):
+        return self.conn
+
+
+class TestUpsertDataframe:
+
+    def _patch_session(self, monkeypatch):
+        import contextlib
+        import mysql_connect.common_mapper as common_mapper
+        session = FakeDriverSession()
+
+        @contextlib.contextmanager
+        def fake_get_session():
+            yield session
+
+        monkeypatch.setattr(common_mapper, 'get_session', fake_get_session)
+        return session
+
+    def test_frame_to_column_lists_nan_to_none(self):
+        import numpy as np
+        import pandas as pd
+        from mysql_connect.common_mapper import frame_to_column_lists
+
+        df = pd.DataFrame({
+            'code': ['a', None, 'c'],
+            'close': [1.5, np.nan, 3.0],
+            'vol': np.array([1, 2, 3], dtype=np.int64),
+        })
+        code, close, vol = frame_to_column_lists(df)
+        assert code == ['a', None, 'c']
+        assert close == [1.5, None, 3.0]
+        assert vol == [1, 2, 3]
+        # 转为 Python 原生类型，pymysql 可直接转义
+        assert type(vol[0]) is int and type(close[0]) is float
+
+    def test_upsert_dataframe_sql_and_chunks(self, monkeypatch):
+        import numpy as np
+        import pandas as pd
+        from mysql_connect.common_mapper import CommonMapper
+
+        session = self._patch_session(monkeypatch)
+        df = pd.DataFrame({
+            'ts_code': ['X'] * 5,
+            'trade_date': [f'2024010{i}' for i in range(1, 6)],
+            'close_price': [1.0, np.nan, 3.0, 4.0, 5.0],
+        })
+        counts = CommonMapper('t').upsert_dataframe(
+            df, {'ts_code': 'ts_code', 'trade_date': 'trade_date', 'close_price': 'close'},
+            chunk_size=2
+        )
+        assert counts == [2, 2, 1]
+        sql, rows = session.conn.calls[0]
+        assert 'INSERT INTO `t` (`ts_code`, `trade_date`, `close`) VALUES (%s, %s, %s)' in sql
+        assert 'ON DUPLICATE KEY UPDATE `ts_code` = VALUES(`ts_code`)' in sql
+        assert rows == [('X', '20240101', 1.0), ('X', '20240102', None)]
+
+    def test_update_dataframe_uses_temp_table_join(self, monkeypatch):
+        import numpy as np
+        import pandas as pd
+        from mysql_connect.common_mapper import CommonMapper
+
+        session = self._patch_session(monkeypatch)
+        df = pd.DataFrame({
+            'ts_code': ['X', 'X', 'X'],
+            'trade_date': ['20240101', '20240102', '20240102'],
+            'pe': [10.0, np.nan, 12.0],
+            'close': [1.0, 2.0, 3.0],
+        })
+        CommonMapper('t').update_dataframe(df, ['ts_code', 'trade_date'], ['pe'], chunk_size=10)
+
+        sqls = [sql for sql, _ in session.conn.calls]
+        assert ('CREATE TEMPORARY TABLE `tmp_update_t` (INDEX idx_keys (`ts_code`, `trade_date`)) '
+                'SELECT `ts_code`, `trade_date`, `pe` FROM `t` LIMIT 0') in sqls
+        assert not any(sql.startswith('ALTER') for sql in sqls)
+        insert_sql, rows = next(c for c in session.conn.calls if c[0].startswith('INSERT INTO `tmp_update_t`'))
+        # 重复键保留最后一行，未列出的列不写入
+        assert rows == [('X', '20240101', 10.0), ('X', '20240102', 12.0)]
+        update_sql = next(sql for sql in sqls if sql.startswith('UPDATE'))
+        assert update_sql == ('UPDATE `t` t JOIN `tmp_update_t` s ON t.`ts_code` = s.`ts_code` '
+                              'AND t.`trade_date` = s.`trade_date` SET t.`pe` = s.`pe`')
+        assert sqls[-1] == 'DROP TEMPORARY TABLE IF EXISTS `tmp_update_t`'
@@ -0,0 +1,138 @@
+"""
+指数行情本地列存 (IndexDataStore) 单元测试
+
+使用假 Mapper，不依赖数据库
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis.index_data_store import INDEX_COLUMNS, IndexDataStore, normalize_index_frame
+from mysql_connect.common_mapper import rows_to_frame
+
+
+class FakeIndexMapper:
+    """按 ts_code 保存行，记录区间查询"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.range_calls = []
+
+    def get_max_trade_time(self, ts_code):
+        dates = [r['trade_date'] for r in self.rows if r['ts_code'] == ts_code]
+        return max(dates) if dates else None
+
+    def select_frame_by_code_and_trade_round(self, ts_code, start_date, end_date, columns='*'):
+        self.range_calls.append((start_date, end_date))
+        start, end = datetime.strptime(start_date, '%Y%m%d'), datetime.strptime(end_date, '%Y%m%d')
+        rows = [tuple(r.get(name) for name in INDEX_COLUMNS) for r in self.rows
+                if r['ts_code'] == ts_code and start <= r['trade_date'] <= end]
+        return rows_to_frame(INDEX_COLUMNS, rows)
+
+
+def _rows(dates, close_start=100.0, ts_code='000300.SH'):
+    return [{'ts_code': ts_code, 'trade_date': datetime.strptime(d, '%Y%m%d'), 'close': close_start + i,
+             'pe_ttm': None, 'name': '沪深300', 'deviation_rate': '{"ma_5": 0.01}'}
+            for i, d in enumerate(dates)]
+
+
+DATES = ['20240102', '20240103', '20240104', '20240105']
+
+
+@pytest.fixture
+def store_factory(tmp_path):
+    def make(rows):
+        mapper = FakeIndexMapper(rows)
+        return IndexDataStore(store_dir=str(tmp_path), mapper=mapper), mapper
+    return make
+
+
+class TestIndexDataStore:
+
+    def test_first_load_builds_store_then_reads_locally(self, store_factory):
+        store, mapper = store_factory(_rows(DATES))
+        df = store.load('000300.SH', '20240103', '20240104')
+
+        assert df['trade_date'].dt.strftime('%Y%m%d').tolist() == ['20240103', '20240104']
+        assert df['close'].dtype == np.float64 and df['pe_ttm'].isna().all()
+        assert df['name'].iloc[0] == '沪深300'
+        assert store.watermark('000300.SH') == '20240105'
+        assert len(mapper.range_calls) == 1
+
+        again = store.load('000300.SH', '20240101', '20241231')
+        assert len(again) == 4
+        assert len(mapper.range_calls) == 1
+
+    def test_stale_store_fetches_only_new_rows(self, store_factory):
+        store, mapper = store_factory(_rows(DATES))
+        store.load('000300.SH', '20240101')
+        mapper.rows.extend(_rows(['20240108', '20240109'], close_start=200.0))
+
+        df = store.load('000300.SH', '20240101', '20241231')
+
+        assert mapper.range_calls[-1] == ('20240106', '20240109')
+        assert df['close'].tolist() == [100.0, 101.0, 102.0, 103.0, 200.0, 201.0]
+        assert store.watermark('000300.SH') == '20240109'
+
+    def test_refresh_overwrites_rewritten_rows(self, store_factory):
+        store, mapper = store_factory(_rows(DATES))
+        assert store.refresh('000300.SH', '20240104') is None  # 尚未建立列存
+
+        store.load('000300.SH', '20240101')
+        for row in mapper.rows:
+            if row['trade_date'] >= datetime(2024, 1, 4):
+                row['pe_ttm'] = 12.5
+        merged = store.refresh('000300.SH', '20240104')
+
+        assert merged['pe_ttm'].iloc[:2].isna().all()
+        assert merged['pe_ttm'].iloc[2:].tolist() == [12.5, 12.5]
+        assert len(store.read('000300.SH')) == 4
+
+    def test_invalidate_and_version_mismatch(self, store_factory, monkeypatch):
+        store, mapper = store_factory(_rows(DATES))
+        store.load('000300.SH', '20240101')
+        monkeypatch.setattr(IndexDataStore, 'SCHEMA_VERSION', 99)
+        assert store.read('000300.SH') is None
+
+        monkeypatch.undo()
+        store.invalidate('000300.SH')
+        assert store.watermark('000300.SH') is None
+        store.load('000300.SH', '20240101')
+        assert len(mapper.range_calls) == 2
+
+    def test_db_unavailable_serves_local_copy(self, store_factory):
+        store, mapper = store_factory(_rows(DATES))
+        store.load('000300.SH', '20240101')
+
+        def broken(ts_code):
+            raise ConnectionError('db down')
+        mapper.get_max_trade_time = broken
+        assert len(store.load('000300.SH', '20240101')) == 4
+
+    def test_typed_indicator_columns_read_back(self, store_factory):
+        rows = _rows(DATES)
+        for row in rows:
+            row.update({'deviation_ma_5': 0.01, 'signal_macd': 'golden_cross', 'pctl_pe_ttm': 42.0})
+        store, _ = store_factory(rows)
+        df = store.load('000300.SH', '20240101')
+
+        assert df['deviation_ma_5'].dtype == np.float64 and df['deviation_ma_5'].tolist() == [0.01] * 4
+        assert df['pctl_pe_ttm'].tolist() == [42.0] * 4
+        assert df['signal_macd'].tolist() == ['golden_cross'] * 4
+        assert df['pctl_pb'].isna().all()
+
+    def test_normalize_sorts_and_types(self):
+        df = pd.DataFrame({'trade_date': ['20240103', '20240102'], 'close': ['2.5', None],
+                           'cross_signals': ['{}', None]})
+        out = normalize_index_frame(df)
+        assert out['trade_date'].dtype.kind == 'M'
+        assert np.isnan(out['close'].iloc[0]) and out['close'].iloc[1] == 2.5
+        assert out['cross_signals'].tolist() == [None, '{}']
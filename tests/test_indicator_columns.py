@@ -0,0 +1,155 @@
+"""
+指标类型化列单元测试
+
+计算器输出的类型化列必须与其 JSON 载荷逐键一致，JSON <-> 类型化列可互相转换
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis.cross_signal_detector import CrossSignalDetector
+from analysis.deviation_rate_calculator import DeviationRateCalculator
+from analysis.indicator_columns import (PAYLOADS, decode_payload, expand_payloads, read_payload,
+                                        render_payload, typed_column, typed_columns)
+from analysis.market_regime_detector import MarketRegimeDetector
+from analysis.ml_predictor import MLPredictor
+from analysis.multi_factor_scorer import MultiFactorScorer
+from analysis.percentile_calculator import PercentileCalculator
+from analysis.technical_indicator_calculator import TechnicalIndicatorCalculator
+
+
+def _make_index_frame(n=400, seed=3):
+    rng = np.random.default_rng(seed)
+    close = 3000 + rng.normal(0, 20, n).cumsum()
+    df = pd.DataFrame({
+        'trade_date': pd.date_range('2020-01-01', periods=n, freq='B').strftime('%Y%m%d'),
+        'close': close,
+        'open': close + rng.normal(0, 5, n),
+        'high': close + 10,
+        'low': close - 10,
+        'vol': rng.uniform(1e6, 2e6, n),
+        'amount': rng.uniform(1e7, 2e7, n),
+        'pct_chg': rng.normal(0, 1, n),
+        'pe_ttm': rng.uniform(10, 20, n),
+        'pb': rng.uniform(1, 2, n),
+    })
+    df.loc[5, 'close'] = np.nan
+    df = TechnicalIndicatorCalculator(ma_periods=[5, 10, 20, 50], wma_periods=[5]).calculate(df)
+    return df
+
+
+@pytest.fixture(scope='module')
+def typed_frame():
+    df = _make_index_frame()
+    df = DeviationRateCalculator(typed_columns=True).calculate(df)
+    df = CrossSignalDetector(typed_columns=True).detect(df)
+    df = PercentileCalculator(lookback_years=1, typed_columns=True).calculate(df)
+    return df
+
+
+class TestTypedOutput:
+
+    def test_calculators_emit_all_typed_columns(self, typed_frame):
+        assert set(typed_columns()) <= set(typed_frame.columns)
+
+    @pytest.mark.parametrize('payload', list(PAYLOADS))
+    def test_typed_columns_match_json(self, typed_frame, payload):
+        decoded = decode_payload(typed_frame, payload)
+        numeric = PAYLOADS[payload][2]
+        for column, expected in decoded.items():
+            actual = typed_frame[column]
+            if numeric:
+                np.testing.assert_allclose(actual.to_numpy(dtype=np.float64), expected.to_numpy(),
+                                           rtol=0, atol=1e-12, equal_nan=True, err_msg=column)
+            else:
+                assert actual.tolist() == expected.tolist(), column
+
+    def test_typed_deviation_skips_json(self, typed_frame):
+        """有类型化偏离率列时，百分位不依赖 deviation_rate JSON"""
+        calc = PercentileCalculator(lookback_years=1, typed_columns=True)
+        without_json = calc.calculate(typed_frame.drop(columns=['deviation_rate', 'percentile_ranks']))
+        for key in ['deviation_ma_5', 'deviation_ma_50']:
+            pd.testing.assert_series_equal(without_json[f'pctl_{key}'], typed_frame[f'pctl_{key}'])
+
+    def test_disabled_by_default(self):
+        df = DeviationRateCalculator().calculate(_make_index_frame(n=60))
+        assert 'deviation_ma_5' not in df.columns
+        assert 'signal_macd' not in CrossSignalDetector().detect(df).columns
+
+
+class TestPayloadConversion:
+
+    def test_decode_handles_bad_and_missing_values(self):
+        df = pd.DataFrame({'percentile_ranks': ['{"pe_ttm": 12.5, "pb": null}', '', None, 'not json', '[]']})
+        decoded = decode_payload(df, 'percentile_ranks', ['pe_ttm', 'pb'])
+        assert list(decoded) == ['pctl_pe_ttm', 'pctl_pb']
+        assert decoded['pctl_pe_ttm'].iloc[0] == 12.5
+        assert decoded['pctl_pe_ttm'].iloc[1:].isna().all()
+        assert decoded['pctl_pb'].isna().all()
+
+    def test_expand_keeps_existing_typed_columns(self):
+        df = pd.DataFrame({'deviation_rate': ['{"ma_5": 0.1, "ma_10": 0.2}'],
+                           'deviation_ma_5': [0.5]})
+        expanded = expand_payloads(df, ['deviation_rate'])
+        assert expanded['deviation_ma_5'].iloc[0] == 0.5
+        assert expanded['deviation_ma_10'].iloc[0] == 0.2
+        assert np.isnan(expanded['deviation_ma_50'].iloc[0])
+        assert expand_payloads(df, ['deviation_rate'], overwrite=True)['deviation_ma_5'].iloc[0] == 0.1
+
+    def test_render_round_trip(self, typed_frame):
+        for payload in PAYLOADS:
+            rendered = render_payload(typed_frame, payload)
+            for original, again in zip(typed_frame[payload].tolist(), rendered.tolist()):
+                original, again = json.loads(original), json.loads(again)
+                for key, value in original.items():
+                    assert again[key] == value, (payload, key)
+
+    def test_typed_column_names(self):
+        assert typed_column('deviation_rate', 'ma_5') == 'deviation_ma_5'
+        assert typed_column('cross_signals', 'macd_hist_trend') == 'signal_macd_hist_trend'
+        assert typed_column('percentile_ranks', 'deviation_ma_20') == 'pctl_deviation_ma_20'
+
+
+@pytest.fixture(scope='module')
+def frames(typed_frame):
+    """(只有 JSON 列, 经 IndexAnalyzer 解码阶段展开类型化列) 两份相同数据"""
+    json_only = typed_frame.drop(columns=typed_columns())
+    decoded = expand_payloads(json_only, ['deviation_rate', 'percentile_ranks'])
+    decoded = CrossSignalDetector(typed_columns=True).detect(decoded)
+    return json_only, decoded
+
+
+class TestDecodedReaders:
+    """下游阶段读取类型化列与只读 JSON 的结果一致"""
+
+    def test_read_payload_prefers_typed_columns(self):
+        df = pd.DataFrame({'percentile_ranks': ['{"pe_ttm": 1.0, "pb": 2.0}'], 'pctl_pe_ttm': [9.0]})
+        values = read_payload(df, 'percentile_ranks', ['pe_ttm', 'pb'])
+        assert values['pe_ttm'].iloc[0] == 9.0
+        assert values['pb'].iloc[0] == 2.0
+
+    def test_market_regime_detector(self, frames):
+        json_only, decoded = frames
+        detector = MarketRegimeDetector()
+        pd.testing.assert_series_equal(detector._calc_sentiment_scores(decoded),
+                                       detector._calc_sentiment_scores(json_only))
+
+    def test_multi_factor_scorer(self, frames):
+        json_only, decoded = frames
+        columns = ['factor_score', 'factor_signal', 'factor_detail']
+        expected = MultiFactorScorer().calculate(json_only)[columns]
+        pd.testing.assert_frame_equal(MultiFactorScorer().calculate(decoded)[columns], expected)
+
+    def test_ml_prepare_features(self, frames):
+        json_only, decoded = frames
+        columns = ['feat_pe_pctl', 'feat_pb_pctl', 'feat_dev_ma5', 'feat_dev_ma50']
+        expected = MLPredictor().prepare_features(json_only)[columns]
+        pd.testing.assert_frame_equal(MLPredictor().prepare_features(decoded)[columns], expected)
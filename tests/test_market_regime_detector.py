@@ -0,0 +1,150 @@
+"""
+MarketRegimeDetector 快速引擎回归测试
+
+滚动排名 / 众数平滑 / 持续天数过滤的向量化实现必须与逐窗口 pandas 参考实现逐点一致
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis.market_regime_detector import (
+    MarketRegimeDetector, BULL_TREND, BULL_LATE, BEAR_TREND, BEAR_LATE, SIDEWAYS, HIGH_VOL
+)
+from util.rolling_util import HAS_NUMBA
+
+ENGINES = ['sorted'] + (['numba'] if HAS_NUMBA else [])
+REGIMES = [BULL_TREND, BULL_LATE, BEAR_TREND, BEAR_LATE, SIDEWAYS, HIGH_VOL]
+OUTPUT_COLUMNS = ['regime_label', 'regime_score', 'regime_trend_score',
+                  'regime_vol_score', 'regime_sent_score', 'regime_macro_score']
+
+
+def make_index_frame(n=900, seed=0):
+    """构造一个指数的指标数据：分段波动率的随机游走，含 NaN 和重复值"""
+    rng = np.random.default_rng(seed)
+    sigma = np.repeat(rng.uniform(0.5, 3.0, n // 100 + 1), 100)[:n]
+    pct_chg = np.round(rng.normal(0.02, 1, n) * sigma, 2)
+    close = 1000 * np.cumprod(1 + pct_chg / 100)
+    s = pd.Series(close)
+    df = pd.DataFrame({
+        'close': close,
+        'pct_chg': pct_chg,
+        'ma_50': s.rolling(50, min_periods=1).mean(),
+        'adx': rng.uniform(10, 50, n),
+        'plus_di': rng.uniform(10, 40, n),
+        'minus_di': rng.uniform(10, 40, n),
+        'atr': np.round(s.rolling(14, min_periods=1).std().fillna(0) + 1, 1),
+        'bb_mid': s.rolling(20, min_periods=1).mean(),
+        'rsi': rng.uniform(10, 90, n),
+        'vol': rng.uniform(5e5, 2e6, n),
+        'vol_ma_10': rng.uniform(8e5, 1.2e6, n),
+    })
+    width = s.rolling(20, min_periods=2).std().fillna(0) * 2
+    df['bb_high'] = df['bb_mid'] + width
+    df['bb_low'] = df['bb_mid'] - width
+    df.loc[rng.random(n) < 0.03, 'atr'] = np.nan
+    df.loc[rng.random(n) < 0.03, 'bb_mid'] = np.nan
+    df['percentile_ranks'] = [json.dumps({'pe_ttm': float(v)}) for v in rng.uniform(0, 100, n)]
+    df['macro_score'] = np.clip(rng.normal(50, 15, n), 0, 100)
+    return df
+
+
+class ReferenceRegimeDetector(MarketRegimeDetector):
+    """滚动排名和平滑防抖替换为逐窗口 pandas 参考实现的检测器"""
+
+    def _rolling_rank_pct(self, values, window):
+        return values.rolling(window, min_periods=20).apply(
+            lambda x: pd.Series(x).rank(pct=True).iloc[-1] * 100, raw=False
+        )
+
+    def _smooth_regimes(self, raw_labels):
+        """逐行实现的 5 日众数平滑 + 最小持续天数过滤"""
+        if len(raw_labels) <= self.smooth_window:
+            return raw_labels
+
+        # 5日众数平滑
+        smoothed = raw_labels.copy()
+        for i in range(self.smooth_window, len(raw_labels)):
+            window = raw_labels.iloc[max(0, i - self.smooth_window + 1):i + 1]
+            mode_val = window.mode()
+            if len(mode_val) > 0:
+                smoothed.iloc[i] = mode_val.iloc[0]
+
+        # 最小持续天数过滤: 如果新状态持续不到min_persist_days, 恢复为前一状态
+        if self.min_persist_days > 1:
+            filtered = smoothed.copy()
+            current_regime = filtered.iloc[0]
+            regime_start = 0
+
+            for i in range(1, len(filtered)):
+                if filtered.iloc[i] != current_regime:
+                    # 状态切换, 检查前一段是否持续足够
+                    duration = i - regime_start
+                    if duration < self.min_persist_days and regime_start > 0:
+                        # 太短, 恢复为再前一个状态
+                        prev_regime = filtered.iloc[max(0, regime_start - 1)]
+                        filtered.iloc[regime_start:i] = prev_regime
+                    current_regime = filtered.iloc[i]
+                    regime_start = i
+
+            smoothed = filtered
+
+        return smoothed
+
+
+class TestRegimeEngineParity:
+
+    @pytest.mark.parametrize('engine', ENGINES)
+    @pytest.mark.parametrize('seed', range(9))
+    def test_detect_matches_reference(self, engine, seed):
+        """9 组不同走势的指数数据，标签和评分与参考实现一致"""
+        df = make_index_frame(seed=seed)
+        expected = ReferenceRegimeDetector().detect(df)
+        actual = MarketRegimeDetector(engine=engine).detect(df)
+
+        assert actual['regime_label'].tolist() == expected['regime_label'].tolist()
+        for col in OUTPUT_COLUMNS[1:]:
+            np.testing.assert_array_equal(actual[col].to_numpy(), expected[col].to_numpy(), err_msg=col)
+
+    @pytest.mark.parametrize('min_persist_days', [1, 3, 5])
+    @pytest.mark.parametrize('n_labels', [2, 3, 6])
+    def test_smoothing_matches_reference(self, min_persist_days, n_labels):
+        rng = np.random.default_rng(n_labels * 10 + min_persist_days)
+        for _ in range(20):
+            n = int(rng.integers(3, 200))
+            raw = pd.Series(rng.choice(REGIMES[:n_labels], n), index=np.arange(100, 100 + n))
+            fast = MarketRegimeDetector(min_persist_days=min_persist_days)
+            reference = ReferenceRegimeDetector(min_persist_days=min_persist_days)
+
+            actual = fast._smooth_regimes(raw)
+            expected = reference._smooth_regimes(raw)
+            assert actual.tolist() == expected.tolist()
+            assert actual.index.equals(expected.index)
+
+    def test_rejects_unknown_engine(self):
+        with pytest.raises(ValueError):
+            MarketRegimeDetector(engine='bogus')
+
+
+class TestRollingRankPct:
+
+    @pytest.mark.parametrize('engine', ENGINES)
+    def test_matches_pandas_rank_with_ties_nan_and_inf(self, engine):
+        from util.rolling_util import RollingUtil
+
+        rng = np.random.default_rng(5)
+        values = np.round(rng.normal(0, 1, 800).cumsum())
+        values[rng.random(800) < 0.05] = np.nan
+        values[[10, 400]] = [np.inf, -np.inf]
+        expected = pd.Series(values).rolling(50, min_periods=20).apply(
+            lambda x: pd.Series(x).rank(pct=True).iloc[-1] * 100, raw=False).to_numpy()
+
+        actual = RollingUtil.rolling_rank_pct(values, 50, min_periods=20, engine=engine)
+        np.testing.assert_array_equal(actual, expected)
@@ -0,0 +1,239 @@
+"""
+MLPredictor 滚动训练单元测试
+
+使用合成技术指标数据和缩小的训练窗口，不依赖数据库
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('xgboost')
+
+import analysis.ml_model_store as ml_model_store
+import analysis.ml_predictor as ml_predictor
+from analysis.ml_predictor import MLPredictor
+
+
+class SmallPredictor(MLPredictor):
+    """缩小训练窗口和模型规模，加快测试"""
+
+    INITIAL_TRAIN_SIZE = 80
+    TEST_SIZE = 20
+    ENSEMBLE_SEEDS = [42, 100]
+    N_ENSEMBLE = 2
+    WARM_START_ROUNDS = 5
+
+    def __init__(self, **kwargs):
+        params = dict(MLPredictor.DEFAULT_PARAMS, n_estimators=10, max_depth=3, n_jobs=1)
+        super().__init__(model_params=params, **kwargs)
+        self.fit_calls = 0
+
+    def _train_ensemble(self, X, y):
+        self.fit_calls += 1
+        return super()._train_ensemble(X, y)
+
+
+def _make_index_frame(n=160, seed=0):
+    """生成 prepare_features 所需的技术指标列"""
+    rng = np.random.default_rng(seed)
+    close = 3000 * np.cumprod(1 + rng.normal(0, 0.01, n))
+    df = pd.DataFrame({
+        'trade_date': pd.date_range('2023-01-02', periods=n, freq='B'),
+        'close': close,
+        'open': close * (1 + rng.normal(0, 0.003, n)),
+        'high': close * 1.01,
+        'low': close * 0.99,
+        'pct_chg': np.r_[0.0, np.diff(close) / close[:-1] * 100],
+        'vol': rng.uniform(1e6, 2e6, n),
+        'amount': rng.uniform(1e8, 2e8, n),
+        'pe_ttm': rng.uniform(10, 15, n),
+        'pb': rng.uniform(1, 2, n),
+    })
+    for col in ['ma_5', 'ma_10', 'ma_20', 'ma_50', 'bb_high', 'bb_low']:
+        df[col] = close * rng.uniform(0.97, 1.03, n)
+    for col in ['macd', 'macd_histogram', 'macd_signal_line', 'adx', 'plus_di', 'minus_di', 'rsi',
+                'kdj_k', 'kdj_d', 'kdj_j', 'atr', 'cci', 'vol_ma_5', 'vol_ma_10', 'obv']:
+        df[col] = rng.uniform(1, 100, n)
+    df['percentile_ranks'] = [json.dumps({'pe_ttm': v, 'pb': v / 2}) for v in rng.uniform(0, 100, n)]
+    df['deviation_rate'] = [json.dumps({f'ma_{p}': v for p in (5, 10, 20, 50)})
+                            for v in rng.normal(0, 2, n)]
+    return df
+
+
+@pytest.fixture
+def cache_root(tmp_path, monkeypatch):
+    def fake_cache_dir(name):
+        path = tmp_path / name
+        path.mkdir(exist_ok=True)
+        return str(path)
+
+    monkeypatch.setattr(ml_model_store, 'get_cache_dir', fake_cache_dir)
+    monkeypatch.setattr(ml_predictor, 'get_cache_dir', fake_cache_dir)
+    return tmp_path
+
+
+class TestIncrementalTraining:
+
+    def test_cache_mode_matches_full_retrain_and_skips_fits(self, cache_root):
+        df = _make_index_frame()
+
+        baseline, _ = SmallPredictor(incremental='off').train_and_predict(df)
+
+        first = SmallPredictor(ts_code='000300.SH')
+        result1, _ = first.train_and_predict(df)
+        second = SmallPredictor(ts_code='000300.SH')
+        result2, _ = second.train_and_predict(df)
+
+        np.testing.assert_array_equal(result1['ml_predicted_return'], baseline['ml_predicted_return'])
+        np.testing.assert_array_equal(result2['ml_predicted_return'], baseline['ml_predicted_return'])
+        # 第二次运行从注册表加载预测和最终模型，不训练
+        assert second.fit_calls == 0
+        assert first.fit_calls > 0
+
+    def test_fold_cache_reused_when_registry_missing(self, cache_root):
+        df = _make_index_frame()
+        SmallPredictor(ts_code='000300.SH').train_and_predict(df)
+        for name in os.listdir(cache_root / 'ml_registry' / '000300.SH'):
+            os.remove(cache_root / 'ml_registry' / '000300.SH' / name)
+
+        predictor = SmallPredictor(ts_code='000300.SH')
+        predictor.train_and_predict(df)
+        # 所有 Walk-Forward 周期命中周期缓存，只训练最终模型
+        assert predictor.fit_calls == 1
+
+    def test_new_rows_only_train_new_fold(self, cache_root):
+        df = _make_index_frame(n=185)
+        SmallPredictor(ts_code='000300.SH').train_and_predict(df.iloc[:160])
+
+        daily = SmallPredictor(ts_code='000300.SH')
+        daily.train_and_predict(df)
+
+        # 新数据跨过一个周期边界：新增周期 1 个 + 最终模型 1 个
+        assert daily.fit_calls == 2
+        files = os.listdir(cache_root / 'ml_folds' / '000300.SH')
+        assert all(name.endswith('.pkl') for name in files)
+
+    def test_registry_predicts_tail_without_training(self, cache_root):
+        df = _make_index_frame(n=165)
+        SmallPredictor(ts_code='000300.SH').train_and_predict(df.iloc[:157])
+
+        daily = SmallPredictor(ts_code='000300.SH')
+        result, metrics = daily.train_and_predict(df)
+        baseline, baseline_metrics = SmallPredictor(incremental='off').train_and_predict(df)
+
+        # 新增行未跨过周期边界：用注册表中最后一个周期的模型预测新增行
+        assert daily.fit_calls == 0
+        np.testing.assert_array_equal(result['ml_predicted_return'], baseline['ml_predicted_return'])
+        assert metrics['ic'] == baseline_metrics['ic']
+        assert len(os.listdir(cache_root / 'ml_registry' / '000300.SH')) == 1
+
+    def test_registry_invalidated_when_history_changes(self, cache_root):
+        df = _make_index_frame()
+        SmallPredictor(ts_code='000300.SH').train_and_predict(df)
+
+        revised = df.copy()
+        revised.loc[10, 'rsi'] = 1.0
+        predictor = SmallPredictor(ts_code='000300.SH')
+        result, _ = predictor.train_and_predict(revised)
+        baseline, _ = SmallPredictor(incremental='off').train_and_predict(revised)
+
+        assert predictor.fit_calls > 1
+        np.testing.assert_array_equal(result['ml_predicted_return'], baseline['ml_predicted_return'])
+
+    def test_warm_start_continues_previous_fold(self, cache_root):
+        df = _make_index_frame()
+        predictor = SmallPredictor(ts_code='000300.SH', incremental='warm_start')
+        result, _ = predictor.train_and_predict(df)
+
+        assert result['ml_predicted_return'].notna().sum() > 0
+        # 只有第一个周期和最终模型从零训练
+        assert predictor.fit_calls == 2
+        assert not (cache_root / 'ml_folds').exists()
+
+    def test_unknown_mode_rejected(self):
+        with pytest.raises(ValueError):
+            SmallPredictor(incremental='bogus')
+
+
+class TestBatchedPrediction:
+
+    def test_block_prediction_matches_row_by_row(self):
+        df = _make_index_frame()
+        predictor = SmallPredictor(incremental='off')
+        result, metrics = predictor.train_and_predict(df)
+
+        # 用最终模型逐行预测，与整块预测一致
+        featured = predictor.prepare_features(df)
+        X = predictor._sanitize_features(featured[predictor.feature_columns].values[-30:])
+        block = predictor._ensemble_predict(predictor.models, X)
+        rows = [np.mean([m.predict(X[[i]])[0] for m in predictor.models]) for i in range(len(X))]
+        np.testing.assert_array_equal(block, np.array(rows, dtype=block.dtype))
+
+        n_pred = result['ml_predicted_return'].notna().sum()
+        assert n_pred == metrics['samples']
+
+    def test_sanitize_features_replaces_inf(self):
+        X = MLPredictor._sanitize_features(np.array([[1.0, np.inf], [-np.inf, np.nan]]))
+        assert X.dtype == np.float32
+        assert X[0, 0] == 1.0 and np.isnan(X[0, 1]) and np.isnan(X[1]).all()
+
+
+class TestOptunaTuning:
+
+    def _data(self):
+        predictor = SmallPredictor(ts_code='000300.SH')
+        featured = predictor.prepare_features(_make_index_frame(n=260))
+        labels = predictor._create_labels(featured)
+        mask = labels.notna() & featured[predictor.feature_columns].notna().all(axis=1)
+        X = predictor._sanitize_features(featured.loc[mask, predictor.feature_columns].values)
+        return predictor, X, labels[mask].values
+
+    def test_study_persists_and_resumes(self, cache_root):
+        pytest.importorskip('optuna')
+        import optuna
+
+        predictor, X, y = self._data()
+        best = predictor.optimize_hyperparams(X, y, n_trials=3, n_jobs=2)
+        assert best['n_jobs'] == -1 and 'max_depth' in best
+
+        db_path = cache_root / 'optuna' / '000300.SH.db'
+        assert db_path.exists()
+
+        predictor.optimize_hyperparams(X, y, n_trials=2, n_jobs=2)
+        storage = f"sqlite:///{db_path}"
+        (summary,) = optuna.get_all_study_summaries(storage)
+        # 续跑: 热启动重评估的历史最优参数计入本次的 2 个 trial
+        assert summary.n_trials == 5
+        study = optuna.load_study(study_name=summary.study_name, storage=storage)
+        complete = [t for t in study.trials if t.state == optuna.trial.TrialState.COMPLETE]
+        assert all(t.intermediate_values for t in complete)
+
+    def test_resume_picks_best_of_current_run(self, cache_root):
+        pytest.importorskip('optuna')
+        import optuna
+
+        predictor, X, y = self._data()
+        predictor.optimize_hyperparams(X, y, n_trials=2, n_jobs=1)
+        study = predictor._create_study()
+        # 旧数据上的历史 trial：评分虚高，不应直接胜出
+        stale = dict(study.best_params, max_depth=7 if study.best_params['max_depth'] != 7 else 2)
+        study.add_trial(optuna.trial.create_trial(
+            params=stale, distributions=study.best_trial.distributions, value=10.0))
+        n_before = len(study.trials)
+
+        best = predictor.optimize_hyperparams(X, y, n_trials=2, n_jobs=1)
+
+        study = predictor._create_study()
+        current = [t for t in study.trials
+                   if t.number >= n_before and t.state == optuna.trial.TrialState.COMPLETE]
+        expected = max(current, key=lambda t: t.value)
+        assert study.best_value == 10.0
+        assert {k: best[k] for k in expected.params} == expected.params
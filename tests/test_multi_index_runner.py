@@ -0,0 +1,76 @@
+"""
+多指数并行分析 (analyze_many) 单元测试
+
+用假 IndexAnalyzer 替换真实分析器，不依赖数据库
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import multiprocessing
+
+import pandas as pd
+import pytest
+
+import analysis.index_analyzer as index_analyzer
+import analysis.multi_index_runner as runner
+
+
+class FakeAnalyzer:
+    """按代码返回固定数据；'BAD' 抛异常，'SHORT' 数据不足"""
+
+    def __init__(self, ts_code, start_date=None, end_date=None, lookback_years=5,
+                 include_macro=True, data=None):
+        if ts_code == 'BAD':
+            raise ValueError('boom')
+        self.ts_code = ts_code
+        self.start_date = start_date
+        n = 3 if ts_code == 'SHORT' else 10
+        self.data = data if data is not None else pd.DataFrame({'close': range(n)})
+
+    def analyze(self, include_ml=True, auto_tune=False):
+        self.data['final_signal'] = 'BUY' if include_ml else 'HOLD'
+        return self.data
+
+    def get_current_signal(self):
+        return {'ts_code': self.ts_code, 'final_signal': self.data['final_signal'].iloc[-1],
+                'start_date': self.start_date}
+
+
+@pytest.fixture
+def fake_analyzer(monkeypatch):
+    monkeypatch.setattr(index_analyzer, 'IndexAnalyzer', FakeAnalyzer)
+    monkeypatch.setattr(runner, '_prepare_shared_inputs', lambda tasks, codes: {'macro': None, 'cross_50': None})
+
+
+class TestAnalyzeMany:
+
+    def test_sequential_order_errors_and_skips(self, fake_analyzer):
+        results = runner.analyze_many(['A', 'BAD', 'SHORT', 'B'], workers=1, min_rows=5,
+                                      start_dates={'B': '20100101'}, start_date='20200101')
+
+        assert [r.ts_code for r in results] == ['A', 'BAD', 'SHORT', 'B']
+        assert results[0].ok and results[0].signal['final_signal'] == 'BUY'
+        assert results[0].signal['start_date'] == '20200101'
+        assert results[3].signal['start_date'] == '20100101'
+        assert results[1].error == 'boom' and 'ValueError' in results[1].traceback
+        assert results[2].skipped and not results[2].ok and results[2].signal == {}
+        assert all(r.elapsed >= 0 for r in results)
+
+    @pytest.mark.skipif(multiprocessing.get_start_method() != 'fork',
+                        reason='假分析器通过 fork 继承到子进程')
+    def test_process_pool_keeps_order(self, fake_analyzer):
+        codes = ['C', 'BAD', 'A', 'B']
+        results = runner.analyze_many(codes, workers=2, include_ml=False)
+
+        assert [r.ts_code for r in results] == codes
+        assert [r.ok for r in results] == [True, False, True, True]
+        assert results[0].signal['final_signal'] == 'HOLD'
+        assert len(results[2].data) == 10
+
+    def test_resolve_workers(self):
+        assert runner.resolve_workers(8, 3) == 3
+        assert runner.resolve_workers(0, 3) == 1
+        assert 1 <= runner.resolve_workers(None, 9) <= 9
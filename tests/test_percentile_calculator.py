@@ -0,0 +1,165 @@
+"""
+PercentileCalculator 滚动百分位引擎一致性测试
+
+快速引擎 (sorted / numba) 必须与逐窗口扫描的参考实现逐点一致
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis.percentile_calculator import PercentileCalculator, RollingPercentileWindow
+from util.rolling_util import HAS_NUMBA, RollingUtil
+
+
+ENGINES = ['sorted'] + (['numba'] if HAS_NUMBA else [])
+
+
+def make_series(n=600, seed=7, nan_ratio=0.05, ties=False):
+    """构造带 NaN / 重复值的测试序列"""
+    rng = np.random.default_rng(seed)
+    values = rng.normal(0, 1, n).cumsum()
+    if ties:
+        values = np.round(values, 0)
+    values[rng.random(n) < nan_ratio] = np.nan
+    return pd.Series(values)
+
+
+def rolling_percentile_reference(series, lookback_days, decimal_places=2):
+    """逐窗口扫描的参考实现，复杂度 O(n·w)"""
+    def calc_percentile(window):
+        if len(window) < 2:
+            return np.nan
+        current_value = window.iloc[-1]
+        if pd.isna(current_value):
+            return np.nan
+        count_below = (window < current_value).sum()
+        count_equal = (window == current_value).sum()
+        percentile = (count_below + count_equal / 2) / len(window) * 100
+        return round(percentile, decimal_places)
+
+    percentiles = []
+    for i in range(len(series)):
+        start_idx = max(0, i - lookback_days + 1)
+        percentiles.append(calc_percentile(series.iloc[start_idx:i + 1]))
+    return pd.Series(percentiles, index=series.index)
+
+
+def reference_of(series, lookback_years=1, decimal_places=2):
+    return rolling_percentile_reference(series, lookback_years * 250, decimal_places)
+
+
+class ReferencePercentileCalculator(PercentileCalculator):
+    """滚动百分位替换为参考实现的计算器"""
+
+    def _calculate_rolling_percentile(self, series):
+        return rolling_percentile_reference(series, self.lookback_days, self.decimal_places)
+
+
+class TestRollingPercentileParity:
+    """快速引擎与参考实现对比"""
+
+    @pytest.mark.parametrize('engine', ENGINES)
+    @pytest.mark.parametrize('ties', [False, True])
+    def test_matches_reference(self, engine, ties):
+        series = make_series(ties=ties)
+        calc = PercentileCalculator(lookback_years=1, engine=engine)
+        fast = calc._calculate_rolling_percentile(series)
+        expected = reference_of(series)
+        pd.testing.assert_series_equal(fast, expected, check_exact=True)
+
+    @pytest.mark.parametrize('engine', ENGINES)
+    def test_window_longer_than_series(self, engine):
+        """窗口大于序列长度时退化为扩展窗口"""
+        series = make_series(n=120)
+        calc = PercentileCalculator(lookback_years=5, engine=engine)
+        fast = calc._calculate_rolling_percentile(series)
+        expected = reference_of(series, lookback_years=5)
+        pd.testing.assert_series_equal(fast, expected, check_exact=True)
+
+    @pytest.mark.parametrize('engine', ENGINES)
+    def test_all_nan_and_short(self, engine):
+        calc = PercentileCalculator(lookback_years=1, engine=engine)
+        for series in [pd.Series([np.nan] * 5), pd.Series([1.0]), pd.Series([], dtype=float)]:
+            fast = calc._calculate_rolling_percentile(series)
+            expected = reference_of(series)
+            assert fast.isna().all()
+            assert len(fast) == len(expected)
+
+    def test_calculate_json_matches_reference(self):
+        """完整 calculate 输出的 JSON 与参考实现一致"""
+        n = 400
+        df = pd.DataFrame({
+            'amount': make_series(n, seed=1).abs(),
+            'vol': make_series(n, seed=2).abs(),
+            'rsi': make_series(n, seed=3, ties=True),
+            'pe_ttm': make_series(n, seed=4),
+        })
+        df['deviation_rate'] = [
+            '{"ma_5": %.3f, "ma_10": %.3f}' % (a, b) if np.isfinite(a) and np.isfinite(b) else ''
+            for a, b in zip(make_series(n, seed=5), make_series(n, seed=6))
+        ]
+        fast = PercentileCalculator(lookback_years=1).calculate(df)
+        ref = ReferencePercentileCalculator(lookback_years=1).calculate(df)
+        assert fast['percentile_ranks'].tolist() == ref['percentile_ranks'].tolist()
+
+
+class TestRollingUtil:
+
+    def test_unknown_engine(self):
+        with pytest.raises(ValueError):
+            RollingUtil.resolve_engine('gpu')
+        with pytest.raises(ValueError):
+            PercentileCalculator(engine='gpu')
+
+    def test_auto_engine(self):
+        assert RollingUtil.resolve_engine('auto') == ('numba' if HAS_NUMBA else 'sorted')
+
+
+class TestIncrementalPercentile:
+    """持久化滚动窗口状态的增量计算与全量计算一致"""
+
+    def _make_df(self, n=700):
+        df = pd.DataFrame({
+            'amount': make_series(n, seed=11).abs(),
+            'vol': make_series(n, seed=12, ties=True).abs(),
+            'rsi': make_series(n, seed=13),
+        })
+        df['deviation_rate'] = [
+            '{"ma_5": %.3f, "ma_20": %.3f}' % (a, b) if np.isfinite(a) and np.isfinite(b) else None
+            for a, b in zip(make_series(n, seed=14), make_series(n, seed=15))
+        ]
+        return df
+
+    @pytest.mark.parametrize('split', [1, 250, 600, 699])
+    def test_incremental_matches_full(self, split):
+        df = self._make_df()
+        calc = PercentileCalculator(lookback_years=1)
+        full = calc.calculate(df)
+
+        states = calc.build_states(df.iloc[:split])
+        incremental = calc.calculate_incremental(df.iloc[split:], states)
+        assert incremental['percentile_ranks'].tolist() == full['percentile_ranks'].iloc[split:].tolist()
+
+    def test_state_roundtrip(self):
+        """to_list 导出后重建的状态继续追加结果不变"""
+        df = self._make_df()
+        calc = PercentileCalculator(lookback_years=1)
+        states = calc.build_states(df.iloc[:500])
+        restored = {k: RollingPercentileWindow(w.window, w.to_list()) for k, w in states.items()}
+
+        a = calc.calculate_incremental(df.iloc[500:], states)
+        b = calc.calculate_incremental(df.iloc[500:], restored)
+        assert a['percentile_ranks'].tolist() == b['percentile_ranks'].tolist()
+
+    def test_missing_indicator_state_is_dropped(self):
+        df = self._make_df()
+        calc = PercentileCalculator(lookback_years=1)
+        states = calc.build_states(df.iloc[:300])
+        calc.calculate_incremental(df.iloc[300:].drop(columns=['rsi']), states)
+        assert 'rsi' not in states
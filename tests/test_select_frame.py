@@ -0,0 +1,121 @@
+"""
+列式读取 (CommonMapper.select_frame / rows_to_frame) 单元测试
+
+使用假 DBAPI 连接，不依赖数据库
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import date, datetime
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+import pymysql
+
+import mysql_connect.common_mapper as common_mapper
+from mysql_connect.common_mapper import CommonMapper, rows_to_frame
+
+
+class FakeCursor:
+
+    def __init__(self, connection, cursor_class=None):
+        self.connection = connection
+        self.cursor_class = cursor_class
+        self.description = [(name,) for name in connection.column_names]
+        self.position = 0
+        self.closed = False
+
+    def execute(self, sql, params=None):
+        self.connection.executed.append((sql, params))
+
+    def fetchall(self):
+        return list(self.connection.rows)
+
+    def fetchmany(self, size):
+        chunk = self.connection.rows[self.position:self.position + size]
+        self.position += size
+        return chunk
+
+    def close(self):
+        self.closed = True
+
+
+class FakeRawConnection:
+
+    def __init__(self, column_names, rows):
+        self.column_names = column_names
+        self.rows = rows
+        self.executed = []
+        self.cursors = []
+        self.closed = False
+
+    def cursor(self, cursor_class=None):
+        cursor = FakeCursor(self, cursor_class)
+        self.cursors.append(cursor)
+        return cursor
+
+    def close(self):
+        self.closed = True
+
+
+def _patch_engine(monkeypatch, column_names, rows):
+    connection = FakeRawConnection(column_names, rows)
+
+    class FakeEngine:
+        def raw_connection(self):
+            return connection
+
+    monkeypatch.setattr(common_mapper, 'get_engine', lambda: FakeEngine())
+    return connection
+
+
+ROWS = [
+    (1, 'A', date(2024, 1, 2), Decimal('10.50'), None, 3),
+    (2, 'B', None, None, 2.5, None),
+    (3, None, datetime(2024, 1, 4, 15, 0), Decimal('-1'), 4.0, 5),
+]
+NAMES = ['id', 'ts_code', 'trade_date', 'pe', 'pb', 'vol']
+
+
+class TestRowsToFrame:
+
+    def test_column_conversion(self):
+        df = rows_to_frame(NAMES, ROWS)
+        assert df['id'].dtype == np.int64
+        assert df['ts_code'].tolist() == ['A', 'B', None]
+        assert df['trade_date'].dtype.kind == 'M' and pd.isna(df['trade_date'].iloc[1])
+        assert df['pe'].dtype == np.float64 and np.isnan(df['pe'].iloc[1])
+        assert df['pe'].iloc[0] == 10.5 and df['pb'].iloc[2] == 4.0
+        # 含 NULL 的整数列转为 float64
+        assert df['vol'].dtype == np.float64 and np.isnan(df['vol'].iloc[1])
+
+    def test_dtypes_override_and_empty(self):
+        df = rows_to_frame(['trade_date', 'pe'], [('20240102', Decimal('1.5'))], {'trade_date': str})
+        assert df['trade_date'].tolist() == ['20240102']
+        empty = rows_to_frame(['trade_date', 'pe'], [], {'pe': np.float64})
+        assert list(empty.columns) == ['trade_date', 'pe'] and empty['pe'].dtype == np.float64
+
+
+class TestSelectFrame:
+
+    def test_single_fetch(self, monkeypatch):
+        connection = _patch_engine(monkeypatch, NAMES, ROWS)
+        df = CommonMapper('t').select_frame('*', 'ts_code IN %s', (('A', 'B'),))
+
+        assert connection.executed == [("SELECT * FROM `t` WHERE ts_code IN %s", (('A', 'B'),))]
+        assert len(df) == 3 and df['pe'].dtype == np.float64
+        assert connection.closed
+
+    def test_chunked_uses_server_side_cursor(self, monkeypatch):
+        connection = _patch_engine(monkeypatch, NAMES, ROWS)
+        chunks = list(CommonMapper('t').select_frame(chunksize=2))
+
+        assert [len(chunk) for chunk in chunks] == [2, 1]
+        assert connection.cursors[0].cursor_class is pymysql.cursors.SSCursor
+        assert connection.cursors[0].closed and connection.closed
+        pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True)[['id', 'ts_code']],
+                                      rows_to_frame(NAMES, ROWS)[['id', 'ts_code']])
@@ -0,0 +1,130 @@
+"""
+共享缓存 (SharedCache) 单元测试
+
+覆盖 TTL、数据水位线、磁盘持久化，以及宏观因子 / 上证50市场锚的跨实例复用
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+import pytest
+
+import analysis.index_analyzer as index_analyzer
+import util.shared_cache as shared_cache
+from analysis.index_analyzer import IndexAnalyzer
+from analysis.macro_factor_collector import MacroFactorCollector
+from util.shared_cache import SharedCache, get_shared_cache
+
+
+@pytest.fixture
+def isolated_caches(tmp_path, monkeypatch):
+    """共享缓存注册表和磁盘目录指向临时目录"""
+    monkeypatch.setattr(shared_cache, '_SHARED_CACHES', {})
+    monkeypatch.setattr(shared_cache, 'get_cache_dir', lambda name='': str(tmp_path / name))
+    return tmp_path
+
+
+class TestSharedCache:
+
+    def test_ttl_and_watermark(self, tmp_path):
+        cache = SharedCache('t', ttl_seconds=60, cache_dir=str(tmp_path))
+        cache.put('k', 1, watermark='20240105')
+
+        assert cache.get('k', '20240105') == 1
+        assert cache.get('k') == 1
+        assert cache.get('k', '20240108') is None
+
+        cache.put('k', 2, created_at=0.0)
+        assert cache.get('k') is None
+
+    def test_disk_round_trip_and_invalidate(self, tmp_path):
+        SharedCache('t', cache_dir=str(tmp_path)).put('a/b', {'x': 1}, watermark='w')
+        other = SharedCache('t', cache_dir=str(tmp_path))
+        assert other.get('a/b', 'w') == {'x': 1}
+
+        other.invalidate()
+        assert SharedCache('t', cache_dir=str(tmp_path)).get('a/b') is None
+
+    def test_memory_only_and_get_or_load(self, tmp_path):
+        cache = SharedCache('t', disk=False, cache_dir=str(tmp_path))
+        calls = []
+        loader = lambda: calls.append(1) or 'v'
+        assert cache.get_or_load('k', loader) == 'v'
+        assert cache.get_or_load('k', loader) == 'v'
+        assert len(calls) == 1
+        assert not os.listdir(tmp_path)
+
+    def test_registry_returns_same_instance(self, isolated_caches):
+        assert get_shared_cache('x') is get_shared_cache('x')
+
+
+class TestMacroCollectorCache:
+
+    def test_collect_reuses_cache_across_instances_and_runs(self, isolated_caches, monkeypatch):
+        calls = []
+
+        def fake_shibor(self, start_date, end_date):
+            calls.append((start_date, end_date))
+            dates = pd.date_range(start_date, end_date, freq='B')
+            return pd.DataFrame({'trade_date': dates, 'shibor_on': 1.0, 'shibor_1w': 1.5, 'shibor_1m': 2.0})
+
+        monkeypatch.setattr(MacroFactorCollector, '_fetch_shibor', fake_shibor)
+        for name in ('_fetch_north_flow', '_fetch_margin', '_fetch_fx'):
+            monkeypatch.setattr(MacroFactorCollector, name, lambda self, s, e: None)
+
+        first = MacroFactorCollector().collect('20240101', '20240331')
+        second = MacroFactorCollector().collect('20240201', '20240301')
+        assert len(calls) == 1
+        assert second['trade_date'].min() >= pd.Timestamp('2024-02-01')
+
+        # 模拟下一次调度运行：内存为空，从磁盘命中
+        monkeypatch.setattr(shared_cache, '_SHARED_CACHES', {})
+        assert len(MacroFactorCollector().collect('20240101', '20240331')) == len(first)
+        assert len(calls) == 1
+
+        MacroFactorCollector.clear_cache()
+        MacroFactorCollector().collect('20240101', '20240331')
+        assert len(calls) == 2
+
+
+class FakeStore:
+    """只记录 load 次数的上证50列存"""
+
+    watermark_value = '20240105'
+    loads = []
+
+    def __init__(self, mapper=None):
+        pass
+
+    def watermark(self, ts_code):
+        return FakeStore.watermark_value
+
+    def load(self, ts_code, start_date, end_date=None):
+        FakeStore.loads.append(end_date)
+        dates = pd.date_range('2023-01-01', periods=120, freq='B')
+        return pd.DataFrame({'trade_date': dates, 'close': range(100, 220)})
+
+
+class TestCross50Cache:
+
+    def test_loaded_once_until_watermark_changes(self, isolated_caches, monkeypatch):
+        monkeypatch.setattr(index_analyzer, 'IndexDataStore', FakeStore)
+        monkeypatch.setattr(FakeStore, 'loads', [])
+
+        first = IndexAnalyzer.load_cross_50_features('20240105')
+        IndexAnalyzer.load_cross_50_features('20240104')
+        assert len(FakeStore.loads) == 1
+        assert 'feat_cross_50_mom_20' in first.columns
+
+        entry = IndexAnalyzer.export_cross_50_cache()
+        monkeypatch.setattr(shared_cache, '_SHARED_CACHES', {})
+        IndexAnalyzer.install_cross_50_cache(entry)
+        IndexAnalyzer.load_cross_50_features('20240105')
+        assert len(FakeStore.loads) == 1
+
+        monkeypatch.setattr(FakeStore, 'watermark_value', '20240108')
+        IndexAnalyzer.load_cross_50_features('20240105')
+        assert len(FakeStore.loads) == 2
@@ -0,0 +1,267 @@
+"""
+日线基础数据按交易日截面同步 (StockDailyBasicSync.sync_by_trade_date) 单元测试
+
+使用假接口和假 Mapper，不访问网络和数据库
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from mysql_connect.sync_state_mapper import ALL_CODES
+from sync.stock.sync_stock_daily_basic import StockDailyBasicSync
+from tu_share_factory.tu_share_factory import TuShareFactory
+from util.date_util import TimeUtils
+
+
+class FakePro:
+    """交易日历 + 按交易日返回全市场截面；fail_dates 中的交易日返回异常"""
+
+    def __init__(self, open_dates, fail_dates=()):
+        self.open_dates = open_dates
+        self.fail_dates = set(fail_dates)
+        self.daily_basic_calls = []
+
+    def trade_cal(self, exchange, start_date, end_date, fields):
+        dates = pd.date_range(start_date, end_date).strftime('%Y%m%d')
+        return pd.DataFrame({'exchange': exchange, 'cal_date': dates,
+                             'is_open': [1 if d in self.open_dates else 0 for d in dates]})
+
+    def imap(self, endpoint, kwargs_list):
+        for kwargs in kwargs_list:
+            trade_date = kwargs['trade_date']
+            self.daily_basic_calls.append(trade_date)
+            if trade_date in self.fail_dates:
+                yield kwargs, RuntimeError('timeout')
+                continue
+            yield kwargs, pd.DataFrame({'ts_code': ['A.SZ', 'B.SZ'], 'trade_date': [trade_date] * 2,
+                                        'circ_mv': [100.0, 200.0]})
+
+
+class FakeDailyBasicMapper:
+
+    def __init__(self, watermark):
+        self.watermark = watermark
+        self.upserts = []
+        self.updates = []
+        self.range_reads = []
+
+    def select_global_max_trade_date(self):
+        return self.watermark
+
+    def select_max_trade_date_by_code(self):
+        return {'A.SZ': self.watermark, 'B.SZ': self.watermark}
+
+    def upsert_stock_daily_basic_frame(self, df, batch_size=1000):
+        self.upserts.append(df)
+        return len(df)
+
+    def select_frame_by_trade_date_range_and_ts_code(self, start_date, end_date, ts_code_list,
+                                                     columns='*', dtypes=None):
+        self.range_reads.append((start_date, end_date, list(ts_code_list)))
+        return pd.DataFrame({'ts_code': ts_code_list, 'trade_date': [end_date] * len(ts_code_list),
+                             'circ_mv': [100.0] * len(ts_code_list)})
+
+    def update_dataframe(self, df, key_columns, update_columns):
+        self.updates.append((df, key_columns, update_columns))
+        return len(df)
+
+
+class FakeSyncStateMapper:
+    """内存中的 sync_state；初始为空，首次读取时由 seed 初始化"""
+
+    def __init__(self):
+        self.state = {}
+        self.errors = {}
+
+    def load_watermarks(self, dataset, seed=None):
+        watermarks = {code: wm for (ds, code), wm in self.state.items() if ds == dataset}
+        if not watermarks and seed is not None:
+            watermarks = {code: wm for code, wm in seed().items() if wm}
+            self.state.update({(dataset, code): wm for code, wm in watermarks.items()})
+        return watermarks
+
+    def load_watermark(self, dataset, ts_code=ALL_CODES, seed=None):
+        return self.load_watermarks(dataset, (lambda: {ts_code: seed()}) if seed else None).get(ts_code)
+
+    def advance_many(self, dataset, watermarks):
+        for code, wm in watermarks.items():
+            self.state[(dataset, code)] = max(self.state.get((dataset, code), ''), wm)
+
+    def advance(self, dataset, ts_code, watermark):
+        self.advance_many(dataset, {ts_code: watermark})
+
+    def record_error(self, dataset, ts_code, error):
+        self.errors[(dataset, ts_code)] = str(error)
+
+
+class FakeFinancialMapper:
+
+    def select_frame(self, columns='*', condition=None, params=None):
+        # A 最近公告了年报，B 的最后一次公告在一年前
+        return pd.DataFrame({'ts_code': ['A.SZ', 'B.SZ'], 'ann_date': ['20240320', '20230320'],
+                             'end_date': ['20231231', '20221231'], 'profit_dedt': [1e6, 2e6]})
+
+
+def _sync(monkeypatch, pro, watermark):
+    monkeypatch.setattr(TuShareFactory, 'build_api_client', staticmethod(lambda: pro))
+    sync = StockDailyBasicSync.__new__(StockDailyBasicSync)
+    sync.stock_daily_basic_mapper = FakeDailyBasicMapper(watermark)
+    sync.financial_mapper = FakeFinancialMapper()
+    sync.sync_state_mapper = FakeSyncStateMapper()
+    return sync
+
+
+class TestSyncByTradeDate:
+
+    def test_one_call_per_missing_trading_day(self, monkeypatch):
+        pro = FakePro({'20240401', '20240402', '20240403'})
+        sync = _sync(monkeypatch, pro, '20240329')
+        sync.sync_by_trade_date(end_date='20240403', refresh_days=0)
+
+        assert pro.daily_basic_calls == ['20240401', '20240402', '20240403']
+        upserts = sync.stock_daily_basic_mapper.upserts
+        assert len(upserts) == 3 and all(len(df) == 2 for df in upserts)
+        # A 按 2023 年报计算扣非市盈率，B 无对应年报
+        first = upserts[0].set_index('ts_code')
+        assert first.loc['A.SZ', 'pe_profit_dedt'] == 100.0 * 10000 / 1e6
+        assert pd.isna(first.loc['B.SZ', 'pe_profit_dedt'])
+
+    def test_stops_at_first_failed_day(self, monkeypatch):
+        pro = FakePro({'20240401', '20240402', '20240403'}, fail_dates={'20240402'})
+        sync = _sync(monkeypatch, pro, '20240329')
+        sync.sync_by_trade_date(end_date='20240403', refresh_days=0)
+
+        assert [df['trade_date'].iloc[0] for df in sync.stock_daily_basic_mapper.upserts] == ['20240401']
+        # 水位线停在失败前一天，下次从失败的交易日继续
+        state = sync.sync_state_mapper.state
+        assert state[(StockDailyBasicSync.DATASET_MARKET, ALL_CODES)] == '20240401'
+        assert state[(StockDailyBasicSync.DATASET, 'A.SZ')] == '20240401'
+        assert (StockDailyBasicSync.DATASET_MARKET, ALL_CODES) in sync.sync_state_mapper.errors
+
+        pro.fail_dates.clear()
+        pro.daily_basic_calls.clear()
+        sync.stock_daily_basic_mapper.watermark = None
+        sync.sync_by_trade_date(end_date='20240403', refresh_days=0)
+        assert pro.daily_basic_calls == ['20240402', '20240403']
+        assert state[(StockDailyBasicSync.DATASET_MARKET, ALL_CODES)] == '20240403'
+
+    def test_up_to_date_refreshes_recent_announcements_only(self, monkeypatch):
+        pro = FakePro(set())
+        sync = _sync(monkeypatch, pro, '20240403')
+        sync.sync_by_trade_date(end_date='20240403')
+
+        mapper = sync.stock_daily_basic_mapper
+        assert pro.daily_basic_calls == [] and mapper.upserts == []
+        assert mapper.range_reads == [('20240101', '20240403', ['A.SZ'])]
+        frame, keys, columns = mapper.updates[0]
+        assert keys == ['ts_code', 'trade_date'] and columns == ['pe_profit_dedt', 'pe_ttm_profit_dedt']
+
+
+def compute_profit_dedt_reference(daily_basic_df, financial_data_pd):
+    """
+    逐行计算扣非市盈率的参考实现
+
+    Returns:
+        tuple: (pe_profit_dedt 列表, pe_ttm_profit_dedt 列表)，与 daily_basic_df 行顺序一致
+    """
+    pe_profit_dedt_list = []
+    pe_ttm_profit_dedt_list = []
+    for _, row in daily_basic_df.iterrows():
+        pe_profit_dedt = None
+        pe_ttm_profit_dedt = None
+
+        # 获取上一年年终扣非净利润
+        if financial_data_pd is not None and not financial_data_pd.empty:
+            last_day_of_previous_year = TimeUtils.get_last_day_of_previous_year(row['trade_date'])
+            filtered_data = financial_data_pd[financial_data_pd['end_date'] == TimeUtils.date_to_str(last_day_of_previous_year)]
+            if len(filtered_data) > 0 and 'profit_dedt' in filtered_data.columns and filtered_data['profit_dedt'] is not None:
+                pe_profit_dedt = row['circ_mv'] * 10000 / filtered_data['profit_dedt'].iloc[0]
+
+            profit_dedt_ttm = _profit_dedt_ttm_reference(financial_data_pd, row['trade_date'])
+            if profit_dedt_ttm is not None:
+                pe_ttm_profit_dedt = row['circ_mv'] * 10000 / profit_dedt_ttm
+
+        pe_profit_dedt_list.append(pe_profit_dedt if pe_profit_dedt is not None and pe_profit_dedt >= 0 else None)
+        pe_ttm_profit_dedt_list.append(pe_ttm_profit_dedt if pe_ttm_profit_dedt is not None and pe_ttm_profit_dedt >= 0 else None)
+    return pe_profit_dedt_list, pe_ttm_profit_dedt_list
+
+def _profit_dedt_ttm_reference(data_pd, date):
+    """计算TTM扣非净利润"""
+    records = data_pd[data_pd['end_date'] <= date]
+    records = records.sort_values(by='end_date', ascending=False)
+    if len(records) < 5:
+        return None
+    records = records.head(5)
+
+    last_quarter_date = records.iloc[0]['end_date']
+    last_quarter_date_time = TimeUtils.str_to_date(last_quarter_date)
+    if last_quarter_date_time.month == 12:
+        return records.iloc[0]['profit_dedt']
+    else:
+        last_year_this_quarter = datetime(
+            last_quarter_date_time.year - 1,
+            last_quarter_date_time.month,
+            last_quarter_date_time.day
+        )
+        last_year_this_quarter_str = TimeUtils.date_to_str(last_year_this_quarter)
+        last_year_last_date = datetime(last_quarter_date_time.year - 1, 12, 31)
+        last_year_last_date_str = TimeUtils.date_to_str(last_year_last_date)
+        last_year_data = records[records['end_date'] == last_year_last_date_str]
+        last_year_this_quarter_data = records[records['end_date'] == last_year_this_quarter_str]
+
+        if (last_year_data is not None and last_year_this_quarter_data is not None
+                and not last_year_data.empty and not last_year_this_quarter_data.empty):
+            return records['profit_dedt'].iloc[0] + last_year_data['profit_dedt'].iloc[0] - last_year_this_quarter_data['profit_dedt'].iloc[0]
+        else:
+            return None
+
+
+def _random_financial(rng, ts_codes):
+    """随机报告期（有缺期）、含负值和空值的扣非净利润"""
+    quarters = [f'{year}{mmdd}' for year in range(2016, 2025) for mmdd in ('0331', '0630', '0930', '1231')]
+    frames = []
+    for ts_code in ts_codes:
+        end_dates = [d for d in quarters if rng.random() > 0.15]
+        profit = rng.normal(1e6, 8e5, len(end_dates))
+        profit[rng.random(len(end_dates)) < 0.05] = np.nan
+        frames.append(pd.DataFrame({'ts_code': ts_code, 'end_date': end_dates, 'profit_dedt': profit}))
+    return pd.concat(frames, ignore_index=True).sample(frac=1, random_state=1)
+
+
+class TestProfitDedtPrecompute:
+
+    def test_matches_row_by_row_reference(self):
+        rng = np.random.default_rng(0)
+        ts_codes = ['A.SZ', 'B.SZ', 'C.SZ', 'D.SZ']
+        financial = _random_financial(rng, ts_codes[:3])
+        trade_dates = pd.bdate_range('2016-01-01', '2024-12-31').strftime('%Y%m%d')
+        daily = pd.DataFrame({'ts_code': rng.choice(ts_codes, 3000),
+                              'trade_date': rng.choice(trade_dates, 3000),
+                              'circ_mv': rng.uniform(1e4, 1e6, 3000)})
+        daily.loc[rng.random(3000) < 0.02, 'circ_mv'] = np.nan
+
+        sync = StockDailyBasicSync.__new__(StockDailyBasicSync)
+        for ts_code in ts_codes:
+            rows = daily[daily['ts_code'] == ts_code]
+            fin = financial[financial['ts_code'] == ts_code]
+            expected = compute_profit_dedt_reference(rows, fin)
+            actual = sync._compute_profit_dedt(rows, fin)
+            for expected_list, actual_list in zip(expected, actual):
+                assert [v is None for v in expected_list] == [v is None for v in actual_list]
+                assert np.allclose([v for v in expected_list if v is not None],
+                                   [v for v in actual_list if v is not None])
+            assert any(v is not None for v in actual[1]) or ts_code == 'D.SZ'
+
+        # 截面（多只股票一起）与逐只计算结果一致
+        whole = sync._compute_profit_dedt(daily, financial)
+        for ts_code in ts_codes:
+            mask = (daily['ts_code'] == ts_code).to_numpy()
+            single = sync._compute_profit_dedt(daily[mask], financial[financial['ts_code'] == ts_code])
+            assert [v for v, m in zip(whole[1], mask) if m] == single[1]
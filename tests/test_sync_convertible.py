@@ -0,0 +1,90 @@
+"""
+可转债日线按交易日截面同步 (sync_convertible.sync_daily) 单元测试
+
+使用假接口和假 Mapper，不访问网络和数据库
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+import sync.sync_convertible as sync_convertible
+from tu_share_factory.tu_share_factory import TuShareFactory
+
+
+class FakePro:
+    """交易日历 + 按交易日返回全部转债截面；fail_dates 中的交易日返回异常，empty_dates 中的返回空截面"""
+
+    def __init__(self, open_dates, fail_dates=(), empty_dates=()):
+        self.open_dates = open_dates
+        self.fail_dates = set(fail_dates)
+        self.empty_dates = set(empty_dates)
+        self.requests = []
+
+    def trade_cal(self, exchange, start_date, end_date, fields):
+        dates = pd.date_range(start_date, end_date).strftime('%Y%m%d')
+        return pd.DataFrame({'cal_date': dates, 'is_open': [int(d in self.open_dates) for d in dates]})
+
+    def imap(self, endpoint, kwargs_list):
+        for kwargs in kwargs_list:
+            self.requests.append((endpoint, kwargs))
+            trade_date = kwargs['trade_date']
+            if trade_date in self.fail_dates:
+                yield kwargs, RuntimeError('timeout')
+                continue
+            if trade_date in self.empty_dates:
+                yield kwargs, pd.DataFrame()
+                continue
+            df = pd.DataFrame({'ts_code': ['110001.SH', '123001.SZ', '999999.SH']})
+            for field in sync_convertible.CB_DAILY_FIELDS[1:]:
+                df[field] = 1.0
+            df['trade_date'] = trade_date
+            yield kwargs, df
+
+
+class FakeMapper:
+
+    upserts = []
+
+    def __init__(self, table_name):
+        self.table_name = table_name
+
+    def upsert_dataframe(self, df):
+        FakeMapper.upserts.append(df)
+
+
+def _patch(monkeypatch, pro):
+    monkeypatch.setattr(TuShareFactory, 'build_api_client', staticmethod(lambda: pro))
+    monkeypatch.setattr(sync_convertible, 'CommonMapper', FakeMapper)
+    monkeypatch.setattr(FakeMapper, 'upserts', [])
+    monkeypatch.setattr(sync_convertible, 'get_basic_codes', lambda: {'110001.SH', '123001.SZ'})
+
+
+class TestSyncDailyByTradeDate:
+
+    def test_one_request_per_trading_day_filtered_by_basic(self, monkeypatch):
+        pro = FakePro({'20240401', '20240402'})
+        _patch(monkeypatch, pro)
+        total = sync_convertible.sync_daily(start='20240330', end='20240402')
+
+        assert [kwargs['trade_date'] for _, kwargs in pro.requests] == ['20240401', '20240402']
+        assert all('ts_code' not in kwargs for _, kwargs in pro.requests)
+        assert total == 4
+        assert all(set(df['ts_code']) == {'110001.SH', '123001.SZ'} for df in FakeMapper.upserts)
+
+    def test_stops_at_first_failed_day(self, monkeypatch):
+        pro = FakePro({'20240401', '20240402', '20240403'}, fail_dates={'20240402'})
+        _patch(monkeypatch, pro)
+        sync_convertible.sync_daily(start='20240401', end='20240403')
+
+        assert [df['trade_date'].iloc[0] for df in FakeMapper.upserts] == ['20240401']
+
+    def test_stops_at_first_empty_day(self, monkeypatch):
+        pro = FakePro({'20240401', '20240402', '20240403'}, empty_dates={'20240402'})
+        _patch(monkeypatch, pro)
+        sync_convertible.sync_daily(start='20240401', end='20240403')
+
+        assert [df['trade_date'].iloc[0] for df in FakeMapper.upserts] == ['20240401']
@@ -0,0 +1,81 @@
+"""
+同步任务依赖图执行器 (sync_dag) 单元测试
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import threading
+
+import pytest
+
+from sync.sync_dag import STATUS_FAILED, STATUS_SKIPPED, SyncStage, format_stage_results, run_stages, select_stages
+
+
+def _stages(log, fail=(), barrier=None):
+    """与 sync_main 相同形状的依赖图；barrier 要求四个并行阶段同时在运行"""
+
+    def step(name, rows=None):
+        def run():
+            if barrier is not None and name in ('margin', 'weight', 'income', 'financial'):
+                barrier.wait(timeout=5)
+            log.append(name)
+            if name in fail:
+                raise RuntimeError(f'{name} boom')
+            return rows
+        return run
+
+    return [
+        SyncStage('stock_basic', '股票基础数据', step('stock_basic')),
+        SyncStage('margin', '两融', step('margin', 10), ('stock_basic',)),
+        SyncStage('weight', '权重', step('weight', 20), ('stock_basic',)),
+        SyncStage('income', '收入', step('income'), ('stock_basic',)),
+        SyncStage('financial', '财务', step('financial', 30), ('stock_basic',)),
+        SyncStage('daily_basic', '日线', step('daily_basic', 40), ('stock_basic', 'financial')),
+        SyncStage('index', '指数', step('index'), ('weight', 'daily_basic')),
+    ]
+
+
+class TestRunStages:
+
+    def test_independent_stages_run_concurrently(self):
+        log = []
+        results = run_stages(_stages(log, barrier=threading.Barrier(4)), max_workers=4)
+
+        assert all(r.ok for r in results)
+        # 只检查依赖顺序：日线只等待财务数据，指数只等待权重和日线
+        assert log[0] == 'stock_basic'
+        assert log.index('financial') < log.index('daily_basic') < log.index('index')
+        assert log.index('weight') < log.index('index')
+        assert {r.name: r.rows for r in results}['financial'] == 30
+        assert 'index' in format_stage_results(results, wall_time=1.0)
+
+    def test_failure_skips_only_dependents(self):
+        log = []
+        results = {r.name: r for r in run_stages(_stages(log, fail=('financial',)), max_workers=2)}
+
+        assert results['financial'].status == STATUS_FAILED and 'boom' in results['financial'].traceback
+        assert results['daily_basic'].status == STATUS_SKIPPED
+        assert results['index'].status == STATUS_SKIPPED
+        assert results['margin'].ok and results['weight'].ok and results['income'].ok
+        assert 'daily_basic' not in log and 'index' not in log
+
+    def test_only_and_from_selection(self):
+        log = []
+        results = run_stages(_stages(log), max_workers=1, from_stage='financial')
+        assert [r.name for r in results] == ['financial', 'daily_basic', 'index'] == log
+
+        log.clear()
+        run_stages(_stages(log), only=['weight', 'index'])
+        assert sorted(log) == ['index', 'weight']
+
+
+class TestSelectStages:
+
+    def test_rejects_unknown_and_misordered(self):
+        with pytest.raises(ValueError):
+            select_stages(_stages([]), only=['nope'])
+        with pytest.raises(ValueError):
+            select_stages([SyncStage('b', 'b', lambda: None, ('a',)), SyncStage('a', 'a', lambda: None)])
@@ -0,0 +1,99 @@
+"""
+同步水位线 (SyncStateMapper) 与断点续传单元测试
+
+不依赖数据库：SyncStateMapper 的读写方法被替换，同步器使用内存中的假 sync_state
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from mysql_connect.sync_state_mapper import SyncStateMapper, to_watermark
+from sync.stock.sync_financial_data import FinancialDataSync
+from tests.test_stock_daily_basic_sync import FakeSyncStateMapper
+from tu_share_factory.tu_share_factory import TuShareFactory
+
+
+class TestSyncStateMapper:
+
+    def test_to_watermark(self):
+        assert to_watermark(date(2024, 1, 5)) == '20240105'
+        assert to_watermark('2024-01-05') == '20240105'
+        assert to_watermark('20240105') == '20240105'
+        assert to_watermark(None) is None and to_watermark('') is None
+
+    def test_seeds_once_from_table_maximum(self, monkeypatch):
+        stored = {}
+        written = []
+        monkeypatch.setattr(SyncStateMapper, 'ensure_table', lambda self: None)
+        monkeypatch.setattr(SyncStateMapper, 'select_watermarks', lambda self, dataset: dict(stored))
+        monkeypatch.setattr(SyncStateMapper, 'bulk_upsert',
+                            lambda self, columns, rows, update_columns=None: written.extend(rows))
+
+        seeds = []
+        seed = lambda: seeds.append(1) or {'A': date(2024, 1, 5), 'B': None}
+        assert SyncStateMapper().load_watermarks('ds', seed) == {'A': '20240105'}
+        assert written == [{'dataset': 'ds', 'ts_code': 'A', 'watermark': '20240105'}]
+
+        stored['A'] = '20240110'
+        assert SyncStateMapper().load_watermarks('ds', seed) == {'A': '20240110'}
+        assert len(seeds) == 1
+
+
+class FakeFinancialPro:
+    """fina_indicator 按股票返回两个报告期；fail_codes 中的股票返回异常"""
+
+    def __init__(self, fail_codes=()):
+        self.fail_codes = set(fail_codes)
+        self.requests = []
+
+    def imap(self, endpoint, kwargs_list):
+        for kwargs in kwargs_list:
+            self.requests.append((kwargs['ts_code'], kwargs['start_date']))
+            if kwargs['ts_code'] in self.fail_codes:
+                yield kwargs, RuntimeError('timeout')
+                continue
+            yield kwargs, pd.DataFrame({'ts_code': kwargs['ts_code'], 'end_date': ['20240331', '20240630']})
+
+
+class FakeStockBasicMapper:
+
+    def get_all_ts_codes(self):
+        return ['A.SZ', 'B.SZ', 'C.SZ']
+
+
+class FakeFinancialDataMapper:
+
+    def select_max_end_date_by_code(self):
+        return {'A.SZ': '20231231', 'B.SZ': '20231231', 'C.SZ': '20231231'}
+
+
+class TestFinancialDataResume:
+
+    def test_interrupted_run_resumes_from_failed_stock(self, monkeypatch):
+        pro = FakeFinancialPro(fail_codes={'B.SZ'})
+        monkeypatch.setattr(TuShareFactory, 'build_api_client', staticmethod(lambda: pro))
+        sync = FinancialDataSync.__new__(FinancialDataSync)
+        sync.mapper = FakeFinancialDataMapper()
+        sync.stock_basic_mapper = FakeStockBasicMapper()
+        sync.sync_state_mapper = FakeSyncStateMapper()
+        monkeypatch.setattr(sync, '_save_data', lambda ts_code, df: len(df))
+
+        with pytest.raises(RuntimeError):
+            sync.additional_data()
+        state = sync.sync_state_mapper.state
+        assert state[('financial_data', 'A.SZ')] == '20240630'
+        assert state[('financial_data', 'B.SZ')] == '20231231'
+        assert ('financial_data', 'B.SZ') in sync.sync_state_mapper.errors
+
+        # 下次运行：A 从已提交的报告期开始，B、C 从中断前的水位线继续
+        pro.fail_codes.clear()
+        pro.requests.clear()
+        assert sync.additional_data() == 6
+        assert pro.requests == [('A.SZ', '20240630'), ('B.SZ', '20231231'), ('C.SZ', '20231231')]
@@ -0,0 +1,126 @@
+"""
+Tushare 统一客户端 (TushareClient / TokenBucket) 单元测试
+
+使用假时钟和假接口，不访问网络
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import threading
+
+import pandas as pd
+import pytest
+
+from tu_share_factory.tushare_client import (TokenBucket, TushareClient, is_rate_limit_error,
+                                             per_minute_for_points)
+
+
+class FakeClock:
+    """sleep 只推进时间，不真正等待"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        with self._lock:
+            self.sleeps.append(seconds)
+            self.now += seconds
+
+
+class FakeApi:
+    """按 ts_code 返回 DataFrame；failures 指定前 N 次调用抛出的异常"""
+
+    def __init__(self, failures=None):
+        self.failures = list(failures or [])
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def daily(self, ts_code=None, **kwargs):
+        with self._lock:
+            self.calls.append(ts_code)
+            if self.failures:
+                raise self.failures.pop(0)
+        return pd.DataFrame({'ts_code': [ts_code]})
+
+
+def _client(api, clock, **kwargs):
+    return TushareClient(api, clock=clock, sleep=clock.sleep, **kwargs)
+
+
+class TestTokenBucket:
+
+    def test_never_exceeds_quota_in_any_minute(self):
+        clock = FakeClock()
+        bucket = TokenBucket(200, clock=clock, sleep=clock.sleep)
+        times = []
+        for _ in range(1000):
+            bucket.acquire()
+            times.append(clock.now)
+        for i, start in enumerate(times):
+            in_window = sum(1 for t in times[i:] if t < start + 60)
+            assert in_window <= 200
+        # 持续速率接近配额上限
+        assert 1000 / times[-1] * 60 > 180
+
+    def test_drain_delays_next_call(self):
+        clock = FakeClock()
+        bucket = TokenBucket(60, clock=clock, sleep=clock.sleep)
+        bucket.drain()
+        assert bucket.acquire() == pytest.approx(1 / 0.95)
+
+
+class TestTushareClient:
+
+    def test_forwards_endpoint_and_counts(self):
+        clock = FakeClock()
+        client = _client(FakeApi(), clock)
+        df = client.daily(ts_code='A')
+        assert df['ts_code'].tolist() == ['A']
+        stats = client.stats()['daily']
+        assert stats['calls'] == 1 and stats['retries'] == 0 and stats['errors'] == 0
+
+    def test_retries_with_backoff_then_succeeds(self):
+        clock = FakeClock()
+        api = FakeApi([RuntimeError('timeout'), RuntimeError('抱歉，您每分钟最多访问该接口200次')])
+        client = _client(api, clock, base_delay=1.0, rate_limit_delay=10.0)
+        client.daily(ts_code='A')
+
+        assert api.calls == ['A', 'A', 'A']
+        stats = client.stats()['daily']
+        assert stats['retries'] == 2 and stats['rate_limited'] == 1 and stats['calls'] == 1
+        backoffs = [s for s in clock.sleeps if s >= 0.5]
+        assert 0.5 <= backoffs[0] <= 1.0      # 普通错误: base_delay * 2^0，带抖动
+        assert 10.0 <= backoffs[1] <= 20.0    # 频率超限: rate_limit_delay * 2^1，带抖动
+
+    def test_gives_up_after_max_retries(self):
+        clock = FakeClock()
+        client = _client(FakeApi([ValueError('bad')] * 3), clock, max_retries=2)
+        with pytest.raises(ValueError):
+            client.daily(ts_code='A')
+        assert client.stats()['daily']['errors'] == 1
+
+    def test_imap_keeps_order_and_returns_errors(self):
+        clock = FakeClock()
+        client = _client(FakeApi([ValueError('bad')]), clock, max_retries=0, max_workers=3)
+        results = list(client.imap('daily', [{'ts_code': c} for c in 'ABCDE'], window=2))
+
+        assert [kwargs['ts_code'] for kwargs, _ in results] == list('ABCDE')
+        errors = [r for _, r in results if isinstance(r, Exception)]
+        assert len(errors) == 1
+        assert sum(1 for _, r in results if isinstance(r, pd.DataFrame)) == 4
+
+    def test_rate_limits_and_points(self):
+        client = TushareClient(FakeApi(), points=5000, rate_limits={'daily': 80})
+        assert client.default_per_minute == 500
+        assert client._bucket('daily').per_minute == 80
+        assert per_minute_for_points(120) == 50
+        assert is_rate_limit_error(RuntimeError('Rate limit exceeded'))
+        assert not is_rate_limit_error(RuntimeError('timeout'))
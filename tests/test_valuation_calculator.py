@@ -0,0 +1,393 @@
+"""
+ValuationCalculator 向量化聚合单元测试
+
+对比 _aggregate_daily_metrics 与逐日逐行的参考实现 daily_both_metrics_reference，
+使用假 Mapper，不依赖数据库
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from mysql_connect.common_mapper import rows_to_frame
+from sync.index.services.valuation_calculator import ValuationCalculator
+from sync.index.services.weight_asof_index import WeightAsOfIndex
+
+METRIC_KEYS = ['weighted_pe', 'weighted_pe_ttm', 'weighted_pb',
+               'equal_weight_pe', 'equal_weight_pe_ttm', 'equal_weight_pb',
+               'weighted_pe_dedt', 'weighted_pe_ttm_dedt',
+               'valid_stocks_pe', 'valid_stocks_pe_ttm', 'valid_stocks_pb', 'total_stocks']
+
+
+def _make_daily_basic(dates, codes, seed=0):
+    """生成含 NaN / 负值 / 缺失 total_mv 的日线基础数据"""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for d in dates:
+        for code in codes:
+            row = {
+                'ts_code': code,
+                'trade_date': d,
+                'total_mv': rng.uniform(1e5, 1e7),
+                'circ_mv': rng.uniform(1e5, 1e7),
+                'pe': rng.uniform(-20, 60),
+                'pe_ttm': rng.uniform(-20, 60),
+                'pb': rng.uniform(0.5, 8),
+                'pe_profit_dedt': rng.uniform(-20, 60),
+                'pe_ttm_profit_dedt': rng.uniform(-20, 60),
+            }
+            for key in ('pe', 'pe_ttm', 'pb', 'pe_profit_dedt', 'total_mv'):
+                if rng.random() < 0.1:
+                    row[key] = np.nan
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def daily_both_metrics_reference(daily_financial_data, month_weights, trade_date):
+    """单日加权指标和等权指标的逐行参考实现"""
+    financial_df = pd.DataFrame(daily_financial_data)
+
+    # 合并财务数据和权重
+    merged_df = pd.merge(
+        financial_df,
+        month_weights[['con_code', 'weight']],
+        left_on='ts_code',
+        right_on='con_code',
+        how='inner'
+    )
+
+    if merged_df.empty:
+        return None
+
+    # 计算加权指标（基于指数权重）
+    weighted_metrics = _index_weighted_metrics_reference(merged_df)
+
+    # 计算等权指标（基于市值权重）
+    equal_weight_metrics = _market_cap_weighted_metrics_reference(merged_df)
+
+    # 合并结果
+    result = {
+        'trade_date': trade_date,
+        # 指数权重加权指标
+        'weighted_pe': weighted_metrics['pe'],
+        'weighted_pe_ttm': weighted_metrics['pe_ttm'],
+        'weighted_pb': weighted_metrics['pb'],
+        # 市值权重等权指标
+        'equal_weight_pe': equal_weight_metrics['pe'],
+        'equal_weight_pe_ttm': equal_weight_metrics['pe_ttm'],
+        'equal_weight_pb': equal_weight_metrics['pb'],
+        # 统计信息
+        'valid_stocks_pe': weighted_metrics['valid_pe_count'],
+        'valid_stocks_pe_ttm': weighted_metrics['valid_pe_ttm_count'],
+        'valid_stocks_pb': weighted_metrics['valid_pb_count'],
+        'total_stocks': len(merged_df),
+        'weighted_pe_dedt': weighted_metrics['pe_dedt'],
+        'weighted_pe_ttm_dedt': weighted_metrics['pe_ttm_dedt']
+    }
+
+    return result
+
+def _index_weighted_metrics_reference(merged_df):
+    """计算基于指数权重的加权指标"""
+    # 初始化累计值
+    weighted_total_net_profit = 0
+    weighted_total_net_profit_ttm = 0
+    weighted_total_net_profit_dedt = 0
+    weighted_total_net_profit_ttm_dedt = 0
+    weighted_total_net_assets = 0
+    weighted_total_circ_mv_pe = 0
+    weighted_total_circ_mv_pe_ttm = 0
+    weighted_total_circ_mv_pb = 0
+    weighted_total_circ_mv_pe_dedt = 0
+    weighted_total_circ_mv_pe_ttm_dedt = 0
+
+    valid_pe_count = 0
+    valid_pe_ttm_count = 0
+    valid_pb_count = 0
+
+    for _, row in merged_df.iterrows():
+        weight = row['weight'] / 100.0  # 假设权重是百分比
+        total_mv = row['total_mv']
+        circ_mv = row['circ_mv']
+
+        # 计算 PE 相关指标
+        if pd.notna(row['pe']) and row['pe'] > 0:
+            net_profit = total_mv / row['pe']
+            weighted_total_net_profit += net_profit * weight
+            weighted_total_circ_mv_pe += circ_mv * weight
+            valid_pe_count += 1
+        else:
+            weighted_total_circ_mv_pe += circ_mv * weight
+            valid_pe_count += 1
+
+        # 计算 PE_TTM 相关指标
+        if pd.notna(row['pe_ttm']) and row['pe_ttm'] > 0:
+            net_profit_ttm = total_mv / row['pe_ttm']
+            weighted_total_net_profit_ttm += net_profit_ttm * weight
+            weighted_total_circ_mv_pe_ttm += circ_mv * weight
+            valid_pe_ttm_count += 1
+        else:
+            weighted_total_circ_mv_pe_ttm += circ_mv * weight
+            valid_pe_ttm_count += 1
+
+        # 计算 PB 相关指标
+        if pd.notna(row['pb']) and row['pb'] > 0:
+            net_assets = total_mv / row['pb']
+            weighted_total_net_assets += net_assets * weight
+            weighted_total_circ_mv_pb += circ_mv * weight
+            valid_pb_count += 1
+        else:
+            weighted_total_circ_mv_pb += circ_mv * weight
+            valid_pb_count += 1
+
+        # 计算扣非 PE 相关指标
+        if 'pe_profit_dedt' in row and pd.notna(row['pe_profit_dedt']) and row['pe_profit_dedt'] > 0:
+            weighted_total_circ_mv_pe_dedt += circ_mv * weight
+            weighted_total_net_profit_dedt += circ_mv / row['pe_profit_dedt'] * weight
+        else:
+            weighted_total_circ_mv_pe_dedt += circ_mv * weight
+
+        # 计算扣非 PE_TTM 相关指标
+        if 'pe_ttm_profit_dedt' in row and pd.notna(row['pe_ttm_profit_dedt']) and row['pe_ttm_profit_dedt'] > 0:
+            weighted_total_circ_mv_pe_ttm_dedt += circ_mv * weight
+            weighted_total_net_profit_ttm_dedt += circ_mv / row['pe_ttm_profit_dedt'] * weight
+        else:
+            weighted_total_circ_mv_pe_ttm_dedt += circ_mv * weight
+
+    # 计算最终的加权指标
+    weighted_pe = (weighted_total_circ_mv_pe / weighted_total_net_profit
+                  if weighted_total_net_profit > 0 else None)
+    weighted_pe_ttm = (weighted_total_circ_mv_pe_ttm / weighted_total_net_profit_ttm
+                      if weighted_total_net_profit_ttm > 0 else None)
+    weighted_pb = (weighted_total_circ_mv_pb / weighted_total_net_assets
+                  if weighted_total_net_assets > 0 else None)
+    weighted_pe_dedt = (weighted_total_circ_mv_pe_dedt / weighted_total_net_profit_dedt
+                       if weighted_total_net_profit_dedt > 0 else None)
+    weighted_pe_ttm_dedt = (weighted_total_circ_mv_pe_ttm_dedt / weighted_total_net_profit_ttm_dedt
+                           if weighted_total_net_profit_ttm_dedt > 0 else None)
+
+    return {
+        'pe': weighted_pe,
+        'pe_ttm': weighted_pe_ttm,
+        'pb': weighted_pb,
+        'pe_dedt': weighted_pe_dedt,
+        'pe_ttm_dedt': weighted_pe_ttm_dedt,
+        'valid_pe_count': valid_pe_count,
+        'valid_pe_ttm_count': valid_pe_ttm_count,
+        'valid_pb_count': valid_pb_count
+    }
+
+def _market_cap_weighted_metrics_reference(merged_df):
+    """计算基于市值权重的等权指标"""
+    # 过滤有效数据
+    valid_data = merged_df.dropna(subset=['total_mv'])
+
+    if valid_data.empty:
+        return {'pe': None, 'pe_ttm': None, 'pb': None}
+
+    # 计算总市值
+    total_market_cap = valid_data['total_mv'].sum()
+
+    if total_market_cap <= 0:
+        return {'pe': None, 'pe_ttm': None, 'pb': None}
+
+    # 计算总流通市值
+    circ_market_cap = valid_data['circ_mv'].sum()
+
+    # 初始化累计值
+    mv_weighted_net_profit = 0
+    mv_weighted_net_profit_ttm = 0
+    mv_weighted_net_assets = 0
+    mv_weighted_total_mv_pe = 0
+    mv_weighted_total_mv_pe_ttm = 0
+    mv_weighted_total_mv_pb = 0
+
+    weighted_total_net_profit_dedt = 0
+    weighted_total_net_profit_ttm_dedt = 0
+    weighted_total_circ_mv_pe_dedt = 0
+    weighted_total_circ_mv_pe_ttm_dedt = 0
+
+    for _, row in valid_data.iterrows():
+        total_mv = row['total_mv']
+        mv_weight = total_mv / total_market_cap  # 市值权重
+        circ_mv = row['circ_mv']
+        circ_mv_weight = circ_mv / circ_market_cap if circ_market_cap > 0 else 0
+
+        # 计算 PE 相关指标
+        if pd.notna(row['pe']) and row['pe'] > 0:
+            net_profit = total_mv / row['pe']
+            mv_weighted_net_profit += net_profit * mv_weight
+            mv_weighted_total_mv_pe += total_mv * mv_weight
+
+        # 计算 PE_TTM 相关指标
+        if pd.notna(row['pe_ttm']) and row['pe_ttm'] > 0:
+            net_profit_ttm = total_mv / row['pe_ttm']
+            mv_weighted_net_profit_ttm += net_profit_ttm * mv_weight
+            mv_weighted_total_mv_pe_ttm += total_mv * mv_weight
+
+        # 计算 PB 相关指标
+        if pd.notna(row['pb']) and row['pb'] > 0:
+            net_assets = total_mv / row['pb']
+            mv_weighted_net_assets += net_assets * mv_weight
+            mv_weighted_total_mv_pb += total_mv * mv_weight
+
+        # 计算扣非 PE 相关指标
+        if 'pe_profit_dedt' in row and pd.notna(row['pe_profit_dedt']) and row['pe_profit_dedt'] > 0:
+            weighted_total_circ_mv_pe_dedt += circ_mv * circ_mv_weight
+            weighted_total_net_profit_dedt += circ_mv / row['pe_profit_dedt'] * circ_mv_weight
+
+        # 计算扣非 PE_TTM 相关指标
+        if 'pe_ttm_profit_dedt' in row and pd.notna(row['pe_ttm_profit_dedt']) and row['pe_ttm_profit_dedt'] > 0:
+            weighted_total_circ_mv_pe_ttm_dedt += circ_mv * circ_mv_weight
+            weighted_total_net_profit_ttm_dedt += circ_mv / row['pe_ttm_profit_dedt'] * circ_mv_weight
+
+    # 计算最终的市值加权指标
+    equal_weight_pe = (mv_weighted_total_mv_pe / mv_weighted_net_profit
+                      if mv_weighted_net_profit > 0 else None)
+    equal_weight_pe_ttm = (mv_weighted_total_mv_pe_ttm / mv_weighted_net_profit_ttm
+                          if mv_weighted_net_profit_ttm > 0 else None)
+    equal_weight_pb = (mv_weighted_total_mv_pb / mv_weighted_net_assets
+                      if mv_weighted_net_assets > 0 else None)
+    weighted_pe_dedt = (weighted_total_circ_mv_pe_dedt / weighted_total_net_profit_dedt
+                       if weighted_total_net_profit_dedt > 0 else None)
+    weighted_pe_ttm_dedt = (weighted_total_circ_mv_pe_ttm_dedt / weighted_total_net_profit_ttm_dedt
+                           if weighted_total_net_profit_ttm_dedt > 0 else None)
+
+    return {
+        'pe': equal_weight_pe,
+        'pe_ttm': equal_weight_pe_ttm,
+        'pb': equal_weight_pb,
+        'weighted_pe_dedt': weighted_pe_dedt,
+        'weighted_pe_ttm_dedt': weighted_pe_ttm_dedt
+    }
+
+
+def _assert_same(actual, expected):
+    assert actual['trade_date'] == expected['trade_date']
+    for key in METRIC_KEYS:
+        a, e = actual[key], expected[key]
+        if e is None or (isinstance(e, float) and np.isnan(e)):
+            assert a is None or np.isnan(a), key
+        else:
+            assert a == pytest.approx(e, rel=1e-12), key
+
+
+class TestAggregateDailyMetrics:
+
+    def test_matches_reference(self):
+        calc = ValuationCalculator(object(), object(), object())
+        codes = [f'{i:06d}.SH' for i in range(30)]
+        dates = ['20240102', '20240103', '20240104', '20240105']
+        daily = _make_daily_basic(dates, codes)
+        weights = pd.DataFrame({'con_code': codes[:25], 'weight': np.linspace(0.5, 7.5, 25)})
+
+        merged = pd.merge(daily, weights, left_on='ts_code', right_on='con_code', how='inner')
+        actual = calc._aggregate_daily_metrics(merged)
+
+        assert [r['trade_date'] for r in actual] == dates
+        for row, date in zip(actual, dates):
+            day_rows = daily[daily['trade_date'] == date].to_dict('records')
+            expected = daily_both_metrics_reference(day_rows, weights, date)
+            _assert_same(row, expected)
+
+    def test_all_total_mv_missing_gives_none(self):
+        calc = ValuationCalculator(object(), object(), object())
+        daily = _make_daily_basic(['20240102'], ['A', 'B'])
+        daily['total_mv'] = np.nan
+        weights = pd.DataFrame({'con_code': ['A', 'B'], 'weight': [40.0, 60.0]})
+        merged = pd.merge(daily, weights, left_on='ts_code', right_on='con_code', how='inner')
+
+        row = calc._aggregate_daily_metrics(merged)[0]
+        expected = daily_both_metrics_reference(daily.to_dict('records'), weights, '20240102')
+        _assert_same(row, expected)
+        assert row['equal_weight_pe'] is None
+
+
+class FakeDailyBasicMapper:
+    """按区间返回行，记录查询次数"""
+
+    def __init__(self, daily):
+        self.daily = daily
+        self.calls = []
+
+    def select_frame_by_trade_date_range_and_ts_code(self, start_date, end_date, ts_code_list,
+                                                     columns='*', dtypes=None):
+        self.calls.append((start_date, end_date))
+        df = self.daily[(self.daily['trade_date'] >= start_date) & (self.daily['trade_date'] <= end_date)
+                        & self.daily['ts_code'].isin(ts_code_list)]
+        names = [name.strip() for name in columns.split(',')]
+        rows = [tuple(None if pd.isna(r[name]) else r[name] for name in names) for r in df.to_dict('records')]
+        return rows_to_frame(names, rows, dtypes)
+
+
+class TestMonthlyRangeQuery:
+
+    def test_one_query_per_month_with_point_in_time_weights(self):
+        codes = ['A', 'B', 'C']
+        dates = ['20240130', '20240131', '20240201', '20240229', '20240301']
+        daily = _make_daily_basic(dates, codes, seed=1)
+        mapper = FakeDailyBasicMapper(daily)
+        calc = ValuationCalculator(object(), object(), mapper)
+        # 1 月底调仓：C 调出
+        jan = pd.DataFrame({'con_code': codes, 'trade_date': '20240102', 'weight': [20.0, 30.0, 50.0]})
+        feb = pd.DataFrame({'con_code': ['A', 'B'], 'trade_date': '20240131', 'weight': [45.0, 55.0]})
+        weight_index = WeightAsOfIndex(pd.concat([feb, jan]))
+
+        result = calc._calculate_both_weighted_metrics(
+            weight_index, datetime(2024, 1, 15), datetime(2024, 3, 10)
+        )
+
+        assert mapper.calls == [('20240115', '20240131'), ('20240201', '20240229'), ('20240301', '20240310')]
+        assert [r['trade_date'] for r in result] == dates
+        assert [r['total_stocks'] for r in result] == [3, 2, 2, 2, 2]
+        for row in result:
+            weights = jan if row['trade_date'] < '20240131' else feb
+            day_rows = daily[daily['trade_date'] == row['trade_date']].to_dict('records')
+            _assert_same(row, daily_both_metrics_reference(day_rows, weights, row['trade_date']))
+
+
+class TestWeightAsOfIndex:
+
+    def _index(self):
+        return WeightAsOfIndex(pd.DataFrame({
+            'con_code': ['A', 'B', 'A', 'C', 'C'],
+            'trade_date': ['20240102', '20240102', '20240201', '20240201', '20240301'],
+            'weight': [60.0, 40.0, 50.0, 50.0, 100.0],
+        }))
+
+    def test_locate_uses_latest_rebalance_on_or_before(self):
+        index = self._index()
+        assert list(index.rebalance_dates) == ['20240102', '20240201', '20240301']
+        positions = index.locate(['20231229', '20240102', '20240131', '20240201', '20240315'])
+        # 早于第一期的交易日使用第一期权重
+        assert positions.tolist() == [0, 0, 0, 1, 2]
+
+    def test_con_codes_between(self):
+        index = self._index()
+        assert index.con_codes_between('20240105', '20240110') == ['A', 'B']
+        assert index.con_codes_between('20240115', '20240215') == ['A', 'B', 'C']
+        assert index.con_codes_between('20240305', '20240331') == ['C']
+
+    def test_attach_weights_joins_effective_constituents_only(self):
+        index = self._index()
+        daily = pd.DataFrame({
+            'ts_code': ['A', 'B', 'C', 'A', 'B', 'C'],
+            'trade_date': ['20240131'] * 3 + ['20240201'] * 3,
+        })
+        merged = index.attach_weights(daily)
+        got = sorted(zip(merged['trade_date'], merged['ts_code'], merged['weight']))
+        assert got == [('20240131', 'A', 60.0), ('20240131', 'B', 40.0),
+                       ('20240201', 'A', 50.0), ('20240201', 'C', 50.0)]
+
+    def test_empty(self):
+        index = WeightAsOfIndex(pd.DataFrame(columns=['con_code', 'trade_date', 'weight']))
+        assert index.empty
+        assert index.con_codes_between('20240101', '20240131') == []
+        assert index.attach_weights(pd.DataFrame({'ts_code': ['A'], 'trade_date': ['20240102']})).empty
@@ -1,14 +1,31 @@
 import os
+import threading
 
 import tushare
 import tushare as ts
 import yaml
 
 from entity import constant
+from tu_share_factory.tushare_client import TushareClient
+from util.config_loader import get_tushare_client_config
 
 
 class TuShareFactory():
+    # 进程内共享的限流客户端
+    _client = None
+    _lock = threading.Lock()
+
     @staticmethod
-    def build_api_client():
+    def build_raw_api():
+        """原生 Tushare 客户端（不限流）"""
         token = os.getenv('TuShareToken')
-        return ts.pro_api(token)
\ No newline at end of file
+        return ts.pro_api(token)
+
+    @staticmethod
+    def build_api_client():
+        """进程内共享的 TushareClient（限流、重试、并发），首次调用时创建"""
+        with TuShareFactory._lock:
+            if TuShareFactory._client is None:
+                TuShareFactory._client = TushareClient(TuShareFactory.build_raw_api(),
+                                                       **get_tushare_client_config())
+            return TuShareFactory._client
@@ -0,0 +1,293 @@
+"""
+Tushare 统一客户端
+
+所有同步模块共用一个客户端，替代各处硬编码的 time.sleep 限流：
+- 按接口的令牌桶：每分钟调用上限由积分档位决定，可按接口覆盖，任意 60 秒窗口内不超过上限
+- 有界线程池：submit / imap 并发请求，总体速率由令牌桶控制，可以跑满配额
+- 抖动指数退避重试：触发频率超限时清空令牌桶并等待更长时间
+- 按接口统计调用次数、重试、失败和耗时
+
+config.yaml 示例（均可省略）:
+    tushare:
+      points: 2000            # 积分档位，决定默认每分钟调用上限
+      max_workers: 4          # 并发线程数
+      max_retries: 4          # 单次调用最多重试次数
+      rate_limits:            # 按接口覆盖每分钟调用上限
+        daily_basic: 200
+
+使用示例:
+    pro = TuShareFactory.build_api_client()
+    df = pro.daily_basic(ts_code='000001.SZ', start_date='20240101')   # 与原生接口用法一致
+    for kwargs, df in pro.imap('cb_daily', [{'ts_code': c} for c in codes]):
+        ...
+    print(pro.format_stats())
+"""
+
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+# 积分档位 -> 默认每分钟调用上限（取不超过积分的最高档）
+POINTS_PER_MINUTE = [(10000, 1000), (5000, 500), (2000, 200), (0, 50)]
+
+# 频率超限错误信息中的关键字
+RATE_LIMIT_MARKERS = ('频率超限', '每分钟最多访问', 'rate limit')
+
+
+def per_minute_for_points(points: int) -> int:
+    """积分对应的默认每分钟调用上限"""
+    for threshold, per_minute in POINTS_PER_MINUTE:
+        if points >= threshold:
+            return per_minute
+    return POINTS_PER_MINUTE[-1][1]
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    message = str(error)
+    return any(marker in message or marker in message.lower() for marker in RATE_LIMIT_MARKERS)
+
+
+class TokenBucket:
+    """
+    线程安全的令牌桶（预约式：令牌可透支，调用方按透支量等待，先到先得）
+
+    补充速率为上限的 SAFETY 倍，桶容量为剩余部分，
+    保证任意 60 秒窗口内的调用次数不超过 per_minute。
+    """
+
+    SAFETY = 0.95
+
+    def __init__(self, per_minute: float,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.per_minute = per_minute
+        self.rate = per_minute * self.SAFETY / 60.0
+        self.capacity = max(1.0, per_minute * (1 - self.SAFETY))
+        self.tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self) -> float:
+        """预约一个令牌，返回需要等待的秒数"""
+        with self._lock:
+            self._refill(self._clock())
+            self.tokens -= 1
+            return max(0.0, -self.tokens / self.rate)
+
+    def acquire(self) -> float:
+        """取得一个令牌（必要时等待），返回等待的秒数"""
+        wait = self.reserve()
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+    def drain(self):
+        """清空桶内剩余令牌（服务端已判定超限时，后续调用按补充速率重新计时）"""
+        with self._lock:
+            self._refill(self._clock())
+            self.tokens = min(self.tokens, 0.0)
+
+
+class EndpointStats:
+    """单个接口的调用统计"""
+
+    def __init__(self):
+        self.calls = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.errors = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.total_wait = 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            'calls': self.calls,
+            'retries': self.retries,
+            'rate_limited': self.rate_limited,
+            'errors': self.errors,
+            'avg_latency': self.total_latency / self.calls if self.calls else 0.0,
+            'max_latency': self.max_latency,
+            'total_wait': self.total_wait,
+        }
+
+
+class TushareClient:
+    """
+    限流、重试、并发的 Tushare 客户端
+
+    未定义的属性按接口名转发给原生客户端（pro.daily(...) 等写法不变），
+    每次调用都经过对应接口的令牌桶和重试。
+    """
+
+    def __init__(self, api, points: int = 2000,
+                 rate_limits: Optional[Dict[str, int]] = None,
+                 max_workers: int = 4, max_retries: int = 4,
+                 base_delay: float = 1.0, rate_limit_delay: float = 10.0, max_delay: float = 60.0,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        """
+        Args:
+            api: 原生客户端（tushare.pro_api 的返回值）
+            points: 积分档位，决定默认每分钟调用上限
+            rate_limits: {接口名: 每分钟调用上限}，覆盖默认值
+            max_workers: 线程池大小
+            max_retries: 单次调用最多重试次数
+            base_delay: 普通错误的首次退避秒数
+            rate_limit_delay: 频率超限错误的首次退避秒数
+            max_delay: 单次退避上限秒数
+        """
+        self.api = api
+        self.default_per_minute = per_minute_for_points(points)
+        self.rate_limits = dict(rate_limits or {})
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.rate_limit_delay = rate_limit_delay
+        self.max_delay = max_delay
+        self._clock = clock
+        self._sleep = sleep
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._stats: Dict[str, EndpointStats] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_pid: Optional[int] = None
+
+    def __getattr__(self, endpoint: str):
+        if endpoint.startswith('_'):
+            raise AttributeError(endpoint)
+
+        def endpoint_call(*args, **kwargs):
+            return self.call(endpoint, *args, **kwargs)
+
+        endpoint_call.__name__ = endpoint
+        return endpoint_call
+
+    # ==================== 限流与统计 ====================
+
+    def _bucket(self, endpoint: str) -> TokenBucket:
+        with self._lock:
+            if endpoint not in self._buckets:
+                per_minute = self.rate_limits.get(endpoint, self.default_per_minute)
+                self._buckets[endpoint] = TokenBucket(per_minute, clock=self._clock, sleep=self._sleep)
+                self._stats[endpoint] = EndpointStats()
+            return self._buckets[endpoint]
+
+    def _backoff(self, attempt: int, rate_limited: bool) -> float:
+        """抖动指数退避：[delay/2, delay] 内均匀取值"""
+        base = self.rate_limit_delay if rate_limited else self.base_delay
+        delay = min(self.max_delay, base * (2 ** attempt))
+        return random.uniform(delay / 2, delay)
+
+    def call(self, endpoint: str, *args, **kwargs):
+        """
+        调用接口（限流 + 重试），最后一次重试仍失败时抛出原异常
+
+        Args:
+            endpoint: 接口名，如 'daily_basic'
+            *args, **kwargs: 原样传给原生接口
+        """
+        bucket = self._bucket(endpoint)
+        stats = self._stats[endpoint]
+        method = getattr(self.api, endpoint)
+        attempt = 0
+        while True:
+            waited = bucket.acquire()
+            started = self._clock()
+            try:
+                result = method(*args, **kwargs)
+            except Exception as e:
+                rate_limited = is_rate_limit_error(e)
+                with self._lock:
+                    stats.total_wait += waited
+                    if rate_limited:
+                        stats.rate_limited += 1
+                    if attempt >= self.max_retries:
+                        stats.errors += 1
+                if rate_limited:
+                    bucket.drain()
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt, rate_limited)
+                print(f"  [Tushare] {endpoint} 调用失败({str(e)[:80]})，{delay:.1f}秒后第{attempt + 1}次重试")
+                with self._lock:
+                    stats.retries += 1
+                self._sleep(delay)
+                attempt += 1
+                continue
+            latency = self._clock() - started
+            with self._lock:
+                stats.calls += 1
+                stats.total_wait += waited
+                stats.total_latency += latency
+                stats.max_latency = max(stats.max_latency, latency)
+            return result
+
+    # ==================== 并发 ====================
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # fork 出的子进程不继承线程，需要重建线程池
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='tushare')
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def submit(self, endpoint: str, *args, **kwargs) -> Future:
+        """在线程池中调用接口，返回 Future"""
+        return self._get_executor().submit(self.call, endpoint, *args, **kwargs)
+
+    def imap(self, endpoint: str, kwargs_list: Iterable[dict],
+             window: Optional[int] = None) -> Iterator[Tuple[dict, object]]:
+        """
+        并发调用同一接口，按输入顺序逐个返回 (kwargs, 结果)
+
+        同时在途的请求不超过 window（默认 2 倍线程数），结果可以边取边处理；
+        重试后仍失败的调用返回异常对象而不是抛出，由调用方决定跳过或中止。
+
+        Args:
+            endpoint: 接口名
+            kwargs_list: 每次调用的参数字典
+            window: 最多在途请求数
+        """
+        window = window or self.max_workers * 2
+        pending = []
+        for kwargs in kwargs_list:
+            pending.append((kwargs, self.submit(endpoint, **kwargs)))
+            if len(pending) >= window:
+                yield self._take(pending.pop(0))
+        while pending:
+            yield self._take(pending.pop(0))
+
+    @staticmethod
+    def _take(item: Tuple[dict, Future]) -> Tuple[dict, object]:
+        kwargs, future = item
+        try:
+            return kwargs, future.result()
+        except Exception as e:
+            return kwargs, e
+
+    # ==================== 统计 ====================
+
+    def stats(self) -> Dict[str, dict]:
+        """按接口的调用统计 {接口名: {calls, retries, rate_limited, errors, avg_latency, max_latency, total_wait}}"""
+        with self._lock:
+            return {endpoint: stats.to_dict() for endpoint, stats in self._stats.items()}
+
+    def format_stats(self) -> str:
+        """调用统计的文本表格"""
+        lines = [f"{'接口':<20}{'调用':>8}{'重试':>6}{'超限':>6}{'失败':>6}{'平均耗时':>10}{'限流等待':>10}"]
+        for endpoint, s in sorted(self.stats().items()):
+            lines.append(f"{endpoint:<20}{s['calls']:>8}{s['retries']:>6}{s['rate_limited']:>6}"
+                         f"{s['errors']:>6}{s['avg_latency']:>9.2f}s{s['total_wait']:>9.1f}s")
+        return '\n'.join(lines)
@@ -73,6 +73,23 @@ def get_tushare_token() -> str:
     return config.get('token', '')
 
 
+def get_tushare_client_config() -> dict:
+    """
+    返回 Tushare 客户端限流配置（config.yaml 的 tushare 节，均可省略）。
+
+    Returns:
+        dict: {'points': int, 'max_workers': int, 'max_retries': int, 'rate_limits': {接口名: 每分钟上限}}
+    """
+    config = load_config()
+    tushare_cfg = config.get('tushare', {}) or {}
+    return {
+        'points': int(tushare_cfg.get('points', 2000)),
+        'max_workers': int(tushare_cfg.get('max_workers', 4)),
+        'max_retries': int(tushare_cfg.get('max_retries', 4)),
+        'rate_limits': {k: int(v) for k, v in (tushare_cfg.get('rate_limits') or {}).items()},
+    }
+
+
 def get_email_config() -> dict:
     """
     返回邮件配置，优先从 config.yaml 读取，fallback 到环境变量。
@@ -127,3 +144,27 @@ def get_report_config() -> dict:
     return {
         'output_dir': report_cfg.get('output_dir', 'reports'),
     }
+
+
+def get_cache_dir(name: str = '') -> str:
+    """
+    返回本地缓存目录（模型、状态文件、行情列存等），不存在时自动创建。
+
+    config.yaml 示例:
+        cache:
+          dir: cache        # 相对路径基于项目根目录
+
+    Args:
+        name: 子目录名，如 'percentile_state'
+
+    Returns:
+        str: 缓存目录绝对路径
+    """
+    config = load_config()
+    cache_cfg = config.get('cache', {}) or {}
+    root = cache_cfg.get('dir', 'cache')
+    if not os.path.isabs(root):
+        root = os.path.join(_PROJECT_ROOT, root)
+    path = os.path.join(root, name) if name else root
+    os.makedirs(path, exist_ok=True)
+    return path
@@ -0,0 +1,220 @@
+"""
+滚动窗口排名工具
+
+为百分位 / 排名类指标提供 O(n log w) 的滚动窗口计算:
+- 有序窗口 (bisect) 引擎: 纯 Python，无额外依赖
+- numba 引擎: 安装 numba 时自动启用（requirements.txt 已声明），同样基于有序数组维护窗口；
+  未安装时 auto 回退有序窗口引擎，结果一致但较慢
+
+窗口长度按 min(i + 1, window) 计算 (包含 NaN 位置)，与逐窗口扫描的结果一致。
+
+另提供 rolling_rank_pct: 当前值在窗口非 NaN 值中的平均排名 / 非 NaN 个数，
+等价于 rolling(window, min_periods).apply(lambda x: pd.Series(x).rank(pct=True).iloc[-1])。
+"""
+
+from bisect import bisect_left, bisect_right, insort
+
+import numpy as np
+
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+
+def _mid_rank_sorted(values: np.ndarray, window: int, min_length: int) -> np.ndarray:
+    """有序窗口引擎: 用 bisect 维护窗口内非 NaN 值的有序列表"""
+    n = len(values)
+    out = np.full(n, np.nan)
+    vals = values.tolist()
+    buf = []
+
+    for i, x in enumerate(vals):
+        # 移出窗口的旧值
+        if i >= window:
+            old = vals[i - window]
+            if old == old:
+                del buf[bisect_left(buf, old)]
+
+        if x != x:  # NaN
+            continue
+        insort(buf, x)
+
+        length = i + 1 if i + 1 < window else window
+        if length < min_length:
+            continue
+        below = bisect_left(buf, x)
+        equal = bisect_right(buf, x) - below
+        out[i] = (below + equal / 2) / length * 100
+
+    return out
+
+
+if HAS_NUMBA:
+    @njit(cache=True)
+    def _mid_rank_numba(values, window, min_length):
+        n = len(values)
+        out = np.full(n, np.nan)
+        buf = np.empty(window, dtype=np.float64)
+        size = 0
+
+        for i in range(n):
+            if i >= window:
+                old = values[i - window]
+                if old == old:
+                    pos = np.searchsorted(buf[:size], old, side='left')
+                    buf[pos:size - 1] = buf[pos + 1:size].copy()
+                    size -= 1
+
+            x = values[i]
+            if x != x:
+                continue
+            pos = np.searchsorted(buf[:size], x, side='right')
+            buf[pos + 1:size + 1] = buf[pos:size].copy()
+            buf[pos] = x
+            size += 1
+
+            length = i + 1 if i + 1 < window else window
+            if length < min_length:
+                continue
+            below = np.searchsorted(buf[:size], x, side='left')
+            equal = np.searchsorted(buf[:size], x, side='right') - below
+            out[i] = (below + equal / 2) / length * 100
+
+        return out
+
+
+def _rank_pct_sorted(values: np.ndarray, window: int, min_periods: int) -> np.ndarray:
+    """有序窗口引擎: 平均排名百分位 (分母为窗口内非 NaN 个数)"""
+    n = len(values)
+    out = np.full(n, np.nan)
+    vals = values.tolist()
+    buf = []
+
+    for i, x in enumerate(vals):
+        if i >= window:
+            old = vals[i - window]
+            if old == old:
+                del buf[bisect_left(buf, old)]
+
+        if x != x:  # NaN
+            continue
+        insort(buf, x)
+
+        count = len(buf)
+        if count < min_periods:
+            continue
+        below = bisect_left(buf, x)
+        equal = bisect_right(buf, x) - below
+        out[i] = (below + (equal + 1) / 2) / count * 100
+
+    return out
+
+
+if HAS_NUMBA:
+    @njit(cache=True)
+    def _rank_pct_numba(values, window, min_periods):
+        n = len(values)
+        out = np.full(n, np.nan)
+        buf = np.empty(window, dtype=np.float64)
+        size = 0
+
+        for i in range(n):
+            if i >= window:
+                old = values[i - window]
+                if old == old:
+                    pos = np.searchsorted(buf[:size], old, side='left')
+                    buf[pos:size - 1] = buf[pos + 1:size].copy()
+                    size -= 1
+
+            x = values[i]
+            if x != x:
+                continue
+            pos = np.searchsorted(buf[:size], x, side='right')
+            buf[pos + 1:size + 1] = buf[pos:size].copy()
+            buf[pos] = x
+            size += 1
+
+            if size < min_periods:
+                continue
+            below = np.searchsorted(buf[:size], x, side='left')
+            equal = np.searchsorted(buf[:size], x, side='right') - below
+            out[i] = (below + (equal + 1) / 2) / size * 100
+
+        return out
+
+
+class RollingUtil:
+
+    ENGINES = ('auto', 'numba', 'sorted')
+
+    @staticmethod
+    def resolve_engine(engine: str = 'auto') -> str:
+        """
+        解析引擎名称
+
+        Args:
+            engine: 'auto' / 'numba' / 'sorted'，auto 在安装 numba 时优先使用 numba
+
+        Returns:
+            str: 实际使用的引擎
+        """
+        if engine not in RollingUtil.ENGINES:
+            raise ValueError(f"未知的滚动引擎: {engine}，可选 {RollingUtil.ENGINES}")
+        if engine == 'auto':
+            return 'numba' if HAS_NUMBA else 'sorted'
+        if engine == 'numba' and not HAS_NUMBA:
+            raise ImportError("numba 未安装，请运行: pip install numba")
+        return engine
+
+    @staticmethod
+    def rolling_mid_rank_percentile(values, window: int, min_length: int = 2,
+                                    engine: str = 'auto') -> np.ndarray:
+        """
+        计算当前值在滚动窗口中的平均排名百分位 (0-100)
+
+        percentile = (小于当前值的个数 + 等于当前值的个数 / 2) / 窗口长度 * 100
+
+        Args:
+            values: 一维数值序列 (ndarray / Series / list)
+            window: 窗口大小
+            min_length: 窗口长度不足时返回 NaN
+            engine: 'auto' / 'numba' / 'sorted'
+
+        Returns:
+            np.ndarray: 百分位序列，当前值为 NaN 时结果为 NaN
+        """
+        arr = np.asarray(values, dtype=np.float64)
+        if window < 1 or len(arr) == 0:
+            return np.full(len(arr), np.nan)
+
+        if RollingUtil.resolve_engine(engine) == 'numba':
+            return _mid_rank_numba(np.ascontiguousarray(arr), window, min_length)
+        return _mid_rank_sorted(arr, window, min_length)
+
+    @staticmethod
+    def rolling_rank_pct(values, window: int, min_periods: int = 1,
+                         engine: str = 'auto') -> np.ndarray:
+        """
+        计算当前值在滚动窗口中的排名百分位 (0-100)，语义同 pandas rank(pct=True, method='average')
+
+        percentile = (小于当前值的个数 + (等于当前值的个数 + 1) / 2) / 窗口内非 NaN 个数 * 100
+
+        Args:
+            values: 一维数值序列 (ndarray / Series / list)，±inf 按 NaN 处理 (同 pandas rolling)
+            window: 窗口大小 (包含 NaN 位置)
+            min_periods: 窗口内非 NaN 个数不足时返回 NaN
+            engine: 'auto' / 'numba' / 'sorted'
+
+        Returns:
+            np.ndarray: 百分位序列，当前值为 NaN 时结果为 NaN
+        """
+        arr = np.asarray(values, dtype=np.float64)
+        if window < 1 or len(arr) == 0:
+            return np.full(len(arr), np.nan)
+        arr = np.where(np.isinf(arr), np.nan, arr)
+
+        if RollingUtil.resolve_engine(engine) == 'numba':
+            return _rank_pct_numba(np.ascontiguousarray(arr), window, min_periods)
+        return _rank_pct_sorted(arr, window, min_periods)
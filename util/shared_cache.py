@@ -0,0 +1,167 @@
+"""
+进程级共享缓存
+
+多个分析器共用的只读数据（上证50市场锚特征、宏观因子等）按名称放在一个共享缓存中：
+- TTL: 条目超过有效期后视为过期（默认一天），调度器每日运行时重新加载一次
+- 数据水位线: 条目记录生成时的数据水位线（如行情列存的最后交易日），水位线变化时视为过期
+- 可选磁盘持久化: <cache>/shared/<name>/<key>.pkl，进程重启/下一次调度运行时可直接复用
+
+使用示例:
+    cache = get_shared_cache('macro', ttl_seconds=86400)
+    df = cache.get('factors', watermark='20240105')
+    if df is None:
+        df = load()
+        cache.put('factors', df, watermark='20240105')
+"""
+
+import os
+import pickle
+import re
+import time
+from typing import Any, Callable, Dict, Optional
+
+from util.config_loader import get_cache_dir
+
+# 默认有效期：一天
+DEFAULT_TTL_SECONDS = 24 * 3600
+
+
+class SharedCache:
+    """
+    带 TTL 和数据水位线的共享缓存
+
+    内存中的条目为同一进程内所有使用方共享；开启 disk 时同时写入磁盘，
+    内存未命中时从磁盘读取（进程池子进程、下一次调度运行均可命中）。
+    """
+
+    def __init__(self, name: str, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 disk: bool = True, cache_dir: Optional[str] = None):
+        """
+        Args:
+            name: 缓存名称（同时作为磁盘子目录名）
+            ttl_seconds: 条目有效期（秒）
+            disk: 是否持久化到磁盘
+            cache_dir: 磁盘目录，默认 <cache>/shared/<name>
+        """
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.disk = disk
+        self._cache_dir = cache_dir
+        self._entries: Dict[str, dict] = {}
+
+    @property
+    def cache_dir(self) -> str:
+        if self._cache_dir is None:
+            self._cache_dir = os.path.join(get_cache_dir('shared'), self.name)
+        os.makedirs(self._cache_dir, exist_ok=True)
+        return self._cache_dir
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, re.sub(r'[^\w.-]', '_', key) + '.pkl')
+
+    def _is_valid(self, entry: Optional[dict], watermark: Optional[str]) -> bool:
+        if entry is None:
+            return False
+        if time.time() - entry['created_at'] > self.ttl_seconds:
+            return False
+        return watermark is None or entry.get('watermark') == watermark
+
+    def _read_disk(self, key: str) -> Optional[dict]:
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return None
+        return entry if isinstance(entry, dict) and 'created_at' in entry else None
+
+    def get(self, key: str, watermark: Optional[str] = None) -> Any:
+        """
+        读取条目
+
+        Args:
+            key: 条目键
+            watermark: 当前数据水位线，与条目记录的不一致时视为未命中；None 时只检查 TTL
+
+        Returns:
+            缓存值，未命中或过期时返回 None
+        """
+        entry = self._entries.get(key)
+        if not self._is_valid(entry, watermark) and self.disk:
+            entry = self._read_disk(key)
+            if self._is_valid(entry, watermark):
+                self._entries[key] = entry
+        return entry['value'] if self._is_valid(entry, watermark) else None
+
+    def put(self, key: str, value: Any, watermark: Optional[str] = None,
+            created_at: Optional[float] = None):
+        """
+        写入条目（开启 disk 时先写临时文件再替换）
+
+        Args:
+            key: 条目键
+            value: 缓存值（需可 pickle）
+            watermark: 生成该值时的数据水位线
+            created_at: 生成时间戳，默认当前时间（注入其他进程导出的条目时保留原时间）
+        """
+        entry = {'value': value, 'watermark': watermark,
+                 'created_at': time.time() if created_at is None else created_at}
+        self._entries[key] = entry
+        if not self.disk:
+            return
+        path = self._path(key)
+        try:
+            with open(path + '.tmp', 'wb') as f:
+                pickle.dump(entry, f)
+            os.replace(path + '.tmp', path)
+        except OSError as e:
+            print(f"  [共享缓存] 写入磁盘失败({e}): {path}")
+
+    def get_or_load(self, key: str, loader: Callable[[], Any],
+                    watermark: Optional[str] = None) -> Any:
+        """未命中时调用 loader 加载并写入"""
+        value = self.get(key, watermark)
+        if value is None:
+            value = loader()
+            self.put(key, value, watermark)
+        return value
+
+    def export_entry(self, key: str) -> Optional[dict]:
+        """导出内存中的条目（传给并行分析的子进程）"""
+        return self._entries.get(key)
+
+    def install_entry(self, key: str, entry: dict):
+        """注入其他进程导出的条目（只写内存）"""
+        self._entries[key] = entry
+
+    def invalidate(self, key: Optional[str] = None):
+        """删除条目，key 为 None 时清空（内存和磁盘）"""
+        keys = [key] if key is not None else list(self._entries)
+        if key is None and self.disk and os.path.isdir(self.cache_dir):
+            keys += [name[:-4] for name in os.listdir(self.cache_dir) if name.endswith('.pkl')]
+        for k in set(keys):
+            self._entries.pop(k, None)
+            if self.disk:
+                path = self._path(k)
+                if os.path.exists(path):
+                    os.remove(path)
+
+
+_SHARED_CACHES: Dict[str, SharedCache] = {}
+
+
+def get_shared_cache(name: str, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                     disk: bool = True) -> SharedCache:
+    """
+    获取进程级共享缓存（同名只创建一次，后续调用返回同一实例）
+
+    Args:
+        name: 缓存名称
+        ttl_seconds: 条目有效期（秒），仅首次创建时生效
+        disk: 是否持久化到磁盘，仅首次创建时生效
+    """
+    if name not in _SHARED_CACHES:
+        _SHARED_CACHES[name] = SharedCache(name, ttl_seconds=ttl_seconds, disk=disk)
+    return _SHARED_CACHES[name]
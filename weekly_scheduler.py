@@ -27,13 +27,8 @@ from typing import List, Dict
 # 添加项目路径
 sys.path.insert(0, r'E:\pycharm\stock-analysis')
 
-from sync.stock.sync_stock_basic import StockBasicSync
-from sync.stock.sync_stock_daily_basic import StockDailyBasicSync
-from sync.stock.sync_financing_margin_trading import FinancingMarginTradingSync
-from sync.index.sync_stock_weight import StockWeightSync
-from sync.stock.sync_income import IncomeSync
-from sync.stock.sync_financial_data import FinancialDataSync
-from sync.index.sixty_index_analysis import SixtyIndexAnalysis
+from sync.sync_dag import format_stage_results, run_stages
+from sync_main import build_sync_stages
 from analysis.index_analyzer import IndexAnalyzer
 from analysis.multi_factor_scorer import MultiFactorScorer
 from analysis.signal_threshold_optimizer import get_aggressive_lite_threshold_optimizer
@@ -86,30 +81,17 @@ class WeeklyScheduler:
         logger.info('=' * 60)
         
         try:
-            # 1. 同步股票基础数据
-            logger.info('[1/6] 同步股票基础数据...')
-            StockBasicSync().sync_all()
+            # 按依赖关系并发执行：股票基础数据 -> 两融/权重/收入/财务 -> 股票日线 -> 指数
+            results = run_stages(build_sync_stages(self.start_date))
+            logger.info('\n' + format_stage_results(results))
             
-            # 2. 同步两融数据
-            logger.info('[2/6] 同步两融数据...')
-            FinancingMarginTradingSync().additional_data()
-            
-            # 3. 同步权重数据
-            logger.info('[3/6] 同步权重数据...')
-            StockWeightSync().additional_data()
-            
-            # 4. 同步财务数据
-            logger.info('[4/6] 同步财务数据...')
-            IncomeSync().additional_data()
-            FinancialDataSync().additional_data()
-            
-            # 5. 同步股票日线数据
-            logger.info('[5/6] 同步股票日线数据...')
-            StockDailyBasicSync().sync_all()
-            
-            # 6. 同步指数数据（最后，依赖上述数据）
-            logger.info('[6/6] 同步指数数据...')
-            SixtyIndexAnalysis().additional_data(self.start_date)
+            failed = [r for r in results if not r.ok]
+            if failed:
+                for r in failed:
+                    logger.error(f'[ERROR] {r.description} ({r.name}) {r.status}: {r.error}')
+                    if r.traceback:
+                        logger.error(r.traceback)
+                return False
             
             logger.info('=' * 60)
             logger.info('[OK] 数据同步完成！')